@@ -31,6 +31,7 @@ from kiln_ai.datamodel.dataset_split import (
     Train80Test10Val10SplitDefinition,
     Train80Test20SplitDefinition,
 )
+from kiln_ai.datamodel.tag_index import TagQuery
 from kiln_ai.utils.name_generator import generate_memorable_name
 from kiln_server.task_api import task_from_id
 from pydantic import BaseModel
@@ -76,6 +77,7 @@ class CreateDatasetSplitRequest(BaseModel):
     filter_type: DatasetFilterType
     name: str | None = None
     description: str | None = None
+    tag_filter: TagQuery | None = None
 
 
 class CreateFinetuneRequest(BaseModel):
@@ -208,6 +210,7 @@ def connect_fine_tune_api(app: FastAPI):
             split_definitions,
             filter_type=request.filter_type,
             description=request.description,
+            tag_filter=request.tag_filter,
         )
         dataset_split.save_to_file()
         return dataset_split
@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any, Dict, List
 
+import httpx
 import openai
 import requests
 from fastapi import FastAPI, HTTPException
@@ -16,6 +17,8 @@ from kiln_ai.adapters.ml_model_list import (
 )
 from kiln_ai.adapters.ollama_tools import (
     OllamaConnection,
+    OllamaDiscovery,
+    get_ollama_connection,
     ollama_base_url,
     parse_ollama_tags,
 )
@@ -44,8 +47,9 @@ async def connect_ollama(custom_ollama_url: str | None = None) -> OllamaConnecti
 
     try:
         base_url = custom_ollama_url or ollama_base_url()
-        tags = requests.get(base_url + "/api/tags", timeout=5).json()
-    except requests.exceptions.ConnectionError:
+        # Always a fresh check, which also updates the cache used for model discovery
+        tags = await OllamaDiscovery.shared().refresh(base_url)
+    except httpx.ConnectError:
         raise HTTPException(
             status_code=417,
             detail="Failed to connect. Ensure Ollama app is running.",
@@ -516,9 +520,12 @@ async def connect_bedrock(key_data: dict):
 
 
 async def available_ollama_models() -> AvailableModels | None:
-    # Try to connect to Ollama, and get the list of installed models
+    # Try to connect to Ollama, and get the list of installed models. Cached, so listing models doesn't wait on Ollama.
     try:
-        ollama_connection = await connect_ollama()
+        ollama_connection = await get_ollama_connection()
+        if ollama_connection is None:
+            # skip ollama if it's not available
+            return None
         ollama_models = AvailableModels(
             provider_name=provider_name_from_id(ModelProviderName.ollama),
             provider_id=ModelProviderName.ollama,
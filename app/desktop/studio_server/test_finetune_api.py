@@ -391,6 +391,32 @@ def test_create_dataset_split_auto_name(
         save_mock.assert_called_once()
 
 
+def test_create_dataset_split_with_tag_filter(
+    client, mock_task_from_id_disk_backed, mock_dataset_split
+):
+    mock_from_task = unittest.mock.patch.object(
+        DatasetSplit, "from_task", return_value=mock_dataset_split
+    )
+    mock_save = unittest.mock.patch.object(DatasetSplit, "save_to_file")
+
+    with mock_from_task as from_task_mock, mock_save:
+        request_data = {
+            "dataset_split_type": "train_test",
+            "filter_type": "all",
+            "tag_filter": {"all_tags": ["reviewed"], "exclude_tags": ["bad"]},
+        }
+
+        response = client.post(
+            "/api/projects/project1/tasks/task1/dataset_splits", json=request_data
+        )
+
+        assert response.status_code == 200
+        tag_filter = from_task_mock.call_args.kwargs["tag_filter"]
+        assert tag_filter.all_tags == ["reviewed"]
+        assert tag_filter.any_tags == []
+        assert tag_filter.exclude_tags == ["bad"]
+
+
 def test_create_dataset_split_request_validation():
     # Test valid request
     request = CreateDatasetSplitRequest(
@@ -2,6 +2,7 @@ import json
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, Mock, patch
 
+import httpx
 import pytest
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
@@ -13,6 +14,7 @@ from kiln_ai.adapters.ml_model_list import (
     ModelProviderName,
     built_in_models,
 )
+from kiln_ai.adapters.ollama_tools import OllamaDiscovery
 from kiln_ai.utils.config import Config
 
 from app.desktop.studio_server.provider_api import (
@@ -369,7 +371,7 @@ async def test_get_available_models(app, client):
         ),
     ]
 
-    # Mock connect_ollama
+    # Mock the Ollama connection
     mock_ollama_connection = OllamaConnection(
         message="Connected", supported_models=["ollama_model1", "ollama_model2:latest"]
     )
@@ -388,7 +390,7 @@ async def test_get_available_models(app, client):
             mock_built_in_models,
         ),
         patch(
-            "app.desktop.studio_server.provider_api.connect_ollama",
+            "app.desktop.studio_server.provider_api.get_ollama_connection",
             return_value=mock_ollama_connection,
         ),
     ):
@@ -462,7 +464,7 @@ async def test_get_available_models_ollama_exception(app, client):
         ),
     ]
 
-    # Mock connect_ollama to raise an HTTPException
+    # Ollama not available
     with (
         patch(
             "app.desktop.studio_server.provider_api.Config.shared",
@@ -477,8 +479,8 @@ async def test_get_available_models_ollama_exception(app, client):
             mock_built_in_models,
         ),
         patch(
-            "app.desktop.studio_server.provider_api.connect_ollama",
-            side_effect=HTTPException(status_code=500),
+            "app.desktop.studio_server.provider_api.get_ollama_connection",
+            return_value=None,
         ),
     ):
         response = client.get("/api/available_models")
@@ -638,7 +640,7 @@ async def test_available_ollama_models():
     with (
         patch("app.desktop.studio_server.provider_api.built_in_models", test_models),
         patch(
-            "app.desktop.studio_server.provider_api.connect_ollama",
+            "app.desktop.studio_server.provider_api.get_ollama_connection",
             return_value=mock_ollama_connection,
         ),
     ):
@@ -677,7 +679,7 @@ async def test_available_ollama_models():
     with (
         patch("app.desktop.studio_server.provider_api.built_in_models", test_models),
         patch(
-            "app.desktop.studio_server.provider_api.connect_ollama",
+            "app.desktop.studio_server.provider_api.get_ollama_connection",
             return_value=mock_ollama_connection,
         ),
     ):
@@ -686,8 +688,8 @@ async def test_available_ollama_models():
 
     # Test when Ollama connection fails
     with patch(
-        "app.desktop.studio_server.provider_api.connect_ollama",
-        side_effect=HTTPException(status_code=417, detail="Failed to connect"),
+        "app.desktop.studio_server.provider_api.get_ollama_connection",
+        return_value=None,
     ):
         result = await available_ollama_models()
         assert result is None
@@ -700,7 +702,7 @@ async def test_available_ollama_models():
     with (
         patch("app.desktop.studio_server.provider_api.built_in_models", test_models),
         patch(
-            "app.desktop.studio_server.provider_api.connect_ollama",
+            "app.desktop.studio_server.provider_api.get_ollama_connection",
             return_value=mock_ollama_connection,
         ),
     ):
@@ -798,11 +800,12 @@ async def test_connect_ollama_rejects_invalid_url_format():
 async def test_connect_ollama_uses_custom_url_when_provided():
     mock_tags_response = {"models": []}
     with (
-        patch("requests.get") as mock_get,
+        patch.object(
+            OllamaDiscovery, "refresh", return_value=mock_tags_response
+        ) as mock_refresh,
         patch("app.desktop.studio_server.provider_api.parse_ollama_tags") as mock_parse,
         patch("app.desktop.studio_server.provider_api.Config.shared") as mock_config,
     ):
-        mock_get.return_value.json.return_value = mock_tags_response
         mock_parse.return_value = OllamaConnection(
             message="Connected", supported_models=[]
         )
@@ -810,20 +813,21 @@ async def test_connect_ollama_uses_custom_url_when_provided():
 
         await connect_ollama("http://custom-url:11434")
 
-        mock_get.assert_called_once_with("http://custom-url:11434/api/tags", timeout=5)
+        mock_refresh.assert_called_once_with("http://custom-url:11434")
 
 
 @pytest.mark.asyncio
 async def test_connect_ollama_uses_default_url_when_no_custom_url():
     mock_tags_response = {"models": []}
     with (
-        patch("requests.get") as mock_get,
+        patch.object(
+            OllamaDiscovery, "refresh", return_value=mock_tags_response
+        ) as mock_refresh,
         patch("app.desktop.studio_server.provider_api.parse_ollama_tags") as mock_parse,
         patch(
             "app.desktop.studio_server.provider_api.ollama_base_url"
         ) as mock_base_url,
     ):
-        mock_get.return_value.json.return_value = mock_tags_response
         mock_parse.return_value = OllamaConnection(
             message="Connected", supported_models=[]
         )
@@ -831,18 +835,28 @@ async def test_connect_ollama_uses_default_url_when_no_custom_url():
 
         await connect_ollama(None)
 
-        mock_get.assert_called_once_with("http://default-url:11434/api/tags", timeout=5)
+        mock_refresh.assert_called_once_with("http://default-url:11434")
+
+
+async def test_connect_ollama_connection_error():
+    with patch.object(
+        OllamaDiscovery, "refresh", side_effect=httpx.ConnectError("refused")
+    ):
+        with pytest.raises(HTTPException) as exc_info:
+            await connect_ollama(None)
+    assert exc_info.value.status_code == 417
 
 
 @pytest.mark.asyncio
 async def test_connect_ollama_saves_custom_url_on_success():
     mock_tags_response = {"models": []}
     with (
-        patch("requests.get") as mock_get,
+        patch.object(
+            OllamaDiscovery, "refresh", return_value=mock_tags_response
+        ) as mock_refresh,
         patch("app.desktop.studio_server.provider_api.parse_ollama_tags") as mock_parse,
         patch("app.desktop.studio_server.provider_api.Config.shared") as mock_config,
     ):
-        mock_get.return_value.json.return_value = mock_tags_response
         mock_parse.return_value = OllamaConnection(
             message="Connected", supported_models=[]
         )
@@ -853,6 +867,8 @@ async def test_connect_ollama_saves_custom_url_on_success():
 
         await connect_ollama("http://new-url:11434")
 
+        mock_refresh.assert_awaited_once_with("http://new-url:11434")
+
         mock_config_instance.save_setting.assert_called_once_with(
             "ollama_base_url", "http://new-url:11434"
         )
@@ -862,11 +878,12 @@ async def test_connect_ollama_saves_custom_url_on_success():
 async def test_connect_ollama_does_not_save_unchanged_url():
     mock_tags_response = {"models": []}
     with (
-        patch("requests.get") as mock_get,
+        patch.object(
+            OllamaDiscovery, "refresh", return_value=mock_tags_response
+        ) as mock_refresh,
         patch("app.desktop.studio_server.provider_api.parse_ollama_tags") as mock_parse,
         patch("app.desktop.studio_server.provider_api.Config.shared") as mock_config,
     ):
-        mock_get.return_value.json.return_value = mock_tags_response
         mock_parse.return_value = OllamaConnection(
             message="Connected", supported_models=[]
         )
@@ -877,6 +894,8 @@ async def test_connect_ollama_does_not_save_unchanged_url():
 
         await connect_ollama("http://same-url:11434")
 
+        mock_refresh.assert_awaited_once_with("http://same-url:11434")
+
         mock_config_instance.save_setting.assert_not_called()
 
 
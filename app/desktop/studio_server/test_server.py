@@ -2,10 +2,11 @@ import os
 import tempfile
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
-import requests
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from kiln_ai.adapters.ollama_tools import OllamaDiscovery
 from kiln_ai.datamodel.strict_mode import strict_mode
 
 from app.desktop.desktop_server import make_app
@@ -40,10 +41,8 @@ def test_strict_mode(client):
 
 
 def test_connect_ollama_success(client):
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.json.return_value = {
-            "models": [{"model": "phi3.5:latest"}]
-        }
+    with patch.object(OllamaDiscovery, "fetch_tags") as mock_fetch:
+        mock_fetch.return_value = {"models": [{"model": "phi3.5:latest"}]}
         response = client.get("/api/provider/ollama/connect")
         assert response.status_code == 200
         assert response.json() == {
@@ -54,8 +53,8 @@ def test_connect_ollama_success(client):
 
 
 def test_connect_ollama_connection_error(client):
-    with patch("requests.get") as mock_get:
-        mock_get.side_effect = requests.exceptions.ConnectionError
+    with patch.object(OllamaDiscovery, "fetch_tags") as mock_fetch:
+        mock_fetch.side_effect = httpx.ConnectError("Connection refused")
         response = client.get("/api/provider/ollama/connect")
         assert response.status_code == 417
         assert response.json() == {
@@ -64,8 +63,8 @@ def test_connect_ollama_connection_error(client):
 
 
 def test_connect_ollama_general_exception(client):
-    with patch("requests.get") as mock_get:
-        mock_get.side_effect = Exception("Test exception")
+    with patch.object(OllamaDiscovery, "fetch_tags") as mock_fetch:
+        mock_fetch.side_effect = Exception("Test exception")
         response = client.get("/api/provider/ollama/connect")
         assert response.status_code == 500
         assert response.json() == {
@@ -74,8 +73,8 @@ def test_connect_ollama_general_exception(client):
 
 
 def test_connect_ollama_no_models(client):
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.json.return_value = {"models": []}
+    with patch.object(OllamaDiscovery, "fetch_tags") as mock_fetch:
+        mock_fetch.return_value = {"models": []}
         response = client.get("/api/provider/ollama/connect")
         assert response.status_code == 200
         r = response.json()
@@ -216,3 +215,17 @@ async def test_setup_route(client):
         client.get("/non_existing_file")
     with pytest.raises(Exception):
         client.get("/nested/non_existing_file")
+
+
+def test_profiler(monkeypatch):
+    monkeypatch.setenv("KILN_PROFILER", "true")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with patch(
+            "app.desktop.studio_server.webhost.studio_path", new=lambda: temp_dir
+        ):
+            with TestClient(make_app()) as client:
+                response = client.get("/ping", headers={"X-Kiln-Profile": "true"})
+                assert response.status_code == 200
+                assert "server-timing" in response.headers
+                profiles = client.get("/api/debug/profiles").json()
+                assert [profile["path"] for profile in profiles] == ["/ping"]
@@ -0,0 +1,192 @@
+"""
+A cache of adapters, so runs reuse initialized models and prebuilt request options.
+
+Building an adapter is cheap, but the first run of each adapter isn't: LangchainAdapter builds its chat model and structured output wrapper, and OpenAICompatibleAdapter builds its structured output options from the task's schema. Both are kept on the adapter instance, and reused by each run of a cached adapter.
+
+Adapters are cached by task path, model, provider, prompt builder and tags, and dropped when:
+ - The task, or anything in its folder other than a run, is saved or deleted (see model_events). Prompt builders read runs when building each prompt, so runs don't need to invalidate. Unsaved edits to a task aren't seen until it's saved.
+ - Settings change (API keys, custom providers and models), tracked by the config's settings version.
+ - Another process changes the data, in multi-process mode (see multi_process).
+
+Adapters are shared by concurrent runs, as they are for batch runs. Unsaved tasks (eg the data gen tasks, built per request) aren't cached.
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from kiln_ai import datamodel
+from kiln_ai.adapters.adapter_registry import adapter_for_task
+from kiln_ai.adapters.ml_model_list import ModelProviderName
+from kiln_ai.adapters.model_adapters.base_adapter import BaseAdapter
+from kiln_ai.adapters.prompt_builders import BasePromptBuilder
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.utils.config import Config
+
+MAX_CACHED_ADAPTERS = 64
+
+AdapterKey = tuple[Path, str, str, str, str | None, tuple[str, ...]]
+
+
+def adapter_key(
+    task: datamodel.Task,
+    model_name: str,
+    provider: ModelProviderName,
+    prompt_builder: BasePromptBuilder | None,
+    tags: list[str] | None,
+) -> AdapterKey | None:
+    if task.path is None:
+        return None
+    builder_name = (
+        prompt_builder.__class__.prompt_builder_name() if prompt_builder else ""
+    )
+    prompt_id = prompt_builder.prompt_id() if prompt_builder else None
+    return (
+        task.path,
+        model_name,
+        provider.value,
+        builder_name,
+        prompt_id,
+        tuple(tags or []),
+    )
+
+
+class AdapterCache:
+    """
+    The most recently used adapters, up to max_size. Use `adapter_for_task` as a drop in for the adapter registry's.
+    """
+
+    _shared_instance = None
+
+    def __init__(self, max_size: int = MAX_CACHED_ADAPTERS):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._adapters: OrderedDict[AdapterKey, BaseAdapter] = OrderedDict()
+        self._listening = False
+        # The config and settings version the cached adapters were built with
+        self._settings: tuple[Config, int] | None = None
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def _listen(self) -> None:
+        # Must hold the lock
+        if not self._listening:
+            ModelEvents.shared().add_listener(self.on_model_event)
+            MultiProcess.shared().add_reset_listener(self.on_reset)
+            self._listening = True
+
+    def _check_settings(self) -> None:
+        # Must hold the lock
+        config = Config.shared()
+        current = self._settings
+        if (
+            current is None
+            or current[0] is not config
+            or current[1] != config.settings_version()
+        ):
+            self._adapters.clear()
+            self._settings = (config, config.settings_version())
+
+    def adapter_for_task(
+        self,
+        kiln_task: datamodel.Task,
+        model_name: str,
+        provider: ModelProviderName,
+        prompt_builder: BasePromptBuilder | None = None,
+        tags: list[str] | None = None,
+    ) -> BaseAdapter:
+        key = adapter_key(kiln_task, model_name, provider, prompt_builder, tags)
+        if key is None:
+            return adapter_for_task(
+                kiln_task,
+                model_name=model_name,
+                provider=provider,
+                prompt_builder=prompt_builder,
+                tags=tags,
+            )
+
+        with self._lock:
+            self._listen()
+            self._check_settings()
+            settings = self._settings
+            adapter = self._adapters.get(key)
+            if adapter is not None:
+                self._adapters.move_to_end(key)
+                return adapter
+
+        adapter = adapter_for_task(
+            kiln_task,
+            model_name=model_name,
+            provider=provider,
+            prompt_builder=prompt_builder,
+            tags=tags,
+        )
+        with self._lock:
+            self._check_settings()
+            if self._settings != settings:
+                # Settings changed while building: don't cache an adapter built with the old ones
+                return adapter
+            # Another thread may have built one first: keep the first, so its models are reused
+            adapter = self._adapters.setdefault(key, adapter)
+            self._adapters.move_to_end(key)
+            while len(self._adapters) > self.max_size:
+                self._adapters.popitem(last=False)
+        return adapter
+
+    def invalidate(self, task_path: Path | None = None) -> None:
+        """Drop cached adapters for a task (or all of them)."""
+        with self._lock:
+            if task_path is None:
+                self._adapters.clear()
+                return
+            for key in [key for key in self._adapters if key[0] == task_path]:
+                del self._adapters[key]
+
+    def on_reset(self, changes: list[Change] | None) -> None:
+        """Drop cached adapters of tasks changed by another process."""
+        if changes is not None:
+            changes = [
+                change
+                for change in changes
+                if change.path.name != datamodel.TaskRun.base_filename()
+            ]
+            if not changes:
+                return
+        if changes is None or any(
+            change.path.name == datamodel.Finetune.base_filename() for change in changes
+        ):
+            # Fine-tune prompt builders can load fine-tunes from any task
+            self.invalidate()
+            return
+        with self._lock:
+            for key in [
+                key for key in self._adapters if changed_within(changes, key[0].parent)
+            ]:
+                del self._adapters[key]
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        if isinstance(event.model, datamodel.TaskRun):
+            return
+        if isinstance(event.model, datamodel.Finetune):
+            # Fine-tune prompt builders can load fine-tunes from any task
+            self.invalidate()
+            return
+        with self._lock:
+            stale = [
+                key
+                for key in self._adapters
+                # Saved in the task's folder, or deleted a folder containing the task
+                if event.path.is_relative_to(key[0].parent)
+                or key[0].is_relative_to(event.path.parent)
+            ]
+            for key in stale:
+                del self._adapters[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._adapters)
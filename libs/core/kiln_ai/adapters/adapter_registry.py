@@ -4,6 +4,7 @@ from kiln_ai import datamodel
 from kiln_ai.adapters.ml_model_list import ModelProviderName
 from kiln_ai.adapters.model_adapters.base_adapter import BaseAdapter
 from kiln_ai.adapters.model_adapters.langchain_adapters import LangchainAdapter
+from kiln_ai.adapters.model_adapters.ollama_adapter import OllamaAdapter
 from kiln_ai.adapters.model_adapters.openai_model_adapter import (
     OpenAICompatibleAdapter,
     OpenAICompatibleConfig,
@@ -14,6 +15,66 @@ from kiln_ai.utils.config import Config
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
 
 
+def openrouter_config(model_name: str, provider: str) -> OpenAICompatibleConfig:
+    return OpenAICompatibleConfig(
+        base_url=getenv("OPENROUTER_BASE_URL") or "https://openrouter.ai/api/v1",
+        api_key=Config.shared().open_router_api_key,
+        model_name=model_name,
+        provider_name=provider,
+        openrouter_style_reasoning=True,
+        default_headers={
+            "HTTP-Referer": "https://getkiln.ai/openrouter",
+            "X-Title": "KilnAI",
+        },
+    )
+
+
+def openai_config(model_name: str, provider: str) -> OpenAICompatibleConfig:
+    return OpenAICompatibleConfig(
+        api_key=Config.shared().open_ai_api_key,
+        model_name=model_name,
+        provider_name=provider,
+    )
+
+
+def groq_config(model_name: str, provider: str) -> OpenAICompatibleConfig:
+    return OpenAICompatibleConfig(
+        base_url="https://api.groq.com/openai/v1",
+        api_key=Config.shared().groq_api_key,
+        model_name=model_name,
+        provider_name=provider,
+    )
+
+
+def fireworks_config(model_name: str, provider: str) -> OpenAICompatibleConfig:
+    return OpenAICompatibleConfig(
+        base_url="https://api.fireworks.ai/inference/v1",
+        api_key=Config.shared().fireworks_api_key,
+        model_name=model_name,
+        provider_name=provider,
+    )
+
+
+def connected_openai_compatible_configs() -> list[OpenAICompatibleConfig]:
+    """
+    A config for each connected provider run by OpenAICompatibleAdapter, for connection warm-up. The model name is left empty: connections are shared by all models of a provider.
+    """
+    configs = []
+    if Config.shared().open_router_api_key:
+        configs.append(openrouter_config("", ModelProviderName.openrouter))
+    if Config.shared().open_ai_api_key:
+        configs.append(openai_config("", ModelProviderName.openai))
+    if Config.shared().groq_api_key:
+        configs.append(groq_config("", ModelProviderName.groq))
+    if Config.shared().fireworks_api_key:
+        configs.append(fireworks_config("", ModelProviderName.fireworks_ai))
+    for provider in Config.shared().openai_compatible_providers or []:
+        name = provider.get("name")
+        if name and provider.get("base_url"):
+            configs.append(openai_compatible_config(f"{name}::"))
+    return configs
+
+
 def adapter_for_task(
     kiln_task: datamodel.Task,
     model_name: str,
@@ -28,29 +89,14 @@ def adapter_for_task(
         case ModelProviderName.openrouter:
             return OpenAICompatibleAdapter(
                 kiln_task=kiln_task,
-                config=OpenAICompatibleConfig(
-                    base_url=getenv("OPENROUTER_BASE_URL")
-                    or "https://openrouter.ai/api/v1",
-                    api_key=Config.shared().open_router_api_key,
-                    model_name=model_name,
-                    provider_name=provider,
-                    openrouter_style_reasoning=True,
-                    default_headers={
-                        "HTTP-Referer": "https://getkiln.ai/openrouter",
-                        "X-Title": "KilnAI",
-                    },
-                ),
+                config=openrouter_config(model_name, provider),
                 prompt_builder=prompt_builder,
                 tags=tags,
             )
         case ModelProviderName.openai:
             return OpenAICompatibleAdapter(
                 kiln_task=kiln_task,
-                config=OpenAICompatibleConfig(
-                    api_key=Config.shared().open_ai_api_key,
-                    model_name=model_name,
-                    provider_name=provider,
-                ),
+                config=openai_config(model_name, provider),
                 prompt_builder=prompt_builder,
                 tags=tags,
             )
@@ -62,15 +108,31 @@ def adapter_for_task(
                 prompt_builder=prompt_builder,
                 tags=tags,
             )
-        # Use LangchainAdapter for the rest
         case ModelProviderName.groq:
-            pass
+            return OpenAICompatibleAdapter(
+                kiln_task=kiln_task,
+                config=groq_config(model_name, provider),
+                prompt_builder=prompt_builder,
+                tags=tags,
+            )
+        case ModelProviderName.fireworks_ai:
+            return OpenAICompatibleAdapter(
+                kiln_task=kiln_task,
+                config=fireworks_config(model_name, provider),
+                prompt_builder=prompt_builder,
+                tags=tags,
+            )
+        # Use LangchainAdapter for the rest
         case ModelProviderName.amazon_bedrock:
             pass
         case ModelProviderName.ollama:
-            pass
-        case ModelProviderName.fireworks_ai:
-            pass
+            return OllamaAdapter(
+                kiln_task=kiln_task,
+                model_name=model_name,
+                provider=provider,
+                prompt_builder=prompt_builder,
+                tags=tags,
+            )
         # These are virtual providers that should have mapped to an actual provider in core_provider
         case ModelProviderName.kiln_fine_tune:
             raise ValueError(
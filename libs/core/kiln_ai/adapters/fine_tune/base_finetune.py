@@ -3,7 +3,7 @@ from typing import Literal
 
 from pydantic import BaseModel
 
-from kiln_ai.adapters.ml_model_list import built_in_models
+from kiln_ai.adapters.ml_model_list import built_in_model_index, built_in_models
 from kiln_ai.datamodel import DatasetSplit, FinetuneDataStrategy, FineTuneStatusType
 from kiln_ai.datamodel import Finetune as FinetuneModel
 from kiln_ai.utils.name_generator import generate_memorable_name
@@ -178,13 +178,10 @@ class BaseFinetuneAdapter(ABC):
         """
         Check if the provider and base model are valid.
         """
-        for model in built_in_models:
-            for provider in model.providers:
-                if (
-                    provider.name == provider_id
-                    and provider.provider_finetune_id == provider_base_model_id
-                ):
-                    return
+        if (provider_id, provider_base_model_id) in built_in_model_index(
+            built_in_models
+        ).finetunable:
+            return
         raise ValueError(
             f"Provider {provider_id} with base model {provider_base_model_id} is not available"
         )
@@ -956,3 +956,37 @@ built_in_models: List[KilnModel] = [
         ],
     ),
 ]
+
+
+class BuiltInModelIndex:
+    """
+    Lookups over a list of models by model name, and by model and provider name. Where names repeat, the first in the list wins (matching a linear search).
+    """
+
+    def __init__(self, models: List[KilnModel]):
+        self.models = models
+        self.by_name: Dict[str, KilnModel] = {}
+        self.providers: Dict[tuple[str, str], KilnModelProvider] = {}
+        # (provider name, provider_finetune_id) of each base model which can be fine-tuned
+        self.finetunable: set[tuple[str, str]] = set()
+        for model in models:
+            self.by_name.setdefault(model.name, model)
+            for provider in model.providers:
+                self.providers.setdefault((model.name, provider.name), provider)
+                if provider.provider_finetune_id is not None:
+                    self.finetunable.add((provider.name, provider.provider_finetune_id))
+
+
+_built_in_model_index: BuiltInModelIndex | None = None
+
+
+def built_in_model_index(models: List[KilnModel]) -> BuiltInModelIndex:
+    """
+    The index of built_in_models. Callers pass the list they imported, so a replaced list (eg patched in tests) is indexed instead.
+    """
+    global _built_in_model_index
+    index = _built_in_model_index
+    if index is None or index.models is not models:
+        index = BuiltInModelIndex(models)
+        _built_in_model_index = index
+    return index
@@ -8,11 +8,13 @@ Model adapters are used to call AI models, like Ollama, OpenAI, etc.
 from . import (
     base_adapter,
     langchain_adapters,
+    ollama_adapter,
     openai_model_adapter,
 )
 
 __all__ = [
     "base_adapter",
     "langchain_adapters",
+    "ollama_adapter",
     "openai_model_adapter",
 ]
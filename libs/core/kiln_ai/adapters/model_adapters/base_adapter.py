@@ -1,22 +1,47 @@
+import asyncio
+import hashlib
 import json
+import time
+import warnings
 from abc import ABCMeta, abstractmethod
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Dict, Literal, Tuple
+from typing import AsyncGenerator, AsyncIterator, Dict, Literal, Sequence, Tuple
 
 from kiln_ai.adapters.ml_model_list import KilnModelProvider, StructuredOutputMode
+from kiln_ai.adapters.parsers.base_parser import StreamSplitter
 from kiln_ai.adapters.parsers.parser_registry import model_parser_from_id
 from kiln_ai.adapters.prompt_builders import BasePromptBuilder, SimplePromptBuilder
 from kiln_ai.adapters.provider_tools import kiln_model_provider_from
-from kiln_ai.adapters.run_output import RunOutput
+from kiln_ai.adapters.rate_limits import RateLimits, estimate_tokens
+from kiln_ai.adapters.response_cache import (
+    CACHE_HIT_PROPERTY,
+    CACHE_VERSION,
+    ResponseCache,
+    ResponseCacheMode,
+    response_cache_enabled,
+)
+from kiln_ai.adapters.retry_policy import RetryPolicies
+from kiln_ai.adapters.run_output import RunOutput, StreamChannel, StreamDelta
+from kiln_ai.adapters.run_usage import with_cost
 from kiln_ai.datamodel import (
     DataSource,
     DataSourceType,
+    RunTimings,
     Task,
     TaskOutput,
     TaskRun,
+    Usage,
 )
+from kiln_ai.datamodel.batch_writer import save_all
 from kiln_ai.datamodel.json_schema import validate_schema
 from kiln_ai.utils.config import Config
+from kiln_ai.utils.timing import (
+    TimingCategory,
+    TimingRecorder,
+    record_timings,
+    timed,
+)
 
 
 @dataclass
@@ -30,6 +55,73 @@ class AdapterInfo:
 
 COT_FINAL_ANSWER_PROMPT = "Considering the above, return a final result."
 
+DEFAULT_BATCH_CONCURRENCY = 8
+# invoke_batch writes completed runs to disk in groups of this size
+SAVE_BATCH_SIZE = 16
+
+
+@dataclass
+class BatchResult:
+    # Index of the input in the inputs passed to invoke_batch
+    index: int
+    input: Dict | str
+    # The run (saved if the batch saves), or the error for this input
+    run: TaskRun | None = None
+    error: Exception | None = None
+
+
+# The adapter running a batch in this task, and its prompt: built once for the whole batch. Set within each of the batch's own tasks, so other callers of the same adapter build their own.
+_batch_prompt: ContextVar[Tuple["BaseAdapter", str] | None] = ContextVar(
+    "batch_prompt", default=None
+)
+
+
+def output_text(output: Dict | str) -> str:
+    """An output as streamed: structured outputs are JSON."""
+    return (
+        json.dumps(output, ensure_ascii=False) if isinstance(output, dict) else output
+    )
+
+
+def run_timings(recorder: TimingRecorder, total_seconds: float) -> RunTimings:
+    seconds = recorder.seconds()
+
+    def ms(category: TimingCategory) -> float:
+        return round(seconds.get(category, 0.0) * 1000, 3)
+
+    return RunTimings(
+        total_ms=round(total_seconds * 1000, 3),
+        prompt_build_ms=ms(TimingCategory.prompt_build),
+        provider_call_ms=ms(TimingCategory.provider_call),
+        parsing_ms=ms(TimingCategory.parsing),
+        validation_ms=ms(TimingCategory.validation),
+    )
+
+
+def save_runs(runs: Sequence[TaskRun]) -> list[Exception | None]:
+    """Write runs with save_all, recording each run's share of the write time in its timings. Returns the error for each run (None if saved)."""
+    start = time.perf_counter()
+    errors = save_all(runs)
+    save_ms = round((time.perf_counter() - start) * 1000 / max(len(runs), 1), 3)
+    for run in runs:
+        if run.timings is not None:
+            run.timings.save_ms = save_ms
+    return errors
+
+
+def stream_deltas(run_output: RunOutput) -> list[StreamDelta]:
+    """A complete response as stream deltas: one per intermediate output, then the output."""
+    deltas = []
+    intermediate_outputs = run_output.intermediate_outputs or {}
+    channel: StreamChannel
+    for channel in ("chain_of_thought", "reasoning"):
+        if intermediate_outputs.get(channel):
+            deltas.append(
+                StreamDelta(channel=channel, text=intermediate_outputs[channel])
+            )
+    deltas.append(StreamDelta(channel="output", text=output_text(run_output.output)))
+    return deltas
+
 
 class BaseAdapter(metaclass=ABCMeta):
     """Base class for AI model adapters that handle task execution.
@@ -83,8 +175,9 @@ class BaseAdapter(metaclass=ABCMeta):
         self,
         input: Dict | str,
         input_source: DataSource | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
     ) -> Dict | str:
-        result = await self.invoke(input, input_source)
+        result = await self.invoke(input, input_source, cache_mode)
         if self.kiln_task.output_json_schema is None:
             return result.output.output
         else:
@@ -94,22 +187,234 @@ class BaseAdapter(metaclass=ABCMeta):
         self,
         input: Dict | str,
         input_source: DataSource | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
     ) -> TaskRun:
-        # validate input
+        run = await self.invoke_unsaved(input, input_source, cache_mode)
+
+        # Save the run if configured to do so, and we have a path to save to
+        if self.autosave_runs():
+            self.save_run(run)
+        else:
+            # Clear the ID to indicate it's not persisted
+            run.id = None
+
+        return run
+
+    async def invoke_unsaved(
+        self,
+        input: Dict | str,
+        input_source: DataSource | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
+    ) -> TaskRun:
+        """
+        Run the task and build the resulting TaskRun, without saving it. Used by callers who write runs in batches: check autosave_runs() and save them yourself.
+
+        When the response cache is enabled in settings, cache_mode controls its use for this call (see kiln_ai.adapters.response_cache).
+
+        The run records the tokens used (see kiln_ai.adapters.run_usage) and where the time went.
+        """
+        start = time.perf_counter()
+        with record_timings() as recorder:
+            self.validate_input(input)
+
+            # Run, or reuse a cached response
+            cache_key, run_output = await self.cached_response(input, cache_mode)
+            cache_hit = run_output is not None
+            if run_output is None:
+                with timed(TimingCategory.provider_call):
+                    run_output = await self.call_model(input)
+
+            run = await self.finish_run(
+                input, input_source, run_output, cache_key, cache_hit
+            )
+        run.timings = run_timings(recorder, time.perf_counter() - start)
+        return run
+
+    async def invoke_stream(
+        self,
+        input: Dict | str,
+        input_source: DataSource | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
+    ) -> AsyncIterator[StreamDelta | TaskRun]:
+        """
+        Run the task, yielding the response as it's generated: StreamDelta text for the output, reasoning and chain of thought, as they arrive.
+
+        Once the response is complete it's parsed, validated and saved (as with invoke), and the TaskRun is the last item yielded. Streamed text is the raw response: the run's output is the parsed version.
+        """
+        start = time.perf_counter()
+        # Only active while our code runs, not while the caller handles each item
+        with record_timings() as recorder:
+            self.validate_input(input)
+            cache_key, run_output = await self.cached_response(input, cache_mode)
+        cache_hit = run_output is not None
+        if run_output is not None:
+            for delta in stream_deltas(run_output):
+                yield delta
+        else:
+            stream = aiter(self.stream_model(input))
+            while True:
+                with record_timings(recorder), timed(TimingCategory.provider_call):
+                    item = await anext(stream, None)
+                if item is None:
+                    break
+                if isinstance(item, RunOutput):
+                    run_output = item
+                else:
+                    yield item
+            if run_output is None:
+                raise RuntimeError("Model stream ended without a response.")
+
+        with record_timings(recorder):
+            run = await self.finish_run(
+                input, input_source, run_output, cache_key, cache_hit
+            )
+        run.timings = run_timings(recorder, time.perf_counter() - start)
+        if self.autosave_runs():
+            self.save_run(run)
+        else:
+            # Clear the ID to indicate it's not persisted
+            run.id = None
+        yield run
+
+    async def invoke_batch(
+        self,
+        inputs: Sequence[Dict | str],
+        input_source: DataSource | Sequence[DataSource | None] | None = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        save: bool | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
+        save_batch_size: int = SAVE_BATCH_SIZE,
+    ) -> AsyncGenerator[BatchResult, None]:
+        """
+        Run the task for many inputs, at most `concurrency` at a time, yielding a BatchResult per input in completion order. An input which fails is a result with an error, rather than failing the batch.
+
+        input_source is the source of every input, or a list with the source of each. Runs are saved if `save` is set (by default, if autosave_runs()), in groups of save_batch_size written from a worker thread. A result is only yielded once its run is on disk.
+
+        The prompt is built once for the batch. Closing the iterator early (break, or aclose()) cancels the calls still running: runs which already completed are still saved, and a warning is issued for any which fail to save.
+        """
+        if input_source is None or isinstance(input_source, DataSource):
+            sources: list[DataSource | None] = [input_source] * len(inputs)
+        else:
+            sources = list(input_source)
+            if len(sources) != len(inputs):
+                raise ValueError("input_source must have one source per input")
+        if save is None:
+            save = self.autosave_runs()
+        try:
+            prompt: str | None = self.build_prompt()
+        except Exception:
+            # Each call builds it, and reports the error for its input
+            prompt = None
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(index: int) -> BatchResult:
+            if prompt is not None:
+                _batch_prompt.set((self, prompt))
+            result = BatchResult(index=index, input=inputs[index])
+            async with semaphore:
+                try:
+                    result.run = await self.invoke_unsaved(
+                        inputs[index], sources[index], cache_mode
+                    )
+                except Exception as e:
+                    result.error = e
+            return result
+
+        pending_save: list[BatchResult] = []
+        saved: set[int] = set()
+
+        async def flush() -> list[BatchResult]:
+            to_save = pending_save.copy()
+            pending_save.clear()
+            # Marked first: once started, the write finishes even if we're cancelled
+            saved.update(result.index for result in to_save)
+            errors = await asyncio.to_thread(
+                save_runs,
+                [result.run for result in to_save],  # type: ignore[misc]
+            )
+            for result, error in zip(to_save, errors):
+                if error is not None:
+                    result.run = None
+                    result.error = error
+            return to_save
+
+        tasks = [asyncio.create_task(run_one(index)) for index in range(len(inputs))]
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                result = await next_completed
+                if result.run is None:
+                    yield result
+                elif save:
+                    pending_save.append(result)
+                    if len(pending_save) >= save_batch_size:
+                        for saved_result in await flush():
+                            yield saved_result
+                else:
+                    # Clear the ID to indicate it's not persisted
+                    result.run.id = None
+                    yield result
+
+            if pending_save:
+                for saved_result in await flush():
+                    yield saved_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            if save:
+                # Closed early: don't lose runs we already paid for, including those completed but not yet reported
+                unsaved = [
+                    task.result().run
+                    for task in tasks
+                    if task.done()
+                    and not task.cancelled()
+                    and task.result().run is not None
+                    and task.result().index not in saved
+                ]
+                if unsaved:
+                    errors = await asyncio.to_thread(save_runs, unsaved)  # type: ignore[arg-type]
+                    failed = [error for error in errors if error is not None]
+                    if failed:
+                        # The caller stopped listening, so can't be told per input
+                        warnings.warn(
+                            f"Failed to save {len(failed)} of {len(unsaved)} completed runs when the batch was closed: {failed[0]}"
+                        )
+
+    def validate_input(self, input: Dict | str) -> None:
         if self.input_schema is not None:
             if not isinstance(input, dict):
                 raise ValueError(f"structured input is not a dict: {input}")
-            validate_schema(input, self.input_schema)
-
-        # Run
-        run_output = await self._run(input)
+            with timed(TimingCategory.validation):
+                validate_schema(input, self.input_schema)
 
+    async def cached_response(
+        self, input: Dict | str, cache_mode: ResponseCacheMode
+    ) -> Tuple[str | None, RunOutput | None]:
+        """
+        The response cache key for this call (None if not using the cache), and the cached response if there is one.
+        """
+        if cache_mode == ResponseCacheMode.bypass or not response_cache_enabled():
+            return None, None
+        cache_key = self.response_cache_key(input)
+        if cache_mode == ResponseCacheMode.refresh:
+            return cache_key, None
+        return cache_key, await asyncio.to_thread(ResponseCache.shared().get, cache_key)
+
+    async def finish_run(
+        self,
+        input: Dict | str,
+        input_source: DataSource | None,
+        run_output: RunOutput,
+        cache_key: str | None,
+        cache_hit: bool,
+    ) -> TaskRun:
+        """Parse and validate the model's response, cache it if needed, and build the TaskRun."""
         # Parse
         provider = self.model_provider()
         parser = model_parser_from_id(provider.parser)(
             structured_output=self.has_structured_output()
         )
-        parsed_output = parser.parse_output(original_output=run_output)
+        with timed(TimingCategory.parsing):
+            parsed_output = parser.parse_output(original_output=run_output)
 
         # validate output
         if self.output_schema is not None:
@@ -117,24 +422,40 @@ class BaseAdapter(metaclass=ABCMeta):
                 raise RuntimeError(
                     f"structured response is not a dict: {parsed_output.output}"
                 )
-            validate_schema(parsed_output.output, self.output_schema)
+            with timed(TimingCategory.validation):
+                validate_schema(parsed_output.output, self.output_schema)
         else:
             if not isinstance(parsed_output.output, str):
                 raise RuntimeError(
                     f"response is not a string for non-structured task: {parsed_output.output}"
                 )
 
-        # Generate the run and output
-        run = self.generate_run(input, input_source, parsed_output)
+        # Only cache responses which parsed and validated
+        if cache_key is not None and not cache_hit:
+            await asyncio.to_thread(ResponseCache.shared().put, cache_key, run_output)
 
-        # Save the run if configured to do so, and we have a path to save to
-        if Config.shared().autosave_runs and self.kiln_task.path is not None:
-            run.save_to_file()
-        else:
-            # Clear the ID to indicate it's not persisted
-            run.id = None
+        # Generate the run and output. Cache hits used no tokens.
+        usage = None
+        if not cache_hit:
+            usage = with_cost(
+                run_output.usage, self.model_provider_name, self.model_name
+            )
+        return self.generate_run(
+            input, input_source, parsed_output, cache_hit=cache_hit, usage=usage
+        )
 
-        return run
+    def save_run(self, run: TaskRun) -> None:
+        """Save a run, recording the write time in its timings."""
+        start = time.perf_counter()
+        run.save_to_file()
+        if run.timings is not None:
+            run.timings.save_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def autosave_runs(self) -> bool:
+        """
+        Runs are saved if configured to do so, and we have a path to save to.
+        """
+        return bool(Config.shared().autosave_runs) and self.kiln_task.path is not None
 
     def has_structured_output(self) -> bool:
         return self.output_schema is not None
@@ -147,7 +468,58 @@ class BaseAdapter(metaclass=ABCMeta):
     async def _run(self, input: Dict | str) -> RunOutput:
         pass
 
+    async def call_model(self, input: Dict | str) -> RunOutput:
+        """_run, within the provider's rate limits and the model's retry policy (see rate_limits and retry_policy)."""
+        return await RetryPolicies.shared().call(
+            self.model_provider_name,
+            self.model_name,
+            lambda: RateLimits.shared().call(
+                self.model_provider_name,
+                self.model_name,
+                lambda: self._run(input),
+                lambda: self.estimate_tokens(input),
+            ),
+        )
+
+    def stream_model(self, input: Dict | str) -> AsyncIterator[StreamDelta | RunOutput]:
+        """_run_stream, within the provider's rate limits and the model's retry policy."""
+        return RetryPolicies.shared().stream(
+            self.model_provider_name,
+            self.model_name,
+            lambda: RateLimits.shared().stream(
+                self.model_provider_name,
+                self.model_name,
+                lambda: self._run_stream(input),
+                lambda: self.estimate_tokens(input),
+            ),
+        )
+
+    async def _run_stream(
+        self, input: Dict | str
+    ) -> AsyncIterator[StreamDelta | RunOutput]:
+        """
+        Run the model, yielding StreamDeltas as the response arrives, then the complete RunOutput (as _run returns).
+
+        Adapters which can stream override this. By default the whole response is generated with _run, then yielded as one delta per channel.
+        """
+        run_output = await self._run(input)
+        for delta in stream_deltas(run_output):
+            yield delta
+        yield run_output
+
+    def stream_splitter(self) -> StreamSplitter:
+        """Splits the model's streamed output into channels, the way its parser splits the complete output."""
+        provider = self.model_provider()
+        parser = model_parser_from_id(provider.parser)(
+            structured_output=self.has_structured_output()
+        )
+        return parser.stream_splitter()
+
     def build_prompt(self) -> str:
+        batch_prompt = _batch_prompt.get()
+        if batch_prompt is not None and batch_prompt[0] is self:
+            return batch_prompt[1]
+
         # The prompt builder needs to know if we want to inject formatting instructions
         provider = self.model_provider()
         add_json_instructions = self.has_structured_output() and (
@@ -156,9 +528,10 @@ class BaseAdapter(metaclass=ABCMeta):
             == StructuredOutputMode.json_instruction_and_object
         )
 
-        return self.prompt_builder.build_prompt(
-            include_json_instructions=add_json_instructions
-        )
+        with timed(TimingCategory.prompt_build):
+            return self.prompt_builder.build_prompt(
+                include_json_instructions=add_json_instructions
+            )
 
     def run_strategy(
         self,
@@ -181,9 +554,46 @@ class BaseAdapter(metaclass=ABCMeta):
         else:
             return "basic", None
 
+    def estimate_tokens(self, input: Dict | str) -> int:
+        """A rough count of the prompt tokens for a call, for tokens per minute rate limits."""
+        return estimate_tokens(
+            self.build_prompt(), self.prompt_builder.build_user_message(input)
+        )
+
+    def response_cache_key(self, input: Dict | str) -> str:
+        """
+        A hash of everything that determines the model's response: the adapter, model, messages and response format.
+        """
+        provider = self.model_provider()
+        run_strategy, cot_prompt = self.run_strategy()
+        key = {
+            "version": CACHE_VERSION,
+            "adapter": self.adapter_info().adapter_name,
+            "model_name": self.model_name,
+            "model_provider": self.model_provider_name,
+            "messages": {
+                "system": self.build_prompt(),
+                "user": self.prompt_builder.build_user_message(input),
+                "run_strategy": run_strategy,
+                "cot_prompt": cot_prompt,
+            },
+            "response_format": {
+                "structured_output_mode": provider.structured_output_mode,
+                "output_schema": self.output_schema,
+            },
+        }
+        return hashlib.sha256(
+            json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
     # create a run and task output
     def generate_run(
-        self, input: Dict | str, input_source: DataSource | None, run_output: RunOutput
+        self,
+        input: Dict | str,
+        input_source: DataSource | None,
+        run_output: RunOutput,
+        cache_hit: bool = False,
+        usage: Usage | None = None,
     ) -> TaskRun:
         # Convert input and output to JSON strings if they are dictionaries
         input_str = (
@@ -211,16 +621,19 @@ class BaseAdapter(metaclass=ABCMeta):
                 # Synthetic since an adapter, not a human, is creating this
                 source=DataSource(
                     type=DataSourceType.synthetic,
-                    properties=self._properties_for_task_output(),
+                    properties=self._properties_for_task_output(cache_hit),
                 ),
             ),
             intermediate_outputs=run_output.intermediate_outputs,
             tags=self.default_tags or [],
+            usage=usage,
         )
 
         return new_task_run
 
-    def _properties_for_task_output(self) -> Dict[str, str | int | float]:
+    def _properties_for_task_output(
+        self, cache_hit: bool = False
+    ) -> Dict[str, str | int | float]:
         props = {}
 
         # adapter info
@@ -231,5 +644,7 @@ class BaseAdapter(metaclass=ABCMeta):
         props["prompt_builder_name"] = adapter_info.prompt_builder_name
         if adapter_info.prompt_id is not None:
             props["prompt_id"] = adapter_info.prompt_id
+        if cache_hit:
+            props[CACHE_HIT_PROPERTY] = "hit"
 
         return props
@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
 from langchain_aws import ChatBedrockConverse
 from langchain_core.language_models import LanguageModelInput
@@ -24,20 +24,38 @@ from kiln_ai.adapters.model_adapters.base_adapter import (
     BaseAdapter,
     BasePromptBuilder,
     RunOutput,
+    StreamDelta,
+    output_text,
 )
-from kiln_ai.adapters.ollama_tools import (
-    get_ollama_connection,
-    ollama_base_url,
-    ollama_model_installed,
-)
+from kiln_ai.adapters.ollama_tools import ollama_base_url, ollama_model_name
+from kiln_ai.adapters.run_usage import add_usage
+from kiln_ai.datamodel import Usage
 from kiln_ai.utils.config import Config
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
 
 LangChainModelType = BaseChatModel | Runnable[LanguageModelInput, Dict | BaseModel]
 
 
+def usage_from_message(message: Any) -> Usage | None:
+    """The usage LangChain reports on a message (or a structured output's raw message), if any."""
+    if isinstance(message, dict):
+        message = message.get("raw")
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if not usage_metadata:
+        return None
+    details = usage_metadata.get("output_token_details") or {}
+    return Usage(
+        input_tokens=usage_metadata.get("input_tokens"),
+        output_tokens=usage_metadata.get("output_tokens"),
+        reasoning_tokens=details.get("reasoning"),
+        total_tokens=usage_metadata.get("total_tokens"),
+    )
+
+
 class LangchainAdapter(BaseAdapter):
     _model: LangChainModelType | None = None
+    # The model without structured output, for chain of thought calls
+    _base_model: BaseChatModel | None = None
 
     def __init__(
         self,
@@ -92,6 +110,7 @@ class LangchainAdapter(BaseAdapter):
             return self._model
 
         self._model = await self.langchain_model_from()
+        self._base_model = self._model
 
         # Decide if we want to use Langchain's structured output:
         # 1. Only for structured tasks
@@ -128,15 +147,19 @@ class LangchainAdapter(BaseAdapter):
             )
         return self._model
 
-    async def _run(self, input: Dict | str) -> RunOutput:
-        provider = self.model_provider()
-        model = await self.model()
-        chain = model
-        intermediate_outputs = {}
+    async def base_model(self) -> BaseChatModel:
+        """The model without structured output, used for chain of thought calls."""
+        if self._base_model is None:
+            self._base_model = await self.langchain_model_from()
+        return self._base_model
 
+    def build_messages(self, input: Dict | str) -> tuple[list[BaseMessage], bool]:
+        """
+        The messages for the run, and whether a separate chain of thought call must be made with them first (using the base model).
+        """
         prompt = self.build_prompt()
         user_msg = self.prompt_builder.build_user_message(input)
-        messages = [
+        messages: list[BaseMessage] = [
             SystemMessage(content=prompt),
             HumanMessage(content=user_msg),
         ]
@@ -153,18 +176,17 @@ class LangchainAdapter(BaseAdapter):
             messages.append(
                 SystemMessage(content=cot_prompt),
             )
+            return messages, True
 
-            # Base model (without structured output) used for COT message
-            base_model = await self.langchain_model_from()
-
-            cot_messages = [*messages]
-            cot_response = await base_model.ainvoke(cot_messages)
-            intermediate_outputs["chain_of_thought"] = cot_response.content
-            messages.append(AIMessage(content=cot_response.content))
-            messages.append(HumanMessage(content=COT_FINAL_ANSWER_PROMPT))
-
-        response = await chain.ainvoke(messages)
+        return messages, False
 
+    def run_output_from_response(
+        self,
+        response: Any,
+        intermediate_outputs: dict[str, str],
+        cot_usage: Usage | None = None,
+    ) -> RunOutput:
+        usage = add_usage(cot_usage, usage_from_message(response))
         # Langchain may have already parsed the response into structured output, so use that if available.
         # However, a plain string may still be fixed at the parsing layer, so not being structured isn't a critical failure (yet)
         if (
@@ -177,6 +199,7 @@ class LangchainAdapter(BaseAdapter):
             return RunOutput(
                 output=self._munge_response(structured_response),
                 intermediate_outputs=intermediate_outputs,
+                usage=usage,
             )
 
         if not isinstance(response, BaseMessage):
@@ -189,6 +212,78 @@ class LangchainAdapter(BaseAdapter):
         return RunOutput(
             output=text_content,
             intermediate_outputs=intermediate_outputs,
+            usage=usage,
+        )
+
+    async def _run(self, input: Dict | str) -> RunOutput:
+        model = await self.model()
+        chain = model
+        intermediate_outputs = {}
+
+        messages, cot_call = self.build_messages(input)
+        cot_usage = None
+
+        if cot_call:
+            # Base model (without structured output) used for COT message
+            base_model = await self.base_model()
+
+            cot_messages = [*messages]
+            cot_response = await base_model.ainvoke(cot_messages)
+            cot_usage = usage_from_message(cot_response)
+            intermediate_outputs["chain_of_thought"] = cot_response.content
+            messages.append(AIMessage(content=cot_response.content))
+            messages.append(HumanMessage(content=COT_FINAL_ANSWER_PROMPT))
+
+        response = await chain.ainvoke(messages)
+        return self.run_output_from_response(response, intermediate_outputs, cot_usage)
+
+    async def _run_stream(
+        self, input: Dict | str
+    ) -> AsyncIterator[StreamDelta | RunOutput]:
+        model = await self.model()
+        intermediate_outputs: dict[str, str] = {}
+
+        messages, cot_call = self.build_messages(input)
+        # Chunks each carry part of the usage
+        usage = None
+
+        if cot_call:
+            base_model = await self.base_model()
+            cot_parts = []
+            async for chunk in base_model.astream([*messages]):
+                usage = add_usage(usage, usage_from_message(chunk))
+                if isinstance(chunk.content, str) and chunk.content:
+                    cot_parts.append(chunk.content)
+                    yield StreamDelta(channel="chain_of_thought", text=chunk.content)
+            cot_content = "".join(cot_parts)
+            intermediate_outputs["chain_of_thought"] = cot_content
+            messages.append(AIMessage(content=cot_content))
+            messages.append(HumanMessage(content=COT_FINAL_ANSWER_PROMPT))
+
+        if not isinstance(model, BaseChatModel):
+            # LangChain's structured output wrapper: it only returns the parsed result once complete
+            response = await model.ainvoke(messages)
+            run_output = self.run_output_from_response(
+                response, intermediate_outputs, usage
+            )
+            yield StreamDelta(channel="output", text=output_text(run_output.output))
+            yield run_output
+            return
+
+        content_parts = []
+        splitter = self.stream_splitter()
+        async for chunk in model.astream(messages):
+            usage = add_usage(usage, usage_from_message(chunk))
+            if isinstance(chunk.content, str) and chunk.content:
+                content_parts.append(chunk.content)
+                for item in splitter.feed(chunk.content):
+                    yield item
+        for item in splitter.flush():
+            yield item
+        yield RunOutput(
+            output="".join(content_parts),
+            intermediate_outputs=intermediate_outputs,
+            usage=usage,
         )
 
     def adapter_info(self) -> AdapterInfo:
@@ -279,23 +374,8 @@ async def langchain_model_from_provider(
         api_key = Config.shared().fireworks_api_key
         return ChatFireworks(**provider.provider_options, api_key=api_key)
     elif provider.name == ModelProviderName.ollama:
-        # Ollama model naming is pretty flexible. We try a few versions of the model name
-        potential_model_names = []
-        if "model" in provider.provider_options:
-            potential_model_names.append(provider.provider_options["model"])
-        if "model_aliases" in provider.provider_options:
-            potential_model_names.extend(provider.provider_options["model_aliases"])
-
-        # Get the list of models Ollama supports
-        ollama_connection = await get_ollama_connection()
-        if ollama_connection is None:
-            raise ValueError("Failed to connect to Ollama. Ensure Ollama is running.")
-
-        for model_name in potential_model_names:
-            if ollama_model_installed(ollama_connection, model_name):
-                return ChatOllama(model=model_name, base_url=ollama_base_url())
-
-        raise ValueError(f"Model {model_name} not installed on Ollama")
+        ollama_model = await ollama_model_name(provider)
+        return ChatOllama(model=ollama_model, base_url=ollama_base_url())
     elif provider.name == ModelProviderName.openrouter:
         raise ValueError("OpenRouter is not supported in Langchain adapter")
     else:
@@ -0,0 +1,273 @@
+"""
+A native Ollama adapter, calling Ollama's /api/chat directly.
+
+ - Requests use the shared Ollama client for the running event loop (see OllamaDiscovery), so connections are kept open and reused across runs.
+ - Models stay loaded for the `ollama_keep_alive` setting (eg "30m", or "-1" for always), rather than Ollama's 5 minute default. Call `preload()` to load the model before the first run, instead of that run waiting for it.
+ - Structured output uses Ollama's `format` option: the task's JSON schema, or "json" for JSON mode.
+ - Concurrent calls are limited to the server's parallel request slots (the `ollama_parallel_requests` setting, see rate_limits).
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict
+
+import kiln_ai.datamodel as datamodel
+from kiln_ai.adapters.ml_model_list import ModelProviderName, StructuredOutputMode
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    COT_FINAL_ANSWER_PROMPT,
+    AdapterInfo,
+    BaseAdapter,
+    BasePromptBuilder,
+    RunOutput,
+    StreamDelta,
+)
+from kiln_ai.adapters.ollama_tools import (
+    OLLAMA_CHAT_TIMEOUT,
+    OllamaDiscovery,
+    OllamaError,
+    ollama_base_url,
+    ollama_keep_alive,
+    ollama_model_name,
+    preload_ollama_model,
+    raise_for_ollama_error,
+)
+from kiln_ai.adapters.parsers.json_parser import parse_json_string
+from kiln_ai.adapters.run_usage import add_usage
+from kiln_ai.datamodel import Usage
+from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
+
+OllamaMessage = dict[str, str]
+
+
+def usage_from_response(response: dict[str, Any]) -> Usage | None:
+    """The usage Ollama reports on a response, or the last chunk of a stream."""
+    input_tokens = response.get("prompt_eval_count")
+    output_tokens = response.get("eval_count")
+    if input_tokens is None and output_tokens is None:
+        return None
+    return Usage(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=(input_tokens or 0) + (output_tokens or 0),
+    )
+
+
+def message_content(response: dict[str, Any]) -> str:
+    content = (response.get("message") or {}).get("content")
+    if not isinstance(content, str):
+        raise RuntimeError(f"response is not a string: {content}")
+    return content
+
+
+class OllamaAdapter(BaseAdapter):
+    def __init__(
+        self,
+        kiln_task: datamodel.Task,
+        model_name: str,
+        provider: str = ModelProviderName.ollama,
+        prompt_builder: BasePromptBuilder | None = None,
+        tags: list[str] | None = None,
+    ):
+        # The name the model is installed under in Ollama, found on first use
+        self._ollama_model: str | None = None
+
+        super().__init__(
+            kiln_task,
+            model_name=model_name,
+            model_provider_name=provider,
+            prompt_builder=prompt_builder,
+            tags=tags,
+        )
+
+    async def ollama_model(self) -> str:
+        if self._ollama_model is None:
+            self._ollama_model = await ollama_model_name(self.model_provider())
+        return self._ollama_model
+
+    async def preload(self) -> None:
+        """Load the model into Ollama's memory, so the first run doesn't wait for it."""
+        await preload_ollama_model(await self.ollama_model())
+
+    def build_messages(self, input: Dict | str) -> tuple[list[OllamaMessage], bool]:
+        """
+        The messages for the run, and whether a separate chain of thought call must be made with them first (see cot_final_answer_messages).
+        """
+        prompt = self.build_prompt()
+        user_msg = self.prompt_builder.build_user_message(input)
+        messages: list[OllamaMessage] = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_msg},
+        ]
+
+        run_strategy, cot_prompt = self.run_strategy()
+
+        if run_strategy == "cot_as_message":
+            if not cot_prompt:
+                raise ValueError("cot_prompt is required for cot_as_message strategy")
+            messages.append({"role": "system", "content": cot_prompt})
+        elif run_strategy == "cot_two_call":
+            if not cot_prompt:
+                raise ValueError("cot_prompt is required for cot_two_call strategy")
+            messages.append({"role": "system", "content": cot_prompt})
+            return messages, True
+
+        return messages, False
+
+    def cot_final_answer_messages(self, cot_content: str) -> list[OllamaMessage]:
+        return [
+            {"role": "assistant", "content": cot_content},
+            {"role": "user", "content": COT_FINAL_ANSWER_PROMPT},
+        ]
+
+    def response_format(self) -> dict | str | None:
+        """The `format` option for the final call: a JSON schema, "json", or None for unstructured output."""
+        # Unstructured if task isn't structured
+        if not self.has_structured_output():
+            return None
+
+        provider = self.model_provider()
+        match provider.structured_output_mode:
+            case (
+                StructuredOutputMode.json_schema
+                | StructuredOutputMode.function_calling
+                | StructuredOutputMode.default
+            ):
+                # Ollama constrains output to the schema, which is more reliable than its tool calling: https://ollama.com/blog/structured-outputs
+                return self.kiln_task.output_schema()
+            case (
+                StructuredOutputMode.json_mode
+                | StructuredOutputMode.json_instruction_and_object
+            ):
+                return "json"
+            case StructuredOutputMode.json_instructions:
+                # JSON done via instructions in prompt, not the API
+                return None
+            case _:
+                raise_exhaustive_enum_error(provider.structured_output_mode)
+
+    async def chat_body(
+        self, messages: list[OllamaMessage], stream: bool, final: bool = True
+    ) -> dict[str, Any]:
+        """The JSON body of an /api/chat request. final=False for the chain of thought call, which has no response format."""
+        body: dict[str, Any] = {
+            "model": await self.ollama_model(),
+            "messages": messages,
+            "stream": stream,
+        }
+        keep_alive = ollama_keep_alive()
+        if keep_alive is not None:
+            body["keep_alive"] = keep_alive
+        if final:
+            response_format = self.response_format()
+            if response_format is not None:
+                body["format"] = response_format
+        return body
+
+    async def chat(self, body: dict[str, Any]) -> dict[str, Any]:
+        client = OllamaDiscovery.shared().client()
+        response = await client.post(
+            ollama_base_url() + "/api/chat", json=body, timeout=OLLAMA_CHAT_TIMEOUT
+        )
+        raise_for_ollama_error(response)
+        return response.json()
+
+    async def chat_stream(self, body: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        """The chunks of a streamed chat, one JSON object per line. The last has done set, and the usage."""
+        client = OllamaDiscovery.shared().client()
+        async with client.stream(
+            "POST",
+            ollama_base_url() + "/api/chat",
+            json=body,
+            timeout=OLLAMA_CHAT_TIMEOUT,
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                raise_for_ollama_error(response)
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                # Errors after the response started are sent as a chunk
+                if chunk.get("error"):
+                    raise OllamaError(f"Ollama returned an error: {chunk['error']}")
+                yield chunk
+
+    def run_output(
+        self, response_content: str, intermediate_outputs: dict[str, str]
+    ) -> RunOutput:
+        # Models with a parser (eg R1's <think> tags) return text around the JSON, which the parser extracts
+        if self.has_structured_output() and self.model_provider().parser is None:
+            return RunOutput(
+                output=parse_json_string(response_content),
+                intermediate_outputs=intermediate_outputs,
+            )
+        return RunOutput(
+            output=response_content,
+            intermediate_outputs=intermediate_outputs,
+        )
+
+    async def _run(self, input: Dict | str) -> RunOutput:
+        intermediate_outputs: dict[str, str] = {}
+        messages, cot_call = self.build_messages(input)
+        cot_usage = None
+
+        if cot_call:
+            # First call for chain of thought
+            cot_response = await self.chat(
+                await self.chat_body(messages, stream=False, final=False)
+            )
+            cot_usage = usage_from_response(cot_response)
+            cot_content = message_content(cot_response)
+            intermediate_outputs["chain_of_thought"] = cot_content
+            messages.extend(self.cot_final_answer_messages(cot_content))
+
+        response = await self.chat(await self.chat_body(messages, stream=False))
+        run_output = self.run_output(message_content(response), intermediate_outputs)
+        run_output.usage = add_usage(cot_usage, usage_from_response(response))
+        return run_output
+
+    async def _run_stream(
+        self, input: Dict | str
+    ) -> AsyncIterator[StreamDelta | RunOutput]:
+        intermediate_outputs: dict[str, str] = {}
+        messages, cot_call = self.build_messages(input)
+        usage = None
+
+        if cot_call:
+            # First call for chain of thought, streamed as it's generated
+            cot_parts = []
+            cot_body = await self.chat_body(messages, stream=True, final=False)
+            async for chunk in self.chat_stream(cot_body):
+                usage = add_usage(usage, usage_from_response(chunk))
+                text = (chunk.get("message") or {}).get("content")
+                if text:
+                    cot_parts.append(text)
+                    yield StreamDelta(channel="chain_of_thought", text=text)
+            cot_content = "".join(cot_parts)
+            intermediate_outputs["chain_of_thought"] = cot_content
+            messages.extend(self.cot_final_answer_messages(cot_content))
+
+        content_parts: list[str] = []
+        splitter = self.stream_splitter()
+        body = await self.chat_body(messages, stream=True)
+        async for chunk in self.chat_stream(body):
+            usage = add_usage(usage, usage_from_response(chunk))
+            text = (chunk.get("message") or {}).get("content")
+            if text:
+                content_parts.append(text)
+                for item in splitter.feed(text):
+                    yield item
+        for item in splitter.flush():
+            yield item
+
+        run_output = self.run_output("".join(content_parts), intermediate_outputs)
+        run_output.usage = usage
+        yield run_output
+
+    def adapter_info(self) -> AdapterInfo:
+        return AdapterInfo(
+            model_name=self.model_name,
+            model_provider=self.model_provider_name,
+            adapter_name="kiln_ollama_adapter",
+            prompt_builder_name=self.prompt_builder.__class__.prompt_builder_name(),
+            prompt_id=self.prompt_builder.prompt_id(),
+        )
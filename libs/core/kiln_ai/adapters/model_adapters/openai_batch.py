@@ -0,0 +1,318 @@
+"""
+Offline bulk runs through the OpenAI Batch API: half the price of real-time calls, for jobs which can wait (up to 24h, usually much less).
+
+Requests are built exactly as OpenAICompatibleAdapter builds them (same messages, response format and extra body), written to JSONL, uploaded and submitted to `/v1/batches`. Once the batch completes, each response is parsed, validated and saved as a TaskRun, as `invoke` would.
+
+ - Chain of thought prompts which need two calls (see BaseAdapter.run_strategy) are run as two batches: the thinking, then the final answers.
+ - Inputs with a cached response (see response_cache) aren't sent, and new responses are cached.
+ - Large jobs are split into several batches, to stay under the API's size limits. Batches are submitted together, and run in parallel.
+ - Per item errors (API errors, parsing, validation) are returned with the results, rather than failing the job.
+
+Works with any OpenAI compatible provider supporting the batch API (eg OpenAI, Groq).
+
+Example:
+    runner = OpenAIBatchRunner(adapter)
+    results = await runner.run(inputs)
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+from openai.types import Batch
+from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
+
+from kiln_ai.adapters.model_adapters.openai_model_adapter import (
+    OpenAICompatibleAdapter,
+    usage_from_completion,
+)
+from kiln_ai.adapters.response_cache import ResponseCacheMode
+from kiln_ai.datamodel import DataSource, TaskRun, Usage
+from kiln_ai.datamodel.batch_writer import save_all
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# The API's limits are 50,000 requests and 200MB per batch file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+
+@dataclass
+class BatchItemResult:
+    input: Dict | str
+    # The run (saved if the adapter autosaves), or the error for this input
+    run: TaskRun | None = None
+    error: Exception | None = None
+
+
+@dataclass
+class _PendingItem:
+    index: int
+    messages: list[ChatCompletionMessageParam]
+    cot_call: bool
+    cache_key: str | None
+    intermediate_outputs: dict[str, str] = field(default_factory=dict)
+    cot_usage: Usage | None = None
+
+    @property
+    def custom_id(self) -> str:
+        return str(self.index)
+
+
+def batch_request_line(custom_id: str, body: dict) -> str:
+    return json.dumps(
+        {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+        ensure_ascii=False,
+    )
+
+
+def split_batch_lines(
+    lines: list[str],
+    max_requests: int = MAX_BATCH_REQUESTS,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> list[list[str]]:
+    """Split request lines into batch files within the API's limits."""
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_bytes = 0
+    for line in lines:
+        line_bytes = len(line.encode("utf-8")) + 1
+        if current and (
+            len(current) >= max_requests or current_bytes + line_bytes > max_bytes
+        ):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(line)
+        current_bytes += line_bytes
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_output(content: str) -> dict[str, ChatCompletion | Exception]:
+    """The completion (or error) for each custom_id in a batch output or error file."""
+    results: dict[str, ChatCompletion | Exception] = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        custom_id = item.get("custom_id")
+        response = item.get("response") or {}
+        error = item.get("error")
+        body = response.get("body") or {}
+        if error:
+            results[custom_id] = RuntimeError(
+                f"Batch request failed: {error.get('message') or error}"
+            )
+        elif response.get("status_code") != 200:
+            message = (body.get("error") or {}).get("message") or body
+            results[custom_id] = RuntimeError(
+                f"Batch request failed with status code {response.get('status_code')}: {message}"
+            )
+        else:
+            results[custom_id] = ChatCompletion.model_validate(body)
+    return results
+
+
+class OpenAIBatchRunner:
+    """
+    Runs many inputs through an OpenAICompatibleAdapter's model, using the batch API.
+    """
+
+    def __init__(
+        self,
+        adapter: OpenAICompatibleAdapter,
+        poll_interval_seconds: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        timeout_seconds: float | None = None,
+        max_requests_per_batch: int = MAX_BATCH_REQUESTS,
+    ):
+        self.adapter = adapter
+        self.poll_interval_seconds = poll_interval_seconds
+        # Batches still running after this long are cancelled. None waits for the batch's completion window.
+        self.timeout_seconds = timeout_seconds
+        self.max_requests_per_batch = max_requests_per_batch
+
+    async def run(
+        self,
+        inputs: list[Dict | str],
+        input_source: DataSource | None = None,
+        cache_mode: ResponseCacheMode = ResponseCacheMode.default,
+    ) -> list[BatchItemResult]:
+        """Run every input, returning a result per input (in order)."""
+        adapter = self.adapter
+        results = [BatchItemResult(input=input) for input in inputs]
+        pending: list[_PendingItem] = []
+        for index, input in enumerate(inputs):
+            try:
+                adapter.validate_input(input)
+                cache_key, cached = await adapter.cached_response(input, cache_mode)
+                if cached is not None:
+                    results[index].run = await adapter.finish_run(
+                        input, input_source, cached, cache_key, cache_hit=True
+                    )
+                    continue
+                messages, cot_call = adapter.build_messages(input)
+                pending.append(_PendingItem(index, messages, cot_call, cache_key))
+            except Exception as e:
+                results[index].error = e
+
+        # Two call chain of thought: a batch for the thinking first
+        cot_items = [item for item in pending if item.cot_call]
+        if cot_items:
+            cot_responses = await self.submit(
+                [
+                    (
+                        item.custom_id,
+                        await adapter.completion_body(item.messages, final=False),
+                    )
+                    for item in cot_items
+                ]
+            )
+            for item in cot_items:
+                response = cot_responses[item.custom_id]
+                if isinstance(response, Exception):
+                    results[item.index].error = response
+                    continue
+                cot_content = (
+                    response.choices[0].message.content if response.choices else None
+                )
+                if cot_content is not None:
+                    item.intermediate_outputs["chain_of_thought"] = cot_content
+                item.cot_usage = usage_from_completion(response.usage)
+                item.messages.extend(adapter.cot_final_answer_messages(cot_content))
+            pending = [item for item in pending if results[item.index].error is None]
+
+        responses = await self.submit(
+            [
+                (item.custom_id, await adapter.completion_body(item.messages))
+                for item in pending
+            ]
+        )
+        for item in pending:
+            response = responses[item.custom_id]
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                run_output = adapter.run_output_from_completion(
+                    response, item.intermediate_outputs, item.cot_usage
+                )
+                results[item.index].run = await adapter.finish_run(
+                    inputs[item.index],
+                    input_source,
+                    run_output,
+                    item.cache_key,
+                    cache_hit=False,
+                )
+            except Exception as e:
+                results[item.index].error = e
+
+        await self.save(results)
+        return results
+
+    async def save(self, results: list[BatchItemResult]) -> None:
+        runs = [result for result in results if result.run is not None]
+        if not self.adapter.autosave_runs():
+            for result in runs:
+                # Clear the ID to indicate it's not persisted
+                result.run.id = None  # type: ignore[union-attr]
+            return
+        errors = await asyncio.to_thread(
+            save_all,
+            [result.run for result in runs],  # type: ignore[misc]
+        )
+        for result, error in zip(runs, errors):
+            if error is not None:
+                result.error = error
+                result.run = None
+
+    async def submit(
+        self, requests: list[tuple[str, dict]]
+    ) -> dict[str, ChatCompletion | Exception]:
+        """Run requests (custom_id, body) as one or more batches. Returns the response or error for every custom_id."""
+        if not requests:
+            return {}
+        lines = [batch_request_line(custom_id, body) for custom_id, body in requests]
+        chunks = split_batch_lines(lines, max_requests=self.max_requests_per_batch)
+        outputs = await asyncio.gather(
+            *[self.run_batch_file(chunk) for chunk in chunks], return_exceptions=True
+        )
+
+        results: dict[str, ChatCompletion | Exception] = {}
+        offset = 0
+        for chunk, output in zip(chunks, outputs):
+            chunk_ids = [
+                custom_id for custom_id, _ in requests[offset : offset + len(chunk)]
+            ]
+            offset += len(chunk)
+            for custom_id in chunk_ids:
+                if isinstance(output, BaseException):
+                    if not isinstance(output, Exception):
+                        raise output
+                    results[custom_id] = output
+                else:
+                    results[custom_id] = output.get(custom_id) or RuntimeError(
+                        "No response for this request in the batch output."
+                    )
+        return results
+
+    async def run_batch_file(
+        self, lines: list[str]
+    ) -> dict[str, ChatCompletion | Exception]:
+        """Upload, submit and wait for one batch, returning its parsed output."""
+        client = self.adapter.client
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+        input_file = await client.files.create(
+            file=("kiln_batch.jsonl", content), purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        try:
+            batch = await self.wait(batch)
+            results: dict[str, ChatCompletion | Exception] = {}
+            for file_id in (batch.error_file_id, batch.output_file_id):
+                if file_id:
+                    file_content = await client.files.content(file_id)
+                    results.update(parse_batch_output(file_content.text))
+            if batch.status != "completed":
+                error = RuntimeError(f"Batch {batch.id} {batch.status}.")
+                for line in lines:
+                    custom_id = json.loads(line)["custom_id"]
+                    results.setdefault(custom_id, error)
+            return results
+        finally:
+            await self.delete_files(
+                input_file.id, batch.output_file_id, batch.error_file_id
+            )
+
+    async def wait(self, batch: Batch) -> Batch:
+        """Poll until the batch is done. Cancels it if it runs past the timeout."""
+        client = self.adapter.client
+        start = time.monotonic()
+        while batch.status not in TERMINAL_STATUSES:
+            if (
+                self.timeout_seconds is not None
+                and time.monotonic() - start > self.timeout_seconds
+            ):
+                await client.batches.cancel(batch.id)
+                raise TimeoutError(
+                    f"Batch {batch.id} didn't complete within {self.timeout_seconds} seconds, and was cancelled."
+                )
+            await asyncio.sleep(self.poll_interval_seconds)
+            batch = await client.batches.retrieve(batch.id)
+        return batch
+
+    async def delete_files(self, *file_ids: str | None) -> None:
+        # Batch files count against the account's storage: clean up, but don't fail the run if we can't
+        for file_id in file_ids:
+            if file_id:
+                try:
+                    await self.adapter.client.files.delete(file_id)
+                except Exception:
+                    pass
@@ -0,0 +1,147 @@
+"""
+A process-wide pool of OpenAI SDK clients, so adapters reuse connections.
+
+Adapters are created per request, and a new client per adapter meant a new connection pool: each run paid TCP and TLS setup, with no keep-alive reuse. Instead, clients are shared by every adapter with the same (base_url, api_key, headers).
+
+ - Clients are per event loop: httpx connections can't be shared across loops (eg separate `asyncio.run` calls).
+ - HTTP/2 is used when the optional `h2` package is installed. Requests to the same provider are then multiplexed over one connection.
+ - Idle connections are kept open for longer than the httpx default, since provider calls are often seconds apart.
+ - The SDK's own retries are off: see rate_limits and retry_policy.
+ - Call `aclose()` on shutdown (the server's lifespan does this), and optionally `warm_up()` on startup.
+"""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Iterable
+
+import httpx
+from openai import DEFAULT_TIMEOUT, AsyncOpenAI, DefaultAsyncHttpxClient
+
+from kiln_ai.adapters.model_adapters.openai_compatible_config import (
+    OpenAICompatibleConfig,
+)
+
+# Idle connections are closed after this many seconds. Most providers keep them open for at least 60s.
+KEEPALIVE_EXPIRY_SECONDS = 60.0
+MAX_CONNECTIONS = 1000
+MAX_KEEPALIVE_CONNECTIONS = 100
+WARM_UP_TIMEOUT_SECONDS = 5.0
+
+ClientKey = tuple[str | None, str | None, tuple[tuple[str, str], ...]]
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def client_key(config: OpenAICompatibleConfig) -> ClientKey:
+    headers = tuple(sorted((config.default_headers or {}).items()))
+    return (config.base_url, config.api_key, headers)
+
+
+def new_http_client() -> httpx.AsyncClient:
+    return DefaultAsyncHttpxClient(
+        http2=http2_available(),
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+
+def new_client(
+    config: OpenAICompatibleConfig, http_client: httpx.AsyncClient | None = None
+) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=config.api_key,
+        base_url=config.base_url,
+        default_headers=config.default_headers,
+        http_client=http_client or new_http_client(),
+        # Retries are handled for all adapters by the rate limiter and retry policy
+        max_retries=0,
+    )
+
+
+@dataclass
+class PooledClient:
+    client: AsyncOpenAI
+    # The client's connection pool, for warm-up
+    http_client: httpx.AsyncClient
+
+
+class OpenAIClientPool:
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Clients for a loop are dropped when the loop is garbage collected
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[ClientKey, PooledClient]
+        ] = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def client(self, config: OpenAICompatibleConfig) -> AsyncOpenAI:
+        """
+        The shared client for this config on the running event loop. Outside of an event loop, returns a new unpooled client, as we can't tell which loop it will be used on.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return new_client(config)
+        return self._pooled(loop, config).client
+
+    def _pooled(
+        self, loop: asyncio.AbstractEventLoop, config: OpenAICompatibleConfig
+    ) -> PooledClient:
+        key = client_key(config)
+        with self._lock:
+            clients = self._clients.setdefault(loop, {})
+            pooled = clients.get(key)
+            if pooled is None or pooled.http_client.is_closed:
+                http_client = new_http_client()
+                pooled = PooledClient(
+                    client=new_client(config, http_client), http_client=http_client
+                )
+                clients[key] = pooled
+            return pooled
+
+    async def warm_up(self, configs: Iterable[OpenAICompatibleConfig]) -> None:
+        """
+        Open a connection to each provider (TCP, TLS and HTTP/2 setup), so the first real request doesn't pay for it. Failures are ignored: the provider may be down or offline, and it's only an optimization.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def warm_up_one(config: OpenAICompatibleConfig) -> None:
+            try:
+                pooled = self._pooled(loop, config)
+                # Any response will do, the connection is kept for reuse
+                await pooled.http_client.head(
+                    str(pooled.client.base_url), timeout=WARM_UP_TIMEOUT_SECONDS
+                )
+            except Exception:
+                pass
+
+        unique = {client_key(config): config for config in configs}
+        await asyncio.gather(*(warm_up_one(config) for config in unique.values()))
+
+    async def aclose(self) -> None:
+        """Close the clients for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+        for pooled in clients.values():
+            await pooled.client.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(clients) for clients in self._clients.values())
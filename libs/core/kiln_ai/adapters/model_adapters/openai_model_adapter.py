@@ -1,28 +1,51 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, AsyncStream
+from openai.types import CompletionUsage
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionAssistantMessageParam,
+    ChatCompletionChunk,
+    ChatCompletionMessageParam,
+    ChatCompletionStreamOptionsParam,
     ChatCompletionSystemMessageParam,
     ChatCompletionUserMessageParam,
 )
 
 import kiln_ai.datamodel as datamodel
-from kiln_ai.adapters.ml_model_list import StructuredOutputMode
+from kiln_ai.adapters.ml_model_list import ModelProviderName, StructuredOutputMode
 from kiln_ai.adapters.model_adapters.base_adapter import (
     COT_FINAL_ANSWER_PROMPT,
     AdapterInfo,
     BaseAdapter,
     BasePromptBuilder,
     RunOutput,
+    StreamDelta,
 )
+from kiln_ai.adapters.model_adapters.openai_client_pool import OpenAIClientPool
 from kiln_ai.adapters.model_adapters.openai_compatible_config import (
     OpenAICompatibleConfig,
 )
 from kiln_ai.adapters.parsers.json_parser import parse_json_string
+from kiln_ai.adapters.run_usage import add_usage
+from kiln_ai.datamodel import Usage
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
 
+# Streams only include usage (with the last chunk) when asked
+STREAM_OPTIONS: ChatCompletionStreamOptionsParam = {"include_usage": True}
+
+
+def usage_from_completion(usage: CompletionUsage | None) -> Usage | None:
+    if usage is None:
+        return None
+    details = usage.completion_tokens_details
+    return Usage(
+        input_tokens=usage.prompt_tokens,
+        output_tokens=usage.completion_tokens,
+        reasoning_tokens=details.reasoning_tokens if details else None,
+        total_tokens=usage.total_tokens,
+    )
+
 
 class OpenAICompatibleAdapter(BaseAdapter):
     def __init__(
@@ -33,11 +56,8 @@ class OpenAICompatibleAdapter(BaseAdapter):
         tags: list[str] | None = None,
     ):
         self.config = config
-        self.client = AsyncOpenAI(
-            api_key=config.api_key,
-            base_url=config.base_url,
-            default_headers=config.default_headers,
-        )
+        # Built on first use: depends only on the task's output schema and the model provider
+        self._response_format_options: dict[str, Any] | None = None
 
         super().__init__(
             kiln_task,
@@ -47,12 +67,20 @@ class OpenAICompatibleAdapter(BaseAdapter):
             tags=tags,
         )
 
-    async def _run(self, input: Dict | str) -> RunOutput:
-        provider = self.model_provider()
-        intermediate_outputs: dict[str, str] = {}
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Shared with other adapters for the same provider, so connections are reused across runs
+        return OpenAIClientPool.shared().client(self.config)
+
+    def build_messages(
+        self, input: Dict | str
+    ) -> tuple[list[ChatCompletionMessageParam], bool]:
+        """
+        The messages for the run, and whether a separate chain of thought call must be made with them first (see cot_final_answer_messages).
+        """
         prompt = self.build_prompt()
         user_msg = self.prompt_builder.build_user_message(input)
-        messages = [
+        messages: list[ChatCompletionMessageParam] = [
             ChatCompletionSystemMessageParam(role="system", content=prompt),
             ChatCompletionUserMessageParam(role="user", content=user_msg),
         ]
@@ -71,34 +99,31 @@ class OpenAICompatibleAdapter(BaseAdapter):
             messages.append(
                 ChatCompletionSystemMessageParam(role="system", content=cot_prompt)
             )
+            return messages, True
 
-            # First call for chain of thought
-            cot_response = await self.client.chat.completions.create(
-                model=provider.provider_options["model"],
-                messages=messages,
-            )
-            cot_content = cot_response.choices[0].message.content
-            if cot_content is not None:
-                intermediate_outputs["chain_of_thought"] = cot_content
+        return messages, False
 
-            messages.extend(
-                [
-                    ChatCompletionAssistantMessageParam(
-                        role="assistant", content=cot_content
-                    ),
-                    ChatCompletionUserMessageParam(
-                        role="user",
-                        content=COT_FINAL_ANSWER_PROMPT,
-                    ),
-                ]
-            )
+    def cot_final_answer_messages(
+        self, cot_content: str | None
+    ) -> list[ChatCompletionMessageParam]:
+        return [
+            ChatCompletionAssistantMessageParam(role="assistant", content=cot_content),
+            ChatCompletionUserMessageParam(
+                role="user",
+                content=COT_FINAL_ANSWER_PROMPT,
+            ),
+        ]
 
+    def require_openrouter_reasoning(self) -> bool:
+        return bool(
+            self.config.openrouter_style_reasoning
+            and self.model_provider().reasoning_capable
+        )
+
+    def extra_body(self) -> dict[str, Any]:
         # OpenRouter specific options for reasoning models
         extra_body = {}
-        require_or_reasoning = (
-            self.config.openrouter_style_reasoning and provider.reasoning_capable
-        )
-        if require_or_reasoning:
+        if self.require_openrouter_reasoning():
             extra_body["include_reasoning"] = True
             # Filter to providers that support the reasoning parameter
             extra_body["provider"] = {
@@ -108,21 +133,122 @@ class OpenAICompatibleAdapter(BaseAdapter):
                 # fp8 quants are awful
                 "ignore": ["DeepInfra"],
             }
+        return extra_body
 
-        # Main completion call
-        response_format_options = await self.response_format_options()
-        response = await self.client.chat.completions.create(
-            model=provider.provider_options["model"],
-            messages=messages,
-            extra_body=extra_body,
-            **response_format_options,
+    def run_output(
+        self,
+        response_content: str | None,
+        reasoning: str | None,
+        intermediate_outputs: dict[str, str],
+    ) -> RunOutput:
+        # Save reasoning if it exists (OpenRouter specific format)
+        if self.require_openrouter_reasoning():
+            if reasoning:
+                intermediate_outputs["reasoning"] = reasoning
+            else:
+                raise RuntimeError(
+                    "Reasoning is required for this model, but no reasoning was returned from OpenRouter."
+                )
+
+        if not isinstance(response_content, str):
+            raise RuntimeError(f"response is not a string: {response_content}")
+
+        # Models with a parser (eg R1's <think> tags) return text around the JSON, which the parser extracts
+        if self.has_structured_output() and self.model_provider().parser is None:
+            structured_response = parse_json_string(response_content)
+            return RunOutput(
+                output=structured_response,
+                intermediate_outputs=intermediate_outputs,
+            )
+
+        return RunOutput(
+            output=response_content,
+            intermediate_outputs=intermediate_outputs,
+        )
+
+    def posts_completion_body(self) -> bool:
+        """
+        Whether calls post completion_body as is, rather than through the SDK's create(). Groq and Fireworks only.
+
+        create() transforms its typed params on every call, which costs more than LangChain's whole client side call (see test_openai_compatible_perf). The body is built from parts made once per adapter, so posting it skips that work.
+        """
+        return self.model_provider().name in (
+            ModelProviderName.groq,
+            ModelProviderName.fireworks_ai,
+        )
+
+    async def post_completion(
+        self, messages: list[ChatCompletionMessageParam], final: bool = True
+    ) -> ChatCompletion:
+        return await self.client.post(
+            "/chat/completions",
+            body=await self.completion_body(messages, final=final),
+            cast_to=ChatCompletion,
         )
 
+    async def post_completion_stream(
+        self, messages: list[ChatCompletionMessageParam], final: bool = True
+    ) -> AsyncStream[ChatCompletionChunk]:
+        body = await self.completion_body(messages, final=final)
+        return await self.client.post(
+            "/chat/completions",
+            body={**body, "stream": True, "stream_options": STREAM_OPTIONS},
+            cast_to=ChatCompletion,
+            stream=True,
+            stream_cls=AsyncStream[ChatCompletionChunk],
+        )
+
+    async def _run(self, input: Dict | str) -> RunOutput:
+        provider = self.model_provider()
+        post_body = self.posts_completion_body()
+        intermediate_outputs: dict[str, str] = {}
+        messages, cot_call = self.build_messages(input)
+        cot_usage = None
+
+        if cot_call:
+            # First call for chain of thought
+            if post_body:
+                cot_response = await self.post_completion(messages, final=False)
+            else:
+                cot_response = await self.client.chat.completions.create(
+                    model=provider.provider_options["model"],
+                    messages=messages,
+                )
+            cot_usage = usage_from_completion(cot_response.usage)
+            cot_content = cot_response.choices[0].message.content
+            if cot_content is not None:
+                intermediate_outputs["chain_of_thought"] = cot_content
+
+            messages.extend(self.cot_final_answer_messages(cot_content))
+
+        # Main completion call
+        if post_body:
+            response = await self.post_completion(messages)
+        else:
+            response_format_options = await self.response_format_options()
+            response = await self.client.chat.completions.create(
+                model=provider.provider_options["model"],
+                messages=messages,
+                extra_body=self.extra_body(),
+                **response_format_options,
+            )
+
         if not isinstance(response, ChatCompletion):
             raise RuntimeError(
                 f"Expected ChatCompletion response, got {type(response)}."
             )
 
+        return self.run_output_from_completion(
+            response, intermediate_outputs, cot_usage
+        )
+
+    def run_output_from_completion(
+        self,
+        response: ChatCompletion,
+        intermediate_outputs: dict[str, str],
+        cot_usage: Usage | None = None,
+    ) -> RunOutput:
+        """The run output for the final response. cot_usage is the usage of the chain of thought call, if one was made."""
         if hasattr(response, "error") and response.error:  # pyright: ignore
             raise RuntimeError(
                 f"OpenAI compatible API returned status code {response.error.get('code')}: {response.error.get('message') or 'Unknown error'}.\nError: {response.error}"  # pyright: ignore
@@ -134,17 +260,6 @@ class OpenAICompatibleAdapter(BaseAdapter):
 
         message = response.choices[0].message
 
-        # Save reasoning if it exists (OpenRouter specific format)
-        if require_or_reasoning:
-            if (
-                hasattr(message, "reasoning") and message.reasoning  # pyright: ignore
-            ):
-                intermediate_outputs["reasoning"] = message.reasoning  # pyright: ignore
-            else:
-                raise RuntimeError(
-                    "Reasoning is required for this model, but no reasoning was returned from OpenRouter."
-                )
-
         # the string content of the response
         response_content = message.content
 
@@ -161,20 +276,123 @@ class OpenAICompatibleAdapter(BaseAdapter):
             if tool_call:
                 response_content = tool_call.function.arguments
 
-        if not isinstance(response_content, str):
-            raise RuntimeError(f"response is not a string: {response_content}")
+        run_output = self.run_output(
+            response_content,
+            getattr(message, "reasoning", None),
+            intermediate_outputs,
+        )
+        run_output.usage = add_usage(cot_usage, usage_from_completion(response.usage))
+        return run_output
 
-        if self.has_structured_output():
-            structured_response = parse_json_string(response_content)
-            return RunOutput(
-                output=structured_response,
-                intermediate_outputs=intermediate_outputs,
+    async def completion_body(
+        self, messages: list[ChatCompletionMessageParam], final: bool = True
+    ) -> dict[str, Any]:
+        """
+        The JSON body of a chat completion request, as _run sends it (eg for the batch API). final=False for the chain of thought call, which has no response format.
+        """
+        body: dict[str, Any] = {
+            "model": self.model_provider().provider_options["model"],
+            "messages": messages,
+        }
+        if final:
+            body.update(self.extra_body())
+            body.update(await self.response_format_options())
+        return body
+
+    async def _run_stream(
+        self, input: Dict | str
+    ) -> AsyncIterator[StreamDelta | RunOutput]:
+        provider = self.model_provider()
+        post_body = self.posts_completion_body()
+        intermediate_outputs: dict[str, str] = {}
+        messages, cot_call = self.build_messages(input)
+        usage = None
+
+        if cot_call:
+            # First call for chain of thought, streamed as it's generated
+            cot_parts = []
+            if post_body:
+                cot_stream = await self.post_completion_stream(messages, final=False)
+            else:
+                cot_stream = await self.client.chat.completions.create(
+                    model=provider.provider_options["model"],
+                    messages=messages,
+                    stream=True,
+                    stream_options=STREAM_OPTIONS,
+                )
+            async for chunk in cot_stream:
+                # Providers which include usage send it with the last chunk
+                usage = add_usage(usage, usage_from_completion(chunk.usage))
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    cot_parts.append(text)
+                    yield StreamDelta(channel="chain_of_thought", text=text)
+            cot_content = "".join(cot_parts)
+            intermediate_outputs["chain_of_thought"] = cot_content
+
+            messages.extend(self.cot_final_answer_messages(cot_content))
+
+        if post_body:
+            stream = await self.post_completion_stream(messages)
+        else:
+            response_format_options = await self.response_format_options()
+            stream = await self.client.chat.completions.create(
+                model=provider.provider_options["model"],
+                messages=messages,
+                extra_body=self.extra_body(),
+                stream=True,
+                stream_options=STREAM_OPTIONS,
+                **response_format_options,
             )
 
-        return RunOutput(
-            output=response_content,
-            intermediate_outputs=intermediate_outputs,
+        content_parts: list[str] = []
+        reasoning_parts: list[str] = []
+        # Arguments of the task_response tool call, for function calling
+        tool_call_parts: list[str] = []
+        splitter = self.stream_splitter()
+        async for chunk in stream:
+            if getattr(chunk, "error", None):
+                error = chunk.error  # pyright: ignore
+                raise RuntimeError(
+                    f"OpenAI compatible API returned status code {error.get('code')}: {error.get('message') or 'Unknown error'}.\nError: {error}"
+                )
+            usage = add_usage(usage, usage_from_completion(chunk.usage))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            # OpenRouter specific format
+            reasoning = getattr(delta, "reasoning", None)
+            if reasoning:
+                reasoning_parts.append(reasoning)
+                yield StreamDelta(channel="reasoning", text=reasoning)
+
+            if delta.content:
+                content_parts.append(delta.content)
+                for item in splitter.feed(delta.content):
+                    yield item
+
+            for tool_call in delta.tool_calls or []:
+                if tool_call.function and tool_call.function.arguments:
+                    tool_call_parts.append(tool_call.function.arguments)
+                    yield StreamDelta(
+                        channel="output", text=tool_call.function.arguments
+                    )
+        for item in splitter.flush():
+            yield item
+
+        response_content = "".join(content_parts) or "".join(tool_call_parts)
+        if not response_content:
+            raise RuntimeError(
+                "No message content returned in the response from OpenAI compatible API"
+            )
+        run_output = self.run_output(
+            response_content,
+            "".join(reasoning_parts) or None,
+            intermediate_outputs,
         )
+        run_output.usage = usage
+        yield run_output
 
     def adapter_info(self) -> AdapterInfo:
         return AdapterInfo(
@@ -186,6 +404,11 @@ class OpenAICompatibleAdapter(BaseAdapter):
         )
 
     async def response_format_options(self) -> dict[str, Any]:
+        if self._response_format_options is None:
+            self._response_format_options = await self.build_response_format_options()
+        return self._response_format_options
+
+    async def build_response_format_options(self) -> dict[str, Any]:
         # Unstructured if task isn't structured
         if not self.has_structured_output():
             return {}
@@ -196,6 +419,14 @@ class OpenAICompatibleAdapter(BaseAdapter):
                 return {"response_format": {"type": "json_object"}}
             case StructuredOutputMode.json_schema:
                 output_schema = self.kiln_task.output_schema()
+                if provider.name == ModelProviderName.fireworks_ai:
+                    # Fireworks takes the schema on a json_object response format: https://docs.fireworks.ai/structured-responses/structured-response-formatting
+                    return {
+                        "response_format": {
+                            "type": "json_object",
+                            "schema": output_schema,
+                        }
+                    }
                 return {
                     "response_format": {
                         "type": "json_schema",
@@ -206,7 +437,7 @@ class OpenAICompatibleAdapter(BaseAdapter):
                     }
                 }
             case StructuredOutputMode.function_calling:
-                return self.tool_call_params()
+                return self.tool_call_params(strict=self.strict_tool_calls())
             case StructuredOutputMode.json_instructions:
                 # JSON done via instructions in prompt, not the API response format. Do not ask for json_object (see option below).
                 return {}
@@ -215,11 +446,18 @@ class OpenAICompatibleAdapter(BaseAdapter):
                 return {"response_format": {"type": "json_object"}}
             case StructuredOutputMode.default:
                 # Default to function calling -- it's older than the other modes. Higher compatibility.
-                return self.tool_call_params()
+                return self.tool_call_params(strict=self.strict_tool_calls())
             case _:
                 raise_exhaustive_enum_error(provider.structured_output_mode)
 
-    def tool_call_params(self) -> dict[str, Any]:
+    def strict_tool_calls(self) -> bool:
+        # Groq and Fireworks reject OpenAI's strict option on function definitions
+        return self.model_provider().name not in (
+            ModelProviderName.groq,
+            ModelProviderName.fireworks_ai,
+        )
+
+    def tool_call_params(self, strict: bool = True) -> dict[str, Any]:
         # Add additional_properties: false to the schema (OpenAI requires this for some models)
         output_schema = self.kiln_task.output_schema()
         if not isinstance(output_schema, dict):
@@ -228,17 +466,15 @@ class OpenAICompatibleAdapter(BaseAdapter):
             )
         output_schema["additionalProperties"] = False
 
+        function: dict[str, Any] = {
+            "name": "task_response",
+            "parameters": output_schema,
+        }
+        if strict:
+            function["strict"] = True
+
         return {
-            "tools": [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "task_response",
-                        "parameters": output_schema,
-                        "strict": True,
-                    },
-                }
-            ],
+            "tools": [{"type": "function", "function": function}],
             "tool_choice": {
                 "type": "function",
                 "function": {"name": "task_response"},
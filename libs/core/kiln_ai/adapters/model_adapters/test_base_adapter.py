@@ -1,10 +1,12 @@
+import json
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from kiln_ai.adapters.ml_model_list import KilnModelProvider, StructuredOutputMode
 from kiln_ai.adapters.model_adapters.base_adapter import AdapterInfo, BaseAdapter
-from kiln_ai.datamodel import Task
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
+from kiln_ai.datamodel import Task, TaskRun
 
 
 class MockAdapter(BaseAdapter):
@@ -188,3 +190,52 @@ async def test_run_strategy(
     # Test
     result = adapter.run_strategy()
     assert result == expected
+
+
+class StreamingMockAdapter(MockAdapter):
+    async def _run(self, input):
+        return RunOutput(
+            output={"answer": "yes"},
+            intermediate_outputs={"chain_of_thought": "because"},
+        )
+
+
+async def test_invoke_stream_default(base_task, mock_provider):
+    base_task.output_json_schema = (
+        '{"type": "object", "properties": {"answer": {"type": "string"}}}'
+    )
+    adapter = StreamingMockAdapter(
+        kiln_task=base_task, model_name="test_model", model_provider_name="openai"
+    )
+    adapter._model_provider = mock_provider
+
+    items = [item async for item in adapter.invoke_stream("input")]
+
+    # Adapters without streaming yield the complete response, then the run
+    assert items[:-1] == [
+        StreamDelta(channel="chain_of_thought", text="because"),
+        StreamDelta(channel="output", text='{"answer": "yes"}'),
+    ]
+    run = items[-1]
+    assert isinstance(run, TaskRun)
+    assert json.loads(run.output.output) == {"answer": "yes"}
+    assert run.intermediate_outputs == {"chain_of_thought": "because"}
+    # The task isn't saved, so neither is the run
+    assert run.id is None
+
+
+async def test_invoke_stream_validates_output(base_task, mock_provider):
+    base_task.output_json_schema = (
+        '{"type": "object", "properties": {"answer": {"type": "integer"}}}'
+    )
+    adapter = StreamingMockAdapter(
+        kiln_task=base_task, model_name="test_model", model_provider_name="openai"
+    )
+    adapter._model_provider = mock_provider
+
+    items = []
+    with pytest.raises(Exception):
+        async for item in adapter.invoke_stream("input"):
+            items.append(item)
+    # The response streamed before validation failed
+    assert len(items) == 2
@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from langchain_aws import ChatBedrockConverse
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_fireworks import ChatFireworks
 from langchain_groq import ChatGroq
@@ -10,6 +11,7 @@ from langchain_ollama import ChatOllama
 
 from kiln_ai.adapters.ml_model_list import (
     KilnModelProvider,
+    ModelParserID,
     ModelProviderName,
     StructuredOutputMode,
 )
@@ -17,9 +19,12 @@ from kiln_ai.adapters.model_adapters.base_adapter import COT_FINAL_ANSWER_PROMPT
 from kiln_ai.adapters.model_adapters.langchain_adapters import (
     LangchainAdapter,
     langchain_model_from_provider,
+    usage_from_message,
 )
 from kiln_ai.adapters.prompt_builders import SimpleChainOfThoughtPromptBuilder
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
 from kiln_ai.adapters.test_prompt_adaptors import build_test_task
+from kiln_ai.datamodel import Usage
 
 
 @pytest.fixture
@@ -103,6 +108,9 @@ async def test_langchain_adapter_with_cot(tmp_path):
         patch.object(LangchainAdapter, "model", return_value=mock_model_instance),
     ):
         response = await lca._run("test input")
+        # The base model is kept for the next run
+        await lca._run("test input")
+    mock_model_from.assert_called_once()
 
     # First 3 messages are the same for both calls
     for invoke_args in [
@@ -217,16 +225,11 @@ async def test_langchain_model_from_provider_ollama():
         provider_options={"model": "llama2", "model_aliases": ["llama2-uncensored"]},
     )
 
-    mock_connection = MagicMock()
     with (
         patch(
-            "kiln_ai.adapters.model_adapters.langchain_adapters.get_ollama_connection",
-            return_value=AsyncMock(return_value=mock_connection),
-        ),
-        patch(
-            "kiln_ai.adapters.model_adapters.langchain_adapters.ollama_model_installed",
-            return_value=True,
-        ),
+            "kiln_ai.adapters.model_adapters.langchain_adapters.ollama_model_name",
+            AsyncMock(return_value="llama2"),
+        ) as mock_model_name,
         patch(
             "kiln_ai.adapters.model_adapters.langchain_adapters.ollama_base_url",
             return_value="http://localhost:11434",
@@ -235,6 +238,7 @@ async def test_langchain_model_from_provider_ollama():
         model = await langchain_model_from_provider(provider, "llama2")
         assert isinstance(model, ChatOllama)
         assert model.model == "llama2"
+        mock_model_name.assert_awaited_once_with(provider)
 
 
 @pytest.mark.asyncio
@@ -348,3 +352,72 @@ async def test_langchain_model_from_provider_unsupported_providers(provider_name
     # Assert unsupported providers raise an error
     with pytest.raises(ValueError):
         await langchain_model_from_provider(provider, "test-model")
+
+
+def streaming_langchain_adapter(tmp_path, model, **provider_kwargs):
+    adapter = LangchainAdapter(
+        kiln_task=build_test_task(tmp_path),
+        model_name="deepseek_r1",
+        provider="ollama",
+    )
+    adapter._model = model
+    adapter._model_provider = KilnModelProvider(
+        name=ModelProviderName.ollama, **provider_kwargs
+    )
+    return adapter
+
+
+async def test_run_stream(tmp_path):
+    # Streams a chunk per word
+    model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="<think>some thinking</think> 4")])
+    )
+    adapter = streaming_langchain_adapter(
+        tmp_path, model, parser=ModelParserID.r1_thinking
+    )
+
+    items = [item async for item in adapter._run_stream("2 + 2")]
+
+    deltas, run_output = items[:-1], items[-1]
+    assert len(deltas) > 2
+    assert "".join(d.text for d in deltas if d.channel == "reasoning") == (
+        "some thinking"
+    )
+    assert "".join(d.text for d in deltas if d.channel == "output") == " 4"
+    assert run_output == RunOutput(
+        output="<think>some thinking</think> 4", intermediate_outputs={}
+    )
+
+
+async def test_run_stream_structured_output_wrapper(tmp_path):
+    # LangChain's structured output wrapper isn't a chat model, and can't stream
+    wrapper = MagicMock()
+    wrapper.ainvoke = AsyncMock(return_value={"parsed": {"answer": 4}})
+    adapter = streaming_langchain_adapter(tmp_path, wrapper)
+    adapter.output_schema = '{"type": "object"}'
+
+    items = [item async for item in adapter._run_stream("2 + 2")]
+
+    assert items == [
+        StreamDelta(channel="output", text='{"answer": 4}'),
+        RunOutput(output={"answer": 4}, intermediate_outputs={}),
+    ]
+
+
+def test_usage_from_message():
+    message = AIMessage(
+        content="answer",
+        usage_metadata={
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "total_tokens": 15,
+            "output_token_details": {"reasoning": 2},
+        },
+    )
+    expected = Usage(
+        input_tokens=10, output_tokens=5, reasoning_tokens=2, total_tokens=15
+    )
+    assert usage_from_message(message) == expected
+    # Structured output's raw message
+    assert usage_from_message({"raw": message, "parsed": {}}) == expected
+    assert usage_from_message(AIMessage(content="answer")) is None
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from kiln_ai.adapters.ml_model_list import StructuredOutputMode
+from kiln_ai.adapters.model_adapters.ollama_adapter import OllamaAdapter
+from kiln_ai.adapters.ollama_tools import OllamaDiscovery, OllamaError
+from kiln_ai.adapters.prompt_builders import SimpleChainOfThoughtPromptBuilder
+from kiln_ai.adapters.rate_limits import RateLimits
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
+from kiln_ai.datamodel import Project, Task, Usage
+
+
+class StubOllama(ThreadingHTTPServer):
+    """A local stand in for Ollama's /api/tags and /api/chat."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubOllamaHandler)
+        self.replies: list[str] = ["Stub reply"]
+        self.chat_bodies: list[dict] = []
+        self.connections: set[tuple[str, int]] = set()
+        self.delay = 0.0
+        self.error_status: int | None = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reply(self) -> str:
+        with self.lock:
+            return self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse can be seen
+    protocol_version = "HTTP/1.1"
+    server: StubOllama
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        assert self.path == "/api/tags"
+        tags = {"models": [{"name": "phi3.5", "model": "phi3.5:latest"}]}
+        self.send_body(200, json.dumps(tags).encode())
+
+    def do_POST(self):
+        assert self.path == "/api/chat"
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.chat_bodies.append(body)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if server.error_status is not None:
+                error = {"error": "model runner crashed"}
+                self.send_body(server.error_status, json.dumps(error).encode())
+                return
+            if not body["messages"]:
+                # Preload
+                done = {"model": body["model"], "done": True, "done_reason": "load"}
+                self.send_body(200, json.dumps(done).encode())
+                return
+
+            reply = server.reply()
+            final = {
+                "model": body["model"],
+                "done": True,
+                "prompt_eval_count": 20,
+                "eval_count": 5,
+            }
+            if body.get("stream"):
+                mid = len(reply) // 2
+                chunks = [
+                    {"message": {"role": "assistant", "content": part}, "done": False}
+                    for part in (reply[:mid], reply[mid:])
+                ]
+                final["message"] = {"role": "assistant", "content": ""}
+                lines = [json.dumps(chunk) for chunk in [*chunks, final]]
+                self.send_body(200, "\n".join(lines).encode() + b"\n")
+            else:
+                final["message"] = {"role": "assistant", "content": reply}
+                self.send_body(200, json.dumps(final).encode())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def ollama():
+    server = StubOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    config = MagicMock()
+    config.ollama_base_url = server.url
+    config.ollama_keep_alive = "30m"
+    config.ollama_parallel_requests = 2
+    config.provider_rate_limits = {}
+    config.retry_policies = {}
+    config.response_cache = False
+    config.model_pricing = {}
+    config.user_id = "test_user"
+    with (
+        patch("kiln_ai.utils.config.Config.shared", return_value=config),
+        patch.object(OllamaDiscovery, "shared", return_value=OllamaDiscovery()),
+        patch.object(RateLimits, "shared", return_value=RateLimits()),
+    ):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_task(tmp_path, structured: bool = False) -> Task:
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    schema = {"type": "object", "properties": {"joke": {"type": "string"}}}
+    task = Task(
+        name="Test Task",
+        instruction="Tell a joke",
+        parent=project,
+        output_json_schema=json.dumps(schema) if structured else None,
+    )
+    task.save_to_file()
+    return task
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    return OllamaAdapter(make_task(tmp_path), model_name="phi_3_5")
+
+
+async def test_run(ollama, adapter):
+    run = await adapter.invoke_unsaved("Tell me a joke")
+    assert run.output.output == "Stub reply"
+    assert run.usage == Usage(input_tokens=20, output_tokens=5, total_tokens=25)
+    source = run.output.source
+    assert source.properties["adapter_name"] == "kiln_ollama_adapter"
+    assert source.properties["model_provider"] == "ollama"
+
+    body = ollama.chat_bodies[0]
+    # Resolved to the name it's installed under
+    assert body["model"] == "phi3.5"
+    assert body["stream"] is False
+    assert body["keep_alive"] == "30m"
+    assert "format" not in body
+    assert [m["role"] for m in body["messages"]] == ["system", "user"]
+    assert body["messages"][1]["content"].endswith("Tell me a joke")
+
+
+async def test_connections_reused(ollama, adapter):
+    for _ in range(3):
+        await adapter.invoke_unsaved("Tell me a joke")
+    other = OllamaAdapter(adapter.kiln_task, model_name="phi_3_5")
+    await other.invoke_unsaved("Tell me a joke")
+    assert len(ollama.chat_bodies) == 4
+    assert len(ollama.connections) == 1
+
+
+async def test_structured_output(ollama, tmp_path):
+    ollama.replies = ['{"joke": "Knock knock"}']
+    adapter = OllamaAdapter(make_task(tmp_path, structured=True), model_name="phi_3_5")
+    run = await adapter.invoke_unsaved("Tell me a joke")
+    assert json.loads(run.output.output) == {"joke": "Knock knock"}
+    assert ollama.chat_bodies[0]["format"] == adapter.kiln_task.output_schema()
+
+
+@pytest.mark.parametrize(
+    "mode,expected",
+    [
+        (StructuredOutputMode.json_schema, "schema"),
+        (StructuredOutputMode.default, "schema"),
+        (StructuredOutputMode.function_calling, "schema"),
+        (StructuredOutputMode.json_mode, "json"),
+        (StructuredOutputMode.json_instruction_and_object, "json"),
+        (StructuredOutputMode.json_instructions, None),
+    ],
+)
+def test_response_format(tmp_path, mode, expected):
+    adapter = OllamaAdapter(make_task(tmp_path, structured=True), model_name="phi_3_5")
+    # A copy: the built-in provider is shared
+    adapter._model_provider = adapter.model_provider().model_copy(
+        update={"structured_output_mode": mode}
+    )
+    if expected == "schema":
+        expected = adapter.kiln_task.output_schema()
+    assert adapter.response_format() == expected
+
+
+async def test_chain_of_thought(ollama, tmp_path):
+    ollama.replies = ["Thinking it over", "The answer"]
+    task = make_task(tmp_path)
+    adapter = OllamaAdapter(
+        task,
+        model_name="phi_3_5",
+        prompt_builder=SimpleChainOfThoughtPromptBuilder(task),
+    )
+    run = await adapter.invoke_unsaved("Tell me a joke")
+    assert run.output.output == "The answer"
+    assert run.intermediate_outputs == {"chain_of_thought": "Thinking it over"}
+    # Both calls are counted
+    assert run.usage.input_tokens == 40
+
+    final_messages = ollama.chat_bodies[1]["messages"]
+    assert final_messages[-2] == {"role": "assistant", "content": "Thinking it over"}
+
+
+async def test_stream(ollama, adapter):
+    items = [item async for item in adapter.invoke_stream("Tell me a joke")]
+    deltas = [item for item in items if isinstance(item, StreamDelta)]
+    assert "".join(delta.text for delta in deltas) == "Stub reply"
+    assert len(deltas) == 2
+    run = items[-1]
+    assert run.output.output == "Stub reply"
+    assert run.usage.output_tokens == 5
+    assert ollama.chat_bodies[0]["stream"] is True
+
+
+async def test_error(ollama, adapter):
+    ollama.error_status = 400
+    with pytest.raises(OllamaError, match="model runner crashed") as exc_info:
+        await adapter.invoke_unsaved("Tell me a joke")
+    assert exc_info.value.status_code == 400
+
+    with pytest.raises(OllamaError, match="model runner crashed"):
+        [item async for item in adapter.invoke_stream("Tell me a joke")]
+
+
+async def test_preload(ollama, adapter):
+    await adapter.preload()
+    assert ollama.chat_bodies == [
+        {"model": "phi3.5", "messages": [], "keep_alive": "30m"}
+    ]
+
+
+async def test_concurrency_limited_to_parallel_requests(ollama, adapter):
+    ollama.delay = 0.05
+    runs = await asyncio.gather(
+        *(adapter.invoke_unsaved("Tell me a joke") for _ in range(6))
+    )
+    assert all(isinstance(run.output.output, str) for run in runs)
+    assert ollama.max_in_flight == 2
+
+
+async def test_model_not_installed(ollama, tmp_path):
+    adapter = OllamaAdapter(make_task(tmp_path), model_name="llama_3_1_8b")
+    with pytest.raises(ValueError, match="not installed on Ollama"):
+        await adapter.invoke_unsaved("Tell me a joke")
+
+
+def test_run_output_structured(tmp_path):
+    adapter = OllamaAdapter(make_task(tmp_path, structured=True), model_name="phi_3_5")
+    assert adapter.run_output('{"joke": "ha"}', {}) == RunOutput(
+        output={"joke": "ha"}, intermediate_outputs={}
+    )
@@ -0,0 +1,373 @@
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import pytest
+
+from kiln_ai.adapters.model_adapters.openai_batch import (
+    OpenAIBatchRunner,
+    parse_batch_output,
+    split_batch_lines,
+)
+from kiln_ai.adapters.model_adapters.openai_compatible_config import (
+    OpenAICompatibleConfig,
+)
+from kiln_ai.adapters.model_adapters.openai_model_adapter import (
+    OpenAICompatibleAdapter,
+)
+from kiln_ai.adapters.prompt_builders import SimpleChainOfThoughtPromptBuilder
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.utils.config import Config
+
+
+def completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+    }
+
+
+class MockBatchServer:
+    """
+    A local server implementing the files and batches endpoints of the OpenAI API. Batches complete on their second poll, with a response from `respond(body)` for each request. `respond` can return an int status code to fail a request.
+    """
+
+    def __init__(self, respond: Callable[[dict], str | int]):
+        self.respond = respond
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self.requests: list[dict] = []
+        self.deleted: list[str] = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, body: dict, status: int = 200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("content-length", 0)))
+
+            def do_POST(self):
+                with server.lock:
+                    if self.path == "/v1/files":
+                        self.send_json(server.upload(self.headers, self.body()))
+                    elif self.path == "/v1/batches":
+                        self.send_json(server.create_batch(json.loads(self.body())))
+                    elif self.path.endswith("/cancel"):
+                        self.body()
+                        batch = server.batches[self.path.split("/")[3]]
+                        batch["status"] = "cancelled"
+                        self.send_json(batch)
+                    else:
+                        self.send_json({"error": "not found"}, 404)
+
+            def do_GET(self):
+                with server.lock:
+                    parts = self.path.split("/")
+                    if self.path.startswith("/v1/batches/"):
+                        self.send_json(server.poll(parts[3]))
+                    elif self.path.endswith("/content"):
+                        data = server.files[parts[3]]
+                        self.send_response(200)
+                        self.send_header("content-length", str(len(data)))
+                        self.end_headers()
+                        self.wfile.write(data)
+                    else:
+                        self.send_json({"error": "not found"}, 404)
+
+            def do_DELETE(self):
+                with server.lock:
+                    file_id = self.path.split("/")[3]
+                    server.deleted.append(file_id)
+                    self.send_json({"id": file_id, "object": "file", "deleted": True})
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def file_object(self, file_id: str, purpose: str) -> dict:
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(self.files[file_id]),
+            "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl",
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def upload(self, headers, body: bytes) -> dict:
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {headers['content-type']}\r\n\r\n".encode() + body
+        )
+        for part in message.iter_parts():
+            if part.get_filename():
+                file_id = f"file-{len(self.files)}"
+                self.files[file_id] = part.get_payload(decode=True)
+                return self.file_object(file_id, "batch")
+        raise ValueError("No file in upload")
+
+    def create_batch(self, request: dict) -> dict:
+        batch_id = f"batch-{len(self.batches)}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"],
+            "created_at": int(time.time()),
+            "status": "validating",
+        }
+        return self.batches[batch_id]
+
+    def poll(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress":
+            self.complete(batch)
+        return batch
+
+    def complete(self, batch: dict) -> None:
+        outputs, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode().splitlines():
+            request = json.loads(line)
+            self.requests.append(request)
+            response = self.respond(request["body"])
+            if isinstance(response, int):
+                errors.append(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": response,
+                            "body": {"error": {"message": "Server error"}},
+                        },
+                    }
+                )
+            else:
+                outputs.append(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": completion(response)},
+                    }
+                )
+        for key, items in (("output_file_id", outputs), ("error_file_id", errors)):
+            if items:
+                file_id = f"file-{len(self.files)}"
+                self.files[file_id] = "".join(
+                    json.dumps(item) + "\n" for item in items
+                ).encode()
+                batch[key] = file_id
+        batch["status"] = "completed"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def user_input(body: dict) -> str:
+    # The input, from the end of the user message
+    message = next(m["content"] for m in body["messages"] if m["role"] == "user")
+    return message.splitlines()[-1]
+
+
+@pytest.fixture
+def task(tmp_path):
+    Config.shared().open_ai_api_key = "test-key"
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Do the thing", parent=project)
+    task.save_to_file()
+    return task
+
+
+def batch_adapter(server: MockBatchServer, task: Task, **kwargs):
+    return OpenAICompatibleAdapter(
+        config=OpenAICompatibleConfig(
+            api_key="test-key",
+            base_url=server.base_url,
+            model_name="gpt_4o",
+            provider_name="openai",
+        ),
+        kiln_task=task,
+        **kwargs,
+    )
+
+
+def test_split_batch_lines():
+    lines = ["a" * 9] * 5
+    assert [len(chunk) for chunk in split_batch_lines(lines, max_requests=2)] == [
+        2,
+        2,
+        1,
+    ]
+    # 10 bytes a line, with the newline
+    assert [len(chunk) for chunk in split_batch_lines(lines, max_bytes=30)] == [3, 2]
+
+
+def test_parse_batch_output():
+    content = "\n".join(
+        [
+            json.dumps(
+                {
+                    "custom_id": "0",
+                    "response": {"status_code": 200, "body": completion("hi")},
+                }
+            ),
+            json.dumps(
+                {
+                    "custom_id": "1",
+                    "response": {
+                        "status_code": 400,
+                        "body": {"error": {"message": "Bad"}},
+                    },
+                }
+            ),
+            json.dumps({"custom_id": "2", "error": {"message": "Expired"}}),
+        ]
+    )
+    results = parse_batch_output(content)
+    assert results["0"].choices[0].message.content == "hi"
+    assert "Bad" in str(results["1"])
+    assert "Expired" in str(results["2"])
+
+
+async def test_batch_run(task):
+    with MockBatchServer(lambda body: f"Echo: {user_input(body)}") as server:
+        adapter = batch_adapter(server, task)
+        runner = OpenAIBatchRunner(adapter, poll_interval_seconds=0.01)
+        results = await runner.run(["one", "two", "three"])
+
+    assert [result.error for result in results] == [None, None, None]
+    assert [result.run.output.output for result in results] == [
+        "Echo: one",
+        "Echo: two",
+        "Echo: three",
+    ]
+    # Saved like invoke
+    assert len(task.runs()) == 3
+    run = results[0].run
+    assert run.output.source.properties["model_name"] == "gpt_4o"
+    assert run.output.source.properties["adapter_name"] == (
+        "kiln_openai_compatible_adapter"
+    )
+
+    # One batch, with the same messages as a real time call
+    assert len(server.batches) == 1
+    request = server.requests[0]
+    assert request["url"] == "/v1/chat/completions"
+    messages, _ = adapter.build_messages("one")
+    assert request["body"]["messages"] == messages
+    assert request["body"]["model"] == "gpt-4o"
+    # Files cleaned up
+    assert sorted(server.deleted) == ["file-0", "file-1"]
+
+
+async def test_batch_run_structured(task):
+    task.output_json_schema = json.dumps(
+        {
+            "type": "object",
+            "properties": {"answer": {"type": "integer"}},
+            "required": ["answer"],
+        }
+    )
+    task.save_to_file()
+
+    def respond(body: dict) -> str | int:
+        match user_input(body):
+            case "good":
+                return json.dumps({"answer": 42})
+            case "invalid":
+                return json.dumps({"answer": "forty two"})
+            case _:
+                return 500
+
+    with MockBatchServer(respond) as server:
+        adapter = batch_adapter(server, task)
+        runner = OpenAIBatchRunner(adapter, poll_interval_seconds=0.01)
+        results = await runner.run(["good", "invalid", "error", {"not": "a string"}])
+
+    assert results[0].run.output.output == '{"answer": 42}'
+    # Schema validation, API errors and bad input are per item
+    assert results[1].run is None and results[1].error is not None
+    assert "Server error" in str(results[2].error)
+    assert results[3].error is not None
+    assert len(task.runs()) == 1
+    # The response format is the adapter's
+    assert (
+        server.requests[0]["body"]["response_format"]
+        == (await adapter.response_format_options())["response_format"]
+    )
+
+
+async def test_batch_run_two_call_chain_of_thought(task):
+    def respond(body: dict) -> str:
+        if body["messages"][-1]["role"] == "system":
+            return "Thinking about it"
+        return "Final answer"
+
+    with MockBatchServer(respond) as server:
+        adapter = batch_adapter(
+            server, task, prompt_builder=SimpleChainOfThoughtPromptBuilder(task)
+        )
+        runner = OpenAIBatchRunner(adapter, poll_interval_seconds=0.01)
+        results = await runner.run(["one"])
+
+    run = results[0].run
+    assert run.output.output == "Final answer"
+    assert run.intermediate_outputs == {"chain_of_thought": "Thinking about it"}
+    assert len(server.batches) == 2
+    final_messages = server.requests[1]["body"]["messages"]
+    assert final_messages[-2] == {"role": "assistant", "content": "Thinking about it"}
+
+
+async def test_batch_run_split_into_batches(task):
+    with MockBatchServer(lambda body: "ok") as server:
+        adapter = batch_adapter(server, task)
+        runner = OpenAIBatchRunner(
+            adapter, poll_interval_seconds=0.01, max_requests_per_batch=2
+        )
+        results = await runner.run([f"input {i}" for i in range(5)])
+    assert all(result.run is not None for result in results)
+    assert len(server.batches) == 3
+
+
+async def test_batch_run_timeout_cancels(task):
+    with MockBatchServer(lambda body: "ok") as server:
+        adapter = batch_adapter(server, task)
+        runner = OpenAIBatchRunner(
+            adapter, poll_interval_seconds=0.01, timeout_seconds=0
+        )
+        results = await runner.run(["one"])
+    assert isinstance(results[0].error, TimeoutError)
+    assert server.batches["batch-0"]["status"] == "cancelled"
+    assert task.runs() == []
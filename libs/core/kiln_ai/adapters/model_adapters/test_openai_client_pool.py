@@ -0,0 +1,99 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from kiln_ai.adapters.model_adapters.openai_client_pool import (
+    KEEPALIVE_EXPIRY_SECONDS,
+    OpenAIClientPool,
+    client_key,
+    new_http_client,
+)
+from kiln_ai.adapters.model_adapters.openai_compatible_config import (
+    OpenAICompatibleConfig,
+)
+
+
+def make_config(**kwargs):
+    defaults = dict(
+        api_key="key",
+        model_name="model",
+        provider_name="openai",
+        base_url="https://api.example.com/v1",
+    )
+    return OpenAICompatibleConfig(**{**defaults, **kwargs})
+
+
+@pytest.fixture
+def pool():
+    return OpenAIClientPool()
+
+
+def test_client_key_ignores_model_and_header_order():
+    assert client_key(make_config(model_name="a")) == client_key(
+        make_config(model_name="b")
+    )
+    assert client_key(make_config(default_headers={"a": "1", "b": "2"})) == client_key(
+        make_config(default_headers={"b": "2", "a": "1"})
+    )
+    assert client_key(make_config(api_key="other")) != client_key(make_config())
+    assert client_key(make_config(base_url="https://other")) != client_key(
+        make_config()
+    )
+
+
+def test_http_client_limits():
+    http_client = new_http_client()
+    pool = http_client._transport._pool
+    assert pool._keepalive_expiry == KEEPALIVE_EXPIRY_SECONDS
+
+
+async def test_client_reused_on_same_loop(pool):
+    client = pool.client(make_config(model_name="a"))
+    assert isinstance(client, AsyncOpenAI)
+    assert pool.client(make_config(model_name="b")) is client
+    assert pool.client(make_config(api_key="other")) is not client
+    assert str(client.base_url) == "https://api.example.com/v1/"
+    assert len(pool) == 2
+
+    await pool.aclose()
+    assert len(pool) == 0
+    assert client.is_closed()
+    # A new client after closing
+    assert pool.client(make_config()) is not client
+    await pool.aclose()
+
+
+def test_client_per_event_loop(pool):
+    async def get_client():
+        return pool.client(make_config())
+
+    first = asyncio.run(get_client())
+    second = asyncio.run(get_client())
+    assert first is not second
+
+    # Outside a loop: not pooled
+    assert pool.client(make_config()) is not pool.client(make_config())
+
+
+async def test_warm_up(pool):
+    with patch.object(httpx.AsyncClient, "head", new_callable=AsyncMock) as mock_head:
+        await pool.warm_up([make_config(model_name="a"), make_config(model_name="b")])
+    # One connection per unique client
+    mock_head.assert_awaited_once()
+    assert mock_head.call_args.args[0] == "https://api.example.com/v1/"
+    assert len(pool) == 1
+    await pool.aclose()
+
+
+async def test_warm_up_ignores_failures(pool):
+    with patch.object(
+        httpx.AsyncClient,
+        "head",
+        new_callable=AsyncMock,
+        side_effect=httpx.ConnectError("offline"),
+    ):
+        await pool.warm_up([make_config()])
+    await pool.aclose()
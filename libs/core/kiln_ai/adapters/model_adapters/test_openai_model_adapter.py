@@ -1,16 +1,25 @@
 import json
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, PropertyMock, patch
 
 import pytest
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
-from kiln_ai.adapters.ml_model_list import StructuredOutputMode
+from kiln_ai.adapters.ml_model_list import (
+    KilnModelProvider,
+    ModelParserID,
+    ModelProviderName,
+    StructuredOutputMode,
+)
 from kiln_ai.adapters.model_adapters.base_adapter import AdapterInfo, BasePromptBuilder
+from kiln_ai.adapters.model_adapters.openai_client_pool import OpenAIClientPool
 from kiln_ai.adapters.model_adapters.openai_compatible_config import (
     OpenAICompatibleConfig,
 )
 from kiln_ai.adapters.model_adapters.openai_model_adapter import OpenAICompatibleAdapter
-from kiln_ai.datamodel import Project, Task
+from kiln_ai.adapters.prompt_builders import SimpleChainOfThoughtPromptBuilder
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
+from kiln_ai.datamodel import Project, Task, Usage
 
 
 @pytest.fixture
@@ -56,6 +65,16 @@ def config():
     )
 
 
+async def test_client_shared_between_adapters(config, mock_task):
+    pool = OpenAIClientPool()
+    with patch.object(OpenAIClientPool, "shared", return_value=pool):
+        first = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+        second = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+        assert first.client is second.client
+        assert str(first.client.base_url).startswith("https://api.test.com")
+    await pool.aclose()
+
+
 def test_initialization(config, mock_task, mock_prompt_builder):
     adapter = OpenAICompatibleAdapter(
         config=config,
@@ -223,3 +242,330 @@ def test_tool_call_params(config, mock_task, mock_prompt_builder):
             "function": {"name": "task_response"},
         },
     }
+
+
+@pytest.mark.parametrize(
+    "provider_name", [ModelProviderName.groq, ModelProviderName.fireworks_ai]
+)
+async def test_response_format_options_function_calling_not_strict(
+    config, mock_task, provider_name
+):
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+    adapter._model_provider = KilnModelProvider(
+        name=provider_name,
+        structured_output_mode=StructuredOutputMode.function_calling,
+    )
+
+    options = await adapter.response_format_options()
+    assert "strict" not in options["tools"][0]["function"]
+    assert options["tools"][0]["function"]["name"] == "task_response"
+    assert options["tool_choice"]["function"]["name"] == "task_response"
+
+
+async def test_response_format_options_fireworks_json_schema(config, mock_task):
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+    adapter._model_provider = KilnModelProvider(
+        name=ModelProviderName.fireworks_ai,
+        structured_output_mode=StructuredOutputMode.json_schema,
+    )
+
+    options = await adapter.response_format_options()
+    assert options == {
+        "response_format": {
+            "type": "json_object",
+            "schema": mock_task.output_schema(),
+        }
+    }
+
+
+def test_run_output_structured_with_parser(config, mock_task):
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+    adapter._model_provider = KilnModelProvider(
+        name=ModelProviderName.fireworks_ai, parser=ModelParserID.r1_thinking
+    )
+
+    # Left as text for the parser, which splits out the thinking before parsing the JSON
+    raw = '<think>hmm</think>{"test": "value"}'
+    assert adapter.run_output(raw, None, {}) == RunOutput(
+        output=raw, intermediate_outputs={}
+    )
+
+
+@pytest.mark.asyncio
+async def test_response_format_options_built_once(
+    config, mock_task, mock_prompt_builder
+):
+    adapter = OpenAICompatibleAdapter(
+        config=config, kiln_task=mock_task, prompt_builder=mock_prompt_builder
+    )
+
+    with patch.object(
+        adapter,
+        "build_response_format_options",
+        return_value={"response_format": {"type": "json_object"}},
+    ) as mock_build:
+        first = await adapter.response_format_options()
+        second = await adapter.response_format_options()
+
+    assert first == second == {"response_format": {"type": "json_object"}}
+    mock_build.assert_called_once()
+
+
+def chunk(content=None, reasoning=None, tool_arguments=None):
+    delta = {"role": "assistant", "content": content}
+    if reasoning is not None:
+        delta["reasoning"] = reasoning
+    if tool_arguments is not None:
+        delta["tool_calls"] = [
+            {
+                "index": 0,
+                "type": "function",
+                "function": {"name": "task_response", "arguments": tool_arguments},
+            }
+        ]
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "test-model",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+    )
+
+
+async def stream_of(chunks):
+    for item in chunks:
+        yield item
+
+
+def streaming_adapter(config, task, streams, name="openai", **provider_kwargs):
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=task)
+    adapter._model_provider = KilnModelProvider(
+        name=name, provider_options={"model": "test-model"}, **provider_kwargs
+    )
+    create = AsyncMock(side_effect=[stream_of(chunks) for chunks in streams])
+    client = Mock()
+    client.chat.completions.create = create
+    # Groq and Fireworks post the completion body directly
+    client.post = create
+    return adapter, client, create
+
+
+async def collect_stream(adapter, client):
+    with patch.object(
+        OpenAICompatibleAdapter, "client", new_callable=PropertyMock
+    ) as mock_client:
+        mock_client.return_value = client
+        return [item async for item in adapter._run_stream("input")]
+
+
+async def test_run_stream_tool_call(config, mock_task):
+    adapter, client, create = streaming_adapter(
+        config,
+        mock_task,
+        [[chunk(tool_arguments='{"test": '), chunk(tool_arguments='"value"}')]],
+        structured_output_mode=StructuredOutputMode.function_calling,
+    )
+
+    items = await collect_stream(adapter, client)
+
+    assert items[:-1] == [
+        StreamDelta(channel="output", text='{"test": '),
+        StreamDelta(channel="output", text='"value"}'),
+    ]
+    assert items[-1] == RunOutput(output={"test": "value"}, intermediate_outputs={})
+    assert create.call_args.kwargs["stream"] is True
+    assert create.call_args.kwargs["stream_options"] == {"include_usage": True}
+    assert create.call_args.kwargs["tools"][0]["function"]["name"] == "task_response"
+
+
+@pytest.mark.parametrize(
+    "provider_name", [ModelProviderName.groq, ModelProviderName.fireworks_ai]
+)
+async def test_run_stream_posts_completion_body(config, mock_task, provider_name):
+    adapter, client, post = streaming_adapter(
+        config,
+        mock_task,
+        [[chunk(tool_arguments='{"test": "value"}')]],
+        name=provider_name,
+        structured_output_mode=StructuredOutputMode.function_calling,
+    )
+
+    items = await collect_stream(adapter, client)
+
+    assert items[-1] == RunOutput(output={"test": "value"}, intermediate_outputs={})
+    # Posted, not passed through create()
+    assert post.call_args.args == ("/chat/completions",)
+    assert post.call_args.kwargs["stream"] is True
+    body = post.call_args.kwargs["body"]
+    assert body["stream"] is True
+    assert body["stream_options"] == {"include_usage": True}
+    assert body["model"] == "test-model"
+    assert body["messages"][-1]["role"] == "user"
+    assert "strict" not in body["tools"][0]["function"]
+
+
+async def test_run_posts_completion_body(config, mock_task):
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+    adapter._model_provider = KilnModelProvider(
+        name=ModelProviderName.fireworks_ai,
+        provider_options={"model": "test-model"},
+        structured_output_mode=StructuredOutputMode.json_schema,
+    )
+    response = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": '{"test": "value"}'},
+                }
+            ],
+        }
+    )
+    client = Mock()
+    client.post = AsyncMock(return_value=response)
+    with patch.object(
+        OpenAICompatibleAdapter, "client", new_callable=PropertyMock
+    ) as mock_client:
+        mock_client.return_value = client
+        run_output = await adapter._run("input")
+
+    assert run_output.output == {"test": "value"}
+    client.chat.completions.create.assert_not_called()
+    body = client.post.call_args.kwargs["body"]
+    assert "stream" not in body
+    assert body["response_format"] == {
+        "type": "json_object",
+        "schema": mock_task.output_schema(),
+    }
+
+
+async def test_run_stream_think_tags_and_cot(config, mock_task):
+    mock_task.output_json_schema = None
+    adapter, client, create = streaming_adapter(
+        config,
+        mock_task,
+        [
+            [chunk("Step 1. "), chunk("Step 2.")],
+            [chunk("<think>hmm"), chunk("</think>"), chunk("Answer")],
+        ],
+        parser=ModelParserID.r1_thinking,
+    )
+    adapter.prompt_builder = SimpleChainOfThoughtPromptBuilder(mock_task)
+
+    items = await collect_stream(adapter, client)
+
+    assert items[:-1] == [
+        StreamDelta(channel="chain_of_thought", text="Step 1. "),
+        StreamDelta(channel="chain_of_thought", text="Step 2."),
+        StreamDelta(channel="reasoning", text="hmm"),
+        StreamDelta(channel="output", text="Answer"),
+    ]
+    # The raw response: the parser splits out the thinking afterwards
+    assert items[-1] == RunOutput(
+        output="<think>hmm</think>Answer",
+        intermediate_outputs={"chain_of_thought": "Step 1. Step 2."},
+    )
+    assert create.call_count == 2
+    # Both calls ask for usage
+    for call in create.call_args_list:
+        assert call.kwargs["stream_options"] == {"include_usage": True}
+    final_messages = create.call_args.kwargs["messages"]
+    assert final_messages[-2] == {"role": "assistant", "content": "Step 1. Step 2."}
+
+
+async def test_run_stream_openrouter_reasoning(config, mock_task):
+    mock_task.output_json_schema = None
+    config.openrouter_style_reasoning = True
+    adapter, client, _ = streaming_adapter(
+        config,
+        mock_task,
+        [[chunk(reasoning="thinking"), chunk("Answer")]],
+        reasoning_capable=True,
+    )
+
+    items = await collect_stream(adapter, client)
+
+    assert items[:-1] == [
+        StreamDelta(channel="reasoning", text="thinking"),
+        StreamDelta(channel="output", text="Answer"),
+    ]
+    assert items[-1] == RunOutput(
+        output="Answer", intermediate_outputs={"reasoning": "thinking"}
+    )
+
+
+async def test_run_stream_empty_response(config, mock_task):
+    adapter, client, _ = streaming_adapter(config, mock_task, [[chunk()]])
+    with pytest.raises(RuntimeError, match="No message content"):
+        await collect_stream(adapter, client)
+
+
+USAGE = {
+    "prompt_tokens": 10,
+    "completion_tokens": 5,
+    "total_tokens": 15,
+    "completion_tokens_details": {"reasoning_tokens": 2},
+}
+
+
+def test_run_output_from_completion_usage(config, mock_task):
+    mock_task.output_json_schema = None
+    adapter = OpenAICompatibleAdapter(config=config, kiln_task=mock_task)
+    adapter._model_provider = KilnModelProvider(name="openai")
+    response = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "answer"},
+                }
+            ],
+            "usage": USAGE,
+        }
+    )
+
+    run_output = adapter.run_output_from_completion(response, {})
+    assert run_output.usage == Usage(
+        input_tokens=10, output_tokens=5, reasoning_tokens=2, total_tokens=15
+    )
+
+    # Includes the chain of thought call
+    run_output = adapter.run_output_from_completion(
+        response, {}, Usage(input_tokens=8, output_tokens=4, total_tokens=12)
+    )
+    assert run_output.usage == Usage(
+        input_tokens=18, output_tokens=9, reasoning_tokens=2, total_tokens=27
+    )
+
+
+async def test_run_stream_usage(config, mock_task):
+    mock_task.output_json_schema = None
+    usage_chunk = ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "test-model",
+            "choices": [],
+            "usage": USAGE,
+        }
+    )
+    adapter, client, _ = streaming_adapter(
+        config, mock_task, [[chunk(content="answer"), usage_chunk]]
+    )
+
+    items = await collect_stream(adapter, client)
+    assert items[-1].output == "answer"
+    assert items[-1].usage.total_tokens == 15
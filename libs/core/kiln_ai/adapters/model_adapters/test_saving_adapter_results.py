@@ -1,7 +1,10 @@
+import asyncio
+import threading
 from unittest.mock import patch
 
 import pytest
 
+from kiln_ai.adapters.model_adapters import base_adapter
 from kiln_ai.adapters.model_adapters.base_adapter import (
     AdapterInfo,
     BaseAdapter,
@@ -12,6 +15,7 @@ from kiln_ai.datamodel import (
     DataSourceType,
     Project,
     Task,
+    Usage,
 )
 from kiln_ai.utils.config import Config
 
@@ -205,3 +209,236 @@ async def test_autosave_true(test_task, adapter):
         assert output.source.properties["model_name"] == "mock_model"
         assert output.source.properties["model_provider"] == "mock_provider"
         assert output.source.properties["prompt_builder_name"] == "mock_prompt_builder"
+
+
+@pytest.mark.asyncio
+async def test_invoke_unsaved(test_task, adapter):
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_config = mock_shared.return_value
+        mock_config.autosave_runs = True
+        mock_config.user_id = "test_user"
+
+        run = await adapter.invoke_unsaved("Test input")
+
+        # Built and ready to save, but not written even with autosave on
+        assert adapter.autosave_runs()
+        assert run.id is not None
+        assert run.path is None
+        assert run.output.output == "Test output"
+        assert len(test_task.runs()) == 0
+
+        run.save_to_file()
+        assert len(test_task.runs()) == 1
+
+
+def test_autosave_runs_requires_task_path(adapter):
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_config = mock_shared.return_value
+        mock_config.autosave_runs = True
+        assert adapter.autosave_runs()
+
+        adapter.kiln_task.path = None
+        assert not adapter.autosave_runs()
+
+        mock_config.autosave_runs = False
+        adapter.kiln_task.path = "/tmp/task.kiln"
+        assert not adapter.autosave_runs()
+
+
+class BatchMockAdapter(MockAdapter):
+    async def _run(self, input: dict | str) -> RunOutput:
+        # Reverse completion order: later inputs finish first
+        await asyncio.sleep(0.01 * (10 - int(input)))
+        if input == "3":
+            raise RuntimeError("Model call failed")
+        self.estimate_tokens(input)
+        return RunOutput(output=f"Output {input}", intermediate_outputs=None)
+
+
+@pytest.fixture
+def batch_adapter(test_task):
+    return BatchMockAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+
+
+@pytest.fixture
+def autosave_config():
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_config = mock_shared.return_value
+        mock_config.autosave_runs = True
+        mock_config.user_id = "test_user"
+        yield mock_config
+
+
+async def test_invoke_batch(test_task, batch_adapter, autosave_config):
+    inputs = [str(i) for i in range(6)]
+    with patch.object(
+        batch_adapter.prompt_builder,
+        "build_prompt",
+        wraps=batch_adapter.prompt_builder.build_prompt,
+    ) as build_prompt:
+        results = [
+            result async for result in batch_adapter.invoke_batch(inputs, concurrency=6)
+        ]
+
+    # Completion order, with errors per input. Errors are reported right away, runs once saved.
+    assert [result.index for result in results] == [3, 5, 4, 2, 1, 0]
+    failed = results[0]
+    assert failed.input == "3" and failed.run is None
+    assert str(failed.error) == "Model call failed"
+    for result in results[1:]:
+        assert result.error is None
+        assert result.run.output.output == f"Output {result.input}"
+        assert result.run.path is not None
+    assert len(test_task.runs()) == 5
+    # One prompt for the batch, used by every call (here when estimating tokens)
+    assert build_prompt.call_count == 1
+
+
+async def test_invoke_batch_input_sources(test_task, batch_adapter, autosave_config):
+    sources = [
+        DataSource(type=DataSourceType.human, properties={"created_by": name})
+        for name in ["a", "b"]
+    ]
+    results = [
+        result
+        async for result in batch_adapter.invoke_batch(["0", "1"], sources, save=False)
+    ]
+    for result in results:
+        assert result.run.input_source == sources[result.index]
+        # Not saved
+        assert result.run.id is None
+    assert len(test_task.runs()) == 0
+
+    with pytest.raises(ValueError, match="one source per input"):
+        async for _ in batch_adapter.invoke_batch(["0", "1"], sources[:1]):
+            pass
+
+
+async def test_invoke_batch_saves_in_batches(test_task, batch_adapter, autosave_config):
+    with patch(
+        "kiln_ai.adapters.model_adapters.base_adapter.save_all",
+        wraps=lambda runs: [run.save_to_file() for run in runs],
+    ) as mock_save_all:
+        results = [
+            result
+            async for result in batch_adapter.invoke_batch(
+                ["0", "1", "2", "4", "5"], save_batch_size=2
+            )
+        ]
+    assert [len(call.args[0]) for call in mock_save_all.call_args_list] == [2, 2, 1]
+    assert all(result.run.path is not None for result in results)
+
+
+class HangingAdapter(MockAdapter):
+    async def _run(self, input: dict | str) -> RunOutput:
+        if input == "hang":
+            await asyncio.Future()
+        return RunOutput(output=f"Output {input}", intermediate_outputs=None)
+
+
+async def test_invoke_batch_closed_early(test_task, autosave_config):
+    adapter = HangingAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    results = adapter.invoke_batch(["a", "hang", "b"], save_batch_size=1)
+    await anext(results)
+    # Both complete, but only one has been reported
+    await asyncio.sleep(0.05)
+    await results.aclose()
+
+    # The call still running is cancelled, and completed runs are saved
+    assert sorted(run.input for run in test_task.runs()) == ["a", "b"]
+
+
+async def test_invoke_batch_closed_early_save_errors(test_task, autosave_config):
+    adapter = HangingAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    save_threads = []
+
+    def failing_save_all(runs):
+        save_threads.append(threading.current_thread())
+        return [OSError("disk full") for _ in runs]
+
+    results = adapter.invoke_batch(["a", "hang", "b"], save_batch_size=1)
+    await anext(results)
+    # "b" completes, but isn't reported
+    await asyncio.sleep(0.05)
+    with (
+        patch.object(base_adapter, "save_all", side_effect=failing_save_all),
+        pytest.warns(UserWarning, match="Failed to save 1 of 1 .*disk full"),
+    ):
+        await results.aclose()
+
+    # Written from a worker thread, not the event loop
+    assert save_threads and threading.main_thread() not in save_threads
+
+
+class UsageMockAdapter(MockAdapter):
+    async def _run(self, input: dict | str) -> RunOutput:
+        await asyncio.sleep(0.01)
+        return RunOutput(
+            output="Test output",
+            intermediate_outputs=None,
+            usage=Usage(input_tokens=1000, output_tokens=100, total_tokens=1100),
+        )
+
+
+async def test_invoke_records_usage_and_timings(test_task, autosave_config):
+    autosave_config.model_pricing = {"ollama/phi_3_5": {"input": 1, "output": 10}}
+    adapter = UsageMockAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    run = await adapter.invoke("Test input")
+
+    assert run.usage.input_tokens == 1000
+    # Priced from settings: 1000 * $1/M + 100 * $10/M
+    assert run.usage.cost == pytest.approx(0.002)
+    assert run.timings.provider_call_ms >= 10
+    assert run.timings.total_ms >= run.timings.provider_call_ms
+    assert run.timings.save_ms > 0
+
+    # Saved with the run, except the save time: measured once written
+    saved = test_task.runs()[0]
+    assert saved.usage == run.usage
+    assert saved.timings == run.timings.model_copy(update={"save_ms": 0})
+
+
+async def test_invoke_stream_records_usage_and_timings(test_task, autosave_config):
+    autosave_config.model_pricing = {}
+    adapter = UsageMockAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    items = [item async for item in adapter.invoke_stream("Test input")]
+    run = items[-1]
+
+    assert run.usage.input_tokens == 1000
+    assert run.timings.provider_call_ms >= 10
+    assert run.timings.total_ms >= run.timings.provider_call_ms
+    assert run.timings.save_ms > 0
+    assert test_task.runs()[0].timings.provider_call_ms == run.timings.provider_call_ms
+
+
+async def test_invoke_batch_records_save_time(test_task, autosave_config):
+    adapter = UsageMockAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    results = [result async for result in adapter.invoke_batch(["a", "b"])]
+    assert all(result.run.timings.save_ms > 0 for result in results)
+
+
+async def test_invoke_cache_hit_has_no_usage(test_task, autosave_config):
+    autosave_config.model_pricing = {}
+    adapter = UsageMockAdapter(
+        test_task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    with patch.object(
+        adapter,
+        "cached_response",
+        return_value=("key", RunOutput(output="Cached", intermediate_outputs=None)),
+    ):
+        run = await adapter.invoke_unsaved("Test input")
+    assert run.usage is None
+    assert run.timings.provider_call_ms == 0
@@ -1,13 +1,27 @@
-import os
+import asyncio
+import threading
+import time
+import weakref
 from typing import Any, List
 
 import httpx
-import requests
 from pydantic import BaseModel, Field
 
-from kiln_ai.adapters.ml_model_list import ModelProviderName, built_in_models
+from kiln_ai.adapters.ml_model_list import (
+    KilnModelProvider,
+    ModelProviderName,
+    built_in_models,
+)
 from kiln_ai.utils.config import Config
 
+OLLAMA_TIMEOUT_SECONDS = 5.0
+# Generating (or loading a large model) can take minutes: only connecting is held to OLLAMA_TIMEOUT_SECONDS
+OLLAMA_CHAT_TIMEOUT = httpx.Timeout(600.0, connect=OLLAMA_TIMEOUT_SECONDS)
+# Cached tags are used without a refresh for this long
+TAGS_TTL_SECONDS = 10.0
+# Older cached tags are still used while a refresh runs in the background, up to this age
+TAGS_MAX_STALE_SECONDS = 600.0
+
 
 def ollama_base_url() -> str:
     """
@@ -30,11 +44,157 @@ async def ollama_online() -> bool:
     Returns:
         True if Ollama is available and responding, False otherwise
     """
+    return await OllamaDiscovery.shared().tags() is not None
+
+
+class _TagsEntry:
+    def __init__(self, tags: Any | None, fetched_at: float):
+        # None if Ollama couldn't be reached
+        self.tags = tags
+        self.fetched_at = fetched_at
+
+
+def ollama_keep_alive() -> str | float | None:
+    """
+    How long Ollama keeps a model loaded after a request, from the ollama_keep_alive setting: a duration like "30m", seconds, or "-1" to keep it loaded. None leaves it to Ollama (5 minutes by default).
+    """
+    keep_alive = Config.shared().ollama_keep_alive
+    if not isinstance(keep_alive, str) or not keep_alive:
+        return None
+    # Ollama only reads seconds from a JSON number: a string must have units
     try:
-        httpx.get(ollama_base_url() + "/api/tags")
-    except httpx.RequestError:
-        return False
-    return True
+        return float(keep_alive)
+    except ValueError:
+        return keep_alive
+
+
+class OllamaError(RuntimeError):
+    """An error returned by Ollama. status_code lets retry policies tell server errors from bad requests."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def raise_for_ollama_error(response: httpx.Response) -> None:
+    """Raise an OllamaError with Ollama's message for an error response. A streamed response must be read first."""
+    if not response.is_error:
+        return
+    try:
+        message = response.json().get("error")
+    except Exception:
+        message = None
+    raise OllamaError(
+        f"Ollama returned status code {response.status_code}: {message or response.text or 'Unknown error'}",
+        status_code=response.status_code,
+    )
+
+
+class OllamaDiscovery:
+    """
+    Ollama's installed models (its /api/tags response), fetched with a shared async client and cached per base URL.
+
+    Results are fresh for TAGS_TTL_SECONDS. After that, the cached result is still returned and a refresh starts in the background (stale while revalidate), so callers only wait on Ollama the first time, or after the result is very old (TAGS_MAX_STALE_SECONDS). Failures are cached too: an offline Ollama isn't retried on every call. Concurrent fetches for the same URL share one request.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, _TagsEntry] = {}
+        # In flight fetches, by base URL
+        self._fetches: dict[str, asyncio.Task] = {}
+        # httpx clients can't be shared across event loops
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncClient
+        ] = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def client(self) -> httpx.AsyncClient:
+        """The shared client for the running event loop. Also used for model calls (see OllamaAdapter), so they reuse its connections."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(timeout=OLLAMA_TIMEOUT_SECONDS)
+                self._clients[loop] = client
+            return client
+
+    async def fetch_tags(self, base_url: str) -> Any:
+        response = await self.client().get(base_url + "/api/tags")
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch(self, base_url: str) -> asyncio.Task:
+        """The in flight fetch for this URL, starting one if needed. It caches its result, or a failure."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._fetches.get(base_url)
+            if task is not None and not task.done() and task.get_loop() is loop:
+                return task
+
+        async def fetch() -> Any:
+            try:
+                tags = await self.fetch_tags(base_url)
+            except Exception:
+                self._store(base_url, None)
+                raise
+            self._store(base_url, tags)
+            return tags
+
+        task = loop.create_task(fetch())
+        # Don't warn about failed background refreshes, which nobody awaits
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        with self._lock:
+            self._fetches[base_url] = task
+        return task
+
+    def _store(self, base_url: str, tags: Any | None) -> None:
+        with self._lock:
+            self._entries[base_url] = _TagsEntry(tags, time.monotonic())
+
+    async def refresh(self, base_url: str | None = None) -> Any:
+        """Fetch the tags now (sharing a fetch already in flight), updating the cache. Raises if Ollama can't be reached."""
+        # Shielded: a cancelled caller doesn't cancel the fetch for others waiting on it
+        return await asyncio.shield(self._fetch(base_url or ollama_base_url()))
+
+    async def tags(self, base_url: str | None = None) -> Any | None:
+        """The tags, from the cache where possible. None if Ollama can't be reached."""
+        base_url = base_url or ollama_base_url()
+        with self._lock:
+            entry = self._entries.get(base_url)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < TAGS_TTL_SECONDS:
+                return entry.tags
+            if age < TAGS_MAX_STALE_SECONDS:
+                self._fetch(base_url)
+                return entry.tags
+        try:
+            return await self.refresh(base_url)
+        except Exception:
+            return None
+
+    def invalidate(self, base_url: str | None = None) -> None:
+        """Drop the cached tags for a URL (or all URLs). The next call waits for a fresh result."""
+        with self._lock:
+            if base_url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(base_url, None)
+
+    async def aclose(self) -> None:
+        """Close the client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
 
 
 class OllamaConnection(BaseModel):
@@ -97,14 +257,19 @@ def parse_ollama_tags(tags: Any) -> OllamaConnection | None:
     )
 
 
-async def get_ollama_connection() -> OllamaConnection | None:
+async def get_ollama_connection(refresh: bool = False) -> OllamaConnection | None:
     """
-    Gets the connection status for Ollama.
+    Gets the connection status for Ollama, from the cached tags unless refresh is set (see OllamaDiscovery).
     """
-    try:
-        tags = requests.get(ollama_base_url() + "/api/tags", timeout=5).json()
-
-    except Exception:
+    discovery = OllamaDiscovery.shared()
+    if refresh:
+        try:
+            tags = await discovery.refresh()
+        except Exception:
+            return None
+    else:
+        tags = await discovery.tags()
+    if tags is None:
         return None
 
     return parse_ollama_tags(tags)
@@ -113,3 +278,45 @@ async def get_ollama_connection() -> OllamaConnection | None:
 def ollama_model_installed(conn: OllamaConnection, model_name: str) -> bool:
     all_models = conn.all_models()
     return model_name in all_models or f"{model_name}:latest" in all_models
+
+
+async def ollama_model_name(provider: KilnModelProvider) -> str:
+    """
+    The name a model is installed under in Ollama: its model name or one of its aliases (Ollama model naming is pretty flexible). Checks the cached tags, then refreshes once in case it was just installed.
+    """
+    potential_model_names = []
+    if "model" in provider.provider_options:
+        potential_model_names.append(provider.provider_options["model"])
+    if "model_aliases" in provider.provider_options:
+        potential_model_names.extend(provider.provider_options["model_aliases"])
+
+    for refresh in (False, True):
+        ollama_connection = await get_ollama_connection(refresh=refresh)
+        if ollama_connection is None:
+            raise ValueError("Failed to connect to Ollama. Ensure Ollama is running.")
+
+        for model_name in potential_model_names:
+            if ollama_model_installed(ollama_connection, model_name):
+                return model_name
+
+    raise ValueError(
+        f"Model {provider.provider_options.get('model')} not installed on Ollama"
+    )
+
+
+async def preload_ollama_model(
+    model_name: str, keep_alive: str | float | None = None
+) -> None:
+    """
+    Load a model into Ollama's memory, so the next request doesn't wait for it. It stays loaded for keep_alive (default: the ollama_keep_alive setting). model_name is the name Ollama knows it by (see ollama_model_name).
+    """
+    # A chat request without messages only loads the model
+    body: dict[str, Any] = {"model": model_name, "messages": []}
+    keep_alive = keep_alive if keep_alive is not None else ollama_keep_alive()
+    if keep_alive is not None:
+        body["keep_alive"] = keep_alive
+    client = OllamaDiscovery.shared().client()
+    response = await client.post(
+        ollama_base_url() + "/api/chat", json=body, timeout=OLLAMA_CHAT_TIMEOUT
+    )
+    raise_for_ollama_error(response)
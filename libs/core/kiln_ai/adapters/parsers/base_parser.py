@@ -1,4 +1,17 @@
-from kiln_ai.adapters.run_output import RunOutput
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
+
+
+class StreamSplitter:
+    """
+    Splits a model's streamed output into channels as it arrives. By default, it's all output.
+    """
+
+    def feed(self, text: str) -> list[StreamDelta]:
+        return [StreamDelta(channel="output", text=text)] if text else []
+
+    def flush(self) -> list[StreamDelta]:
+        """Any text held back, once the stream ends."""
+        return []
 
 
 class BaseParser:
@@ -10,3 +23,9 @@ class BaseParser:
         Method for parsing the output of a model. Typically overridden by subclasses.
         """
         return original_output
+
+    def stream_splitter(self) -> StreamSplitter:
+        """
+        Splits streamed output the way parse_output splits the complete output, so parts like reasoning can be shown as they arrive. Override with parse_output.
+        """
+        return StreamSplitter()
@@ -1,6 +1,68 @@
-from kiln_ai.adapters.parsers.base_parser import BaseParser
+from typing import Literal
+
+from kiln_ai.adapters.parsers.base_parser import BaseParser, StreamSplitter
 from kiln_ai.adapters.parsers.json_parser import parse_json_string
-from kiln_ai.adapters.run_output import RunOutput
+from kiln_ai.adapters.run_output import RunOutput, StreamChannel, StreamDelta
+
+
+def partial_tag_length(text: str, tag: str) -> int:
+    """The length of the longest prefix of tag which text ends with (a tag which may be completed by the next chunk)."""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkTagStreamSplitter(StreamSplitter):
+    """
+    Streams the content of the <think> block as reasoning, and the rest as output. Text which may be the start of a tag is held back until the next chunk shows if it is one.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._state: Literal["before", "thinking", "after"] = "before"
+
+    def feed(self, text: str) -> list[StreamDelta]:
+        self._buffer += text
+        deltas = []
+        while self._buffer:
+            if self._state == "after":
+                deltas.append(StreamDelta(channel="output", text=self._buffer))
+                self._buffer = ""
+                break
+
+            channel: StreamChannel
+            if self._state == "before":
+                tag = R1ThinkingParser.START_TAG
+                channel = "output"
+            else:
+                tag = R1ThinkingParser.END_TAG
+                channel = "reasoning"
+            index = self._buffer.find(tag)
+            if index >= 0:
+                if index > 0:
+                    deltas.append(
+                        StreamDelta(channel=channel, text=self._buffer[:index])
+                    )
+                self._buffer = self._buffer[index + len(tag) :]
+                self._state = "thinking" if self._state == "before" else "after"
+                continue
+
+            held = partial_tag_length(self._buffer, tag)
+            ready = self._buffer[: len(self._buffer) - held]
+            if ready:
+                deltas.append(StreamDelta(channel=channel, text=ready))
+            self._buffer = self._buffer[len(ready) :]
+            break
+        return deltas
+
+    def flush(self) -> list[StreamDelta]:
+        if not self._buffer:
+            return []
+        channel: StreamChannel = "reasoning" if self._state == "thinking" else "output"
+        delta = StreamDelta(channel=channel, text=self._buffer)
+        self._buffer = ""
+        return [delta]
 
 
 class R1ThinkingParser(BaseParser):
@@ -67,3 +129,6 @@ class R1ThinkingParser(BaseParser):
             output=output,
             intermediate_outputs=intermediate_outputs,
         )
+
+    def stream_splitter(self) -> StreamSplitter:
+        return ThinkTagStreamSplitter()
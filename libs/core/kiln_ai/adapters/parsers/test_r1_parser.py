@@ -1,7 +1,7 @@
 import pytest
 
 from kiln_ai.adapters.parsers.r1_parser import R1ThinkingParser
-from kiln_ai.adapters.run_output import RunOutput
+from kiln_ai.adapters.run_output import RunOutput, StreamDelta
 
 
 @pytest.fixture
@@ -142,3 +142,41 @@ def test_intermediate_outputs(parser):
         )
     )
     assert out.intermediate_outputs["reasoning"] == "Some content"
+
+
+def stream_text(splitter, chunks):
+    deltas = [delta for chunk in chunks for delta in splitter.feed(chunk)]
+    deltas += splitter.flush()
+    channels = {}
+    for delta in deltas:
+        channels[delta.channel] = channels.get(delta.channel, "") + delta.text
+    return channels
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        ["<think>thinking</think>result"],
+        ["<thi", "nk>think", "ing</th", "ink>res", "ult"],
+        list("<think>thinking</think>result"),
+    ],
+)
+def test_stream_splitter(parser, chunks):
+    channels = stream_text(parser.stream_splitter(), chunks)
+    assert channels == {"reasoning": "thinking", "output": "result"}
+
+
+def test_stream_splitter_holds_back_partial_tags(parser):
+    splitter = parser.stream_splitter()
+    assert splitter.feed("<think>a <") == [StreamDelta(channel="reasoning", text="a ")]
+    # Not a tag after all
+    assert splitter.feed("b") == [StreamDelta(channel="reasoning", text="<b")]
+
+
+def test_stream_splitter_unclosed_and_untagged(parser):
+    assert stream_text(parser.stream_splitter(), ["<think>still thinking</"]) == {
+        "reasoning": "still thinking</"
+    }
+    assert stream_text(parser.stream_splitter(), ["no tags <"]) == {
+        "output": "no tags <"
+    }
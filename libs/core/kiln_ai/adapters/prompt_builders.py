@@ -2,7 +2,9 @@ import json
 from abc import ABCMeta, abstractmethod
 from typing import Dict
 
-from kiln_ai.datamodel import Task, TaskRun
+from kiln_ai.datamodel import Finetune, Prompt, Task, TaskRun
+from kiln_ai.datamodel.child_id_index import ChildIdIndex
+from kiln_ai.datamodel.example_index import ExampleIndex
 from kiln_ai.utils.formatting import snake_case
 
 
@@ -150,16 +152,25 @@ class MultiShotPromptBuilder(BasePromptBuilder):
                 base_prompt += f"{i + 1}) {requirement.instruction}\n"
             base_prompt += "\n"
 
+        if self.task.path is None:
+            return base_prompt + self.examples_section()
+
+        # Rendered once per change to the task's examples, shared by builders of the same class
+        index = ExampleIndex.shared().for_task(self.task.path)
+        return base_prompt + index.rendered(
+            (self.__class__, self.__class__.example_count()), self.examples_section
+        )
+
+    def examples_section(self) -> str:
         valid_examples = self.collect_examples()
 
         if len(valid_examples) == 0:
-            return base_prompt
+            return ""
 
-        base_prompt += "# Example Outputs\n\n"
+        section = "# Example Outputs\n\n"
         for i, example in enumerate(valid_examples):
-            base_prompt += self.prompt_section_for_example(i, example)
-
-        return base_prompt
+            section += self.prompt_section_for_example(i, example)
+        return section
 
     def prompt_section_for_example(self, index: int, example: TaskRun) -> str:
         # Prefer repaired output if it exists, otherwise use the regular output
@@ -167,35 +178,14 @@ class MultiShotPromptBuilder(BasePromptBuilder):
         return f"## Example {index + 1}\n\nInput: {example.input}\nOutput: {output.output}\n\n"
 
     def collect_examples(self) -> list[TaskRun]:
-        valid_examples: list[TaskRun] = []
-        runs = self.task.runs(readonly=True)
-
-        # first pass, we look for repaired outputs. These are the best examples.
-        for run in runs:
-            if len(valid_examples) >= self.__class__.example_count():
-                break
-            if run.repaired_output is not None:
-                valid_examples.append(run)
-
-        # second pass, we look for high quality outputs (rating based)
-        # Minimum is "high_quality" (4 star in star rating scale), then sort by rating
-        # exclude repaired outputs as they were used above
-        runs_with_rating = [
-            run
-            for run in runs
-            if run.output.rating is not None
-            and run.output.rating.value is not None
-            and run.output.rating.is_high_quality()
-            and run.repaired_output is None
-        ]
-        runs_with_rating.sort(
-            key=lambda x: (x.output.rating and x.output.rating.value) or 0, reverse=True
-        )
-        for run in runs_with_rating:
-            if len(valid_examples) >= self.__class__.example_count():
-                break
-            valid_examples.append(run)
-        return valid_examples
+        """
+        The examples for the prompt: runs with repaired outputs first (the best examples), then high quality rated runs (4+ stars), highest rated first. Selected from the task's example index (see example_index), not a scan of its runs.
+        """
+        if self.task.path is None:
+            # Unsaved: no runs on disk
+            return []
+        index = ExampleIndex.shared().for_task(self.task.path)
+        return index.select(self.__class__.example_count())
 
 
 class FewShotPromptBuilder(MultiShotPromptBuilder):
@@ -273,13 +263,10 @@ class SavedPromptBuilder(BasePromptBuilder):
 
     def __init__(self, task: Task, prompt_id: str):
         super().__init__(task)
-        prompt_model = next(
-            (
-                prompt
-                for prompt in task.prompts(readonly=True)
-                if prompt.id == prompt_id
-            ),
-            None,
+        prompt_model = (
+            ChildIdIndex.shared().load(Prompt, task.path, prompt_id, readonly=True)
+            if task.path is not None
+            else None
         )
         if not prompt_model:
             raise ValueError(f"Prompt ID not found: {prompt_id}")
@@ -315,13 +302,10 @@ class FineTunePromptBuilder(BasePromptBuilder):
             )
         fine_tune_id = parts[2]
 
-        fine_tune_model = next(
-            (
-                fine_tune
-                for fine_tune in task.finetunes(readonly=True)
-                if fine_tune.id == fine_tune_id
-            ),
-            None,
+        fine_tune_model = (
+            ChildIdIndex.shared().load(Finetune, task.path, fine_tune_id, readonly=True)
+            if task.path is not None
+            else None
         )
         if not fine_tune_model:
             raise ValueError(f"Fine-tune ID not found: {fine_tune_id}")
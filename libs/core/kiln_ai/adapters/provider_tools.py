@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, TypeVar
 
 from kiln_ai.adapters.ml_model_list import (
     KilnModel,
@@ -7,6 +7,7 @@ from kiln_ai.adapters.ml_model_list import (
     ModelName,
     ModelProviderName,
     StructuredOutputMode,
+    built_in_model_index,
     built_in_models,
 )
 from kiln_ai.adapters.model_adapters.openai_compatible_config import (
@@ -16,6 +17,8 @@ from kiln_ai.adapters.ollama_tools import (
     get_ollama_connection,
 )
 from kiln_ai.datamodel import Finetune, Task
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents
+from kiln_ai.datamodel.multi_process import Change, MultiProcess
 from kiln_ai.datamodel.registry import project_from_id
 from kiln_ai.utils.config import Config
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
@@ -84,8 +87,8 @@ def builtin_model_from(
     if name not in ModelName.__members__:
         return None
 
-    # Select the model from built_in_models using the name
-    model = next(filter(lambda m: m.name == name, built_in_models))
+    index = built_in_model_index(built_in_models)
+    model = index.by_name.get(name)
     if model is None:
         raise ValueError(f"Model {name} not found")
 
@@ -96,9 +99,7 @@ def builtin_model_from(
     elif provider_name is None:
         provider = model.providers[0]
     else:
-        provider = next(
-            filter(lambda p: p.name == provider_name, model.providers), None
-        )
+        provider = index.providers.get((name, provider_name))
     if provider is None:
         return None
 
@@ -170,17 +171,31 @@ def kiln_model_provider_from(
         raise ValueError(f"Invalid provider name: {provider_name}")
     provider = ModelProviderName(provider_name)
     check_provider_warnings(provider)
-    return KilnModelProvider(
-        name=provider,
-        supports_structured_output=False,
-        supports_data_gen=False,
-        untested_model=True,
-        provider_options=provider_options_for_custom_model(name, provider_name),
+    return resolved(
+        "custom",
+        f"{provider.value}::{name}",
+        lambda: KilnModelProvider(
+            name=provider,
+            supports_structured_output=False,
+            supports_data_gen=False,
+            untested_model=True,
+            provider_options=provider_options_for_custom_model(name, provider),
+        ),
     )
 
 
 def openai_compatible_config(
     model_id: str,
+) -> OpenAICompatibleConfig:
+    return resolved(
+        "openai_compatible_config",
+        model_id,
+        lambda: build_openai_compatible_config(model_id),
+    )
+
+
+def build_openai_compatible_config(
+    model_id: str,
 ) -> OpenAICompatibleConfig:
     try:
         openai_provider_name, model_id = model_id.split("::")
@@ -216,20 +231,73 @@ def openai_compatible_config(
 def openai_compatible_provider_model(
     model_id: str,
 ) -> KilnModelProvider:
-    return KilnModelProvider(
-        name=ModelProviderName.openai_compatible,
-        provider_options={
-            "model": model_id,
-        },
-        supports_structured_output=False,
-        supports_data_gen=False,
-        untested_model=True,
+    return resolved(
+        "openai_compatible",
+        model_id,
+        lambda: KilnModelProvider(
+            name=ModelProviderName.openai_compatible,
+            provider_options={
+                "model": model_id,
+            },
+            supports_structured_output=False,
+            supports_data_gen=False,
+            untested_model=True,
+        ),
     )
 
 
+T = TypeVar("T")
+
+# Providers and configs built at runtime (custom models, OpenAI compatible providers, fine-tunes), keyed by (kind, model ID). Dropped when settings change. Shared by callers, so must not be mutated.
+resolution_cache: dict[tuple[str, str], Any] = {}
+# The Config (and its settings version) the resolution cache was built from
+_resolution_cache_settings: tuple[Any, Any] | None = None
+
 finetune_cache: dict[str, Finetune] = {}
 
 
+def resolved(kind: str, model_id: str, build: Callable[[], T]) -> T:
+    """The cached value for a model ID, built on first use (and again after settings change). Errors aren't cached."""
+    global _resolution_cache_settings
+    config = Config.shared()
+    settings = (config, config.settings_version())
+    current = _resolution_cache_settings
+    if current is None or current[0] is not config or current[1] != settings[1]:
+        resolution_cache.clear()
+        _resolution_cache_settings = settings
+    key = (kind, model_id)
+    if key in resolution_cache:
+        return resolution_cache[key]
+    value = build()
+    resolution_cache[key] = value
+    return value
+
+
+def clear_resolution_caches(changes: list[Change] | None = None) -> None:
+    # Only fine-tune changes affect resolved models (settings changes are caught by the settings version)
+    if changes is not None and not any(
+        change.path.name == Finetune.base_filename() for change in changes
+    ):
+        return
+    resolution_cache.clear()
+    finetune_cache.clear()
+
+
+def on_finetune_event(event: ModelEvent) -> None:
+    # A fine-tune's status, model ID or output mode changed: drop anything resolved from it
+    if not isinstance(event.model, Finetune) or event.id is None:
+        return
+    suffix = f"::{event.id}"
+    for model_id in [m for m in finetune_cache if m.endswith(suffix)]:
+        finetune_cache.pop(model_id, None)
+    for key in [k for k in resolution_cache if k[1].endswith(suffix)]:
+        resolution_cache.pop(key, None)
+
+
+# Another process may delete or replace a fine-tune
+MultiProcess.shared().add_reset_listener(clear_resolution_caches)
+
+
 def finetune_from_id(model_id: str) -> Finetune:
     if model_id in finetune_cache:
         return finetune_cache[model_id]
@@ -252,12 +320,22 @@ def finetune_from_id(model_id: str) -> Finetune:
             f"Fine tune {fine_tune_id} not completed. Refresh it's status in the fine-tune tab."
         )
 
+    # Watch for changes once something is cached, so saves don't pay for dispatching to this listener before then
+    ModelEvents.shared().add_listener(on_finetune_event)
     finetune_cache[model_id] = fine_tune
     return fine_tune
 
 
 def finetune_provider_model(
     model_id: str,
+) -> KilnModelProvider:
+    return resolved(
+        "fine_tune", model_id, lambda: build_finetune_provider_model(model_id)
+    )
+
+
+def build_finetune_provider_model(
+    model_id: str,
 ) -> KilnModelProvider:
     fine_tune = finetune_from_id(model_id)
 
@@ -287,10 +365,9 @@ def finetune_provider_model(
 def get_model_and_provider(
     model_name: str, provider_name: str
 ) -> tuple[KilnModel | None, KilnModelProvider | None]:
-    model = next(filter(lambda m: m.name == model_name, built_in_models), None)
-    if model is None:
-        return None, None
-    provider = next(filter(lambda p: p.name == provider_name, model.providers), None)
+    index = built_in_model_index(built_in_models)
+    model = index.by_name.get(model_name)
+    provider = index.providers.get((model_name, provider_name))
     # all or nothing
     if provider is None or model is None:
         return None, None
@@ -0,0 +1,418 @@
+"""
+Rate limiting and adaptive concurrency for model calls, shared by all adapters in the process.
+
+Each provider has a limiter, and each model can have its own as well (configured only). A call waits on both. A limiter has:
+ - Adaptive concurrency (AIMD): the number of concurrent calls grows by ~1 for each window of successful calls, up to max_concurrency, and halves when the provider returns a rate limit error (429).
+ - Optional token buckets for requests per minute and tokens per minute. Tokens are estimated from the prompt and input length (about 4 characters per token), as usage isn't known until the call completes.
+ - Retry-After: a 429 with a Retry-After header pauses all calls through the limiter until then.
+
+Calls which hit a rate limit are retried, up to `rate_limit_retries` times (default 3), after the Retry-After delay or a jittered exponential backoff. So a batch slows down instead of failing.
+
+Configure limits with the `provider_rate_limits` setting, keyed by provider name, or "provider/model_name" for a model:
+
+    provider_rate_limits:
+      openrouter:
+        requests_per_minute: 200
+        max_concurrency: 16
+      groq/llama_3_1_8b:
+        tokens_per_minute: 6000
+
+Ollama's concurrency defaults to the `ollama_parallel_requests` setting (the server's OLLAMA_NUM_PARALLEL), as it only runs that many requests at once and queues the rest.
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel, Field
+
+from kiln_ai.utils.config import Config
+
+T = TypeVar("T")
+
+# The concurrency limit when none is configured: high enough to not slow anyone down before the first 429
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_RETRIES = 3
+# Backoff between rate limited retries, without a Retry-After header
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Longest Retry-After we'll honour
+MAX_RETRY_AFTER_SECONDS = 120.0
+CHARS_PER_TOKEN = 4
+
+# Error codes AWS uses for rate limits (boto errors have no status code attribute)
+_THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException"}
+
+
+class RateLimitConfig(BaseModel):
+    requests_per_minute: float | None = Field(default=None, gt=0)
+    tokens_per_minute: float | None = Field(default=None, gt=0)
+    max_concurrency: int = Field(default=DEFAULT_MAX_CONCURRENCY, ge=1)
+
+
+def default_limits(provider: str) -> dict:
+    """The limits for a provider without configured ones."""
+    if provider == "ollama":
+        parallel = Config.shared().ollama_parallel_requests
+        if isinstance(parallel, int) and parallel >= 1:
+            return {"max_concurrency": parallel}
+    return {}
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for rate limit errors from any provider SDK (OpenAI, Groq, Fireworks, httpx, boto)."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in _THROTTLING_ERROR_CODES
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """The delay requested by a rate limit error's Retry-After (or retry-after-ms) header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            return min(float(retry_after_ms) / 1000, MAX_RETRY_AFTER_SECONDS)
+        retry_after = headers.get("retry-after")
+        if retry_after is None:
+            return None
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            # An HTTP date
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+            seconds = parsed.timestamp() - time.time()
+        return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full jitter exponential backoff for the nth retry (from 0)."""
+    return random.uniform(
+        0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+    )
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, with bursts up to a minute's worth. Callers reserve units and wait the returned delay: reservations queue in order, so a busy bucket can't starve anyone.
+    """
+
+    def __init__(self, per_minute: float):
+        self._lock = threading.Lock()
+        self.per_minute = per_minute
+        self._available = per_minute
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket, returning how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            rate = self.per_minute / 60
+            self._available = min(
+                self.per_minute, self._available + (now - self._updated) * rate
+            )
+            self._updated = now
+            # A request larger than the bucket would never fit: let it through once the bucket is full
+            self._available -= min(amount, self.per_minute)
+            if self._available >= 0:
+                return 0.0
+            return -self._available / rate
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    granted: bool = False
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """
+    An AIMD concurrency limit: +1/limit per success (about +1 per window of calls), halved on rate limit errors.
+
+    Thread and event loop agnostic: waiters are woken on their own loop, and slots are handed to waiters in order.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self._lock = threading.Lock()
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: deque[_Waiter] = deque()
+        # Calls started before the last decrease don't decrease again: one burst of 429s is one signal
+        self._last_decrease = 0.0
+
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> float:
+        """Wait for a slot. Returns the start time, to pass to release."""
+        with self._lock:
+            if not self._waiters and self.in_flight < self._capacity():
+                self.in_flight += 1
+                return time.monotonic()
+            waiter = _Waiter(future=asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # Granted as we were cancelled: pass the slot on
+                    self.in_flight -= 1
+                    self._grant()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+        return time.monotonic()
+
+    def release(self, started_at: float, rate_limited: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                if started_at >= self._last_decrease:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._grant()
+
+    def set_max_limit(self, max_limit: int) -> None:
+        with self._lock:
+            self.max_limit = max_limit
+            self.limit = min(self.limit, float(max_limit))
+            self._grant()
+
+    def _grant(self) -> None:
+        # Must hold the lock
+        while self._waiters and self.in_flight < self._capacity():
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            future = waiter.future
+            try:
+                future.get_loop().call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiter's loop is closed
+                self.in_flight -= 1
+
+
+class RateLimiter:
+    """The limits for one provider, or one model."""
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.concurrency = AdaptiveConcurrency(config.max_concurrency)
+        self._requests = self._bucket(config.requests_per_minute)
+        self._tokens = self._bucket(config.tokens_per_minute)
+        self._paused_until = 0.0
+
+    @staticmethod
+    def _bucket(per_minute: float | None) -> TokenBucket | None:
+        return TokenBucket(per_minute) if per_minute else None
+
+    def configure(self, config: RateLimitConfig) -> None:
+        if config == self.config:
+            return
+        self.concurrency.set_max_limit(config.max_concurrency)
+        if config.requests_per_minute != self.config.requests_per_minute:
+            self._requests = self._bucket(config.requests_per_minute)
+        if config.tokens_per_minute != self.config.tokens_per_minute:
+            self._tokens = self._bucket(config.tokens_per_minute)
+        self.config = config
+
+    @property
+    def needs_token_estimate(self) -> bool:
+        return self._tokens is not None
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait for a concurrency slot, then for the rate limits. Returns the start time, to pass to release."""
+        started_at = await self.concurrency.acquire()
+        try:
+            delay = self._paused_until - time.monotonic()
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1))
+            if self._tokens is not None:
+                delay = max(delay, self._tokens.reserve(tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.concurrency.release(started_at)
+            raise
+        return started_at
+
+    def release(self, started_at: float, rate_limited: bool = False) -> None:
+        self.concurrency.release(started_at, rate_limited)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all calls for this long (eg for a Retry-After header)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimits:
+    """
+    The rate limiters for each provider and model, shared by all adapters in the process.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters: dict[str, RateLimiter] = {}
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    @staticmethod
+    def model_key(provider: str, model_name: str) -> str:
+        return f"{provider}/{model_name}"
+
+    def limiters(self, provider: str, model_name: str) -> list[RateLimiter]:
+        """The provider's limiter, plus the model's if it has configured limits. Picks up settings changes."""
+        settings = Config.shared().provider_rate_limits
+        if not isinstance(settings, dict):
+            settings = {}
+        model_key = self.model_key(provider, model_name)
+        limiters = []
+        with self._lock:
+            for key in (provider, model_key):
+                if key != provider and key not in settings:
+                    continue
+                config = RateLimitConfig.model_validate(
+                    {**default_limits(key), **(settings.get(key) or {})}
+                )
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = RateLimiter(config)
+                    self._limiters[key] = limiter
+                else:
+                    limiter.configure(config)
+                limiters.append(limiter)
+        return limiters
+
+    def retries(self) -> int:
+        retries = Config.shared().rate_limit_retries
+        return retries if isinstance(retries, int) else DEFAULT_RETRIES
+
+    async def _acquire_all(
+        self, limiters: list[RateLimiter], estimate: Callable[[], int]
+    ) -> list[tuple[RateLimiter, float]]:
+        tokens = (
+            estimate()
+            if any(limiter.needs_token_estimate for limiter in limiters)
+            else 0
+        )
+        acquired: list[tuple[RateLimiter, float]] = []
+        try:
+            for limiter in limiters:
+                acquired.append((limiter, await limiter.acquire(tokens)))
+        except BaseException:
+            self._release_all(acquired)
+            raise
+        return acquired
+
+    @staticmethod
+    def _release_all(
+        acquired: list[tuple[RateLimiter, float]],
+        error: BaseException | None = None,
+    ) -> float | None:
+        """Release the limiters, backing off if the call was rate limited. Returns the delay before retrying, if it should be retried."""
+        rate_limited = error is not None and is_rate_limit_error(error)
+        retry_after = retry_after_seconds(error) if rate_limited and error else None
+        for limiter, started_at in acquired:
+            limiter.release(started_at, rate_limited)
+            if retry_after:
+                limiter.pause(retry_after)
+        if not rate_limited:
+            return None
+        return retry_after or 0.0
+
+    async def call(
+        self,
+        provider: str,
+        model_name: str,
+        fn: Callable[[], Awaitable[T]],
+        estimate: Callable[[], int] = lambda: 0,
+    ) -> T:
+        """
+        Call fn within the provider and model's limits, retrying rate limit errors. estimate returns the call's approximate token count, and is only called if there's a tokens per minute limit.
+        """
+        limiters = self.limiters(provider, model_name)
+        attempt = 0
+        while True:
+            acquired = await self._acquire_all(limiters, estimate)
+            try:
+                result = await fn()
+            except Exception as e:
+                retry_after = self._release_all(acquired, e)
+                if retry_after is None or attempt >= self.retries():
+                    raise
+                # Without a Retry-After, back off. With one, the limiters are paused until then.
+                if not retry_after:
+                    await asyncio.sleep(backoff_seconds(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self._release_all(acquired)
+                raise
+            self._release_all(acquired)
+            return result
+
+    async def stream(
+        self,
+        provider: str,
+        model_name: str,
+        fn: Callable[[], AsyncIterator[T]],
+        estimate: Callable[[], int] = lambda: 0,
+    ) -> AsyncIterator[T]:
+        """
+        As call, for a stream: holds the limits until the stream ends. Rate limit errors are only retried before the first item (once items are yielded, the caller has them).
+        """
+        limiters = self.limiters(provider, model_name)
+        attempt = 0
+        while True:
+            acquired = await self._acquire_all(limiters, estimate)
+            started = False
+            try:
+                async for item in fn():
+                    started = True
+                    yield item
+            except Exception as e:
+                retry_after = self._release_all(acquired, e)
+                if retry_after is None or started or attempt >= self.retries():
+                    raise
+                if not retry_after:
+                    await asyncio.sleep(backoff_seconds(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self._release_all(acquired)
+                raise
+            self._release_all(acquired)
+            return
@@ -0,0 +1,182 @@
+"""
+An optional on-disk cache of model responses, so re-running the same prompt, input and model (eg while iterating on data gen, repairs or evals) doesn't pay for the call again.
+
+Off by default: enable with the `response_cache` setting. When enabled:
+ - Responses are keyed by a hash of the adapter, model, provider, messages (system prompt, user message and chain of thought prompt) and response format (structured output mode and schema). See BaseAdapter.response_cache_key.
+ - Only responses which parsed and validated are stored.
+ - Entries expire after `response_cache_ttl_hours` (default 1 week), and the least recently used are evicted once the cache is over `response_cache_max_mb` (default 500MB).
+ - Runs built from a cached response have `response_cache: hit` in their output source properties.
+ - Each call can bypass the cache, or refresh its entry (see ResponseCacheMode).
+
+The cache is a SQLite database in the Kiln settings folder, shared by all processes.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from enum import Enum
+from pathlib import Path
+
+from kiln_ai.adapters.run_output import RunOutput
+from kiln_ai.utils.config import Config
+
+# Bump to ignore existing entries when the key or value format changes
+CACHE_VERSION = 1
+# Size checks and expiry run every this many writes
+PRUNE_EVERY = 100
+# The source property set on runs built from a cached response
+CACHE_HIT_PROPERTY = "response_cache"
+
+
+class ResponseCacheMode(str, Enum):
+    # Read and write the cache, if enabled in settings
+    default = "default"
+    # Don't read or write the cache
+    bypass = "bypass"
+    # Don't read the cache, but store the new response (if enabled in settings)
+    refresh = "refresh"
+
+
+def response_cache_enabled() -> bool:
+    return Config.shared().response_cache is True
+
+
+class ResponseCache:
+    _shared_instance = None
+
+    def __init__(
+        self,
+        db_path: Path | None = None,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.db_path = db_path or Path(Config.settings_path()).parent / (
+            "response_cache.sqlite"
+        )
+        self._ttl_seconds = ttl_seconds
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn: sqlite3.Connection | None = None
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    @property
+    def ttl_seconds(self) -> float:
+        if self._ttl_seconds is not None:
+            return self._ttl_seconds
+        return Config.shared().response_cache_ttl_hours * 3600
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(Config.shared().response_cache_max_mb * 1024 * 1024)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Must hold the lock
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Used from worker threads (see asyncio.to_thread). All access is under the lock.
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version != CACHE_VERSION:
+                    conn.execute("DROP TABLE IF EXISTS responses")
+                    conn.execute(
+                        "CREATE TABLE responses ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                        "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+                    )
+                    conn.execute(
+                        "CREATE INDEX responses_last_used ON responses (last_used_at)"
+                    )
+                    conn.execute(f"PRAGMA user_version={CACHE_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> RunOutput | None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute(
+                    "UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key)
+                )
+        value = json.loads(row[0])
+        return RunOutput(
+            output=value["output"],
+            intermediate_outputs=value["intermediate_outputs"],
+        )
+
+    def put(self, key: str, run_output: RunOutput) -> None:
+        value = json.dumps(
+            {
+                "output": run_output.output,
+                "intermediate_outputs": run_output.intermediate_outputs,
+            },
+            ensure_ascii=False,
+        )
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode("utf-8")), now, now),
+                )
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 1:
+                self._prune(conn, now)
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        # Must hold the lock
+        with conn:
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Least recently used first, until under the limit
+            evict = []
+            for key, size in conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used_at"
+            ):
+                if total <= self.max_bytes:
+                    break
+                evict.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+    def prune(self) -> None:
+        """Drop expired entries, and evict the least recently used if over the size limit."""
+        with self._lock:
+            self._prune(self._connection(), time.time())
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,333 @@
+"""
+Retries, hedged requests and timeout budgets for model calls, applied to every adapter's calls.
+
+ - Retries: transient errors (5xx, 408/409, connection errors and timeouts) are retried with jittered exponential backoff, up to `max_retries` times (default 2). Rate limit errors are retried by the rate limiter instead (see rate_limits).
+ - Hedged requests: off by default. With `hedge_percentile` set (eg 95), a call still running after that percentile of the model's recent latencies gets a second, identical request. The first response wins, and the other is cancelled. Hedging waits for `hedge_min_samples` successful calls, to learn the latency distribution. Streams aren't hedged.
+ - Timeout budget: with `timeout_seconds` set, the whole call (all attempts, hedges and backoff) fails with a ModelCallTimeoutError after that long.
+
+Policies are set with the `retry_policies` setting, keyed by "default", a provider name or "provider/model_name". More specific keys override fields of less specific ones:
+
+    retry_policies:
+      default:
+        max_retries: 3
+        timeout_seconds: 300
+      openrouter:
+        hedge_percentile: 95
+
+Counts of calls, retries, hedges and timeouts are kept per model (see RetryPolicies.metrics).
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, TypeVar
+
+import httpx
+import openai
+from pydantic import BaseModel, Field
+
+from kiln_ai.adapters.rate_limits import backoff_seconds, is_rate_limit_error
+from kiln_ai.utils.config import Config
+
+T = TypeVar("T")
+
+DEFAULT_POLICY_KEY = "default"
+# Successful call latencies kept per model, for the hedging percentile
+LATENCY_WINDOW = 200
+RETRYABLE_STATUS_CODES = {408, 409}
+
+
+class RetryPolicy(BaseModel):
+    max_retries: int = Field(default=2, ge=0)
+    timeout_seconds: float | None = Field(default=None, gt=0)
+    hedge_percentile: float | None = Field(default=None, gt=0, lt=100)
+    hedge_min_samples: int = Field(default=20, ge=1)
+
+
+class CallMetrics(BaseModel):
+    calls: int = 0
+    retries: int = 0
+    hedges: int = 0
+    # Calls where the hedged request answered first
+    hedge_wins: int = 0
+    timeouts: int = 0
+    failures: int = 0
+    p50_latency_ms: float | None = None
+    p95_latency_ms: float | None = None
+
+
+class ModelCallTimeoutError(TimeoutError):
+    """A model call ran past its policy's timeout budget. Not retried."""
+
+    def __init__(self, timeout_seconds: float):
+        super().__init__(f"Model call timed out after {timeout_seconds} seconds.")
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    if is_rate_limit_error(error) or isinstance(error, ModelCallTimeoutError):
+        return False
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return isinstance(
+        error,
+        (
+            openai.APIConnectionError,
+            httpx.TransportError,
+            ConnectionError,
+            TimeoutError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+async def within_budget(
+    awaitable: Awaitable[T], seconds: float, budget_seconds: float
+) -> T:
+    """
+    Await, cancelling it and raising ModelCallTimeoutError after `seconds`. Unlike asyncio.wait_for, TimeoutErrors raised by the awaitable itself (eg an HTTP timeout) pass through, to be retried.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=max(0.0, seconds))
+    finally:
+        if not task.done():
+            task.cancel()
+    if not done:
+        raise ModelCallTimeoutError(budget_seconds)
+    return task.result()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+class _ModelState:
+    def __init__(self):
+        self.metrics = CallMetrics()
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class RetryPolicies:
+    """
+    Applies the configured retry policy to model calls, and keeps their metrics. Shared by all adapters in the process.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[str, _ModelState] = {}
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    @staticmethod
+    def model_key(provider: str, model_name: str) -> str:
+        return f"{provider}/{model_name}"
+
+    def policy(self, provider: str, model_name: str) -> RetryPolicy:
+        settings = Config.shared().retry_policies
+        if not isinstance(settings, dict):
+            settings = {}
+        fields: dict = {}
+        for key in (DEFAULT_POLICY_KEY, provider, self.model_key(provider, model_name)):
+            fields.update(settings.get(key) or {})
+        return RetryPolicy.model_validate(fields)
+
+    def _state(self, key: str) -> _ModelState:
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = _ModelState()
+                self._states[key] = state
+            return state
+
+    def _count(self, state: _ModelState, field: str) -> None:
+        with self._lock:
+            setattr(state.metrics, field, getattr(state.metrics, field) + 1)
+
+    def metrics(self) -> Dict[str, CallMetrics]:
+        """A snapshot of the metrics for each model, keyed by "provider/model_name"."""
+        with self._lock:
+            snapshot = {}
+            for key, state in self._states.items():
+                metrics = state.metrics.model_copy()
+                if state.latencies:
+                    latencies = list(state.latencies)
+                    metrics.p50_latency_ms = round(percentile(latencies, 50) * 1000, 1)
+                    metrics.p95_latency_ms = round(percentile(latencies, 95) * 1000, 1)
+                snapshot[key] = metrics
+            return snapshot
+
+    def reset_metrics(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def hedge_delay(self, policy: RetryPolicy, state: _ModelState) -> float | None:
+        """How long to wait before hedging a call, or None to not hedge."""
+        if policy.hedge_percentile is None:
+            return None
+        with self._lock:
+            if len(state.latencies) < policy.hedge_min_samples:
+                return None
+            return percentile(list(state.latencies), policy.hedge_percentile)
+
+    async def call(
+        self, provider: str, model_name: str, fn: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Call fn with the model's policy: retries, hedging and timeout budget."""
+        policy = self.policy(provider, model_name)
+        state = self._state(self.model_key(provider, model_name))
+        self._count(state, "calls")
+        try:
+            if policy.timeout_seconds is None:
+                return await self._call_with_retries(policy, state, fn)
+            try:
+                return await within_budget(
+                    self._call_with_retries(policy, state, fn),
+                    policy.timeout_seconds,
+                    policy.timeout_seconds,
+                )
+            except ModelCallTimeoutError:
+                self._count(state, "timeouts")
+                raise
+        except Exception:
+            self._count(state, "failures")
+            raise
+
+    async def _call_with_retries(
+        self,
+        policy: RetryPolicy,
+        state: _ModelState,
+        fn: Callable[[], Awaitable[T]],
+    ) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged(policy, state, fn)
+            except Exception as e:
+                if attempt >= policy.max_retries or not is_retryable_error(e):
+                    raise
+            self._count(state, "retries")
+            await asyncio.sleep(backoff_seconds(attempt))
+            attempt += 1
+
+    async def _timed(self, state: _ModelState, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await fn()
+        with self._lock:
+            state.latencies.append(time.monotonic() - start)
+        return result
+
+    async def _hedged(
+        self,
+        policy: RetryPolicy,
+        state: _ModelState,
+        fn: Callable[[], Awaitable[T]],
+    ) -> T:
+        delay = self.hedge_delay(policy, state)
+        if delay is None:
+            return await self._timed(state, fn)
+
+        first = asyncio.ensure_future(self._timed(state, fn))
+        pending: set[asyncio.Future] = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            self._count(state, "hedges")
+            hedge = asyncio.ensure_future(self._timed(state, fn))
+            pending.add(hedge)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Collect every exception, so none go unretrieved
+                results = [(task, task.exception()) for task in done]
+                for task, task_error in results:
+                    if task_error is None:
+                        if task is hedge:
+                            self._count(state, "hedge_wins")
+                        return task.result()
+                    error = error or task_error
+            assert error is not None
+            raise error
+        finally:
+            # The losing request (or all of them, if we're cancelled)
+            for task in pending:
+                task.cancel()
+
+    async def stream(
+        self,
+        provider: str,
+        model_name: str,
+        fn: Callable[[], AsyncIterator[T]],
+    ) -> AsyncIterator[T]:
+        """
+        As call, for a stream. Errors are only retried before the first item (once items are yielded, the caller has them), and streams aren't hedged. The timeout budget covers the whole stream.
+        """
+        policy = self.policy(provider, model_name)
+        state = self._state(self.model_key(provider, model_name))
+        self._count(state, "calls")
+        deadline = (
+            time.monotonic() + policy.timeout_seconds
+            if policy.timeout_seconds is not None
+            else None
+        )
+        attempt = 0
+        try:
+            while True:
+                started = False
+                stream = fn()
+                try:
+                    async for item in self._with_deadline(stream, deadline, policy):
+                        started = True
+                        yield item
+                    return
+                except ModelCallTimeoutError:
+                    self._count(state, "timeouts")
+                    raise
+                except Exception as e:
+                    if (
+                        started
+                        or attempt >= policy.max_retries
+                        or not is_retryable_error(e)
+                    ):
+                        raise
+                self._count(state, "retries")
+                await asyncio.sleep(backoff_seconds(attempt))
+                attempt += 1
+        except Exception:
+            self._count(state, "failures")
+            raise
+
+    @staticmethod
+    async def _with_deadline(
+        stream: AsyncIterator[T], deadline: float | None, policy: RetryPolicy
+    ) -> AsyncIterator[T]:
+        """Yield the stream's items, raising ModelCallTimeoutError if it runs past the deadline."""
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                if deadline is None or policy.timeout_seconds is None:
+                    item = await iterator.__anext__()
+                else:
+                    item = await within_budget(
+                        iterator.__anext__(),
+                        deadline - time.monotonic(),
+                        policy.timeout_seconds,
+                    )
+            except StopAsyncIteration:
+                return
+            yield item
@@ -1,8 +1,21 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Literal
+
+from kiln_ai.datamodel.task_run import Usage
+
+# Where streamed text belongs: the final output, the model's reasoning (eg <think> content) or a separate chain of thought call
+StreamChannel = Literal["output", "reasoning", "chain_of_thought"]
 
 
 @dataclass
 class RunOutput:
     output: Dict | str
     intermediate_outputs: Dict[str, str] | None
+    # Tokens used, when the provider reports them
+    usage: Usage | None = None
+
+
+@dataclass
+class StreamDelta:
+    channel: StreamChannel
+    text: str
@@ -0,0 +1,188 @@
+"""
+Token usage, cost and latency of runs.
+
+Adapters record the provider's token counts (see Usage) and a timing breakdown (see RunTimings) on each run they generate. Costs come from the `model_pricing` setting, in USD per million tokens, keyed by "provider/model_name" or model name:
+
+    model_pricing:
+      openai/gpt_4o:
+        input: 2.5
+        output: 10
+      llama_3_1_8b:
+        input: 0.1
+        output: 0.1
+
+Runs without a cost (eg saved before the model's pricing was set) are priced from the current setting when computing stats.
+
+`task_usage_stats` aggregates a task's runs into latency and cost statistics per model and per prompt.
+"""
+
+from typing import Dict, Iterable
+
+from pydantic import BaseModel, Field, ValidationError
+
+from kiln_ai.adapters.response_cache import CACHE_HIT_PROPERTY
+from kiln_ai.adapters.retry_policy import percentile
+from kiln_ai.datamodel import DataSourceType, TaskRun, Usage
+from kiln_ai.utils.config import Config
+
+
+class ModelPrice(BaseModel):
+    # USD per million tokens
+    input: float = Field(ge=0)
+    output: float = Field(ge=0)
+
+
+def add_usage(a: Usage | None, b: Usage | None) -> Usage | None:
+    """The combined usage of two calls, either of which may not have reported any."""
+    if a is None or b is None:
+        return a or b
+    return a + b
+
+
+def model_price(provider: str, model_name: str) -> ModelPrice | None:
+    """The model's price from the model_pricing setting, if set."""
+    settings = Config.shared().model_pricing
+    if not isinstance(settings, dict):
+        return None
+    price = settings.get(f"{provider}/{model_name}") or settings.get(model_name)
+    if not isinstance(price, dict):
+        return None
+    try:
+        return ModelPrice.model_validate(price)
+    except ValidationError:
+        return None
+
+
+def usage_cost(usage: Usage, provider: str, model_name: str) -> float | None:
+    """The cost of the usage in USD, or None if the price or token counts are unknown."""
+    if usage.input_tokens is None and usage.output_tokens is None:
+        return None
+    price = model_price(provider, model_name)
+    if price is None:
+        return None
+    return (
+        (usage.input_tokens or 0) * price.input
+        + (usage.output_tokens or 0) * price.output
+    ) / 1_000_000
+
+
+def with_cost(usage: Usage | None, provider: str, model_name: str) -> Usage | None:
+    """The usage, with its cost set if the provider didn't report one and the price is known."""
+    if usage is None or usage.cost is not None:
+        return usage
+    cost = usage_cost(usage, provider, model_name)
+    if cost is None:
+        return usage
+    return usage.model_copy(update={"cost": cost})
+
+
+class LatencyStats(BaseModel):
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+class UsageStats(BaseModel):
+    runs: int = 0
+    # Answered from the response cache: no tokens used, and not counted in latency
+    cache_hits: int = 0
+    runs_with_usage: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    reasoning_tokens: int = 0
+    runs_with_cost: int = 0
+    total_cost: float | None = None
+    mean_cost: float | None = Field(
+        default=None, description="Mean cost of the runs with a cost."
+    )
+    latency: LatencyStats | None = Field(
+        default=None, description="Total time generating each run."
+    )
+    provider_latency: LatencyStats | None = Field(
+        default=None, description="Time waiting on the provider for each run."
+    )
+
+
+class TaskUsageStats(BaseModel):
+    # Keyed by "provider/model_name"
+    by_model: Dict[str, UsageStats]
+    # Keyed by prompt ID, or prompt builder name for prompts without one
+    by_prompt: Dict[str, UsageStats]
+
+
+def latency_stats(values: list[float]) -> LatencyStats | None:
+    if not values:
+        return None
+    return LatencyStats(
+        mean_ms=sum(values) / len(values),
+        p50_ms=percentile(values, 50),
+        p95_ms=percentile(values, 95),
+        max_ms=max(values),
+    )
+
+
+class _Accumulator:
+    def __init__(self):
+        self.stats = UsageStats()
+        self.costs: list[float] = []
+        self.latencies: list[float] = []
+        self.provider_latencies: list[float] = []
+
+    def add(self, run: TaskRun, provider: str, model_name: str) -> None:
+        stats = self.stats
+        stats.runs += 1
+        if run.output.source.properties.get(CACHE_HIT_PROPERTY):
+            stats.cache_hits += 1
+            return
+        if run.usage is not None:
+            stats.runs_with_usage += 1
+            stats.input_tokens += run.usage.input_tokens or 0
+            stats.output_tokens += run.usage.output_tokens or 0
+            stats.reasoning_tokens += run.usage.reasoning_tokens or 0
+            cost = run.usage.cost
+            if cost is None:
+                cost = usage_cost(run.usage, provider, model_name)
+            if cost is not None:
+                self.costs.append(cost)
+        if run.timings is not None:
+            self.latencies.append(run.timings.total_ms)
+            self.provider_latencies.append(run.timings.provider_call_ms)
+
+    def result(self) -> UsageStats:
+        stats = self.stats.model_copy()
+        if self.costs:
+            stats.runs_with_cost = len(self.costs)
+            stats.total_cost = sum(self.costs)
+            stats.mean_cost = stats.total_cost / len(self.costs)
+        stats.latency = latency_stats(self.latencies)
+        stats.provider_latency = latency_stats(self.provider_latencies)
+        return stats
+
+
+def task_usage_stats(runs: Iterable[TaskRun]) -> TaskUsageStats:
+    """Usage, cost and latency stats for runs generated by a model, per model and per prompt."""
+    by_model: Dict[str, _Accumulator] = {}
+    by_prompt: Dict[str, _Accumulator] = {}
+    for run in runs:
+        source = run.output.source
+        if source is None or source.type != DataSourceType.synthetic:
+            continue
+        properties = source.properties
+        provider = properties.get("model_provider")
+        model_name = properties.get("model_name")
+        if not isinstance(provider, str) or not isinstance(model_name, str):
+            continue
+        prompt = properties.get("prompt_id") or properties.get("prompt_builder_name")
+
+        model_key = f"{provider}/{model_name}"
+        by_model.setdefault(model_key, _Accumulator()).add(run, provider, model_name)
+        if prompt is not None:
+            by_prompt.setdefault(str(prompt), _Accumulator()).add(
+                run, provider, model_name
+            )
+
+    return TaskUsageStats(
+        by_model={key: acc.result() for key, acc in by_model.items()},
+        by_prompt={key: acc.result() for key, acc in by_prompt.items()},
+    )
@@ -0,0 +1,179 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.adapters import adapter_cache
+from kiln_ai.adapters.adapter_cache import AdapterCache
+from kiln_ai.adapters.ml_model_list import ModelProviderName
+from kiln_ai.adapters.prompt_builders import (
+    FewShotPromptBuilder,
+    SimplePromptBuilder,
+)
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Prompt,
+    Task,
+    TaskOutput,
+    TaskRun,
+)
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import Change, MultiProcess
+from kiln_ai.utils.config import Config
+
+
+@pytest.fixture
+def cache():
+    events = ModelEvents()
+    process = MultiProcess()
+    with (
+        patch.object(ModelEvents, "shared", return_value=events),
+        patch.object(MultiProcess, "shared", return_value=process),
+    ):
+        yield AdapterCache()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Do the thing", parent=project)
+    task.save_to_file()
+    return task
+
+
+def adapter(cache, task, **kwargs):
+    return cache.adapter_for_task(
+        task,
+        model_name=kwargs.pop("model_name", "gpt_4o"),
+        provider=kwargs.pop("provider", ModelProviderName.openai),
+        **kwargs,
+    )
+
+
+def test_reuses_adapter(cache, task):
+    first = adapter(cache, task, tags=["a"])
+    assert adapter(cache, task, tags=["a"]) is first
+    # A fresh load of the same task shares the adapter
+    loaded = Task.load_from_file(task.path)
+    assert adapter(cache, loaded, tags=["a"]) is first
+    assert len(cache) == 1
+
+
+def test_key_parts(cache, task):
+    first = adapter(cache, task)
+    assert adapter(cache, task, model_name="gpt_4o_mini") is not first
+    assert adapter(cache, task, provider=ModelProviderName.openrouter) is not first
+    assert adapter(cache, task, tags=["other"]) is not first
+    assert adapter(cache, task, prompt_builder=FewShotPromptBuilder(task)) is not first
+    # The default prompt builder is SimplePromptBuilder, but keyed separately
+    assert adapter(cache, task, prompt_builder=SimplePromptBuilder(task)) is not first
+    assert adapter(cache, task) is first
+
+
+def test_unsaved_tasks_not_cached(cache):
+    task = Task(name="Unsaved", instruction="Do the thing")
+    assert adapter(cache, task) is not adapter(cache, task)
+    assert len(cache) == 0
+
+
+def test_task_changes_invalidate(cache, task):
+    first = adapter(cache, task)
+    task.instruction = "Do another thing"
+    task.save_to_file()
+    assert len(cache) == 0
+    assert adapter(cache, task) is not first
+
+
+def test_saves_in_task_folder_invalidate(cache, task, tmp_path):
+    first = adapter(cache, task)
+
+    # Runs don't: prompt builders read them for each prompt
+    run = TaskRun(
+        parent=task,
+        input="test input",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "tester"}
+        ),
+        output=TaskOutput(
+            output="test output",
+            source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "tester"}
+            ),
+        ),
+    )
+    run.save_to_file()
+    assert adapter(cache, task) is first
+
+    Prompt(name="Test Prompt", prompt="A prompt", parent=task).save_to_file()
+    assert adapter(cache, task) is not first
+
+
+def test_project_delete_invalidates(cache, task):
+    adapter(cache, task)
+    task.parent.delete()
+    assert len(cache) == 0
+
+
+def test_settings_changes_invalidate(cache, task):
+    first = adapter(cache, task)
+    Config.shared().open_ai_api_key = "new-key"
+    second = adapter(cache, task)
+    assert second is not first
+    assert second.config.api_key == "new-key"
+    assert adapter(cache, task) is second
+    assert len(cache) == 1
+
+
+def test_settings_change_while_building_not_cached(cache, task):
+    real_adapter_for_task = adapter_cache.adapter_for_task
+
+    def build_then_change_settings(*args, **kwargs):
+        built = real_adapter_for_task(*args, **kwargs)
+        Config.shared().open_ai_api_key = "changed-while-building"
+        return built
+
+    with patch.object(
+        adapter_cache, "adapter_for_task", side_effect=build_then_change_settings
+    ):
+        adapter(cache, task)
+    assert len(cache) == 0
+
+
+def test_multi_process_reset_invalidates(cache, task):
+    adapter(cache, task)
+    MultiProcess.shared()._reset()
+    assert len(cache) == 0
+
+
+def test_multi_process_reset_only_changed_task(cache, task, tmp_path):
+    adapter(cache, task)
+    multi_process = MultiProcess.shared()
+    # Runs don't change adapters, nor do other tasks
+    multi_process._reset([Change(task.path.parent / "runs" / "1" / "task_run.kiln")])
+    multi_process._reset([Change(tmp_path / "other_task" / "task.kiln")])
+    assert len(cache) == 1
+
+    multi_process._reset([Change(task.path)])
+    assert len(cache) == 0
+
+    # Fine-tunes can be used by any task
+    adapter(cache, task)
+    multi_process._reset(
+        [Change(tmp_path / "other_task" / "finetunes" / "1" / "finetune.kiln")]
+    )
+    assert len(cache) == 0
+
+
+def test_lru_eviction(cache, task):
+    cache.max_size = 2
+    first = adapter(cache, task, tags=["1"])
+    adapter(cache, task, tags=["2"])
+    # Recently used, so kept
+    assert adapter(cache, task, tags=["1"]) is first
+    adapter(cache, task, tags=["3"])
+    assert len(cache) == 2
+    assert adapter(cache, task, tags=["1"]) is first
+    cache.invalidate(task.path)
+    assert len(cache) == 0
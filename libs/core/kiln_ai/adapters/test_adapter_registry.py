@@ -3,9 +3,13 @@ from unittest.mock import patch
 import pytest
 
 from kiln_ai import datamodel
-from kiln_ai.adapters.adapter_registry import adapter_for_task
+from kiln_ai.adapters.adapter_registry import (
+    adapter_for_task,
+    connected_openai_compatible_configs,
+)
 from kiln_ai.adapters.ml_model_list import ModelProviderName
 from kiln_ai.adapters.model_adapters.langchain_adapters import LangchainAdapter
+from kiln_ai.adapters.model_adapters.ollama_adapter import OllamaAdapter
 from kiln_ai.adapters.model_adapters.openai_model_adapter import OpenAICompatibleAdapter
 from kiln_ai.adapters.prompt_builders import BasePromptBuilder
 from kiln_ai.adapters.provider_tools import kiln_model_provider_from
@@ -16,6 +20,8 @@ def mock_config():
     with patch("kiln_ai.adapters.adapter_registry.Config") as mock:
         mock.shared.return_value.open_ai_api_key = "test-openai-key"
         mock.shared.return_value.open_router_api_key = "test-openrouter-key"
+        mock.shared.return_value.groq_api_key = "test-groq-key"
+        mock.shared.return_value.fireworks_api_key = "test-fireworks-key"
         yield mock
 
 
@@ -70,23 +76,52 @@ def test_openrouter_adapter_creation(mock_config, basic_task):
 
 
 @pytest.mark.parametrize(
-    "provider",
+    "provider,api_key,base_url",
     [
-        ModelProviderName.groq,
-        ModelProviderName.amazon_bedrock,
-        ModelProviderName.ollama,
-        ModelProviderName.fireworks_ai,
+        (ModelProviderName.groq, "test-groq-key", "https://api.groq.com/openai/v1"),
+        (
+            ModelProviderName.fireworks_ai,
+            "test-fireworks-key",
+            "https://api.fireworks.ai/inference/v1",
+        ),
     ],
 )
-def test_langchain_adapter_creation(mock_config, basic_task, provider):
+def test_groq_and_fireworks_adapter_creation(
+    mock_config, basic_task, provider, api_key, base_url
+):
+    adapter = adapter_for_task(
+        kiln_task=basic_task, model_name="llama_3_1_8b", provider=provider
+    )
+
+    assert isinstance(adapter, OpenAICompatibleAdapter)
+    assert adapter.config.model_name == "llama_3_1_8b"
+    assert adapter.config.provider_name == provider
+    assert adapter.config.api_key == api_key
+    assert adapter.config.base_url == base_url
+    assert adapter.config.openrouter_style_reasoning is False
+
+
+def test_langchain_adapter_creation(mock_config, basic_task):
     adapter = adapter_for_task(
-        kiln_task=basic_task, model_name="test-model", provider=provider
+        kiln_task=basic_task,
+        model_name="test-model",
+        provider=ModelProviderName.amazon_bedrock,
     )
 
     assert isinstance(adapter, LangchainAdapter)
     assert adapter.model_name == "test-model"
 
 
+def test_ollama_adapter_creation(mock_config, basic_task):
+    adapter = adapter_for_task(
+        kiln_task=basic_task, model_name="test-model", provider=ModelProviderName.ollama
+    )
+
+    assert isinstance(adapter, OllamaAdapter)
+    assert adapter.model_name == "test-model"
+    assert adapter.model_provider_name == ModelProviderName.ollama
+
+
 # TODO should run for all cases
 def test_custom_prompt_builder(mock_config, basic_task):
     class TestPromptBuilder(BasePromptBuilder):
@@ -175,3 +210,26 @@ async def test_fine_tune_provider(mock_config, basic_task, mock_finetune_from_id
     )
     # The actual model name from the fine tune object
     assert provider.provider_options["model"] == "test-model"
+
+
+def test_connected_openai_compatible_configs(mock_config):
+    mock_config.shared.return_value.openai_compatible_providers = [
+        {"name": "local", "base_url": "http://localhost:1234/v1", "api_key": "k"},
+        {"name": "no_url"},
+    ]
+    with patch("kiln_ai.adapters.provider_tools.Config", mock_config):
+        configs = connected_openai_compatible_configs()
+    assert [(c.base_url, c.api_key) for c in configs] == [
+        ("https://openrouter.ai/api/v1", "test-openrouter-key"),
+        (None, "test-openai-key"),
+        ("https://api.groq.com/openai/v1", "test-groq-key"),
+        ("https://api.fireworks.ai/inference/v1", "test-fireworks-key"),
+        ("http://localhost:1234/v1", "k"),
+    ]
+
+    mock_config.shared.return_value.open_ai_api_key = None
+    mock_config.shared.return_value.open_router_api_key = None
+    mock_config.shared.return_value.groq_api_key = None
+    mock_config.shared.return_value.fireworks_api_key = None
+    mock_config.shared.return_value.openai_compatible_providers = None
+    assert connected_openai_compatible_configs() == []
@@ -1,8 +1,19 @@
+import asyncio
 import json
+from unittest.mock import patch
+
+import httpx
+import pytest
 
 from kiln_ai.adapters.ollama_tools import (
+    TAGS_MAX_STALE_SECONDS,
+    TAGS_TTL_SECONDS,
     OllamaConnection,
+    OllamaDiscovery,
+    get_ollama_connection,
+    ollama_keep_alive,
     ollama_model_installed,
+    ollama_online,
     parse_ollama_tags,
 )
 
@@ -40,3 +51,111 @@ def test_ollama_model_installed():
     assert ollama_model_installed(conn, "scosman_net:latest")
     assert ollama_model_installed(conn, "scosman_net")
     assert not ollama_model_installed(conn, "unknown_model")
+
+
+TAGS = {"models": [{"name": "phi3.5", "model": "phi3.5:latest"}]}
+
+
+class MockOllama:
+    """Serves /api/tags through an httpx mock transport, counting requests."""
+
+    def __init__(self, tags=TAGS, status_code=200):
+        self.tags = tags
+        self.status_code = status_code
+        self.requests = 0
+        self.release: asyncio.Event | None = None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.release is not None:
+            await self.release.wait()
+        return httpx.Response(self.status_code, json=self.tags)
+
+
+@pytest.fixture
+def ollama():
+    mock = MockOllama()
+    discovery = OllamaDiscovery()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(mock.handle))
+    with (
+        patch.object(OllamaDiscovery, "shared", return_value=discovery),
+        patch.object(discovery, "client", return_value=client),
+        patch(
+            "kiln_ai.adapters.ollama_tools.ollama_base_url",
+            return_value="http://ollama",
+        ),
+    ):
+        yield mock, discovery
+
+
+def age(discovery, seconds):
+    discovery._entries["http://ollama"].fetched_at -= seconds
+
+
+async def test_tags_cached(ollama):
+    mock, discovery = ollama
+    assert await discovery.tags() == TAGS
+    assert await discovery.tags() == TAGS
+    assert mock.requests == 1
+
+    conn = await get_ollama_connection()
+    assert conn.supported_models == ["phi3.5:latest"]
+    assert mock.requests == 1
+    # Refresh skips the cache
+    await get_ollama_connection(refresh=True)
+    assert mock.requests == 2
+
+
+async def test_stale_tags_refreshed_in_background(ollama):
+    mock, discovery = ollama
+    await discovery.tags()
+    age(discovery, TAGS_TTL_SECONDS)
+    mock.tags = {"models": []}
+    mock.release = asyncio.Event()
+
+    # Returned right away, while the refresh waits on Ollama
+    assert await discovery.tags() == TAGS
+    assert await discovery.tags() == TAGS
+    await asyncio.sleep(0)
+    assert mock.requests == 2
+
+    mock.release.set()
+    await discovery._fetches["http://ollama"]
+    assert await discovery.tags() == {"models": []}
+
+    # Too old to use: waits for a fresh result
+    age(discovery, TAGS_MAX_STALE_SECONDS)
+    mock.tags = TAGS
+    assert await discovery.tags() == TAGS
+
+
+async def test_concurrent_calls_share_a_fetch(ollama):
+    mock, discovery = ollama
+    results = await asyncio.gather(*(discovery.tags() for _ in range(5)))
+    assert results == [TAGS] * 5
+    assert mock.requests == 1
+
+
+async def test_failures_cached(ollama):
+    mock, discovery = ollama
+    mock.status_code = 500
+    assert await discovery.tags() is None
+    assert not await ollama_online()
+    assert await get_ollama_connection() is None
+    assert mock.requests == 1
+    with pytest.raises(httpx.HTTPStatusError):
+        await discovery.refresh()
+
+    mock.status_code = 200
+    discovery.invalidate()
+    assert await ollama_online()
+
+
+@pytest.mark.parametrize(
+    "setting,expected",
+    [(None, None), ("", None), ("30m", "30m"), ("-1", -1.0), ("600", 600.0)],
+)
+def test_ollama_keep_alive(setting, expected):
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_shared.return_value.ollama_keep_alive = setting
+        assert ollama_keep_alive() == expected
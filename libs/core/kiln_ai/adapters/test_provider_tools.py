@@ -6,17 +6,21 @@ from kiln_ai.adapters.ml_model_list import (
     KilnModel,
     ModelName,
     ModelProviderName,
+    built_in_model_index,
+    built_in_models,
 )
 from kiln_ai.adapters.ollama_tools import OllamaConnection
 from kiln_ai.adapters.provider_tools import (
     builtin_model_from,
     check_provider_warnings,
+    clear_resolution_caches,
     core_provider,
     finetune_cache,
     finetune_from_id,
     finetune_provider_model,
     get_model_and_provider,
     kiln_model_provider_from,
+    on_finetune_event,
     openai_compatible_config,
     openai_compatible_provider_model,
     parse_custom_model_id,
@@ -25,13 +29,14 @@ from kiln_ai.adapters.provider_tools import (
     provider_options_for_custom_model,
     provider_warnings,
 )
-from kiln_ai.datamodel import Finetune, StructuredOutputMode, Task
+from kiln_ai.datamodel import Finetune, Project, StructuredOutputMode, Task
+from kiln_ai.datamodel.model_events import ModelEvents
 
 
 @pytest.fixture(autouse=True)
 def clear_finetune_cache():
-    """Clear the finetune provider model cache before each test"""
-    finetune_cache.clear()
+    """Clear the finetune and resolved provider caches before each test"""
+    clear_resolution_caches()
     yield
 
 
@@ -846,3 +851,94 @@ def test_finetune_from_id_cache_hit(mock_project, mock_task, mock_finetune):
     mock_project.assert_not_called()
     mock_task.assert_not_called()
     mock_finetune.assert_not_called()
+
+
+def test_built_in_model_index():
+    index = built_in_model_index(built_in_models)
+    assert index is built_in_model_index(built_in_models)
+    model, provider = get_model_and_provider(
+        ModelName.phi_3_5, ModelProviderName.ollama
+    )
+    assert model is index.by_name[ModelName.phi_3_5]
+    assert provider is index.providers[(ModelName.phi_3_5, ModelProviderName.ollama)]
+    # Plain strings work as keys too
+    assert index.by_name["phi_3_5"] is model
+    assert ("openai", "gpt-4o-mini-2024-07-18") in index.finetunable
+
+    # Indexes a replaced list
+    other = [
+        KilnModel(
+            name=ModelName.phi_3_5, friendly_name="Phi", providers=[], family="phi"
+        )
+    ]
+    assert built_in_model_index(other).by_name["phi_3_5"] is other[0]
+
+
+def test_openai_compatible_config_cached_until_settings_change(mock_shared_config):
+    config = mock_shared_config.return_value
+    config.settings_version.return_value = 1
+    first = openai_compatible_config("test_provider::gpt-4")
+    config.openai_compatible_providers = [
+        {"name": "test_provider", "base_url": "https://api.changed.com"}
+    ]
+    assert openai_compatible_config("test_provider::gpt-4") is first
+
+    config.settings_version.return_value = 2
+    changed = openai_compatible_config("test_provider::gpt-4")
+    assert changed.base_url == "https://api.changed.com"
+    assert changed.api_key is None
+
+
+def test_custom_model_provider_cached(mock_config):
+    mock_config.return_value = "fake-api-key"
+    provider = kiln_model_provider_from("custom-model", ModelProviderName.openai)
+    assert (
+        kiln_model_provider_from("custom-model", ModelProviderName.openai) is provider
+    )
+    assert (
+        kiln_model_provider_from(
+            "openai::custom-model", ModelProviderName.kiln_custom_registry
+        )
+        is provider
+    )
+    # Provider keys are still checked on each call
+    mock_config.return_value = None
+    with pytest.raises(ValueError):
+        kiln_model_provider_from("custom-model", ModelProviderName.openai)
+
+
+def test_finetune_provider_model_updated_on_save(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    fine_tune = Finetune(
+        name="test-finetune",
+        provider="openai",
+        base_model_id="gpt-4o-mini-2024-07-18",
+        dataset_split_id="dataset-123",
+        train_split_name="train",
+        system_message="Test system message",
+        fine_tune_model_id="ft:model-1",
+        parent=task,
+    )
+    fine_tune.save_to_file()
+    model_id = f"{project.id}::{task.id}::{fine_tune.id}"
+
+    # Only registered for save events once a fine-tune is cached
+    ModelEvents.shared().remove_listener(on_finetune_event)
+    with patch("kiln_ai.adapters.provider_tools.project_from_id", return_value=project):
+        provider = finetune_provider_model(model_id)
+        assert on_finetune_event in ModelEvents.shared()._listeners
+        assert provider.provider_options == {"model": "ft:model-1"}
+        assert finetune_provider_model(model_id) is provider
+
+        fine_tune.fine_tune_model_id = "ft:model-2"
+        fine_tune.save_to_file()
+        assert finetune_provider_model(model_id).provider_options == {
+            "model": "ft:model-2"
+        }
+
+        fine_tune.delete()
+        with pytest.raises(ValueError, match="not found"):
+            finetune_provider_model(model_id)
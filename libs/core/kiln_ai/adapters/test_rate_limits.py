@@ -0,0 +1,277 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    AdapterInfo,
+    BaseAdapter,
+    RunOutput,
+)
+from kiln_ai.adapters.rate_limits import (
+    DEFAULT_MAX_CONCURRENCY,
+    AdaptiveConcurrency,
+    RateLimits,
+    TokenBucket,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.utils.config import Config
+
+
+def rate_limit_error(headers: dict | None = None) -> openai.RateLimitError:
+    response = httpx.Response(
+        429,
+        headers=headers or {},
+        request=httpx.Request("POST", "https://api.example.com/v1/chat"),
+    )
+    return openai.RateLimitError("Rate limited", response=response, body=None)
+
+
+@pytest.fixture
+def limits():
+    limits = RateLimits()
+    with (
+        patch.object(RateLimits, "shared", return_value=limits),
+        # No real waiting for backoff
+        patch("kiln_ai.adapters.rate_limits.backoff_seconds", return_value=0),
+    ):
+        yield limits
+    Config.shared().provider_rate_limits = {}
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(rate_limit_error())
+    assert not is_rate_limit_error(ValueError("nope"))
+    error = MagicMock(spec=["response"])
+    error.response = {"Error": {"Code": "ThrottlingException"}}
+    assert is_rate_limit_error(error)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(rate_limit_error()) is None
+    assert retry_after_seconds(rate_limit_error({"retry-after": "2"})) == 2
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(rate_limit_error({"retry-after": "99999"})) == 120
+    assert retry_after_seconds(rate_limit_error({"retry-after": "junk"})) is None
+
+
+def test_token_bucket():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    # Empty: 1 per second
+    assert bucket.reserve(1) == pytest.approx(1, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2, abs=0.05)
+    # Larger than the bucket: waits for a full bucket
+    assert TokenBucket(per_minute=60).reserve(1000) == 0
+
+
+async def test_adaptive_concurrency_aimd():
+    concurrency = AdaptiveConcurrency(max_limit=8)
+    started = await concurrency.acquire()
+    concurrency.release(started, rate_limited=True)
+    assert concurrency.limit == 4
+    # Calls started before the decrease don't decrease again
+    concurrency.in_flight += 1
+    concurrency.release(started, rate_limited=True)
+    assert concurrency.limit == 4
+
+    for _ in range(4):
+        concurrency.release(await concurrency.acquire())
+    assert concurrency.limit == pytest.approx(5, abs=0.2)
+    for _ in range(100):
+        concurrency.release(await concurrency.acquire())
+    assert concurrency.limit == 8
+
+
+async def test_adaptive_concurrency_queues():
+    concurrency = AdaptiveConcurrency(max_limit=2)
+    running = 0
+    peak = 0
+
+    async def work():
+        nonlocal running, peak
+        started = await concurrency.acquire()
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        concurrency.release(started)
+
+    await asyncio.gather(*[work() for _ in range(10)])
+    assert peak == 2
+    assert concurrency.in_flight == 0
+
+
+async def test_adaptive_concurrency_cancel():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    started = await concurrency.acquire()
+    waiter = asyncio.create_task(concurrency.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    concurrency.release(started)
+    assert concurrency.in_flight == 0
+    concurrency.release(await concurrency.acquire())
+
+
+async def test_call_retries_rate_limits(limits):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise rate_limit_error()
+        return "done"
+
+    assert await limits.call("openai", "gpt_4o", fn) == "done"
+    assert calls == 3
+    limiter = limits.limiters("openai", "gpt_4o")[0]
+    assert limiter.concurrency.limit < 64
+    assert limiter.concurrency.in_flight == 0
+
+
+async def test_call_gives_up(limits):
+    Config.shared().rate_limit_retries = 1
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        raise rate_limit_error()
+
+    try:
+        with pytest.raises(openai.RateLimitError):
+            await limits.call("openai", "gpt_4o", fn)
+    finally:
+        Config.shared().rate_limit_retries = 3
+    assert calls == 2
+
+
+async def test_call_other_errors_not_retried(limits):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        await limits.call("openai", "gpt_4o", fn)
+    assert calls == 1
+    assert limits.limiters("openai", "gpt_4o")[0].concurrency.limit == 64
+
+
+async def test_retry_after_pauses_provider(limits):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise rate_limit_error({"retry-after-ms": "50"})
+        return "done"
+
+    with patch(
+        "kiln_ai.adapters.rate_limits.asyncio.sleep", wraps=asyncio.sleep
+    ) as sleep:
+        await limits.call("openai", "gpt_4o", fn)
+    assert sleep.call_args.args[0] == pytest.approx(0.05, abs=0.02)
+
+
+def test_configured_limits(limits):
+    Config.shared().provider_rate_limits = {
+        "groq": {"requests_per_minute": 30, "max_concurrency": 4},
+        "groq/llama_3_1_8b": {"tokens_per_minute": 6000},
+    }
+    provider, model = limits.limiters("groq", "llama_3_1_8b")
+    assert provider.concurrency.max_limit == 4
+    assert provider._requests.per_minute == 30
+    assert model.needs_token_estimate
+    # Unconfigured models only use the provider's limiter
+    assert limits.limiters("groq", "llama_3_1_70b") == [provider]
+
+    # Settings changes are picked up, keeping the limiter's state
+    Config.shared().provider_rate_limits = {"groq": {"max_concurrency": 2}}
+    assert limits.limiters("groq", "llama_3_1_8b") == [provider]
+    assert provider.concurrency.max_limit == 2
+    assert provider._requests is None
+
+
+def test_ollama_limited_to_parallel_requests(limits):
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        config = mock_shared.return_value
+        config.provider_rate_limits = {}
+        config.ollama_parallel_requests = 3
+        (ollama,) = limits.limiters("ollama", "phi_3_5")
+        assert ollama.concurrency.max_limit == 3
+        (groq,) = limits.limiters("groq", "llama_3_1_8b")
+        assert groq.concurrency.max_limit == DEFAULT_MAX_CONCURRENCY
+
+        # Configured limits win
+        config.provider_rate_limits = {"ollama": {"max_concurrency": 8}}
+        limits.limiters("ollama", "phi_3_5")
+        assert ollama.concurrency.max_limit == 8
+
+
+class RateLimitedAdapter(BaseAdapter):
+    def __init__(self, *args, failures: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.calls = 0
+
+    async def _run(self, input: dict | str) -> RunOutput:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise rate_limit_error()
+        return RunOutput(output="Test output", intermediate_outputs=None)
+
+    def adapter_info(self) -> AdapterInfo:
+        return AdapterInfo(
+            adapter_name="rate_limited_adapter",
+            model_name=self.model_name,
+            model_provider=self.model_provider_name,
+            prompt_builder_name="simple_prompt_builder",
+        )
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Do the thing", parent=project)
+    task.save_to_file()
+    return task
+
+
+async def test_adapter_invoke_retries(limits, task):
+    adapter = RateLimitedAdapter(
+        task, model_name="phi_3_5", model_provider_name="ollama", failures=2
+    )
+    run = await adapter.invoke_unsaved("input")
+    assert run.output.output == "Test output"
+    assert adapter.calls == 3
+
+
+async def test_adapter_stream_retries(limits, task):
+    adapter = RateLimitedAdapter(
+        task, model_name="phi_3_5", model_provider_name="ollama", failures=1
+    )
+    items = [item async for item in adapter.invoke_stream("input")]
+    assert items[-1].output.output == "Test output"
+    assert adapter.calls == 2
+
+
+async def test_adapter_token_limit_estimates(limits, task):
+    Config.shared().provider_rate_limits = {"ollama": {"tokens_per_minute": 100000}}
+    adapter = RateLimitedAdapter(
+        task, model_name="phi_3_5", model_provider_name="ollama"
+    )
+    with patch.object(adapter, "estimate_tokens", return_value=10) as estimate:
+        await adapter.invoke_unsaved("input")
+    estimate.assert_called_once_with("input")
@@ -0,0 +1,176 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    AdapterInfo,
+    BaseAdapter,
+    RunOutput,
+)
+from kiln_ai.adapters.prompt_builders import SimpleChainOfThoughtPromptBuilder
+from kiln_ai.adapters.response_cache import (
+    PRUNE_EVERY,
+    ResponseCache,
+    ResponseCacheMode,
+)
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.utils.config import Config
+
+
+class CountingAdapter(BaseAdapter):
+    def __init__(self, *args, output: str = "Test output", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output = output
+        self.calls = 0
+
+    async def _run(self, input: dict | str) -> RunOutput:
+        self.calls += 1
+        return RunOutput(
+            output=self.output, intermediate_outputs={"reasoning": "thinking"}
+        )
+
+    def adapter_info(self) -> AdapterInfo:
+        return AdapterInfo(
+            adapter_name="counting_adapter",
+            model_name=self.model_name,
+            model_provider=self.model_provider_name,
+            prompt_builder_name="simple_prompt_builder",
+        )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(db_path=tmp_path / "cache" / "responses.sqlite")
+    with patch.object(ResponseCache, "shared", return_value=cache):
+        yield cache
+    cache.close()
+
+
+@pytest.fixture
+def enabled(cache):
+    Config.shared().response_cache = True
+    yield
+    Config.shared().response_cache = False
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Do the thing", parent=project)
+    task.save_to_file()
+    return task
+
+
+def counting_adapter(task, **kwargs):
+    return CountingAdapter(
+        task,
+        model_name=kwargs.pop("model_name", "phi_3_5"),
+        model_provider_name="ollama",
+        **kwargs,
+    )
+
+
+def test_put_get(cache):
+    assert cache.get("key") is None
+    cache.put("key", RunOutput(output={"a": 1}, intermediate_outputs=None))
+    assert cache.get("key") == RunOutput(output={"a": 1}, intermediate_outputs=None)
+    cache.clear()
+    assert cache.get("key") is None
+
+
+def test_ttl(tmp_path):
+    cache = ResponseCache(db_path=tmp_path / "responses.sqlite", ttl_seconds=60)
+    cache.put("key", RunOutput(output="out", intermediate_outputs=None))
+    with patch("kiln_ai.adapters.response_cache.time") as mock_time:
+        mock_time.time.return_value = time.time() + 61
+        assert cache.get("key") is None
+        cache.prune()
+    assert cache.get("key") is None
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Each value is ~50 bytes: room for 3
+    cache = ResponseCache(db_path=tmp_path / "responses.sqlite", max_bytes=160)
+    for i in range(3):
+        cache.put(f"key{i}", RunOutput(output=f"output {i}", intermediate_outputs=None))
+    # Most recently used now
+    assert cache.get("key0") is not None
+    cache._writes = PRUNE_EVERY
+    cache.put("key3", RunOutput(output="output 3", intermediate_outputs=None))
+    assert cache.get("key1") is None
+    for key in ["key0", "key2", "key3"]:
+        assert cache.get(key) is not None
+    cache.close()
+
+
+async def test_disabled_by_default(cache, task):
+    adapter = counting_adapter(task)
+    await adapter.invoke_unsaved("input")
+    await adapter.invoke_unsaved("input")
+    assert adapter.calls == 2
+
+
+async def test_cache_hit(enabled, task):
+    adapter = counting_adapter(task)
+    first = await adapter.invoke_unsaved("input")
+    assert "response_cache" not in first.output.source.properties
+
+    second = await counting_adapter(task).invoke_unsaved("input")
+    assert second.output.output == "Test output"
+    assert second.intermediate_outputs == {"reasoning": "thinking"}
+    assert second.output.source.properties["response_cache"] == "hit"
+    assert second.id != first.id
+    assert adapter.calls == 1
+
+
+async def test_key_includes_model_and_messages(enabled, task):
+    adapter = counting_adapter(task)
+    await adapter.invoke_unsaved("input")
+    await adapter.invoke_unsaved("other input")
+    assert adapter.calls == 2
+
+    other_model = counting_adapter(task, model_name="llama_3_1_8b")
+    await other_model.invoke_unsaved("input")
+    assert other_model.calls == 1
+
+    cot = counting_adapter(task, prompt_builder=SimpleChainOfThoughtPromptBuilder(task))
+    await cot.invoke_unsaved("input")
+    assert cot.calls == 1
+
+    # Changing the instructions changes the system prompt
+    task.instruction = "Do another thing"
+    await adapter.invoke_unsaved("input")
+    assert adapter.calls == 3
+
+
+async def test_bypass_and_refresh(enabled, task):
+    adapter = counting_adapter(task)
+    await adapter.invoke_unsaved("input", cache_mode=ResponseCacheMode.bypass)
+    # Bypass doesn't write
+    await adapter.invoke_unsaved("input")
+    assert adapter.calls == 2
+
+    await adapter.invoke_unsaved("input", cache_mode=ResponseCacheMode.bypass)
+    assert adapter.calls == 3
+
+    adapter.output = "New output"
+    refreshed = await adapter.invoke_unsaved(
+        "input", cache_mode=ResponseCacheMode.refresh
+    )
+    assert adapter.calls == 4
+    assert "response_cache" not in refreshed.output.source.properties
+    hit = await adapter.invoke_unsaved("input")
+    assert adapter.calls == 4
+    assert hit.output.output == "New output"
+
+
+async def test_invalid_output_not_cached(enabled, task):
+    task.output_json_schema = '{"type": "object", "properties": {"a": {"type": "integer"}}, "required": ["a"]}'
+    adapter = counting_adapter(task, output='{"b": 1}')
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await adapter.invoke_unsaved("input")
+    assert adapter.calls == 2
@@ -0,0 +1,274 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import openai
+import pytest
+
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    AdapterInfo,
+    BaseAdapter,
+    RunOutput,
+)
+from kiln_ai.adapters.rate_limits import RateLimits
+from kiln_ai.adapters.retry_policy import (
+    ModelCallTimeoutError,
+    RetryPolicies,
+    is_retryable_error,
+)
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.utils.config import Config
+
+
+def status_error(status_code: int) -> openai.APIStatusError:
+    response = httpx.Response(
+        status_code, request=httpx.Request("POST", "https://api.example.com/v1/chat")
+    )
+    return openai.APIStatusError("Error", response=response, body=None)
+
+
+@pytest.fixture
+def policies():
+    policies = RetryPolicies()
+    with (
+        patch.object(RetryPolicies, "shared", return_value=policies),
+        patch.object(RateLimits, "shared", return_value=RateLimits()),
+        # No real waiting for backoff
+        patch("kiln_ai.adapters.retry_policy.backoff_seconds", return_value=0),
+    ):
+        yield policies
+    Config.shared().retry_policies = {}
+
+
+def test_is_retryable_error():
+    assert is_retryable_error(status_error(500))
+    assert is_retryable_error(status_error(503))
+    assert is_retryable_error(status_error(408))
+    assert not is_retryable_error(status_error(400))
+    # Retried by the rate limiter
+    assert not is_retryable_error(status_error(429))
+    assert is_retryable_error(
+        openai.APIConnectionError(request=httpx.Request("POST", "https://x.com"))
+    )
+    assert is_retryable_error(httpx.ConnectTimeout("timeout"))
+    assert not is_retryable_error(ModelCallTimeoutError(1))
+    assert not is_retryable_error(ValueError("bad"))
+
+
+def test_policy_merges_settings(policies):
+    assert policies.policy("openai", "gpt_4o").max_retries == 2
+    Config.shared().retry_policies = {
+        "default": {"max_retries": 5, "timeout_seconds": 60},
+        "openai": {"hedge_percentile": 95},
+        "openai/gpt_4o": {"max_retries": 1},
+    }
+    policy = policies.policy("openai", "gpt_4o")
+    assert policy.max_retries == 1
+    assert policy.timeout_seconds == 60
+    assert policy.hedge_percentile == 95
+    assert policies.policy("openai", "gpt_4o_mini").max_retries == 5
+    assert policies.policy("groq", "gpt_4o").hedge_percentile is None
+
+
+async def test_retries_transient_errors(policies):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise status_error(502)
+        return "done"
+
+    assert await policies.call("openai", "gpt_4o", fn) == "done"
+    metrics = policies.metrics()["openai/gpt_4o"]
+    assert metrics.calls == 1
+    assert metrics.retries == 2
+    assert metrics.failures == 0
+    assert metrics.p50_latency_ms is not None
+
+
+async def test_gives_up(policies):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        raise status_error(500)
+
+    with pytest.raises(openai.APIStatusError):
+        await policies.call("openai", "gpt_4o", fn)
+    assert calls == 3
+    assert policies.metrics()["openai/gpt_4o"].failures == 1
+
+    calls = 0
+
+    async def bad_request():
+        nonlocal calls
+        calls += 1
+        raise status_error(400)
+
+    with pytest.raises(openai.APIStatusError):
+        await policies.call("openai", "gpt_4o", bad_request)
+    assert calls == 1
+
+
+async def test_timeout_budget(policies):
+    Config.shared().retry_policies = {"default": {"timeout_seconds": 0.05}}
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(ModelCallTimeoutError):
+        await policies.call("openai", "gpt_4o", slow)
+    metrics = policies.metrics()["openai/gpt_4o"]
+    assert metrics.timeouts == 1
+    assert metrics.retries == 0
+
+    # A timeout from the call itself is retried
+    calls = 0
+
+    async def times_out_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise TimeoutError("read timeout")
+        return "done"
+
+    assert await policies.call("openai", "gpt_4o", times_out_once) == "done"
+
+
+async def test_hedged_request_wins(policies):
+    Config.shared().retry_policies = {
+        "default": {"hedge_percentile": 90, "hedge_min_samples": 5}
+    }
+
+    async def fast():
+        await asyncio.sleep(0.001)
+        return "fast"
+
+    # Not enough samples to hedge yet
+    for _ in range(5):
+        await policies.call("openai", "gpt_4o", fast)
+    assert policies.metrics()["openai/gpt_4o"].hedges == 0
+
+    calls = 0
+    cancelled = False
+
+    async def first_slow():
+        nonlocal calls, cancelled
+        calls += 1
+        if calls == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return "slow"
+        return "hedge"
+
+    assert await policies.call("openai", "gpt_4o", first_slow) == "hedge"
+    await asyncio.sleep(0)
+    assert cancelled
+    metrics = policies.metrics()["openai/gpt_4o"]
+    assert metrics.hedges == 1
+    assert metrics.hedge_wins == 1
+
+
+async def test_hedge_failure_waits_for_original(policies):
+    Config.shared().retry_policies = {
+        "default": {"hedge_percentile": 50, "hedge_min_samples": 1, "max_retries": 0}
+    }
+
+    async def fast():
+        return "fast"
+
+    await policies.call("openai", "gpt_4o", fast)
+    calls = 0
+
+    async def hedge_fails():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(0.05)
+            return "original"
+        raise status_error(500)
+
+    assert await policies.call("openai", "gpt_4o", hedge_fails) == "original"
+    assert policies.metrics()["openai/gpt_4o"].hedge_wins == 0
+
+
+async def test_stream_retries_before_first_item(policies):
+    calls = 0
+
+    async def stream():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise status_error(503)
+        yield "a"
+        yield "b"
+
+    items = [item async for item in policies.stream("openai", "gpt_4o", stream)]
+    assert items == ["a", "b"]
+    assert policies.metrics()["openai/gpt_4o"].retries == 1
+
+    async def fails_midway():
+        yield "a"
+        raise status_error(503)
+
+    with pytest.raises(openai.APIStatusError):
+        async for _ in policies.stream("openai", "gpt_4o", fails_midway):
+            pass
+
+
+async def test_stream_timeout_budget(policies):
+    Config.shared().retry_policies = {"default": {"timeout_seconds": 0.05}}
+
+    async def slow_stream():
+        yield "a"
+        await asyncio.sleep(1)
+        yield "b"
+
+    items = []
+    with pytest.raises(ModelCallTimeoutError):
+        async for item in policies.stream("openai", "gpt_4o", slow_stream):
+            items.append(item)
+    assert items == ["a"]
+    assert policies.metrics()["openai/gpt_4o"].timeouts == 1
+
+
+class FlakyAdapter(BaseAdapter):
+    def __init__(self, *args, failures: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.calls = 0
+
+    async def _run(self, input: dict | str) -> RunOutput:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise status_error(500)
+        return RunOutput(output="Test output", intermediate_outputs=None)
+
+    def adapter_info(self) -> AdapterInfo:
+        return AdapterInfo(
+            adapter_name="flaky_adapter",
+            model_name=self.model_name,
+            model_provider=self.model_provider_name,
+            prompt_builder_name="simple_prompt_builder",
+        )
+
+
+async def test_adapter_retries(policies, tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Do the thing", parent=project)
+    task.save_to_file()
+
+    adapter = FlakyAdapter(
+        task, model_name="phi_3_5", model_provider_name="ollama", failures=1
+    )
+    run = await adapter.invoke_unsaved("input")
+    assert run.output.output == "Test output"
+    assert adapter.calls == 2
+    assert policies.metrics()["ollama/phi_3_5"].retries == 1
@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.adapters.response_cache import CACHE_HIT_PROPERTY
+from kiln_ai.adapters.run_usage import (
+    add_usage,
+    model_price,
+    task_usage_stats,
+    usage_cost,
+    with_cost,
+)
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    RunTimings,
+    TaskOutput,
+    TaskRun,
+    Usage,
+)
+
+
+@pytest.fixture
+def pricing():
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_shared.return_value.model_pricing = {
+            "openai/gpt_4o": {"input": 2.5, "output": 10},
+            "llama_3_1_8b": {"input": 0.1, "output": 0.2},
+            "bad_model": {"input": "free"},
+        }
+        yield mock_shared.return_value
+
+
+def test_model_price(pricing):
+    assert model_price("openai", "gpt_4o").output == 10
+    # By model name, for any provider
+    assert model_price("groq", "llama_3_1_8b").input == 0.1
+    assert model_price("openrouter", "gpt_4o") is None
+    assert model_price("openai", "bad_model") is None
+
+    pricing.model_pricing = None
+    assert model_price("openai", "gpt_4o") is None
+
+
+def test_usage_cost(pricing):
+    usage = Usage(input_tokens=1_000_000, output_tokens=500_000)
+    assert usage_cost(usage, "openai", "gpt_4o") == 7.5
+    assert usage_cost(usage, "openrouter", "unknown") is None
+    assert usage_cost(Usage(), "openai", "gpt_4o") is None
+
+    assert with_cost(usage, "openai", "gpt_4o").cost == 7.5
+    # Reported costs are kept
+    assert with_cost(Usage(cost=1.0), "openai", "gpt_4o").cost == 1.0
+    assert with_cost(None, "openai", "gpt_4o") is None
+
+
+def test_add_usage():
+    a = Usage(input_tokens=10, output_tokens=5, total_tokens=15)
+    b = Usage(input_tokens=20, output_tokens=10, reasoning_tokens=3)
+    assert add_usage(a, b) == Usage(
+        input_tokens=30, output_tokens=15, reasoning_tokens=3, total_tokens=15
+    )
+    assert add_usage(a, None) is a
+    assert add_usage(None, None) is None
+
+
+def model_run(
+    provider="openai",
+    model_name="gpt_4o",
+    prompt_id=None,
+    usage=None,
+    total_ms=None,
+    cache_hit=False,
+):
+    properties = {
+        "adapter_name": "test",
+        "model_name": model_name,
+        "model_provider": provider,
+        "prompt_builder_name": "simple_prompt_builder",
+    }
+    if prompt_id:
+        properties["prompt_id"] = prompt_id
+    if cache_hit:
+        properties[CACHE_HIT_PROPERTY] = "hit"
+    return TaskRun(
+        input="input",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+        ),
+        output=TaskOutput(
+            output="output",
+            source=DataSource(type=DataSourceType.synthetic, properties=properties),
+        ),
+        usage=usage,
+        timings=RunTimings(total_ms=total_ms, provider_call_ms=total_ms / 2)
+        if total_ms is not None
+        else None,
+    )
+
+
+def test_task_usage_stats(pricing):
+    runs = [
+        model_run(usage=Usage(input_tokens=100, output_tokens=10), total_ms=100),
+        model_run(
+            usage=Usage(input_tokens=200, output_tokens=20, cost=1.0), total_ms=300
+        ),
+        model_run(cache_hit=True, total_ms=1),
+        model_run(
+            provider="ollama",
+            model_name="phi_3_5",
+            prompt_id="id::123",
+            usage=Usage(input_tokens=50, output_tokens=5, reasoning_tokens=2),
+            total_ms=50,
+        ),
+        # No usage or timings recorded
+        model_run(provider="ollama", model_name="phi_3_5", prompt_id="id::123"),
+        # Not generated by a model
+        TaskRun(
+            input="input",
+            output=TaskOutput(
+                output="output",
+                source=DataSource(
+                    type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+                ),
+            ),
+        ),
+    ]
+    stats = task_usage_stats(runs)
+
+    assert set(stats.by_model) == {"openai/gpt_4o", "ollama/phi_3_5"}
+    gpt = stats.by_model["openai/gpt_4o"]
+    assert gpt.runs == 3
+    assert gpt.cache_hits == 1
+    assert gpt.runs_with_usage == 2
+    assert gpt.input_tokens == 300
+    assert gpt.output_tokens == 30
+    # One run priced from settings, one with a reported cost
+    assert gpt.total_cost == pytest.approx(0.00035 + 1.0)
+    assert gpt.mean_cost == pytest.approx((0.00035 + 1.0) / 2)
+    # Cache hits aren't counted in latency
+    assert gpt.latency.mean_ms == 200
+    assert gpt.latency.max_ms == 300
+    assert gpt.provider_latency.mean_ms == 100
+
+    phi = stats.by_model["ollama/phi_3_5"]
+    assert phi.runs == 2
+    assert phi.reasoning_tokens == 2
+    assert phi.total_cost is None
+    assert phi.latency.p50_ms == 50
+
+    assert stats.by_prompt["simple_prompt_builder"].runs == 3
+    assert stats.by_prompt["id::123"].runs == 2
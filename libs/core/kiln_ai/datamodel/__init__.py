@@ -37,15 +37,25 @@ from kiln_ai.datamodel.task_output import (
     TaskOutputRating,
 )
 from kiln_ai.datamodel.task_run import (
+    RunTimings,
     TaskRun,
+    Usage,
 )
 
 __all__ = [
     "strict_mode",
     "dataset_split",
+    "batch_writer",
+    "listing_index",
+    "model_events",
+    "multi_process",
+    "search_index",
+    "tag_index",
     "Task",
     "Project",
     "TaskRun",
+    "Usage",
+    "RunTimings",
     "TaskOutput",
     "Priority",
     "DataSource",
@@ -2,6 +2,7 @@ import json
 import os
 import re
 import shutil
+import time
 import uuid
 from abc import ABCMeta
 from builtins import classmethod
@@ -29,8 +30,10 @@ from pydantic_core import ErrorDetails
 from typing_extensions import Self
 
 from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
 from kiln_ai.utils.config import Config
 from kiln_ai.utils.formatting import snake_case
+from kiln_ai.utils.timing import TimingCategory, timed
 
 # ID is a 12 digit random integer string.
 # Should be unique per item, at least inside the context of a parent/child relationship.
@@ -61,6 +64,21 @@ SHORT_NAME_FIELD = Field(
     description="A name for this entity",
 )
 
+# Windows refuses to replace a file while a reader has it open. Readers only hold files briefly, so retry before failing the save.
+REPLACE_ATTEMPTS = 5
+REPLACE_RETRY_SECONDS = 0.01
+
+
+def replace_file(src: Path, dst: Path) -> None:
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_RETRY_SECONDS * (attempt + 1))
+
 
 def string_to_valid_name(name: str) -> str:
     # Replace any character not allowed by NAME_REGEX with an underscore
@@ -91,6 +109,8 @@ class KilnBaseModel(BaseModel):
     created_by: str = Field(default_factory=lambda: Config.shared().user_id)
 
     _loaded_from_file: bool = False
+    # mtime of the file when this instance was last loaded or saved. Used for optimistic concurrency checks.
+    _file_mtime_ns: int | None = None
 
     @computed_field()
     def model_type(self) -> str:
@@ -140,14 +160,17 @@ class KilnBaseModel(BaseModel):
         if cached_model is not None:
             return cached_model
         with open(path, "r", encoding="utf-8") as file:
-            # modified time of file for cache invalidation. From file descriptor so it's atomic w read.
-            mtime_ns = os.fstat(file.fileno()).st_mtime_ns
-            file_data = file.read()
-            parsed_json = json.loads(file_data)
-            m = cls.model_validate(parsed_json, context={"loading_from_file": True})
+            with timed(TimingCategory.disk_io):
+                # modified time of file for cache invalidation. From file descriptor so it's atomic w read.
+                mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+                file_data = file.read()
+            with timed(TimingCategory.validation):
+                parsed_json = json.loads(file_data)
+                m = cls.model_validate(parsed_json, context={"loading_from_file": True})
             if not isinstance(m, cls):
                 raise ValueError(f"Loaded model is not of type {cls.__name__}")
             m._loaded_from_file = True
+            m._file_mtime_ns = mtime_ns
             file_data = None
         m.path = path
         if m.v > m.max_schema_version():
@@ -196,15 +219,47 @@ class KilnBaseModel(BaseModel):
                 f"Cannot save to file because 'path' is not set. Class: {self.__class__.__name__}, "
                 f"id: {getattr(self, 'id', None)}, path: {path}"
             )
+        # Only check for an existing file when someone is listening for changes
+        model_events = ModelEvents.shared()
+        notify = model_events.has_listeners()
+        created = notify and not path.exists()
         path.parent.mkdir(parents=True, exist_ok=True)
         json_data = self.model_dump_json(indent=2, exclude={"path"})
-        with open(path, "w", encoding="utf-8") as file:
-            file.write(json_data)
+        # Write then rename, so concurrent readers (including other processes) never see a partially written file
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with timed(TimingCategory.disk_io):
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    file.write(json_data)
+                    file.flush()
+                    self._file_mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+                replace_file(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
         # save the path so even if something like name changes, the file doesn't move
         self.path = path
         # We could save, but invalidating will trigger load on next use.
         # This ensures everything in cache is loaded from disk, and the cache perfectly reflects what's on disk
         ModelCache.shared().invalidate(path)
+        if notify:
+            event_type = ModelEventType.created if created else ModelEventType.updated
+            model_events.notify(ModelEvent(type=event_type, model=self, path=path))
+
+    def modified_on_disk(self) -> bool:
+        """Check if the file was changed by another writer since this instance was loaded or saved.
+
+        Used for optimistic concurrency: load, modify, check, then save.
+
+        Returns:
+            bool: True if the file was modified or removed. False if unchanged, or if this instance was never loaded from or saved to disk.
+        """
+        if self.path is None or self._file_mtime_ns is None:
+            return False
+        try:
+            return os.stat(self.path).st_mtime_ns != self._file_mtime_ns
+        except FileNotFoundError:
+            return True
 
     def delete(self) -> None:
         if self.path is None:
@@ -214,6 +269,9 @@ class KilnBaseModel(BaseModel):
             raise ValueError("Cannot delete model because path is not set")
         shutil.rmtree(dir_path)
         ModelCache.shared().invalidate(self.path)
+        ModelEvents.shared().notify(
+            ModelEvent(type=ModelEventType.deleted, model=self, path=self.path)
+        )
         self.path = None
 
     def build_path(self) -> Path | None:
@@ -339,7 +397,8 @@ class KilnParentedModel(KilnBaseModel, metaclass=ABCMeta):
         else:
             parent_folder = parent_path
 
-        parent = cls.parent_type().load_from_file(parent_path)
+        # Readonly: only checking the parent exists, so no need to copy it
+        parent = cls.parent_type().load_from_file(parent_path, readonly=True)
         if parent is None:
             raise ValueError("Parent must be set to load children")
 
@@ -397,6 +456,32 @@ class KilnParentedModel(KilnBaseModel, metaclass=ABCMeta):
                     return child
         return None
 
+    @classmethod
+    def from_ids_and_parent_path(
+        cls: Type[PT], ids: set[str], parent_path: Path | None
+    ) -> dict[str, PT]:
+        """
+        Find many children by ID in a single pass over the parent's children. Same cache strategy as from_id_and_parent_path, but doesn't rescan the folder for each ID.
+
+        Returns a dict of ID to model (a copy, safe to mutate). IDs which aren't found are not included.
+        """
+        found: dict[str, PT] = {}
+        if parent_path is None or len(ids) == 0:
+            return found
+
+        for child_path in cls.iterate_children_paths_of_parent_path(parent_path):
+            child_id = ModelCache.shared().get_model_id(child_path, cls)
+            if child_id is not None:
+                if child_id in ids:
+                    found[child_id] = cls.load_from_file(child_path)
+            else:
+                child = cls.load_from_file(child_path)
+                if child.id is not None and child.id in ids:
+                    found[child.id] = child
+            if len(found) == len(ids):
+                break
+        return found
+
 
 # Parent create methods for all child relationships
 # You must pass in parent_of in the subclass definition, defining the child relationships
@@ -0,0 +1,43 @@
+"""
+Batched writes for datamodel objects.
+
+Saving a model is dominated by file system latency (mkdir, open, write), not CPU. When writing many models at once (bulk edits, batch runs) a small thread pool gives a large speedup over saving one after another.
+
+Each model is still written with `save_to_file`, so paths, cache invalidation and file format are identical to a normal save.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def save_all(
+    models: Sequence[KilnBaseModel], max_workers: int = DEFAULT_MAX_WORKERS
+) -> list[Exception | None]:
+    """Save many models to disk in parallel.
+
+    Args:
+        models: The models to save. Each must have a path or a parent, as with save_to_file.
+        max_workers: Maximum number of concurrent writes.
+
+    Returns:
+        A list with one entry per model (same order): None if the save succeeded, otherwise the exception raised. A failure never prevents the other models from saving.
+    """
+    if len(models) == 0:
+        return []
+    if len(models) == 1 or max_workers <= 1:
+        return [_save(model) for model in models]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(models))) as executor:
+        return list(executor.map(_save, models))
+
+
+def _save(model: KilnBaseModel) -> Exception | None:
+    try:
+        model.save_to_file()
+    except Exception as e:
+        return e
+    return None
@@ -0,0 +1,132 @@
+"""
+ID to path lookups for child models (eg a task's prompts or fine-tunes), so finding one by ID doesn't load every sibling.
+
+ - Each parent's children of a type are scanned once, the first time they're queried. IDs come from the model cache where possible (see model_cache), so the scan reads few files.
+ - Kept current from save/delete events (see model_events). An ID which isn't found (eg saved by another process) triggers one rescan before it's reported missing. Multi-process mode drops the indexes of parents whose children other processes changed (see multi_process).
+"""
+
+import threading
+from pathlib import Path
+from typing import Type, TypeVar
+
+from kiln_ai.datamodel.basemodel import KilnParentedModel
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+
+PT = TypeVar("PT", bound=KilnParentedModel)
+
+# (parent path, relationship name)
+ChildrenKey = tuple[Path, str]
+
+
+def scan_child_ids(
+    child_type: Type[KilnParentedModel], parent_path: Path
+) -> dict[str, Path]:
+    paths: dict[str, Path] = {}
+    for child_path in child_type.iterate_children_paths_of_parent_path(parent_path):
+        child_id = ModelCache.shared().get_model_id(child_path, child_type)
+        if child_id is None:
+            child_id = child_type.load_from_file(child_path, readonly=True).id
+        if child_id is not None:
+            paths[child_id] = child_path
+    return paths
+
+
+class ChildIdIndex:
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths: dict[ChildrenKey, dict[str, Path]] = {}
+        self._listening = False
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def _children(
+        self,
+        child_type: Type[KilnParentedModel],
+        parent_path: Path,
+        rescan: bool = False,
+    ) -> dict[str, Path]:
+        key = (parent_path, child_type.relationship_name())
+        with self._lock:
+            if not self._listening:
+                ModelEvents.shared().add_listener(self.on_model_event)
+                MultiProcess.shared().add_reset_listener(self.on_reset)
+                self._listening = True
+            paths = self._paths.get(key)
+            if paths is None or rescan:
+                # Scanned under the lock: a child saved mid-scan waits in on_model_event, then is applied
+                paths = scan_child_ids(child_type, parent_path)
+                self._paths[key] = paths
+            return paths
+
+    def path_for_id(
+        self, child_type: Type[KilnParentedModel], parent_path: Path, id: str
+    ) -> Path | None:
+        path = self._children(child_type, parent_path).get(id)
+        if path is None or not path.is_file():
+            path = self._children(child_type, parent_path, rescan=True).get(id)
+        return path
+
+    def load(
+        self,
+        child_type: Type[PT],
+        parent_path: Path,
+        id: str,
+        readonly: bool = False,
+    ) -> PT | None:
+        """The child with this ID, or None if the parent has none."""
+        path = self.path_for_id(child_type, parent_path, id)
+        if path is None:
+            return None
+        child = child_type.load_from_file(path, readonly=readonly)
+        if child.id == id:
+            return child
+        # Edited on disk since indexed
+        path = self._children(child_type, parent_path, rescan=True).get(id)
+        if path is None:
+            return None
+        return child_type.load_from_file(path, readonly=readonly)
+
+    def invalidate(self, parent_path: Path | None = None) -> None:
+        """Drop the index for a parent (or all parents). It's rescanned on next use."""
+        with self._lock:
+            if parent_path is None:
+                self._paths.clear()
+                return
+            for key in [key for key in self._paths if key[0] == parent_path]:
+                del self._paths[key]
+
+    def on_reset(self, changes: list[Change] | None) -> None:
+        """Drop the indexes of parents whose children were changed by another process."""
+        with self._lock:
+            for key in [
+                key for key in self._paths if changed_within(changes, key[0].parent)
+            ]:
+                del self._paths[key]
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        model = event.model
+        if isinstance(model, KilnParentedModel) and model.id is not None:
+            parent_path = (
+                event.path.parent.parent.parent
+                / model.__class__.parent_type().base_filename()
+            )
+            key = (parent_path, model.__class__.relationship_name())
+            with self._lock:
+                paths = self._paths.get(key)
+                if paths is None:
+                    return
+                if event.type == ModelEventType.deleted:
+                    paths.pop(model.id, None)
+                else:
+                    paths[model.id] = event.path
+        if event.type == ModelEventType.deleted:
+            # A deleted parent takes its children with it
+            self.invalidate(event.path)
@@ -10,6 +10,7 @@ from typing import TYPE_CHECKING, Callable
 from pydantic import BaseModel, Field, model_validator
 
 from kiln_ai.datamodel.basemodel import NAME_FIELD, KilnParentedModel
+from kiln_ai.datamodel.tag_index import TagIndex, TagQuery
 from kiln_ai.datamodel.task_run import TaskRun
 
 if TYPE_CHECKING:
@@ -130,6 +131,10 @@ class DatasetSplit(KilnParentedModel):
         default=None,
         description="The filter used to build the dataset.",
     )
+    tag_filter: TagQuery | None = Field(
+        default=None,
+        description="The tag query used to select runs for the dataset, if any.",
+    )
 
     @model_validator(mode="after")
     def validate_split_percentages(self) -> "DatasetSplit":
@@ -146,12 +151,13 @@ class DatasetSplit(KilnParentedModel):
         splits: list[DatasetSplitDefinition],
         filter_type: DatasetFilterType = DatasetFilterType.ALL,
         description: str | None = None,
+        tag_filter: TagQuery | None = None,
     ):
         """
-        Build a dataset split from a task.
+        Build a dataset split from a task. If a tag filter is provided, only runs matching it are included (in addition to the filter type).
         """
         filter = dataset_filters[filter_type]
-        split_contents = cls.build_split_contents(task, splits, filter)
+        split_contents = cls.build_split_contents(task, splits, filter, tag_filter)
         return cls(
             parent=task,
             name=name,
@@ -159,6 +165,7 @@ class DatasetSplit(KilnParentedModel):
             splits=splits,
             split_contents=split_contents,
             filter=filter_type,
+            tag_filter=tag_filter,
         )
 
     @classmethod
@@ -167,11 +174,29 @@ class DatasetSplit(KilnParentedModel):
         task: "Task",
         splits: list[DatasetSplitDefinition],
         filter: DatasetFilter,
+        tag_filter: TagQuery | None = None,
     ) -> dict[str, list[str]]:
         valid_ids = []
-        for task_run in task.runs():
-            if filter(task_run):
-                valid_ids.append(task_run.id)
+        if tag_filter is not None and not tag_filter.is_empty():
+            # Use the tag index so we only load the runs which match the tags
+            candidate_ids = (
+                TagIndex.shared().query(task.path, tag_filter)
+                if task.path is not None
+                else []
+            )
+            if filter is AllDatasetFilter:
+                valid_ids = candidate_ids
+            else:
+                runs = TaskRun.from_ids_and_parent_path(set(candidate_ids), task.path)
+                valid_ids = [
+                    run_id
+                    for run_id in candidate_ids
+                    if run_id in runs and filter(runs[run_id])
+                ]
+        else:
+            for task_run in task.runs():
+                if filter(task_run):
+                    valid_ids.append(task_run.id)
 
         # Shuffle and split by split percentage
         random.shuffle(valid_ids)
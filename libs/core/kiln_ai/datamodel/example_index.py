@@ -0,0 +1,179 @@
+"""
+An in-memory index of each task's prompt example candidates: runs with a repaired output, and runs with a high quality rating.
+
+Multi-shot prompt builders pick their examples from this index instead of loading and sorting every run of the task for each prompt. Picking k examples is a heap selection over the candidates (O(c log k)), and the rendered examples are cached until the candidates change.
+
+ - Built lazily, with one scan of the task's runs, the first time a task's examples are needed.
+ - Kept current from save/delete events (see model_events). Changes made by other processes are not seen until `invalidate` is called. Multi-process mode drops the indexes of tasks changed by other processes automatically (see multi_process).
+"""
+
+import heapq
+import threading
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Hashable
+
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.datamodel.task_run import TaskRun
+
+
+def is_repaired_example(run: TaskRun) -> bool:
+    return run.repaired_output is not None
+
+
+def is_rated_example(run: TaskRun) -> bool:
+    rating = run.output.rating
+    return (
+        rating is not None
+        and rating.value is not None
+        and rating.is_high_quality()
+        and run.repaired_output is None
+    )
+
+
+def rating_value(run: TaskRun) -> float:
+    return (run.output.rating and run.output.rating.value) or 0
+
+
+class TaskExampleIndex:
+    """Example candidates for the runs of a single task."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # In scan order, then save order. Dicts keep insertion order.
+        self._repaired: dict[str, TaskRun] = {}
+        self._rated: dict[str, TaskRun] = {}
+        self._version = 0
+        self._rendered: dict[Hashable, tuple[int, str]] = {}
+
+    @classmethod
+    def build(cls, task_path: Path) -> "TaskExampleIndex":
+        index = cls()
+        for run in TaskRun.all_children_of_parent_path(task_path, readonly=True):
+            index.set_run(run)
+        return index
+
+    def set_run(self, run: TaskRun) -> None:
+        """Add, update or remove the run as a candidate. The index keeps the run: pass a copy if the caller may mutate it."""
+        if run.id is None:
+            return
+        if is_repaired_example(run):
+            target, other = self._repaired, self._rated
+        elif is_rated_example(run):
+            target, other = self._rated, self._repaired
+        else:
+            self.remove_run(run.id)
+            return
+        with self._lock:
+            other.pop(run.id, None)
+            # Updates keep their position
+            target[run.id] = run
+            self._version += 1
+
+    def remove_run(self, run_id: str) -> None:
+        with self._lock:
+            removed_repaired = self._repaired.pop(run_id, None) is not None
+            removed_rated = self._rated.pop(run_id, None) is not None
+            if removed_repaired or removed_rated:
+                self._version += 1
+
+    def select(self, count: int) -> list[TaskRun]:
+        """
+        Up to count examples: repaired runs first, then the highest rated (ties in scan order).
+        """
+        with self._lock:
+            examples = list(islice(self._repaired.values(), count))
+            remaining = count - len(examples)
+            if remaining > 0:
+                # Same result as a stable sort by rating, descending
+                examples.extend(
+                    heapq.nlargest(remaining, self._rated.values(), key=rating_value)
+                )
+            return examples
+
+    def rendered(self, key: Hashable, render: Callable[[], str]) -> str:
+        """The cached result of render for this key, re-rendered if the candidates changed since."""
+        with self._lock:
+            version = self._version
+            cached = self._rendered.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        text = render()
+        with self._lock:
+            self._rendered[key] = (version, text)
+        return text
+
+    def __len__(self) -> int:
+        return len(self._repaired) + len(self._rated)
+
+
+class ExampleIndex:
+    """
+    Holds the example index for each task, and keeps them up to date as runs are saved and deleted.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: dict[Path, TaskExampleIndex] = {}
+        self._listening = False
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def for_task(self, task_path: Path) -> TaskExampleIndex:
+        """The index for the task saved at this path, building it if needed."""
+        with self._lock:
+            if not self._listening:
+                ModelEvents.shared().add_listener(self.on_model_event)
+                MultiProcess.shared().add_reset_listener(self.on_reset)
+                self._listening = True
+            index = self._indexes.get(task_path)
+            if index is None:
+                # Built under the lock: a run saved mid-build waits in on_model_event, then is applied to the new index
+                index = TaskExampleIndex.build(task_path)
+                self._indexes[task_path] = index
+            return index
+
+    def invalidate(self, task_path: Path | None = None) -> None:
+        """Drop the index for a task (or all tasks). It's rebuilt from disk on next use."""
+        with self._lock:
+            if task_path is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(task_path, None)
+
+    def on_reset(self, changes: list[Change] | None) -> None:
+        """Drop the indexes of tasks changed by another process."""
+        with self._lock:
+            for task_path in [
+                path for path in self._indexes if changed_within(changes, path.parent)
+            ]:
+                del self._indexes[task_path]
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        model = event.model
+        if isinstance(model, TaskRun):
+            task_path = (
+                event.path.parent.parent.parent / TaskRun.parent_type().base_filename()
+            )
+            with self._lock:
+                index = self._indexes.get(task_path)
+            if index is None or model.id is None:
+                return
+            if event.type == ModelEventType.deleted:
+                index.remove_run(model.id)
+            elif is_repaired_example(model) or is_rated_example(model):
+                # The event's model is the caller's: keep a copy, as saved. Without the parent, which is loaded from the path if needed.
+                index.set_run(
+                    model.model_copy(update={"parent": None}).model_copy(deep=True)
+                )
+            else:
+                index.set_run(model)
+        elif event.type == ModelEventType.deleted and model.type_name() == "task":
+            self.invalidate(event.path)
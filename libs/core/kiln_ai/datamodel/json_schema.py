@@ -1,11 +1,36 @@
+import functools
+import importlib.util
 import json
-from typing import Annotated, Dict
+from typing import Annotated, Any, Callable, Dict
 
 import jsonschema
 import jsonschema.exceptions
 import jsonschema.validators
 from pydantic import AfterValidator
 
+# Parsed schemas and compiled validators are cached by schema string. Tasks have few schemas, but every input, output and run is validated against one.
+SCHEMA_CACHE_SIZE = 256
+
+# Keywords from drafts newer than fastjsonschema supports (draft 7). Schemas using them are validated with jsonschema only.
+NEWER_DRAFT_KEYWORDS = {
+    "$anchor",
+    "$defs",
+    "$dynamicAnchor",
+    "$dynamicRef",
+    "$recursiveAnchor",
+    "$recursiveRef",
+    "dependentRequired",
+    "dependentSchemas",
+    "maxContains",
+    "minContains",
+    "prefixItems",
+    "unevaluatedItems",
+    "unevaluatedProperties",
+}
+
+# Keywords where fastjsonschema's draft 7 rules could accept instances draft 2020-12 rejects: draft 7 ignores keywords beside a $ref, and $schema can switch it to an older draft. Schemas using them are validated with jsonschema only.
+DRAFT_DEPENDENT_KEYWORDS = {"$ref", "$schema"}
+
 JsonObjectSchema = Annotated[
     str,
     AfterValidator(lambda v: _check_json_schema(v)),
@@ -34,6 +59,8 @@ def _check_json_schema(v: str) -> str:
 def validate_schema(instance: Dict, schema_str: str) -> None:
     """Validate a dictionary against a JSON schema.
 
+    Uses a cached validator for the schema (see compiled_validator), so validating many instances against the same schema doesn't re-parse or re-check it.
+
     Args:
         instance: Dictionary to validate
         schema_str: JSON schema string to validate against
@@ -43,9 +70,7 @@ def validate_schema(instance: Dict, schema_str: str) -> None:
         ValueError: If the schema is invalid
     """
     try:
-        schema = schema_from_json_str(schema_str)
-        v = jsonschema.Draft202012Validator(schema)
-        v.validate(instance)
+        compiled_validator(schema_str)(instance)
     except jsonschema.exceptions.ValidationError as e:
         raise ValueError(
             f"This task requires a specific output schema. While the model produced JSON, that JSON didn't meet the schema. Search 'Troubleshooting Structured Data Issues' in our docs for more information. The error from the schema check was: {e.message}"
@@ -55,15 +80,24 @@ def validate_schema(instance: Dict, schema_str: str) -> None:
 def schema_from_json_str(v: str) -> Dict:
     """Parse and validate a JSON schema string.
 
+    The schema check is cached: each distinct schema string is only checked once.
+
     Args:
         v: String containing a JSON schema definition
 
     Returns:
-        Dict containing the parsed JSON schema
+        Dict containing the parsed JSON schema. A new dict for each call: safe to modify.
 
     Raises:
         ValueError: If the input is not a valid JSON schema object with required properties
     """
+    _checked_schema(v)
+    return json.loads(v)
+
+
+@functools.lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _checked_schema(v: str) -> Dict:
+    """The parsed schema, once checked. Shared: never return it to callers who might modify it."""
     try:
         parsed = json.loads(v)
         jsonschema.Draft202012Validator.check_schema(parsed)
@@ -83,3 +117,51 @@ def schema_from_json_str(v: str) -> Dict:
         raise ValueError(f"Invalid JSON: {v}\n {e}")
     except Exception as e:
         raise ValueError(f"Unexpected error parsing JSON schema: {v}\n {e}")
+
+
+def fast_validation_available() -> bool:
+    return importlib.util.find_spec("fastjsonschema") is not None
+
+
+def uses_keywords(schema: Any, keywords: set[str]) -> bool:
+    if isinstance(schema, dict):
+        return any(
+            key in keywords or uses_keywords(value, keywords)
+            for key, value in schema.items()
+        )
+    if isinstance(schema, list):
+        return any(uses_keywords(item, keywords) for item in schema)
+    return False
+
+
+@functools.lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def compiled_validator(schema_str: str) -> Callable[[Any], None]:
+    """
+    A validation function for the schema, raising jsonschema.exceptions.ValidationError for invalid instances. Built once per schema string.
+
+    When the optional fastjsonschema package is installed, schemas it validates the same way as draft 2020-12 are compiled to Python code, several times faster than jsonschema. That excludes schemas using newer keywords, $ref or $schema. Invalid instances are re-checked with jsonschema, so errors (and the final say) are the same with either backend.
+
+    Raises:
+        ValueError: If the schema is invalid
+    """
+    schema = _checked_schema(schema_str)
+    validator = jsonschema.Draft202012Validator(schema)
+    if fast_validation_available() and not uses_keywords(
+        schema, NEWER_DRAFT_KEYWORDS | DRAFT_DEPENDENT_KEYWORDS
+    ):
+        import fastjsonschema
+
+        try:
+            fast_validate = fastjsonschema.compile(schema)
+        except Exception:
+            # Unsupported by fastjsonschema (eg an unknown format): jsonschema only
+            return validator.validate
+
+        def validate(instance: Any) -> None:
+            try:
+                fast_validate(instance)
+            except fastjsonschema.JsonSchemaException:
+                validator.validate(instance)
+
+        return validate
+    return validator.validate
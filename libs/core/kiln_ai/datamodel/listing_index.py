@@ -0,0 +1,298 @@
+"""
+Lightweight project and task listings, with aggregate counts, for list views.
+
+ - Project and task metadata is cached per file, and checked against the file's mtime and size on each listing. So a listing costs one stat per project/task instead of a full load and copy.
+ - Run counts (total, rated, repaired) are computed with one scan of a task's runs the first time it's listed, then kept current from save/delete events (see model_events). Multi-process mode resets them for the tasks another process changes (see multi_process).
+ - Dataset split and fine-tune counts are folder counts: there are few of them, and no need to load them.
+"""
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, TypeVar
+
+from pydantic import BaseModel
+
+from kiln_ai.datamodel.basemodel import KilnBaseModel, KilnParentedModel
+from kiln_ai.datamodel.dataset_split import DatasetSplit
+from kiln_ai.datamodel.finetune import Finetune
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.datamodel.project import Project
+from kiln_ai.datamodel.task import Task
+from kiln_ai.datamodel.task_run import TaskRun
+
+T = TypeVar("T", bound=KilnBaseModel)
+
+
+class TaskCounts(BaseModel):
+    runs: int = 0
+    # Runs with an overall rating
+    rated: int = 0
+    # Runs with a repaired output
+    repaired: int = 0
+    dataset_splits: int = 0
+    finetunes: int = 0
+
+
+class TaskListing(BaseModel):
+    id: str
+    name: str
+    description: str | None
+    created_at: datetime
+    created_by: str
+    counts: TaskCounts
+
+
+class ProjectListing(BaseModel):
+    id: str
+    name: str
+    description: str | None
+    path: str
+    created_at: datetime
+    created_by: str
+    task_count: int
+    # Totals across the project's tasks
+    counts: TaskCounts
+
+
+def run_flags(run: TaskRun) -> tuple[bool, bool]:
+    """(rated, repaired) for a run."""
+    rated = (
+        run.output is not None
+        and run.output.rating is not None
+        and run.output.rating.value is not None
+    )
+    return rated, run.repaired_output is not None
+
+
+class TaskRunCounts:
+    """Run counts for a single task, updated one run at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._run_flags: dict[str, tuple[bool, bool]] = {}
+        self._rated = 0
+        self._repaired = 0
+
+    @classmethod
+    def build(cls, task_path: Path) -> "TaskRunCounts":
+        counts = cls()
+        for run in TaskRun.all_children_of_parent_path(task_path, readonly=True):
+            counts.set_run(run)
+        return counts
+
+    def set_run(self, run: TaskRun) -> None:
+        if run.id is None:
+            return
+        flags = run_flags(run)
+        with self._lock:
+            self._remove(run.id)
+            self._run_flags[run.id] = flags
+            self._rated += flags[0]
+            self._repaired += flags[1]
+
+    def remove_run(self, run_id: str) -> None:
+        with self._lock:
+            self._remove(run_id)
+
+    def _remove(self, run_id: str) -> None:
+        # Must hold the lock
+        flags = self._run_flags.pop(run_id, None)
+        if flags is not None:
+            self._rated -= flags[0]
+            self._repaired -= flags[1]
+
+    def counts(self) -> tuple[int, int, int]:
+        """(runs, rated, repaired)"""
+        with self._lock:
+            return len(self._run_flags), self._rated, self._repaired
+
+
+def child_paths(child_type: type[KilnParentedModel], parent_path: Path) -> list[Path]:
+    """
+    Like iterate_children_paths_of_parent_path, but without loading the parent: listings check parents are valid when loading their metadata.
+    """
+    folder = parent_path.parent / child_type.relationship_name()
+    base_filename = child_type.base_filename()
+    try:
+        with os.scandir(folder) as entries:
+            return [
+                Path(entry.path) / base_filename
+                for entry in entries
+                if entry.is_dir() and os.path.isfile(Path(entry.path) / base_filename)
+            ]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+class ListingIndex:
+    """
+    Builds project and task listings, caching what it can and keeping run counts up to date as runs are saved and deleted.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._run_counts: dict[Path, TaskRunCounts] = {}
+        # path -> ((mtime_ns, size), model), for projects and tasks
+        self._metadata: dict[Path, tuple[tuple[int, int], KilnBaseModel]] = {}
+        self._listening = False
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def _listen(self) -> None:
+        # Must hold the lock
+        if not self._listening:
+            ModelEvents.shared().add_listener(self.on_model_event)
+            MultiProcess.shared().add_reset_listener(self.on_reset)
+            self._listening = True
+
+    def run_counts(self, task_path: Path) -> TaskRunCounts:
+        """The run counts for the task saved at this path, building them if needed."""
+        with self._lock:
+            self._listen()
+            counts = self._run_counts.get(task_path)
+            if counts is None:
+                # Built under the lock: a run saved mid-build waits in on_model_event, then is applied
+                counts = TaskRunCounts.build(task_path)
+                self._run_counts[task_path] = counts
+            return counts
+
+    def _load(self, path: Path, model_type: type[T]) -> T:
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self._listen()
+            cached = self._metadata.get(path)
+        if (
+            cached is not None
+            and cached[0] == key
+            and isinstance(cached[1], model_type)
+        ):
+            return cached[1]
+        # Readonly: never handed out, only read to build listings
+        model = model_type.load_from_file(path, readonly=True)
+        with self._lock:
+            self._metadata[path] = (key, model)
+        return model
+
+    def task_counts(self, task_path: Path) -> TaskCounts:
+        runs, rated, repaired = self.run_counts(task_path).counts()
+        return TaskCounts(
+            runs=runs,
+            rated=rated,
+            repaired=repaired,
+            dataset_splits=len(child_paths(DatasetSplit, task_path)),
+            finetunes=len(child_paths(Finetune, task_path)),
+        )
+
+    def task_listings(self, project_path: Path) -> list[TaskListing]:
+        listings = []
+        for task_path in child_paths(Task, project_path):
+            try:
+                task = self._load(task_path, Task)
+            except Exception:
+                # Deleted or invalid task: skip it
+                continue
+            if task.id is None:
+                continue
+            listings.append(
+                TaskListing(
+                    id=task.id,
+                    name=task.name,
+                    description=task.description,
+                    created_at=task.created_at,
+                    created_by=task.created_by,
+                    counts=self.task_counts(task_path),
+                )
+            )
+        return listings
+
+    def project_listings(self, project_paths: Iterable[Path]) -> list[ProjectListing]:
+        listings = []
+        for project_path in project_paths:
+            try:
+                project = self._load(project_path, Project)
+            except Exception:
+                # Deleted or invalid project: skip it
+                continue
+            if project.id is None:
+                continue
+            tasks = self.task_listings(project_path)
+            totals = TaskCounts(
+                **{
+                    name: sum(getattr(task.counts, name) for task in tasks)
+                    for name in TaskCounts.model_fields
+                }
+            )
+            listings.append(
+                ProjectListing(
+                    id=project.id,
+                    name=project.name,
+                    description=project.description,
+                    path=str(project_path),
+                    created_at=project.created_at,
+                    created_by=project.created_by,
+                    task_count=len(tasks),
+                    counts=totals,
+                )
+            )
+        return listings
+
+    def invalidate(self, task_path: Path | None = None) -> None:
+        """Drop cached counts for a task (or everything). Rebuilt from disk on next use."""
+        with self._lock:
+            if task_path is None:
+                self._run_counts.clear()
+                self._metadata.clear()
+            else:
+                self._run_counts.pop(task_path, None)
+                self._metadata.pop(task_path, None)
+
+    def on_reset(self, changes: list[Change] | None) -> None:
+        """Drop run counts of tasks changed by another process, and metadata of changed files."""
+        if changes is None:
+            self.invalidate()
+            return
+        changed_paths = {change.path for change in changes}
+        with self._lock:
+            for task_path in [
+                path
+                for path in self._run_counts
+                if changed_within(changes, path.parent)
+            ]:
+                del self._run_counts[task_path]
+            # Deleted files fail to load, so only updates need dropping
+            for path in [path for path in self._metadata if path in changed_paths]:
+                del self._metadata[path]
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        model = event.model
+        if isinstance(model, TaskRun):
+            task_path = (
+                event.path.parent.parent.parent / TaskRun.parent_type().base_filename()
+            )
+            with self._lock:
+                counts = self._run_counts.get(task_path)
+            if counts is None or model.id is None:
+                return
+            if event.type == ModelEventType.deleted:
+                counts.remove_run(model.id)
+            else:
+                counts.set_run(model)
+        elif event.type == ModelEventType.deleted and isinstance(
+            model, (Task, Project)
+        ):
+            # Deleting a project or task deletes its folder, and everything in it
+            folder = event.path.parent
+            with self._lock:
+                for cache in (self._run_counts, self._metadata):
+                    for path in [path for path in cache if path.is_relative_to(folder)]:
+                        del cache[path]
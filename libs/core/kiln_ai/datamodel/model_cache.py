@@ -20,6 +20,8 @@ from typing import Dict, Optional, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
 
+from kiln_ai.utils.timing import TimingCategory, timed
+
 T = TypeVar("T", bound=BaseModel)
 
 
@@ -42,6 +44,10 @@ class ModelCache:
             cls._shared_instance = cls()
         return cls._shared_instance
 
+    def enabled(self) -> bool:
+        """False on file systems with coarse timestamps, where a file's mtime can't show that it changed."""
+        return self._enabled
+
     def _is_cache_valid(self, path: Path, cached_mtime_ns: int) -> bool:
         try:
             current_mtime_ns = path.stat().st_mtime_ns
@@ -72,7 +78,8 @@ class ModelCache:
             if readonly:
                 return model
             else:
-                return model.model_copy(deep=True)
+                with timed(TimingCategory.cache_copy):
+                    return model.model_copy(deep=True)
         return None
 
     def get_model_id(self, path: Path, model_type: Type[T]) -> Optional[str]:
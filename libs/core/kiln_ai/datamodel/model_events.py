@@ -0,0 +1,82 @@
+"""
+Change notifications for the datamodel.
+
+Every `save_to_file` and `delete` publishes a ModelEvent to the listeners registered on `ModelEvents.shared()`. This lets derived state (indexes, caches, live UIs) stay current without rescanning the file system.
+
+ - Listeners are called synchronously, on the thread which saved the model (which may be a worker thread). Keep them fast, and hand off to your own queue/loop for anything slow.
+ - A failing listener never fails the save: exceptions are reported as warnings.
+ - Only changes made through this process are reported. Edits made by other processes (or by hand) are not.
+ - When there are no listeners, saving does no extra work. Once any listener is registered (by this process's event stream or caches, eg fine-tune lookups in provider_tools), each save also checks whether the file already existed and calls every listener before returning.
+"""
+
+import threading
+import warnings
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from kiln_ai.datamodel.basemodel import KilnBaseModel
+
+
+class ModelEventType(str, Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+@dataclass(frozen=True)
+class ModelEvent:
+    type: ModelEventType
+    # The saved or deleted model. Shared with the caller: listeners must not mutate it.
+    model: "KilnBaseModel"
+    # The model's file path. Kept separately as model.path is cleared on delete.
+    path: Path
+
+    @property
+    def model_type(self) -> str:
+        return self.model.type_name()
+
+    @property
+    def id(self) -> str | None:
+        return self.model.id
+
+
+ModelEventListener = Callable[[ModelEvent], None]
+
+
+class ModelEvents:
+    _shared_instance = None
+
+    def __init__(self):
+        self._listeners: list[ModelEventListener] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def add_listener(self, listener: ModelEventListener) -> None:
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners = [*self._listeners, listener]
+
+    def remove_listener(self, listener: ModelEventListener) -> None:
+        with self._lock:
+            self._listeners = [
+                existing for existing in self._listeners if existing != listener
+            ]
+
+    def has_listeners(self) -> bool:
+        return len(self._listeners) > 0
+
+    def notify(self, event: ModelEvent) -> None:
+        # Listener list is replaced (never mutated) on change, so it's safe to iterate without the lock
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                warnings.warn(f"Model event listener failed: {e}")
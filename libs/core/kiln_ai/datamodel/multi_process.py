@@ -0,0 +1,244 @@
+"""
+Coherence for several processes sharing the same Kiln data (eg a kiln_server with multiple workers).
+
+The datamodel itself is safe to share: files are the source of truth and ModelCache validates every hit against the file's mtime. What isn't safe is in-memory state derived from save/delete events (the tag index, search index sync state, etc) or read once (settings), since events are only seen by the process which made the change.
+
+When enabled, every save/delete in any process (and every settings change) appends the changed file's path to a shared change log. Each process calls `check_for_changes()` (eg once per request): if another process appended since it last looked, the registered reset listeners are called with those changes, and drop the derived state they affect (eg only the changed task's indexes). It's rebuilt from disk on next use. Settings are reloaded when the settings file changes.
+
+The log is started afresh once it grows past MAX_CHANGES_BYTES. Other processes can't tell what they missed from the old log, so they reset everything once.
+
+Also provides named cross-process locks, for read-modify-write sequences.
+
+Disabled by default: a single process pays nothing.
+"""
+
+import json
+import os
+import threading
+import uuid
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.utils.config import Config
+from kiln_ai.utils.file_lock import FileLock
+
+CHANGES_FILENAME = "changes"
+MAX_CHANGES_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Change:
+    """A file saved or deleted by another process."""
+
+    path: Path
+    deleted: bool = False
+
+    def within(self, folder: Path) -> bool:
+        """Whether this change may affect files in this folder: a file saved in it, or the deletion of a folder containing it (deleting a model deletes its folder)."""
+        if self.path.is_relative_to(folder):
+            return True
+        return self.deleted and folder.is_relative_to(self.path.parent)
+
+
+def changed_within(changes: Iterable[Change] | None, folder: Path) -> bool:
+    """Whether any of the changes may affect files in this folder. None (unknown changes) affects everything."""
+    if changes is None:
+        return True
+    return any(change.within(folder) for change in changes)
+
+
+# Called with the changes made by other processes, or None if unknown (drop everything)
+ResetListener = Callable[[list[Change] | None], None]
+
+
+def reload_settings(changes: list[Change] | None) -> None:
+    config = Config.shared()
+    if changes is None:
+        config.reload_settings()
+        return
+    settings_path = Path(os.path.abspath(config.settings_path()))
+    if any(change.path == settings_path for change in changes):
+        # Told it changed: the file's mtime may not have moved on a coarse-timestamp file system
+        config.reload_settings(force=True)
+
+
+class MultiProcess:
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state_dir: Path | None = None
+        # Identifies this process's entries in the change log
+        self._process_token = uuid.uuid4().hex
+        # The change log file we've read (device, inode), and how far
+        self._log_key: tuple[int, int] | None = None
+        self._log_offset = 0
+        self._reset_listeners: list[ResetListener] = []
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    @staticmethod
+    def default_state_dir() -> Path:
+        return Path(Config.settings_path()).parent / "multi_process"
+
+    @property
+    def enabled(self) -> bool:
+        return self._state_dir is not None
+
+    @property
+    def state_dir(self) -> Path | None:
+        return self._state_dir
+
+    def enable(self, state_dir: Path | None = None) -> None:
+        """
+        Enable cross-process coherence. All processes sharing data must use the same state_dir.
+        """
+        state_dir = state_dir or self.default_state_dir()
+        state_dir.mkdir(parents=True, exist_ok=True)
+        # Created up front, so we can tell if it's started afresh before our first read
+        (state_dir / CHANGES_FILENAME).touch(exist_ok=True)
+        with self._lock:
+            self._state_dir = state_dir
+            # Everything on disk now is current: start from the end of the log
+            self._log_key = None
+            self._log_offset = 0
+            self._read_new_changes()
+        ModelEvents.shared().add_listener(self.on_model_event)
+        self.add_reset_listener(reload_settings)
+
+    def disable(self) -> None:
+        ModelEvents.shared().remove_listener(self.on_model_event)
+        with self._lock:
+            self._state_dir = None
+            self._log_key = None
+            self._log_offset = 0
+
+    def add_reset_listener(self, listener: ResetListener) -> None:
+        """Register a callback which drops in-memory state derived from the datamodel. Called with the changes when another process changes the data."""
+        with self._lock:
+            if listener not in self._reset_listeners:
+                self._reset_listeners = [*self._reset_listeners, listener]
+
+    def remove_reset_listener(self, listener: ResetListener) -> None:
+        with self._lock:
+            self._reset_listeners = [
+                existing for existing in self._reset_listeners if existing != listener
+            ]
+
+    def lock(self, name: str) -> FileLock:
+        """
+        A cross-process lock with this name. Only valid while enabled.
+        """
+        if self._state_dir is None:
+            raise RuntimeError("Multi-process mode is not enabled")
+        return FileLock(self._state_dir / "locks" / f"{name}.lock")
+
+    def _changes_path(self) -> Path | None:
+        if self._state_dir is None:
+            return None
+        return self._state_dir / CHANGES_FILENAME
+
+    def _read_new_changes(self) -> tuple[bool, list[Change] | None]:
+        """
+        Read the log entries appended since we last read it. Must hold self._lock.
+
+        Returns:
+            Whether other processes changed anything, and the changes (None if unknown).
+        """
+        path = self._changes_path()
+        if path is None:
+            return False, []
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            # Nothing written yet
+            return False, []
+        with file:
+            stat = os.fstat(file.fileno())
+            key = (stat.st_dev, stat.st_ino)
+            # Started afresh since we last read: what was appended to the old log is unknown
+            missed = self._log_key is not None and key != self._log_key
+            if key != self._log_key:
+                self._log_key = key
+                self._log_offset = 0
+            if stat.st_size == self._log_offset:
+                return (True, None) if missed else (False, [])
+            file.seek(self._log_offset)
+            data = file.read()
+        # Only whole lines: another process may be mid-append
+        end = data.rfind(b"\n") + 1
+        self._log_offset += end
+        changed = missed
+        changes: list[Change] = []
+        for line in data[:end].splitlines():
+            token, deleted, changed_path = json.loads(line)
+            if token == self._process_token:
+                continue
+            changed = True
+            if changed_path is None:
+                missed = True
+            else:
+                changes.append(Change(Path(changed_path), deleted))
+        return changed, None if missed else changes
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        self.mark_changed(
+            Change(event.path, deleted=event.type == ModelEventType.deleted)
+        )
+
+    def mark_changed(self, change: Change | None = None) -> None:
+        """Tell other processes this file changed (None: anything may have changed)."""
+        path = self._changes_path()
+        if path is None:
+            return
+        changed_path = str(os.path.abspath(change.path)) if change else None
+        deleted = change.deleted if change else False
+        line = json.dumps([self._process_token, deleted, changed_path]) + "\n"
+        # Locked so appends don't interleave, and so we don't miss entries appended between our read and our write
+        with self.lock(CHANGES_FILENAME):
+            with self._lock:
+                other_process_changed, unseen = self._read_new_changes()
+                if self._log_offset > MAX_CHANGES_BYTES:
+                    # Start afresh. Write then rename, so readers see either log whole.
+                    tmp_path = path.with_name(
+                        f"{CHANGES_FILENAME}.{uuid.uuid4().hex}.tmp"
+                    )
+                    tmp_path.write_bytes(b"")
+                    os.replace(tmp_path, path)
+                with open(path, "ab") as file:
+                    file.write(line.encode("utf-8"))
+                    stat = os.fstat(file.fileno())
+                self._log_key = (stat.st_dev, stat.st_ino)
+                self._log_offset = stat.st_size
+        if other_process_changed:
+            self._reset(unseen)
+
+    def check_for_changes(self) -> bool:
+        """
+        Reset derived state if another process changed the data since we last checked.
+
+        Returns:
+            bool: True if a change from another process was found (and listeners reset).
+        """
+        if self._state_dir is None:
+            return False
+        with self._lock:
+            changed, changes = self._read_new_changes()
+        if not changed:
+            return False
+        self._reset(changes)
+        return True
+
+    def _reset(self, changes: list[Change] | None = None) -> None:
+        for listener in self._reset_listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                warnings.warn(f"Multi-process reset listener failed: {e}")
@@ -0,0 +1,315 @@
+"""
+Local full-text search over task runs, using SQLite FTS5.
+
+Each task gets its own SQLite database in the Kiln settings folder (not the project folder, so it never ends up in version control). It indexes each run's input, output, repaired output and repair instructions.
+
+ - The first search of a task in a process syncs its index with disk: only runs whose file changed since they were indexed (by mtime and size) are re-read, so this is a folder scan plus one stat per run.
+ - After that, the index is kept current from save/delete events (see model_events). In multi-process mode, changes by other processes trigger a re-sync of the affected tasks (see multi_process).
+ - Queries are ranked with BM25 and paginated in SQL, so a search costs the same at 100 runs or 100k.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.datamodel.task_run import TaskRun
+from kiln_ai.utils.config import Config
+
+# Bump to rebuild existing indexes when the schema or tokenizer changes
+SCHEMA_VERSION = 1
+# Column weights for ranking: input, output, repaired_output, repair_instructions
+BM25_WEIGHTS = (2.0, 4.0, 4.0, 1.0)
+# Runs written per transaction while syncing
+SYNC_BATCH_SIZE = 500
+
+_TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchResult:
+    run_id: str
+    # The run's file, as of when it was indexed
+    run_path: Path
+    # BM25 score. Lower is a better match.
+    score: float
+    # Highlighted excerpt of the best matching field. Matches are wrapped in [ and ].
+    snippet: str
+
+
+@dataclass
+class SearchResults:
+    results: list[SearchResult]
+    # Total matches across all pages
+    total: int
+
+
+def simple_match_query(text: str) -> str:
+    """
+    Convert plain user text to an FTS5 query: every word must match, and the last word can be a prefix (for search-as-you-type). Avoids syntax errors from user input containing FTS5 operators.
+    """
+    tokens = _TOKEN_REGEX.findall(text)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] = terms[-1] + "*"
+    return " ".join(terms)
+
+
+class TaskSearchIndex:
+    """The full-text index for the runs of a single task."""
+
+    def __init__(self, task_path: Path, db_path: Path):
+        self.task_path = task_path
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Shared across threads: save events arrive on worker threads. All access is under the lock.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS runs")
+                self._conn.execute("DROP TABLE IF EXISTS run_text")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "rowid INTEGER PRIMARY KEY, "
+                "run_id TEXT NOT NULL UNIQUE, "
+                "run_path TEXT NOT NULL UNIQUE, "
+                "mtime_ns INTEGER NOT NULL, "
+                "size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS run_text USING fts5("
+                "input, output, repaired_output, repair_instructions, "
+                "tokenize='porter unicode61 remove_diacritics 2')"
+            )
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def sync(self) -> None:
+        """Bring the index up to date with the runs on disk."""
+        with self._lock:
+            indexed: dict[str, tuple[int, int]] = {
+                run_path: (mtime_ns, size)
+                for run_path, mtime_ns, size in self._conn.execute(
+                    "SELECT run_path, mtime_ns, size FROM runs"
+                )
+            }
+        seen: set[str] = set()
+        changed: list[TaskRun] = []
+        for run_path in TaskRun.iterate_children_paths_of_parent_path(self.task_path):
+            key = str(run_path)
+            seen.add(key)
+            try:
+                stat = os.stat(run_path)
+            except FileNotFoundError:
+                continue
+            # Size as well as mtime, in case of coarse file system timestamps
+            if indexed.get(key) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            try:
+                changed.append(TaskRun.load_from_file(run_path, readonly=True))
+            except Exception:
+                # Unreadable run: skip it, it won't appear in search results
+                continue
+            if len(changed) >= SYNC_BATCH_SIZE:
+                self.upsert_runs(changed)
+                changed = []
+        if changed:
+            self.upsert_runs(changed)
+
+        removed = [run_path for run_path in indexed if run_path not in seen]
+        if removed:
+            with self._lock, self._conn:
+                for run_path in removed:
+                    self._delete_where("run_path", run_path)
+
+    def upsert_runs(self, runs: list[TaskRun]) -> None:
+        with self._lock, self._conn:
+            for run in runs:
+                if run.id is None or run.path is None:
+                    continue
+                try:
+                    stat = os.stat(run.path)
+                except FileNotFoundError:
+                    continue
+                # A run's ID and path are both unique: clear any row holding either
+                self._delete_where("run_id", run.id)
+                self._delete_where("run_path", str(run.path))
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (run_id, run_path, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                    (run.id, str(run.path), stat.st_mtime_ns, stat.st_size),
+                )
+                self._conn.execute(
+                    "INSERT INTO run_text (rowid, input, output, repaired_output, repair_instructions) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        cursor.lastrowid,
+                        run.input,
+                        run.output.output if run.output else None,
+                        run.repaired_output.output if run.repaired_output else None,
+                        run.repair_instructions,
+                    ),
+                )
+
+    def delete_run(self, run_id: str) -> None:
+        with self._lock, self._conn:
+            self._delete_where("run_id", run_id)
+
+    def _delete_where(self, column: str, value: str) -> None:
+        # Must hold the lock, inside a transaction
+        row = self._conn.execute(
+            f"SELECT rowid FROM runs WHERE {column} = ?", (value,)
+        ).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM run_text WHERE rowid = ?", (row[0],))
+        self._conn.execute("DELETE FROM runs WHERE rowid = ?", (row[0],))
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0, raw: bool = False
+    ) -> SearchResults:
+        """
+        Search the task's runs, best matches first.
+
+        Args:
+            query: Plain text (every word must match, the last may be a prefix), or FTS5 query syntax if raw is True.
+            limit: Max results to return.
+            offset: Number of results to skip, for pagination.
+            raw: Pass the query to FTS5 as-is (phrases, OR/NOT, column filters, etc).
+
+        Raises:
+            ValueError: If a raw query is not valid FTS5 syntax.
+        """
+        match = query if raw else simple_match_query(query)
+        if not match.strip():
+            return SearchResults(results=[], total=0)
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        try:
+            with self._lock:
+                total = self._conn.execute(
+                    "SELECT count(*) FROM run_text WHERE run_text MATCH ?", (match,)
+                ).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT runs.run_id, runs.run_path, bm25(run_text, {weights}) AS score, "
+                    "snippet(run_text, -1, '[', ']', '…', 16) "
+                    "FROM run_text JOIN runs ON runs.rowid = run_text.rowid "
+                    "WHERE run_text MATCH ? ORDER BY score LIMIT ? OFFSET ?",
+                    (match, limit, offset),
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}") from e
+        return SearchResults(
+            results=[
+                SearchResult(
+                    run_id=run_id, run_path=Path(run_path), score=score, snippet=snippet
+                )
+                for run_id, run_path, score, snippet in rows
+            ],
+            total=total,
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM runs").fetchone()[0]
+
+
+class SearchIndex:
+    """
+    Holds the search index for each task, and keeps them up to date as runs are saved and deleted.
+    """
+
+    _shared_instance = None
+
+    def __init__(self, index_dir: Path | None = None):
+        self.index_dir = index_dir or Path(Config.settings_path()).parent / "search"
+        self._lock = threading.Lock()
+        self._indexes: dict[Path, TaskSearchIndex] = {}
+        # Indexes which may have missed changes, and must sync before next use
+        self._stale: set[Path] = set()
+        self._listening = False
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def db_path(self, task_path: Path) -> Path:
+        # Stable per task path. The absolute path, so the same task opened via a different relative path shares an index.
+        key = hashlib.sha256(str(task_path.resolve()).encode("utf-8")).hexdigest()
+        return self.index_dir / f"{key[:32]}.sqlite"
+
+    def for_task(self, task_path: Path) -> TaskSearchIndex:
+        """The index for the task saved at this path, synced with disk on first use."""
+        with self._lock:
+            if not self._listening:
+                ModelEvents.shared().add_listener(self.on_model_event)
+                MultiProcess.shared().add_reset_listener(self.mark_stale)
+                self._listening = True
+            index = self._indexes.get(task_path)
+            if index is None:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                index = TaskSearchIndex(task_path, self.db_path(task_path))
+                # Synced under the lock: a run saved mid-sync waits in on_model_event, then is applied
+                index.sync()
+                self._indexes[task_path] = index
+            elif task_path in self._stale:
+                index.sync()
+                self._stale.discard(task_path)
+            return index
+
+    def mark_stale(self, changes: list[Change] | None = None) -> None:
+        """The data may have changed without events (eg by another process): re-sync the affected indexes (all, if changes is None) before their next use."""
+        with self._lock:
+            self._stale |= {
+                task_path
+                for task_path in self._indexes
+                if changed_within(changes, task_path.parent)
+            }
+
+    def search(
+        self,
+        task_path: Path,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        raw: bool = False,
+    ) -> SearchResults:
+        return self.for_task(task_path).search(query, limit, offset, raw)
+
+    def close(self) -> None:
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+            self._stale.clear()
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        model = event.model
+        if not isinstance(model, TaskRun) or model.id is None:
+            return
+        task_path = (
+            event.path.parent.parent.parent / TaskRun.parent_type().base_filename()
+        )
+        with self._lock:
+            index = self._indexes.get(task_path)
+        if index is None:
+            # Not loaded in this process: the sync on first use will pick up the change
+            return
+        if event.type == ModelEventType.deleted:
+            index.delete_run(model.id)
+        else:
+            index.upsert_runs([model])
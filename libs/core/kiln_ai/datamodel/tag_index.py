@@ -0,0 +1,264 @@
+"""
+An in-memory inverted index of task run tags, for filtering runs by tag without loading every run.
+
+Each task gets an index of tag -> bitmap of runs. Run IDs are assigned a slot (bit position), and bitmaps are Python ints, so AND/OR/NOT queries are a few big-int operations regardless of the number of runs. Matches are decoded from the bitmap's bytes in C-level passes (see `_run_ids_from_bits`), rather than bit by bit.
+
+ - Built lazily, with one scan of the task's runs, the first time a task is queried.
+ - Kept current from save/delete events (see model_events). Changes made by other processes are not seen until `invalidate` is called. Multi-process mode drops the indexes of tasks changed by other processes automatically (see multi_process).
+"""
+
+import sys
+import threading
+from array import array
+from itertools import compress
+from pathlib import Path
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.datamodel.task_run import TaskRun
+
+# Maps a bitmap's binary digits to 0/1 bytes, for itertools.compress
+_BINARY_DIGIT_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+# Below this many matches per 64 runs, scanning only the non-empty words of the bitmap is faster than a pass over every run
+_SPARSE_MATCHES_PER_WORD = 0.25
+
+
+class TagQuery(BaseModel):
+    """
+    A boolean query over run tags: runs with all of `all_tags`, at least one of `any_tags` (if provided), and none of `exclude_tags`. An empty query matches every run.
+    """
+
+    all_tags: list[str] = Field(
+        default_factory=list, description="Runs must have every one of these tags."
+    )
+    any_tags: list[str] = Field(
+        default_factory=list,
+        description="Runs must have at least one of these tags. Ignored if empty.",
+    )
+    exclude_tags: list[str] = Field(
+        default_factory=list, description="Runs must have none of these tags."
+    )
+
+    def is_empty(self) -> bool:
+        return not self.all_tags and not self.any_tags and not self.exclude_tags
+
+    def matches(self, tags: Iterable[str]) -> bool:
+        """Evaluate the query against a single run's tags, without an index."""
+        tag_set = set(tags)
+        if not tag_set.issuperset(self.all_tags):
+            return False
+        if self.any_tags and tag_set.isdisjoint(self.any_tags):
+            return False
+        return tag_set.isdisjoint(self.exclude_tags)
+
+
+class TaskTagIndex:
+    """Tag index for the runs of a single task."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots: dict[str, int] = {}
+        self._slot_run_ids: list[str | None] = []
+        self._free_slots: list[int] = []
+        self._run_tags: dict[str, frozenset[str]] = {}
+        self._tag_bits: dict[str, int] = {}
+        self._all_bits = 0
+
+    @classmethod
+    def build(cls, task_path: Path) -> "TaskTagIndex":
+        return cls.from_run_tags(
+            (run.id, run.tags)
+            for run in TaskRun.all_children_of_parent_path(task_path, readonly=True)
+            if run.id is not None
+        )
+
+    @classmethod
+    def from_run_tags(
+        cls, run_tags: Iterable[tuple[str, Iterable[str]]]
+    ) -> "TaskTagIndex":
+        """An index of these runs (ID, tags). Bitmaps are built once at the end: set_run_tags for each run would copy them for every run."""
+        index = cls()
+        tag_flags: dict[str, bytearray] = {}
+        for run_id, tags in run_tags:
+            if run_id in index._slots:
+                continue
+            slot = len(index._slot_run_ids)
+            index._slots[run_id] = slot
+            index._slot_run_ids.append(run_id)
+            tag_set = frozenset(tags)
+            index._run_tags[run_id] = tag_set
+            for tag in tag_set:
+                flags = tag_flags.setdefault(tag, bytearray())
+                byte_index = slot >> 3
+                if len(flags) <= byte_index:
+                    flags.extend(bytes(byte_index + 1 - len(flags)))
+                flags[byte_index] |= 1 << (slot & 7)
+        index._tag_bits = {
+            tag: int.from_bytes(flags, "little") for tag, flags in tag_flags.items()
+        }
+        index._all_bits = (1 << len(index._slot_run_ids)) - 1
+        return index
+
+    def set_run_tags(self, run_id: str, tags: Iterable[str]) -> None:
+        new_tags = frozenset(tags)
+        with self._lock:
+            slot = self._slots.get(run_id)
+            if slot is None:
+                slot = (
+                    self._free_slots.pop()
+                    if self._free_slots
+                    else len(self._slot_run_ids)
+                )
+                if slot == len(self._slot_run_ids):
+                    self._slot_run_ids.append(run_id)
+                else:
+                    self._slot_run_ids[slot] = run_id
+                self._slots[run_id] = slot
+                self._all_bits |= 1 << slot
+            old_tags = self._run_tags.get(run_id, frozenset())
+            bit = 1 << slot
+            for tag in old_tags - new_tags:
+                self._clear_bit(tag, bit)
+            for tag in new_tags - old_tags:
+                self._tag_bits[tag] = self._tag_bits.get(tag, 0) | bit
+            self._run_tags[run_id] = new_tags
+
+    def remove_run(self, run_id: str) -> None:
+        with self._lock:
+            slot = self._slots.pop(run_id, None)
+            if slot is None:
+                return
+            bit = 1 << slot
+            for tag in self._run_tags.pop(run_id, frozenset()):
+                self._clear_bit(tag, bit)
+            self._all_bits &= ~bit
+            self._slot_run_ids[slot] = None
+            self._free_slots.append(slot)
+
+    def _clear_bit(self, tag: str, bit: int) -> None:
+        bits = self._tag_bits.get(tag, 0) & ~bit
+        if bits:
+            self._tag_bits[tag] = bits
+        else:
+            self._tag_bits.pop(tag, None)
+
+    def query(self, query: TagQuery) -> list[str]:
+        """IDs of the runs matching the query. Order is not meaningful."""
+        with self._lock:
+            bits = self._all_bits
+            for tag in query.all_tags:
+                bits &= self._tag_bits.get(tag, 0)
+            if query.any_tags:
+                any_bits = 0
+                for tag in query.any_tags:
+                    any_bits |= self._tag_bits.get(tag, 0)
+                bits &= any_bits
+            for tag in query.exclude_tags:
+                bits &= ~self._tag_bits.get(tag, 0)
+            return self._run_ids_from_bits(bits)
+
+    def _run_ids_from_bits(self, bits: int) -> list[str]:
+        # Must hold the lock. Only slots of current runs have bits set.
+        slot_run_ids = self._slot_run_ids
+        word_count = (bits.bit_length() + 63) // 64
+        if bits.bit_count() < word_count * _SPARSE_MATCHES_PER_WORD:
+            # Few matches: visit only the non-empty 64-bit words
+            run_ids: list[str] = []
+            words = array("Q", bits.to_bytes(word_count * 8, "little"))
+            if sys.byteorder == "big":
+                words.byteswap()
+            for word_index, word in enumerate(words):
+                if not word:
+                    continue
+                base = word_index * 64
+                while word:
+                    low_bit = word & -word
+                    run_ids.append(slot_run_ids[base + low_bit.bit_length() - 1])
+                    word ^= low_bit
+            return run_ids
+        # Many matches: one pass over every slot, with the binary digits (lowest first) as flags
+        flags = bin(bits)[:1:-1].encode().translate(_BINARY_DIGIT_FLAGS)
+        return list(compress(slot_run_ids, flags))  # type: ignore[arg-type]
+
+    def tag_counts(self) -> dict[str, int]:
+        """Number of runs with each tag."""
+        with self._lock:
+            return {tag: bits.bit_count() for tag, bits in self._tag_bits.items()}
+
+    def run_tags(self, run_id: str) -> frozenset[str] | None:
+        return self._run_tags.get(run_id)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class TagIndex:
+    """
+    Holds the tag index for each task, and keeps them up to date as runs are saved and deleted.
+    """
+
+    _shared_instance = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: dict[Path, TaskTagIndex] = {}
+        self._listening = False
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def for_task(self, task_path: Path) -> TaskTagIndex:
+        """The index for the task saved at this path, building it if needed."""
+        with self._lock:
+            if not self._listening:
+                ModelEvents.shared().add_listener(self.on_model_event)
+                MultiProcess.shared().add_reset_listener(self.on_reset)
+                self._listening = True
+            index = self._indexes.get(task_path)
+            if index is None:
+                # Built under the lock: a run saved mid-build waits in on_model_event, then is applied to the new index
+                index = TaskTagIndex.build(task_path)
+                self._indexes[task_path] = index
+            return index
+
+    def query(self, task_path: Path, query: TagQuery) -> list[str]:
+        return self.for_task(task_path).query(query)
+
+    def invalidate(self, task_path: Path | None = None) -> None:
+        """Drop the index for a task (or all tasks). It's rebuilt from disk on next use."""
+        with self._lock:
+            if task_path is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(task_path, None)
+
+    def on_reset(self, changes: list[Change] | None) -> None:
+        """Drop the indexes of tasks changed by another process."""
+        with self._lock:
+            for task_path in [
+                path for path in self._indexes if changed_within(changes, path.parent)
+            ]:
+                del self._indexes[task_path]
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        model = event.model
+        if isinstance(model, TaskRun):
+            task_path = (
+                event.path.parent.parent.parent / TaskRun.parent_type().base_filename()
+            )
+            with self._lock:
+                index = self._indexes.get(task_path)
+            if index is None or model.id is None:
+                return
+            if event.type == ModelEventType.deleted:
+                index.remove_run(model.id)
+            else:
+                index.set_run_tags(model.id, model.tags)
+        elif event.type == ModelEventType.deleted and model.type_name() == "task":
+            self.invalidate(event.path)
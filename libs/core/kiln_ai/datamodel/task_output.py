@@ -216,6 +216,12 @@ class DataSource(BaseModel):
             type=str,
             not_allowed_for=[DataSourceType.human],
         ),
+        DataSourceProperty(
+            # Set to "hit" when the output came from the response cache, not a new model call
+            name="response_cache",
+            type=str,
+            not_allowed_for=[DataSourceType.human],
+        ),
     ]
 
     @model_validator(mode="after")
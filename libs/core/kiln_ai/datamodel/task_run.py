@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING, Dict, List, Union
 
 import jsonschema
 import jsonschema.exceptions
-from pydantic import Field, ValidationInfo, model_validator
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 from typing_extensions import Self
 
 from kiln_ai.datamodel.basemodel import KilnParentedModel
@@ -15,6 +15,71 @@ if TYPE_CHECKING:
     from kiln_ai.datamodel.task import Task
 
 
+class Usage(BaseModel):
+    """Tokens used by a run, as reported by the model provider, and their cost."""
+
+    input_tokens: int | None = Field(
+        default=None, ge=0, description="The number of input (prompt) tokens."
+    )
+    output_tokens: int | None = Field(
+        default=None,
+        ge=0,
+        description="The number of output (completion) tokens, including reasoning tokens.",
+    )
+    reasoning_tokens: int | None = Field(
+        default=None,
+        ge=0,
+        description="How many of the output tokens were reasoning, for providers which report it.",
+    )
+    total_tokens: int | None = Field(
+        default=None, ge=0, description="The total number of tokens."
+    )
+    cost: float | None = Field(
+        default=None,
+        ge=0,
+        description="The cost of the run in USD, when the model's pricing is known.",
+    )
+
+    def __add__(self, other: "Usage") -> "Usage":
+        """The combined usage of two calls (eg chain of thought, then the final answer). A count reported by only one of them is kept as is."""
+
+        def add(a, b):
+            if a is None or b is None:
+                return a if b is None else b
+            return a + b
+
+        return Usage(
+            input_tokens=add(self.input_tokens, other.input_tokens),
+            output_tokens=add(self.output_tokens, other.output_tokens),
+            reasoning_tokens=add(self.reasoning_tokens, other.reasoning_tokens),
+            total_tokens=add(self.total_tokens, other.total_tokens),
+            cost=add(self.cost, other.cost),
+        )
+
+
+class RunTimings(BaseModel):
+    """Where the time went generating a run, in milliseconds."""
+
+    total_ms: float = Field(
+        ge=0, description="The time from the start of the run, until the run was built."
+    )
+    prompt_build_ms: float = Field(default=0, ge=0)
+    provider_call_ms: float = Field(
+        default=0,
+        ge=0,
+        description="Time waiting on the model provider, including retries and rate limit waits.",
+    )
+    parsing_ms: float = Field(default=0, ge=0)
+    validation_ms: float = Field(
+        default=0, ge=0, description="Input, output and datamodel validation."
+    )
+    save_ms: float = Field(
+        default=0,
+        ge=0,
+        description="Writing the run to disk (its share, when written in a batch). Not included in total_ms. Measured once the write is done, so only set on the run returned, not in the saved file.",
+    )
+
+
 class TaskRun(KilnParentedModel):
     """
     Represents a single execution of a Task.
@@ -47,6 +112,14 @@ class TaskRun(KilnParentedModel):
         default=[],
         description="Tags for the task run. Tags are used to categorize task runs for filtering and reporting.",
     )
+    usage: Usage | None = Field(
+        default=None,
+        description="Tokens used generating the output, and their cost. None if not reported by the provider, or not generated by a model.",
+    )
+    timings: RunTimings | None = Field(
+        default=None,
+        description="Where the time went generating the output. Saving the run isn't included: it happens after the run is built.",
+    )
 
     def has_thinking_training_data(self) -> bool:
         """
@@ -1,5 +1,6 @@
 import datetime
 import json
+import os
 from pathlib import Path
 from typing import Optional
 from unittest.mock import MagicMock, patch
@@ -10,6 +11,7 @@ from kiln_ai.adapters.model_adapters.base_adapter import AdapterInfo, BaseAdapte
 from kiln_ai.adapters.run_output import RunOutput
 from kiln_ai.datamodel import Task, TaskRun
 from kiln_ai.datamodel.basemodel import (
+    REPLACE_ATTEMPTS,
     KilnBaseModel,
     KilnParentedModel,
     string_to_valid_name,
@@ -78,6 +80,59 @@ def test_save_to_file(test_base_file):
     assert data["model_type"] == "kiln_base_model"
 
 
+def test_save_to_file_is_atomic(test_base_file):
+    model = KilnBaseModel(path=test_base_file)
+    # A failed write leaves the existing file intact, and no temp file behind
+    with patch(
+        "kiln_ai.datamodel.basemodel.os.replace", side_effect=OSError("disk full")
+    ):
+        with pytest.raises(OSError, match="disk full"):
+            model.save_to_file()
+    assert json.loads(test_base_file.read_text())["v"] == 1
+    assert list(test_base_file.parent.iterdir()) == [test_base_file]
+
+    model.save_to_file()
+    assert list(test_base_file.parent.iterdir()) == [test_base_file]
+    assert not model.modified_on_disk()
+
+
+def test_save_to_file_retries_permission_error(test_base_file):
+    model = KilnBaseModel(path=test_base_file, v=2)
+    real_replace = os.replace
+    attempts = []
+
+    # Windows: a reader briefly has the file open
+    def replace_once_in_use(src, dst):
+        attempts.append(src)
+        if len(attempts) == 1:
+            raise PermissionError("in use")
+        real_replace(src, dst)
+
+    with patch(
+        "kiln_ai.datamodel.basemodel.os.replace", side_effect=replace_once_in_use
+    ) as mock_replace:
+        model.save_to_file()
+    assert mock_replace.call_count == 2
+    assert json.loads(test_base_file.read_text())["v"] == 2
+    assert list(test_base_file.parent.iterdir()) == [test_base_file]
+
+
+def test_save_to_file_permission_error_persists(test_base_file):
+    model = KilnBaseModel(path=test_base_file, v=2)
+    with (
+        patch(
+            "kiln_ai.datamodel.basemodel.os.replace",
+            side_effect=PermissionError("in use"),
+        ) as mock_replace,
+        patch("kiln_ai.datamodel.basemodel.time.sleep"),
+    ):
+        with pytest.raises(PermissionError):
+            model.save_to_file()
+    assert mock_replace.call_count == REPLACE_ATTEMPTS
+    assert json.loads(test_base_file.read_text())["v"] == 1
+    assert list(test_base_file.parent.iterdir()) == [test_base_file]
+
+
 def test_save_to_file_without_path():
     model = KilnBaseModel()
     with pytest.raises(ValueError):
@@ -478,6 +533,67 @@ def test_from_id_and_parent_path_without_parent():
     assert not_found is None
 
 
+def test_modified_on_disk(test_base_file):
+    model = KilnBaseModel.load_from_file(test_base_file)
+    assert model.modified_on_disk() is False
+
+    # Simulate another writer changing the file after we loaded it
+    model._file_mtime_ns = model._file_mtime_ns - 1
+    assert model.modified_on_disk() is True
+
+    # Saving records the new mtime
+    model.save_to_file()
+    assert model.modified_on_disk() is False
+
+    # Removed files count as modified
+    test_base_file.unlink()
+    assert model.modified_on_disk() is True
+
+
+def test_modified_on_disk_never_saved():
+    assert KilnBaseModel().modified_on_disk() is False
+
+
+def test_from_ids_and_parent_path(test_base_parented_file, tmp_model_cache):
+    parent = BaseParentExample.load_from_file(test_base_parented_file)
+    children = [DefaultParentedModel(parent=parent, name=f"Child{i}") for i in range(4)]
+    for child in children:
+        child.save_to_file()
+
+    wanted = {children[0].id, children[2].id, "nonexistent"}
+    found = DefaultParentedModel.from_ids_and_parent_path(
+        wanted, test_base_parented_file
+    )
+
+    assert set(found.keys()) == {children[0].id, children[2].id}
+    assert found[children[0].id].name == "Child0"
+    assert found[children[2].id].name == "Child2"
+    # copies, not the saved instances
+    assert found[children[0].id] is not children[0]
+
+
+def test_from_ids_and_parent_path_single_scan(test_base_parented_file, tmp_model_cache):
+    parent = BaseParentExample.load_from_file(test_base_parented_file)
+    children = [DefaultParentedModel(parent=parent, name=f"Child{i}") for i in range(3)]
+    for child in children:
+        child.save_to_file()
+
+    with patch.object(
+        DefaultParentedModel,
+        "iterate_children_paths_of_parent_path",
+        wraps=DefaultParentedModel.iterate_children_paths_of_parent_path,
+    ) as mock_iterate:
+        found = DefaultParentedModel.from_ids_and_parent_path(
+            {child.id for child in children}, test_base_parented_file
+        )
+    assert len(found) == 3
+    assert mock_iterate.call_count == 1
+
+
+def test_from_ids_and_parent_path_empty():
+    assert DefaultParentedModel.from_ids_and_parent_path({"any-id"}, None) == {}
+
+
 class MockAdapter(BaseAdapter):
     """Implementation of BaseAdapter for testing"""
 
@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from kiln_ai.datamodel import Project
+from kiln_ai.datamodel.batch_writer import save_all
+
+
+def test_save_all(tmp_path):
+    projects = [
+        Project(name=f"Project {i}", path=tmp_path / f"p{i}" / "project.kiln")
+        for i in range(10)
+    ]
+
+    errors = save_all(projects, max_workers=4)
+
+    assert errors == [None] * 10
+    for i, project in enumerate(projects):
+        loaded = Project.load_from_file(tmp_path / f"p{i}" / "project.kiln")
+        assert loaded.name == f"Project {i}"
+        assert loaded.id == project.id
+
+
+def test_save_all_empty():
+    assert save_all([]) == []
+
+
+def test_save_all_reports_errors_per_model(tmp_path):
+    good = Project(name="Good", path=tmp_path / "good" / "project.kiln")
+    # No path and no parent, can't be saved
+    bad = Project(name="Bad")
+
+    errors = save_all([bad, good])
+
+    assert isinstance(errors[0], ValueError)
+    assert errors[1] is None
+    assert (tmp_path / "good" / "project.kiln").exists()
+
+
+def test_save_all_sequential_for_single_worker(tmp_path):
+    projects = [
+        Project(name=f"Project {i}", path=tmp_path / f"p{i}" / "project.kiln")
+        for i in range(3)
+    ]
+    with patch("kiln_ai.datamodel.batch_writer.ThreadPoolExecutor") as mock_executor:
+        errors = save_all(projects, max_workers=1)
+    mock_executor.assert_not_called()
+    assert errors == [None] * 3
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import Project, Prompt, Task
+from kiln_ai.datamodel.child_id_index import ChildIdIndex
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import MultiProcess
+
+
+@pytest.fixture
+def child_ids():
+    with (
+        patch.object(ModelEvents, "shared", return_value=ModelEvents()),
+        patch.object(MultiProcess, "shared", return_value=MultiProcess()),
+    ):
+        yield ChildIdIndex()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def add_prompt(task, name):
+    prompt = Prompt(name=name, prompt=f"{name} prompt", parent=task)
+    prompt.save_to_file()
+    return prompt
+
+
+def test_load(child_ids, task):
+    prompts = [add_prompt(task, f"Prompt {i}") for i in range(3)]
+    loaded = child_ids.load(Prompt, task.path, prompts[1].id)
+    assert loaded.prompt == "Prompt 1 prompt"
+    assert child_ids.load(Prompt, task.path, "missing") is None
+
+
+def test_kept_current(child_ids, task):
+    first = add_prompt(task, "First")
+    assert child_ids.load(Prompt, task.path, first.id) is not None
+
+    # Saves and deletes are applied without a rescan
+    with patch(
+        "kiln_ai.datamodel.child_id_index.scan_child_ids", side_effect=AssertionError
+    ):
+        second = add_prompt(task, "Second")
+        assert child_ids.load(Prompt, task.path, second.id).name == "Second"
+        first.delete()
+    assert child_ids.load(Prompt, task.path, first.id) is None
+
+
+def test_rescans_for_unknown_ids(child_ids, task):
+    child_ids.load(Prompt, task.path, "missing")
+    # Saved without events, as another process would
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        prompt = add_prompt(task, "Other process")
+    assert child_ids.load(Prompt, task.path, prompt.id).name == "Other process"
+
+
+def test_invalidate(child_ids, task):
+    prompt = add_prompt(task, "Prompt")
+    child_ids.load(Prompt, task.path, prompt.id)
+    MultiProcess.shared()._reset()
+    assert child_ids._paths == {}
@@ -23,6 +23,7 @@ from kiln_ai.datamodel.dataset_split import (
     Train60Test20Val20SplitDefinition,
     Train80Test20SplitDefinition,
 )
+from kiln_ai.datamodel.tag_index import TagQuery
 
 
 @pytest.fixture
@@ -331,3 +332,39 @@ def test_thinking_model_dataset_filter_high_rated(
     )
 
     assert ThinkingModelHighRatedFilter(task_run) is expected_result
+
+
+def test_dataset_split_with_tag_filter(sample_task, sample_task_runs):
+    for i, run in enumerate(sample_task_runs):
+        run.tags = ["even"] if i % 2 == 0 else ["odd"]
+        if i < 3:
+            run.tags.append("reviewed")
+        run.save_to_file()
+
+    dataset = DatasetSplit.from_task(
+        "Split Name",
+        sample_task,
+        AllSplitDefinition,
+        tag_filter=TagQuery(all_tags=["even"], exclude_tags=["reviewed"]),
+    )
+    # Even runs 4, 6, 8 (0 and 2 are reviewed)
+    expected_ids = {sample_task_runs[i].id for i in [4, 6, 8]}
+    assert set(dataset.split_contents["all"]) == expected_ids
+    assert dataset.tag_filter.all_tags == ["even"]
+
+
+def test_dataset_split_with_tag_and_rating_filter(sample_task, sample_task_runs):
+    for run in sample_task_runs[4:8]:
+        run.tags = ["synthetic"]
+        run.save_to_file()
+
+    dataset = DatasetSplit.from_task(
+        "Split Name",
+        sample_task,
+        AllSplitDefinition,
+        filter_type=DatasetFilterType.HIGH_RATING,
+        tag_filter=TagQuery(any_tags=["synthetic", "other"]),
+    )
+    # Runs 4 and 5 are tagged and high rated, 6 and 7 are low rated
+    expected_ids = {sample_task_runs[i].id for i in [4, 5]}
+    assert set(dataset.split_contents["all"]) == expected_ids
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskOutputRating,
+    TaskRun,
+)
+from kiln_ai.datamodel.example_index import ExampleIndex
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import MultiProcess
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def example_index(model_events):
+    with patch.object(MultiProcess, "shared", return_value=MultiProcess()):
+        yield ExampleIndex()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def source():
+    return DataSource(type=DataSourceType.human, properties={"created_by": "Jane Doe"})
+
+
+def add_run(task, output, rating=None, repaired=None):
+    run = TaskRun(
+        parent=task,
+        input="Test input",
+        input_source=source(),
+        output=TaskOutput(
+            output=output,
+            source=source(),
+            rating=TaskOutputRating(value=rating) if rating else None,
+        ),
+        repair_instructions="Fix it" if repaired else None,
+        repaired_output=TaskOutput(output=repaired, source=source())
+        if repaired
+        else None,
+    )
+    run.save_to_file()
+    return run
+
+
+def outputs(examples):
+    return [(run.repaired_output or run.output).output for run in examples]
+
+
+def test_select(example_index, task):
+    add_run(task, "ok", rating=3)
+    add_run(task, "good", rating=4)
+    add_run(task, "great", rating=5)
+    add_run(task, "bad", repaired="repaired")
+    add_run(task, "unrated")
+
+    index = example_index.for_task(task.path)
+    assert len(index) == 3
+    assert outputs(index.select(10)) == ["repaired", "great", "good"]
+    assert outputs(index.select(2)) == ["repaired", "great"]
+    assert outputs(index.select(1)) == ["repaired"]
+
+
+def test_kept_current(example_index, task):
+    index = example_index.for_task(task.path)
+    run = add_run(task, "output")
+    assert index.select(10) == []
+
+    run.output.rating = TaskOutputRating(value=5)
+    run.save_to_file()
+    assert outputs(index.select(10)) == ["output"]
+    # A copy as saved: later edits aren't seen until saved
+    run.output.output = "edited"
+    assert outputs(index.select(10)) == ["output"]
+
+    run = run.model_copy(
+        update={
+            "repair_instructions": "Fix it",
+            "repaired_output": TaskOutput(output="repaired", source=source()),
+        }
+    )
+    run.save_to_file()
+    assert outputs(index.select(10)) == ["repaired"]
+
+    run.delete()
+    assert index.select(10) == []
+    assert example_index.for_task(task.path) is index
+
+
+def test_rendered_cached_until_change(example_index, task):
+    index = example_index.for_task(task.path)
+    renders = 0
+
+    def render():
+        nonlocal renders
+        renders += 1
+        return f"render {renders}"
+
+    assert index.rendered("key", render) == "render 1"
+    assert index.rendered("key", render) == "render 1"
+    # Runs which aren't examples don't change it
+    add_run(task, "unrated")
+    assert index.rendered("key", render) == "render 1"
+    add_run(task, "great", rating=5)
+    assert index.rendered("key", render) == "render 2"
+
+
+def test_invalidate(example_index, task):
+    index = example_index.for_task(task.path)
+    MultiProcess.shared()._reset()
+    assert example_index.for_task(task.path) is not index
+
+    example_index.for_task(task.path)
+    task_path = task.path
+    task.delete()
+    assert task_path not in example_index._indexes
@@ -1,9 +1,16 @@
+import json
+from unittest.mock import patch
+
+import jsonschema
 import pytest
 from pydantic import BaseModel
 
 from kiln_ai.datamodel.json_schema import (
+    NEWER_DRAFT_KEYWORDS,
     JsonObjectSchema,
+    compiled_validator,
     schema_from_json_str,
+    uses_keywords,
     validate_schema,
 )
 
@@ -123,3 +130,57 @@ def test_triangle_schema():
     validate_schema({"a": 1, "b": 2, "c": 3}, json_triangle_schema)
     with pytest.raises(Exception):
         validate_schema({"a": 1, "b": 2, "c": "3"}, json_triangle_schema)
+
+
+def test_schema_checked_once():
+    schema = '{"type": "object", "properties": {"cached": {"type": "integer"}}}'
+    with patch.object(
+        jsonschema.Draft202012Validator,
+        "check_schema",
+        wraps=jsonschema.Draft202012Validator.check_schema,
+    ) as check_schema:
+        for i in range(100):
+            validate_schema({"cached": i}, schema)
+        # Parsed copies are safe to modify
+        schema_from_json_str(schema)["properties"] = {}
+        assert schema_from_json_str(schema)["properties"] == {
+            "cached": {"type": "integer"}
+        }
+    assert check_schema.call_count == 1
+    assert compiled_validator(schema) is compiled_validator(schema)
+
+    with pytest.raises(ValueError, match="didn't meet the schema"):
+        validate_schema({"cached": "not an int"}, schema)
+
+
+def test_uses_keywords():
+    assert uses_keywords(
+        {"properties": {"a": {"prefixItems": []}}}, NEWER_DRAFT_KEYWORDS
+    )
+    assert not uses_keywords(
+        {"properties": {"a": {"type": "array", "items": [{}]}}}, NEWER_DRAFT_KEYWORDS
+    )
+
+
+def test_fast_validation():
+    pytest.importorskip("fastjsonschema")
+    validator = compiled_validator(json_joke_schema)
+    validator({"setup": "Why?", "punchline": "Because."})
+    # Errors come from jsonschema, as without the fast backend
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        validator({"setup": 1, "punchline": "Because."})
+
+
+def test_ref_with_sibling_keywords():
+    # Draft 7 (fastjsonschema) ignores the maxLength beside the $ref. Draft 2020-12 applies it, with either backend.
+    schema = json.dumps(
+        {
+            "type": "object",
+            "properties": {"joke": {"$ref": "#/definitions/text", "maxLength": 5}},
+            "definitions": {"text": {"type": "string"}},
+        }
+    )
+    validator = compiled_validator(schema)
+    validator({"joke": "Ha"})
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        validator({"joke": "Far too long"})
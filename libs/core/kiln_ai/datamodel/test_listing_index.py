@@ -0,0 +1,161 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DatasetSplit,
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskOutputRating,
+    TaskRun,
+)
+from kiln_ai.datamodel.dataset_split import AllSplitDefinition
+from kiln_ai.datamodel.listing_index import ListingIndex, TaskCounts, TaskRunCounts
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import MultiProcess
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def listing_index(model_events):
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        yield ListingIndex()
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = Project(
+        name="Test Project",
+        description="A project",
+        path=tmp_path / "project" / "project.kiln",
+    )
+    project.save_to_file()
+    return project
+
+
+@pytest.fixture
+def task(project):
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def add_run(task, rating=None, repaired=False):
+    source = DataSource(type=DataSourceType.human, properties={"created_by": "Jane"})
+    run = TaskRun(
+        parent=task,
+        input="Test input",
+        input_source=source,
+        output=TaskOutput(
+            output="Test output",
+            source=source,
+            rating=TaskOutputRating(value=rating) if rating else None,
+        ),
+        repaired_output=TaskOutput(output="Repaired", source=source)
+        if repaired
+        else None,
+        repair_instructions="Fix it" if repaired else None,
+    )
+    run.save_to_file()
+    return run
+
+
+def test_task_listings(project, task, listing_index):
+    add_run(task, rating=5)
+    add_run(task, rating=3, repaired=True)
+    add_run(task)
+    DatasetSplit.from_task("Split", task, AllSplitDefinition).save_to_file()
+    empty_task = Task(name="Empty Task", instruction="Instruction", parent=project)
+    empty_task.save_to_file()
+
+    listings = {
+        listing.id: listing for listing in listing_index.task_listings(project.path)
+    }
+    assert listings.keys() == {task.id, empty_task.id}
+    assert listings[task.id].name == "Test Task"
+    assert listings[task.id].counts == TaskCounts(
+        runs=3, rated=2, repaired=1, dataset_splits=1, finetunes=0
+    )
+    assert listings[empty_task.id].counts == TaskCounts()
+
+
+def test_project_listings(tmp_path, project, task, listing_index):
+    add_run(task, rating=5)
+    second_task = Task(name="Second Task", instruction="Instruction", parent=project)
+    second_task.save_to_file()
+    add_run(second_task, repaired=True)
+
+    listings = listing_index.project_listings(
+        [project.path, tmp_path / "missing" / "project.kiln"]
+    )
+    assert len(listings) == 1
+    listing = listings[0]
+    assert listing.id == project.id
+    assert listing.name == "Test Project"
+    assert listing.description == "A project"
+    assert listing.path == str(project.path)
+    assert listing.task_count == 2
+    assert listing.counts == TaskCounts(runs=2, rated=1, repaired=1)
+
+
+def test_counts_kept_current_without_rescanning(task, listing_index):
+    run = add_run(task)
+    assert listing_index.task_counts(task.path).runs == 1
+
+    with patch.object(TaskRunCounts, "build") as mock_build:
+        run.output.rating = TaskOutputRating(value=4)
+        run.save_to_file()
+        second = add_run(task, repaired=True)
+        counts = listing_index.task_counts(task.path)
+        assert (counts.runs, counts.rated, counts.repaired) == (2, 1, 1)
+
+        second.delete()
+        counts = listing_index.task_counts(task.path)
+        assert (counts.runs, counts.rated, counts.repaired) == (1, 1, 0)
+        mock_build.assert_not_called()
+
+
+def test_metadata_cached_until_file_changes(project, task, listing_index):
+    assert listing_index.task_listings(project.path)[0].name == "Test Task"
+
+    with patch.object(Task, "load_from_file", wraps=Task.load_from_file) as mock_load:
+        listing_index.task_listings(project.path)
+        task_loads = [c for c in mock_load.call_args_list if c.args[0] == task.path]
+        assert task_loads == []
+
+        task.name = "Renamed Task"
+        task.save_to_file()
+        assert listing_index.task_listings(project.path)[0].name == "Renamed Task"
+
+
+def test_task_delete_drops_cached_state(project, task, listing_index):
+    add_run(task)
+    listing_index.task_listings(project.path)
+    assert task.path in listing_index._run_counts
+
+    task_path = task.path
+    task.delete()
+    assert task_path not in listing_index._run_counts
+    assert task_path not in listing_index._metadata
+    assert listing_index.task_listings(project.path) == []
+
+
+def test_reset_by_other_process(task, listing_index):
+    listing_index.task_counts(task.path)
+    # Written without a save event (eg by another process)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        add_run(task)
+    assert listing_index.task_counts(task.path).runs == 0
+
+    MultiProcess.shared()._reset()
+    assert listing_index.task_counts(task.path).runs == 1
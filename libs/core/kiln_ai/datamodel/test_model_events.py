@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.datamodel.model_events import ModelEvents, ModelEventType
+
+
+@pytest.fixture
+def model_events():
+    # Isolated instance, so tests don't see (or leave behind) other listeners
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def received(model_events):
+    received = []
+    model_events.add_listener(received.append)
+    return received
+
+
+def test_save_emits_created_then_updated(tmp_path, received):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    project.description = "Updated"
+    project.save_to_file()
+
+    assert [event.type for event in received] == [
+        ModelEventType.created,
+        ModelEventType.updated,
+    ]
+    assert all(event.model is project for event in received)
+    assert received[0].path == tmp_path / "project.kiln"
+    assert received[0].model_type == "project"
+    assert received[0].id == project.id
+
+
+def test_child_save_and_delete(tmp_path, received):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    task_path = task.path
+    task.delete()
+
+    assert [(event.model_type, event.type) for event in received] == [
+        ("project", ModelEventType.created),
+        ("task", ModelEventType.created),
+        ("task", ModelEventType.deleted),
+    ]
+    # Deleted events keep the path, even though the model's path is cleared
+    assert received[2].path == task_path
+    assert task.path is None
+
+
+def test_remove_listener(tmp_path, model_events, received):
+    model_events.remove_listener(received.append)
+    assert not model_events.has_listeners()
+
+    Project(name="Test Project", path=tmp_path / "project.kiln").save_to_file()
+    assert received == []
+
+
+def test_add_listener_is_idempotent(model_events):
+    listener = lambda event: None  # noqa: E731
+    model_events.add_listener(listener)
+    model_events.add_listener(listener)
+    assert model_events._listeners == [listener]
+
+
+def test_failing_listener_does_not_fail_save(tmp_path, model_events, received):
+    def failing_listener(event):
+        raise RuntimeError("listener error")
+
+    model_events.add_listener(failing_listener)
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    with pytest.warns(UserWarning, match="listener error"):
+        project.save_to_file()
+
+    assert project.path.exists()
+    # Later listeners still run
+    model_events.add_listener(received.append)
+    assert len(received) == 1
+
+
+def test_no_listeners_skips_exists_check(tmp_path, model_events):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    with patch.object(ModelEvents, "notify") as mock_notify:
+        project.save_to_file()
+    mock_notify.assert_not_called()
@@ -0,0 +1,186 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from kiln_ai.datamodel import Project, multi_process
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import Change, MultiProcess, changed_within
+from kiln_ai.utils.config import Config
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    return tmp_path / "multi_process"
+
+
+@pytest.fixture
+def process_a(state_dir, model_events):
+    process = MultiProcess()
+    process.enable(state_dir)
+    yield process
+    process.disable()
+
+
+@pytest.fixture
+def process_b(state_dir, model_events):
+    # Shares state_dir with process_a, standing in for another worker
+    process = MultiProcess()
+    process.enable(state_dir)
+    yield process
+    process.disable()
+
+
+def test_disabled_by_default(tmp_path):
+    process = MultiProcess()
+    assert not process.enabled
+    assert process.check_for_changes() is False
+    process.mark_changed()
+    with pytest.raises(RuntimeError, match="not enabled"):
+        process.lock("test")
+
+
+def test_default_state_dir(model_events):
+    process = MultiProcess()
+    process.enable()
+    assert process.state_dir == MultiProcess.default_state_dir()
+    assert process.state_dir.is_dir()
+    process.disable()
+    assert not process.enabled
+
+
+def test_change_seen_by_other_process(process_a, process_b):
+    reset_a = MagicMock()
+    reset_b = MagicMock()
+    process_a.add_reset_listener(reset_a)
+    process_b.add_reset_listener(reset_b)
+
+    process_a.mark_changed()
+    # Our own changes don't reset our state
+    assert process_a.check_for_changes() is False
+    reset_a.assert_not_called()
+
+    assert process_b.check_for_changes() is True
+    # Unknown change: reset everything
+    reset_b.assert_called_once_with(None)
+    # Only once per change
+    assert process_b.check_for_changes() is False
+    reset_b.assert_called_once()
+
+
+def test_write_after_unseen_change_resets(process_a, process_b):
+    reset_b = MagicMock()
+    process_b.add_reset_listener(reset_b)
+
+    process_a.mark_changed()
+    # process_b writes before checking: it must still reset, since it missed process_a's change
+    process_b.mark_changed()
+    reset_b.assert_called_once()
+    assert process_b.check_for_changes() is False
+
+
+def test_saves_mark_changed(tmp_path, model_events, process_a, process_b):
+    # Only process_a sees this process's save events
+    model_events.remove_listener(process_b.on_model_event)
+    reset_b = MagicMock()
+    process_b.add_reset_listener(reset_b)
+
+    project = Project(name="Test Project", path=tmp_path / "project" / "project.kiln")
+    project.save_to_file()
+    assert process_b.check_for_changes() is True
+    reset_b.assert_called_once_with([Change(project.path)])
+
+    path = project.path
+    project.delete()
+    assert process_b.check_for_changes() is True
+    reset_b.assert_called_with([Change(path, deleted=True)])
+
+
+def test_remove_reset_listener_and_failures(process_a, process_b):
+    failing = MagicMock(side_effect=Exception("boom"))
+    reset = MagicMock()
+    process_b.add_reset_listener(failing)
+    process_b.add_reset_listener(reset)
+    # Registering twice is a no-op
+    process_b.add_reset_listener(reset)
+
+    process_a.mark_changed()
+    with pytest.warns(UserWarning, match="boom"):
+        process_b.check_for_changes()
+    reset.assert_called_once()
+
+    process_b.remove_reset_listener(reset)
+    process_b.remove_reset_listener(failing)
+    process_a.mark_changed()
+    process_b.check_for_changes()
+    reset.assert_called_once()
+
+
+def test_lock(process_a, state_dir):
+    with process_a.lock("test") as lock:
+        assert lock.is_locked
+        assert lock.path == state_dir / "locks" / "test.lock"
+
+
+def test_changes_batched_until_checked(tmp_path, process_a, process_b):
+    reset_b = MagicMock()
+    process_b.add_reset_listener(reset_b)
+    process_a.mark_changed(Change(tmp_path / "a.kiln"))
+    process_a.mark_changed(Change(tmp_path / "b.kiln", deleted=True))
+    assert process_b.check_for_changes() is True
+    reset_b.assert_called_once_with(
+        [Change(tmp_path / "a.kiln"), Change(tmp_path / "b.kiln", deleted=True)]
+    )
+
+
+def test_log_started_afresh_resets_everything(tmp_path, process_a, process_b):
+    reset_b = MagicMock()
+    process_b.add_reset_listener(reset_b)
+    with patch.object(multi_process, "MAX_CHANGES_BYTES", 0):
+        process_a.mark_changed(Change(tmp_path / "a.kiln"))
+        # Replaces the log: process_b can't tell what it missed
+        process_a.mark_changed(Change(tmp_path / "b.kiln"))
+    assert process_b.check_for_changes() is True
+    reset_b.assert_called_once_with(None)
+    # Reads the new log from the start after that
+    process_a.mark_changed(Change(tmp_path / "c.kiln"))
+    assert process_b.check_for_changes() is True
+    reset_b.assert_called_with([Change(tmp_path / "c.kiln")])
+
+
+def test_changed_within(tmp_path):
+    task_folder = tmp_path / "project" / "tasks" / "task"
+    run = Change(task_folder / "runs" / "1" / "task_run.kiln")
+    assert changed_within([run], task_folder)
+    assert not changed_within([run], tmp_path / "project" / "tasks" / "other")
+    # Deleting the project deletes its folder, and every task in it
+    deleted_project = Change(tmp_path / "project" / "project.kiln", deleted=True)
+    assert changed_within([deleted_project], task_folder)
+    assert not changed_within([Change(deleted_project.path)], task_folder)
+    assert not changed_within([], task_folder)
+    assert changed_within(None, task_folder)
+
+
+def test_settings_reloaded_in_other_process(tmp_path, process_a, process_b):
+    settings_path = tmp_path / "settings.yaml"
+    config = Config()
+    with (
+        patch.object(Config, "settings_path", return_value=str(settings_path)),
+        patch.object(Config, "shared", return_value=config),
+        patch.object(MultiProcess, "shared", return_value=process_a),
+    ):
+        config.update_settings({"user_id": "before"})
+        version = config.settings_version()
+        # process_b writes the settings file, standing in for another worker's Config
+        settings_path.write_text("user_id: after\n")
+        process_b.mark_changed(Change(settings_path))
+
+        assert process_a.check_for_changes() is True
+        assert config.settings()["user_id"] == "after"
+        assert config.settings_version() != version
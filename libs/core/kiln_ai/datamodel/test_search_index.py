@@ -0,0 +1,222 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskRun,
+)
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import MultiProcess
+from kiln_ai.datamodel.search_index import (
+    SearchIndex,
+    TaskSearchIndex,
+    simple_match_query,
+)
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def search_index(tmp_path, model_events):
+    index = SearchIndex(index_dir=tmp_path / "search")
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project" / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def add_run(task, input, output="Some output", **kwargs):
+    source = DataSource(type=DataSourceType.human, properties={"created_by": "Jane"})
+    run = TaskRun(
+        parent=task,
+        input=input,
+        input_source=source,
+        output=TaskOutput(output=output, source=source),
+        **kwargs,
+    )
+    run.save_to_file()
+    return run
+
+
+def result_ids(results):
+    return [result.run_id for result in results.results]
+
+
+def test_simple_match_query():
+    assert simple_match_query("hello world") == '"hello" "world"*'
+    # FTS5 operators and quotes are treated as plain words
+    assert simple_match_query('NEAR(a "b) OR c-') == '"NEAR" "a" "b" "OR" "c"*'
+    assert simple_match_query("  !! ") == ""
+
+
+def test_search_fields(task, search_index):
+    run1 = add_run(task, "What is the capital of France?", "Paris")
+    run2 = add_run(
+        task,
+        "Translate cheese",
+        "fromage",
+        repair_instructions="Should be lowercase",
+        repaired_output=TaskOutput(
+            output="fromage frais",
+            source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "Jane"}
+            ),
+        ),
+    )
+
+    assert result_ids(search_index.search(task.path, "capital")) == [run1.id]
+    assert search_index.search(task.path, "capital").results[0].run_path == run1.path
+    assert result_ids(search_index.search(task.path, "paris")) == [run1.id]
+    assert result_ids(search_index.search(task.path, "frais")) == [run2.id]
+    assert result_ids(search_index.search(task.path, "lowercase")) == [run2.id]
+    assert search_index.search(task.path, "missing").total == 0
+    assert search_index.search(task.path, "").total == 0
+
+
+def test_search_prefix_stemming_and_snippet(task, search_index):
+    run = add_run(task, "The runners were running quickly")
+
+    # Stemmed: "run" matches "running"/"runners"
+    assert result_ids(search_index.search(task.path, "run")) == [run.id]
+    # Last word is a prefix
+    assert result_ids(search_index.search(task.path, "quic")) == [run.id]
+    result = search_index.search(task.path, "quickly").results[0]
+    assert "[quickly]" in result.snippet
+
+
+def test_search_ranking_and_pagination(task, search_index):
+    weak = add_run(task, "banana and other fruit, apples too")
+    strong = add_run(task, "banana banana banana", "banana")
+    for i in range(5):
+        add_run(task, f"banana filler {i} " + "words " * 20)
+
+    results = search_index.search(task.path, "banana", limit=3)
+    assert results.total == 7
+    assert len(results.results) == 3
+    assert results.results[0].run_id == strong.id
+    assert results.results[0].score <= results.results[1].score
+
+    all_ids = result_ids(search_index.search(task.path, "banana", limit=100))
+    page_ids = result_ids(
+        search_index.search(task.path, "banana", limit=3, offset=0)
+    ) + result_ids(search_index.search(task.path, "banana", limit=10, offset=3))
+    assert page_ids == all_ids
+    assert weak.id in all_ids
+
+
+def test_raw_query(task, search_index):
+    run1 = add_run(task, "red apple")
+    run2 = add_run(task, "green pear")
+
+    results = search_index.search(task.path, "apple OR pear", raw=True)
+    assert set(result_ids(results)) == {run1.id, run2.id}
+    results = search_index.search(task.path, '"green pear"', raw=True)
+    assert result_ids(results) == [run2.id]
+    with pytest.raises(ValueError, match="Invalid search query"):
+        search_index.search(task.path, 'broken "quote', raw=True)
+
+
+def test_kept_current_by_save_events(task, search_index):
+    run = add_run(task, "first version")
+    search_index.for_task(task.path)
+
+    with patch.object(TaskSearchIndex, "sync") as mock_sync:
+        run.input = "second version"
+        run.save_to_file()
+        assert search_index.search(task.path, "first").total == 0
+        assert result_ids(search_index.search(task.path, "second")) == [run.id]
+
+        new_run = add_run(task, "brand new")
+        assert result_ids(search_index.search(task.path, "brand")) == [new_run.id]
+
+        run.delete()
+        assert search_index.search(task.path, "second").total == 0
+        mock_sync.assert_not_called()
+
+
+def test_sync_reindexes_only_changed_runs(task, tmp_path, model_events):
+    run1 = add_run(task, "alpha")
+    run2 = add_run(task, "beta")
+    index_dir = tmp_path / "search"
+    first = SearchIndex(index_dir=index_dir)
+    assert first.search(task.path, "alpha").total == 1
+    first.close()
+
+    # Changes made while no index is loaded (eg another process)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        run2.input = "gamma"
+        run2.save_to_file()
+        run1.delete()
+        run3 = add_run(task, "delta")
+
+    second = SearchIndex(index_dir=index_dir)
+    with patch.object(
+        TaskRun, "load_from_file", wraps=TaskRun.load_from_file
+    ) as mock_load:
+        second.for_task(task.path)
+    loaded = {call.args[0] for call in mock_load.call_args_list}
+    assert loaded == {run2.path, run3.path}
+
+    assert second.search(task.path, "alpha").total == 0
+    assert second.search(task.path, "beta").total == 0
+    assert result_ids(second.search(task.path, "gamma")) == [run2.id]
+    assert result_ids(second.search(task.path, "delta")) == [run3.id]
+    assert len(second.for_task(task.path)) == 2
+    second.close()
+
+
+def test_schema_version_change_rebuilds(task, tmp_path, model_events):
+    add_run(task, "alpha")
+    index_dir = tmp_path / "search"
+    index = SearchIndex(index_dir=index_dir)
+    db_path = index.for_task(task.path).db_path
+    index.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA user_version=0")
+    conn.close()
+
+    index = SearchIndex(index_dir=index_dir)
+    assert index.search(task.path, "alpha").total == 1
+    index.close()
+
+
+def test_db_per_task(tmp_path, search_index):
+    assert search_index.db_path(tmp_path / "a" / "task.kiln") != search_index.db_path(
+        tmp_path / "b" / "task.kiln"
+    )
+    assert search_index.db_path(tmp_path / "task.kiln").parent == tmp_path / "search"
+
+
+def test_resynced_after_other_process_changes(task, search_index):
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        search_index.for_task(task.path)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        run = add_run(task, "written elsewhere")
+    assert search_index.search(task.path, "elsewhere").total == 0
+
+    multi_process._reset()
+    assert result_ids(search_index.search(task.path, "elsewhere")) == [run.id]
+    # Only synced once per reset
+    with patch.object(TaskSearchIndex, "sync") as mock_sync:
+        search_index.search(task.path, "elsewhere")
+        mock_sync.assert_not_called()
@@ -0,0 +1,269 @@
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskRun,
+)
+from kiln_ai.datamodel.model_events import ModelEvents
+from kiln_ai.datamodel.multi_process import Change, MultiProcess
+from kiln_ai.datamodel.tag_index import TagIndex, TagQuery, TaskTagIndex
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def tag_index(model_events):
+    return TagIndex()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def add_run(task, tags):
+    run = TaskRun(
+        parent=task,
+        input="Test input",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+        ),
+        output=TaskOutput(
+            output="Test output",
+            source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+            ),
+        ),
+        tags=tags,
+    )
+    run.save_to_file()
+    return run
+
+
+@pytest.fixture
+def index():
+    index = TaskTagIndex()
+    index.set_run_tags("1", ["a", "b"])
+    index.set_run_tags("2", ["a"])
+    index.set_run_tags("3", ["b", "c"])
+    index.set_run_tags("4", [])
+    return index
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        (TagQuery(), {"1", "2", "3", "4"}),
+        (TagQuery(all_tags=["a"]), {"1", "2"}),
+        (TagQuery(all_tags=["a", "b"]), {"1"}),
+        (TagQuery(any_tags=["a", "c"]), {"1", "2", "3"}),
+        (TagQuery(exclude_tags=["b"]), {"2", "4"}),
+        (TagQuery(all_tags=["b"], exclude_tags=["c"]), {"1"}),
+        (TagQuery(all_tags=["a"], any_tags=["b", "c"]), {"1"}),
+        (TagQuery(all_tags=["missing"]), set()),
+        (TagQuery(any_tags=["missing"]), set()),
+        (TagQuery(exclude_tags=["missing"]), {"1", "2", "3", "4"}),
+    ],
+)
+def test_query(index, query, expected):
+    assert set(index.query(query)) == expected
+    # Same result as evaluating each run directly
+    all_runs = {"1": ["a", "b"], "2": ["a"], "3": ["b", "c"], "4": []}
+    assert {id for id, tags in all_runs.items() if query.matches(tags)} == expected
+
+
+def test_update_and_remove(index):
+    index.set_run_tags("2", ["c"])
+    assert set(index.query(TagQuery(all_tags=["a"]))) == {"1"}
+    assert set(index.query(TagQuery(all_tags=["c"]))) == {"2", "3"}
+
+    index.remove_run("3")
+    index.remove_run("missing")
+    assert set(index.query(TagQuery())) == {"1", "2", "4"}
+    assert index.tag_counts() == {"a": 1, "b": 1, "c": 1}
+    assert len(index) == 3
+
+    # Slot is reused, without leaking the removed run's tags
+    index.set_run_tags("5", ["d"])
+    assert set(index.query(TagQuery(all_tags=["c"]))) == {"2"}
+    assert set(index.query(TagQuery(all_tags=["d"]))) == {"5"}
+    assert index.run_tags("5") == frozenset(["d"])
+
+
+def test_tag_counts(index):
+    assert index.tag_counts() == {"a": 2, "b": 2, "c": 1}
+
+
+def test_build_from_disk(task, tag_index):
+    run1 = add_run(task, ["a"])
+    run2 = add_run(task, ["a", "b"])
+
+    assert set(tag_index.query(task.path, TagQuery(all_tags=["a"]))) == {
+        run1.id,
+        run2.id,
+    }
+    assert tag_index.query(task.path, TagQuery(all_tags=["b"])) == [run2.id]
+
+
+def test_kept_current_by_saves(task, tag_index):
+    run1 = add_run(task, ["a"])
+    tag_index.for_task(task.path)
+
+    # Doesn't rescan the disk once built
+    with patch.object(TaskTagIndex, "build") as mock_build:
+        run2 = add_run(task, ["a"])
+        assert set(tag_index.query(task.path, TagQuery(all_tags=["a"]))) == {
+            run1.id,
+            run2.id,
+        }
+
+        run1.tags = ["b"]
+        run1.save_to_file()
+        assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == [run2.id]
+        assert tag_index.query(task.path, TagQuery(all_tags=["b"])) == [run1.id]
+
+        run2.delete()
+        assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == []
+        mock_build.assert_not_called()
+
+
+def test_invalidate(task, tag_index):
+    tag_index.for_task(task.path)
+    # Not seen: written without a save event (eg by another process)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        run = add_run(task, ["a"])
+    assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == []
+
+    tag_index.invalidate(task.path)
+    assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == [run.id]
+
+    tag_index.invalidate()
+    assert tag_index._indexes == {}
+
+
+def test_task_delete_drops_index(task, tag_index):
+    tag_index.for_task(task.path)
+    task_path = task.path
+    task.delete()
+    assert task_path not in tag_index._indexes
+
+
+def test_query_large_task():
+    index = TaskTagIndex()
+    for i in range(20000):
+        tags = [f"session_{i % 100}"]
+        if i % 3 == 0:
+            tags.append("reviewed")
+        index.set_run_tags(str(i), tags)
+
+    query = TagQuery(all_tags=["session_7"], exclude_tags=["reviewed"])
+    run_ids = index.query(query)
+    assert len(run_ids) == len([i for i in range(20000) if i % 100 == 7 and i % 3])
+
+
+def test_from_run_tags_matches_incremental():
+    run_tags = [
+        (str(i), [f"session_{i % 100}", "even" if i % 2 else "odd"])
+        for i in range(5000)
+    ]
+    built = TaskTagIndex.from_run_tags(run_tags)
+    incremental = TaskTagIndex()
+    for run_id, tags in run_tags:
+        incremental.set_run_tags(run_id, tags)
+
+    # Sparse (few matches per word) and dense results decode differently
+    for query in [
+        TagQuery(),
+        TagQuery(all_tags=["session_7"]),
+        TagQuery(all_tags=["even"]),
+        TagQuery(any_tags=["session_1", "session_2"], exclude_tags=["odd"]),
+        TagQuery(exclude_tags=["session_0"]),
+    ]:
+        expected = [run_id for run_id, tags in run_tags if query.matches(tags)]
+        assert built.query(query) == expected
+        assert sorted(incremental.query(query)) == sorted(expected)
+    assert built.tag_counts() == incremental.tag_counts()
+
+    # Still updatable after a bulk build
+    built.remove_run("7")
+    built.set_run_tags("new", ["session_7"])
+    assert "7" not in built.query(TagQuery(all_tags=["session_7"]))
+    assert "new" in built.query(TagQuery(all_tags=["session_7"]))
+
+
+@pytest.mark.benchmark
+def test_benchmark_query_200k_runs(benchmark):
+    run_count = 200_000
+    index = TaskTagIndex.from_run_tags(
+        (str(i), [f"session_{i % 1000}", "reviewed" if i % 2 else "unreviewed"])
+        for i in range(run_count)
+    )
+
+    def ops_per_second(query: TagQuery, expected_count: int) -> float:
+        iterations = 20
+        start_time = benchmark._timer()
+        for _ in range(iterations):
+            assert len(index.query(query)) == expected_count
+        return iterations / (benchmark._timer() - start_time)
+
+    selective = ops_per_second(
+        TagQuery(all_tags=["session_4"], exclude_tags=["reviewed"]), 200
+    )
+    broad = ops_per_second(TagQuery(all_tags=["reviewed"]), run_count // 2)
+    negated = ops_per_second(TagQuery(exclude_tags=["reviewed"]), run_count // 2)
+
+    # I get ~4.5k ops per second for the selective query (0.2ms), and ~190 for the queries matching 100k runs. Lower values here for CI.
+    # Decoding matches bit by bit took ~1.2s for the 100k match queries.
+    if selective < 1000:
+        pytest.fail(f"Selective query ops per second: {selective:.6f}, expected 1k")
+    if broad < 30 or negated < 30:
+        pytest.fail(
+            f"Broad query ops per second: {broad:.6f} and {negated:.6f}, expected 30"
+        )
+
+
+def test_reset_by_other_process(task, tag_index):
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        tag_index.for_task(task.path)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        run = add_run(task, ["a"])
+
+    multi_process._reset()
+    assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == [run.id]
+
+
+def test_reset_by_other_process_only_changed_task(task, tag_index):
+    other_task = Task(name="Other Task", instruction="Instruction", parent=task.parent)
+    other_task.save_to_file()
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        tag_index.for_task(task.path)
+        tag_index.for_task(other_task.path)
+    with patch.object(ModelEvents, "shared", return_value=ModelEvents()):
+        run = add_run(task, ["a"])
+        other_run = add_run(other_task, ["a"])
+
+    multi_process._reset([Change(run.path)])
+    assert tag_index.query(task.path, TagQuery(all_tags=["a"])) == [run.id]
+    # Not changed, as far as this process knows: kept
+    assert tag_index.query(other_task.path, TagQuery(all_tags=["a"])) == []
+
+    # Deleting a folder containing the task resets it too
+    multi_process._reset([Change(task.parent.path, deleted=True)])
+    assert tag_index.query(other_task.path, TagQuery(all_tags=["a"])) == [other_run.id]
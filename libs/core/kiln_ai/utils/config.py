@@ -1,6 +1,7 @@
 import getpass
 import os
 import threading
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional
 
@@ -27,6 +28,8 @@ class ConfigProperty:
 
 class Config:
     _shared_instance = None
+    # Shared by all instances, as they write the same settings file
+    _settings_lock = threading.Lock()
 
     def __init__(self, properties: Dict[str, ConfigProperty] | None = None):
         self._properties: Dict[str, ConfigProperty] = properties or {
@@ -54,6 +57,16 @@ class Config:
                 str,
                 env_var="OLLAMA_BASE_URL",
             ),
+            # See kiln_ai.adapters.ollama_tools
+            "ollama_keep_alive": ConfigProperty(
+                str,
+            ),
+            # Matches the Ollama server's setting of the same env var: requests beyond it wait in Kiln rather than Ollama's queue
+            "ollama_parallel_requests": ConfigProperty(
+                int,
+                env_var="OLLAMA_NUM_PARALLEL",
+                default=4,
+            ),
             "bedrock_access_key": ConfigProperty(
                 str,
                 env_var="AWS_ACCESS_KEY_ID",
@@ -91,8 +104,42 @@ class Config:
                 default_lambda=lambda: [],
                 sensitive_keys=["api_key"],
             ),
+            # See kiln_ai.adapters.response_cache
+            "response_cache": ConfigProperty(
+                bool,
+                default=False,
+            ),
+            "response_cache_ttl_hours": ConfigProperty(
+                float,
+                default=24 * 7,
+            ),
+            "response_cache_max_mb": ConfigProperty(
+                float,
+                default=500,
+            ),
+            # See kiln_ai.adapters.rate_limits
+            "provider_rate_limits": ConfigProperty(
+                dict,
+                default_lambda=lambda: {},
+            ),
+            "rate_limit_retries": ConfigProperty(
+                int,
+                default=3,
+            ),
+            # See kiln_ai.adapters.retry_policy
+            "retry_policies": ConfigProperty(
+                dict,
+                default_lambda=lambda: {},
+            ),
+            # See kiln_ai.adapters.run_usage
+            "model_pricing": ConfigProperty(
+                dict,
+                default_lambda=lambda: {},
+            ),
         }
+        self._settings_stat = self.settings_file_stat()
         self._settings = self.load_settings()
+        self._version = 0
 
     @classmethod
     def shared(cls):
@@ -107,6 +154,10 @@ class Config:
         except AttributeError:
             return None
 
+    def settings_version(self) -> int:
+        """Incremented on every settings change, so values derived from settings can be cached until then."""
+        return self._version
+
     def __getattr__(self, name: str) -> Any:
         if name == "_properties":
             return super().__getattribute__("_properties")
@@ -134,7 +185,7 @@ class Config:
         return None if value is None else property_config.type(value)
 
     def __setattr__(self, name, value):
-        if name in ("_properties", "_settings"):
+        if name in ("_properties", "_settings", "_settings_stat", "_version"):
             super().__setattr__(name, value)
         elif name in self._properties:
             self.update_settings({name: value})
@@ -156,6 +207,31 @@ class Config:
             settings = yaml.safe_load(f.read()) or {}
         return settings
 
+    @classmethod
+    def settings_file_stat(cls) -> tuple[int, int] | None:
+        """The settings file's (mtime_ns, size), or None if it doesn't exist."""
+        try:
+            stat = os.stat(cls.settings_path(create=False))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload_settings(self, force: bool = False) -> bool:
+        """
+        Reload settings written by another process: if the file changed since we last read or wrote it (or always, if force).
+
+        Returns:
+            bool: True if reloaded.
+        """
+        with self._settings_lock:
+            stat = self.settings_file_stat()
+            if not force and stat == self._settings_stat:
+                return False
+            self._settings_stat = stat
+            self._settings = self.load_settings()
+            self._version += 1
+            return True
+
     def settings(self, hide_sensitive=False) -> Dict[str, Any]:
         if not hide_sensitive:
             return self._settings
@@ -182,8 +258,15 @@ class Config:
         self.update_settings({name: value})
 
     def update_settings(self, new_settings: Dict[str, Any]):
-        # Lock to prevent race conditions in multi-threaded scenarios
-        with threading.Lock():
+        # Imported here: multi_process depends on Config
+        from kiln_ai.datamodel.multi_process import Change, MultiProcess
+
+        # Lock to prevent race conditions between threads, and between processes sharing the settings file in multi-process mode
+        multi_process = MultiProcess.shared()
+        process_lock = (
+            multi_process.lock("settings") if multi_process.enabled else nullcontext()
+        )
+        with self._settings_lock, process_lock:
             # Fresh load to avoid clobbering changes from other instances
             current_settings = self.load_settings()
             current_settings.update(new_settings)
@@ -193,7 +276,12 @@ class Config:
             }
             with open(self.settings_path(), "w") as f:
                 yaml.dump(current_settings, f)
+            self._settings_stat = self.settings_file_stat()
             self._settings = current_settings
+            self._version += 1
+        if multi_process.enabled:
+            # So other processes reload. Outside the locks: it may reset (and reload) with changes from other processes.
+            multi_process.mark_changed(Change(Path(self.settings_path())))
 
 
 def _get_user_id():
@@ -0,0 +1,127 @@
+"""
+A simple cross-process file lock, for coordinating writes between processes sharing the same Kiln data (eg several server workers).
+
+Uses OS advisory locks (flock on Unix, msvcrt.locking on Windows), which are released automatically if the process dies, so a crash never leaves a stale lock behind.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from types import TracebackType
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Sleep between attempts when waiting with a timeout
+POLL_INTERVAL_SECONDS = 0.01
+
+
+class FileLockTimeout(TimeoutError):
+    pass
+
+
+class FileLock:
+    """
+    An exclusive lock on a lock file. Not reentrant.
+
+    Also excludes other threads in this process (each acquire opens its own file handle), but an instance must not be shared by threads while held.
+
+    Example:
+        with FileLock(Path("/tmp/my.lock")):
+            ...  # only one process at a time
+    """
+
+    def __init__(self, path: Path | str, timeout: float | None = None):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._fd: int | None = None
+
+    @property
+    def is_locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, timeout: float | None = None) -> None:
+        """
+        Wait for the lock.
+
+        Args:
+            timeout: Seconds to wait before raising FileLockTimeout. Defaults to the instance timeout. None waits forever.
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"Lock already held: {self.path}")
+        timeout = self.timeout if timeout is None else timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if timeout is None:
+                _lock(fd, blocking=True)
+            else:
+                deadline = time.monotonic() + timeout
+                while not _lock(fd, blocking=False):
+                    if time.monotonic() >= deadline:
+                        raise FileLockTimeout(
+                            f"Timed out waiting for lock: {self.path}"
+                        )
+                    time.sleep(POLL_INTERVAL_SECONDS)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self) -> None:
+        fd = self._fd
+        if fd is None:
+            return
+        self._fd = None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+if sys.platform == "win32":
+
+    def _lock(fd: int, blocking: bool) -> bool:
+        # msvcrt has no indefinite blocking mode (LK_LOCK gives up after ~10s), so poll
+        while True:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(POLL_INTERVAL_SECONDS)
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+
+    def _lock(fd: int, blocking: bool) -> bool:
+        try:
+            fcntl.flock(
+                fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            )
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
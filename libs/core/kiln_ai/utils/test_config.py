@@ -5,6 +5,7 @@ from unittest.mock import patch
 import pytest
 import yaml
 
+from kiln_ai.datamodel.multi_process import MultiProcess
 from kiln_ai.utils.config import Config, ConfigProperty, _get_user_id
 
 
@@ -63,6 +64,17 @@ def test_property_setter(config_with_yaml):
     assert config.example_property == "new_value"
 
 
+def test_settings_version(config_with_yaml):
+    config = config_with_yaml
+    version = config.settings_version()
+    assert config.example_property == "default_value"
+    assert config.settings_version() == version
+    config.example_property = "new_value"
+    assert config.settings_version() == version + 1
+    config.save_setting("int_property", 1)
+    assert config.settings_version() == version + 2
+
+
 def test_nonexistent_property(config_with_yaml):
     config = config_with_yaml
     with pytest.raises(AttributeError):
@@ -254,6 +266,26 @@ def test_stale_values_bug(config_with_yaml):
     assert config_with_yaml.example_property == "third_value"
 
 
+def test_update_settings_no_lock_file_single_process(config_with_yaml, tmp_path):
+    with patch.object(MultiProcess, "shared", return_value=MultiProcess()):
+        config_with_yaml.update_settings({"example_property": "new_value"})
+    assert config_with_yaml.example_property == "new_value"
+    assert [p.name for p in tmp_path.iterdir()] == ["test_settings.yaml"]
+
+
+def test_update_settings_file_lock_multi_process(config_with_yaml, tmp_path):
+    multi_process = MultiProcess()
+    multi_process.enable(tmp_path / "multi_process")
+    try:
+        with patch.object(MultiProcess, "shared", return_value=multi_process):
+            config_with_yaml.update_settings({"example_property": "new_value"})
+    finally:
+        multi_process.disable()
+    assert config_with_yaml.example_property == "new_value"
+    assert (tmp_path / "multi_process" / "locks" / "settings.lock").exists()
+    assert not (tmp_path / "test_settings.yaml.lock").exists()
+
+
 async def test_openai_compatible_providers():
     config = Config.shared()
     assert config.openai_compatible_providers == []
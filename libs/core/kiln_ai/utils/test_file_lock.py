@@ -0,0 +1,83 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from kiln_ai.utils.file_lock import FileLock, FileLockTimeout
+
+
+def hold_lock(path, acquired, release):
+    with FileLock(path):
+        acquired.set()
+        release.wait(10)
+
+
+def test_acquire_and_release(tmp_path):
+    lock = FileLock(tmp_path / "locks" / "a.lock")
+    assert not lock.is_locked
+    with lock:
+        assert lock.is_locked
+        assert (tmp_path / "locks" / "a.lock").exists()
+    assert not lock.is_locked
+    # Release is a no-op when not held
+    lock.release()
+
+
+def test_not_reentrant(tmp_path):
+    lock = FileLock(tmp_path / "a.lock")
+    with lock:
+        with pytest.raises(RuntimeError, match="already held"):
+            lock.acquire()
+
+
+def test_timeout(tmp_path):
+    path = tmp_path / "a.lock"
+    with FileLock(path):
+        start = time.monotonic()
+        with pytest.raises(FileLockTimeout):
+            FileLock(path, timeout=0.05).acquire()
+        assert time.monotonic() - start >= 0.05
+        # Other names aren't blocked
+        with FileLock(tmp_path / "b.lock", timeout=0):
+            pass
+
+
+def test_excludes_threads(tmp_path):
+    path = tmp_path / "a.lock"
+    order = []
+
+    def worker(name):
+        with FileLock(path):
+            order.append(f"{name}_start")
+            time.sleep(0.02)
+            order.append(f"{name}_end")
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert order in (
+        ["a_start", "a_end", "b_start", "b_end"],
+        ["b_start", "b_end", "a_start", "a_end"],
+    )
+
+
+def test_excludes_processes(tmp_path):
+    path = tmp_path / "a.lock"
+    context = multiprocessing.get_context("spawn")
+    acquired = context.Event()
+    release = context.Event()
+    process = context.Process(target=hold_lock, args=(path, acquired, release))
+    process.start()
+    try:
+        assert acquired.wait(30)
+        with pytest.raises(FileLockTimeout):
+            FileLock(path).acquire(timeout=0.05)
+    finally:
+        release.set()
+        process.join(30)
+    # Released when the other process is done
+    with FileLock(path, timeout=5):
+        pass
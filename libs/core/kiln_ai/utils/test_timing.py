@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from kiln_ai.datamodel import Project
+from kiln_ai.utils.timing import TimingCategory, record_timings, timed
+
+
+def test_not_recording_by_default():
+    # No recorder active: a no-op
+    with timed(TimingCategory.disk_io):
+        pass
+
+
+def test_records_by_category():
+    with record_timings() as recorder:
+        with timed(TimingCategory.disk_io):
+            time.sleep(0.01)
+        with timed(TimingCategory.disk_io):
+            pass
+        with timed(TimingCategory.validation):
+            pass
+
+    seconds = recorder.seconds()
+    assert seconds[TimingCategory.disk_io] >= 0.01
+    assert TimingCategory.provider_call not in seconds
+    assert recorder.counts() == {
+        TimingCategory.disk_io: 2,
+        TimingCategory.validation: 1,
+    }
+
+    # Stops recording on exit
+    with timed(TimingCategory.disk_io):
+        pass
+    assert recorder.counts()[TimingCategory.disk_io] == 2
+
+
+def test_records_on_exception():
+    with record_timings() as recorder:
+        try:
+            with timed(TimingCategory.provider_call):
+                raise ValueError("failed")
+        except ValueError:
+            pass
+    assert recorder.counts() == {TimingCategory.provider_call: 1}
+
+
+def test_nested_recorders():
+    with record_timings() as outer:
+        with timed(TimingCategory.disk_io):
+            pass
+        with record_timings() as inner:
+            with timed(TimingCategory.validation):
+                pass
+        with timed(TimingCategory.disk_io):
+            pass
+
+    assert inner.counts() == {TimingCategory.validation: 1}
+    # The outer recorder still sees work recorded by the inner one
+    assert outer.counts() == {
+        TimingCategory.disk_io: 2,
+        TimingCategory.validation: 1,
+    }
+
+
+async def test_follows_context_into_threads():
+    def work():
+        with timed(TimingCategory.validation):
+            pass
+
+    with record_timings() as recorder:
+        await asyncio.to_thread(work)
+    assert recorder.counts() == {TimingCategory.validation: 1}
+
+
+def test_datamodel_load_and_save(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    with record_timings() as recorder:
+        project.save_to_file()
+        Project.load_from_file(project.path)
+
+    counts = recorder.counts()
+    assert counts[TimingCategory.disk_io] >= 2
+    assert counts[TimingCategory.validation] >= 1
@@ -0,0 +1,105 @@
+"""
+Lightweight timing of where a request's time goes: disk I/O, validation, cache copies and provider calls.
+
+Off by default. Code wraps work in `timed(category)`, which only measures when a recorder is active in the current context (see `record_timings`). Otherwise it costs a single ContextVar lookup.
+
+The recorder is carried by contextvars, so it follows the request into `asyncio.to_thread` and tasks it creates. Categories can nest (eg a provider call which reads a file), so totals can add up to more than the request's duration.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from types import TracebackType
+from typing import Dict, Iterator
+
+
+class TimingCategory(str, Enum):
+    disk_io = "disk_io"
+    validation = "validation"
+    cache_copy = "cache_copy"
+    provider_call = "provider_call"
+    prompt_build = "prompt_build"
+    parsing = "parsing"
+
+
+class TimingRecorder:
+    """Totals for each category. Safe to add to from several threads. Times are also added to the parent recorder, if any."""
+
+    def __init__(self, parent: "TimingRecorder | None" = None):
+        self._lock = threading.Lock()
+        self._seconds: Dict[TimingCategory, float] = {}
+        self._counts: Dict[TimingCategory, int] = {}
+        self._parent = parent
+
+    def add(self, category: TimingCategory, seconds: float) -> None:
+        with self._lock:
+            self._seconds[category] = self._seconds.get(category, 0.0) + seconds
+            self._counts[category] = self._counts.get(category, 0) + 1
+        if self._parent is not None:
+            self._parent.add(category, seconds)
+
+    def seconds(self) -> Dict[TimingCategory, float]:
+        with self._lock:
+            return dict(self._seconds)
+
+    def counts(self) -> Dict[TimingCategory, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+_current_recorder: ContextVar[TimingRecorder | None] = ContextVar(
+    "kiln_timing_recorder", default=None
+)
+
+
+@contextmanager
+def record_timings(
+    recorder: TimingRecorder | None = None,
+) -> Iterator[TimingRecorder]:
+    """
+    Record timings for all `timed` work in this context until exit. Nests: an enclosing recorder still sees the work.
+
+    Pass a recorder to add to it rather than starting a new one: eg to record each step of an async generator, which mustn't leave its recorder active while the caller runs between items.
+    """
+    if recorder is None:
+        recorder = TimingRecorder(parent=_current_recorder.get())
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+class timed:
+    """
+    Add the time spent in this block to the active recorder's total for the category, if any.
+
+    A class rather than a generator contextmanager, to keep the cost negligible when not recording.
+
+    Example:
+        with timed(TimingCategory.disk_io):
+            data = file.read()
+    """
+
+    __slots__ = ("category", "recorder", "start")
+
+    def __init__(self, category: TimingCategory):
+        self.category = category
+        self.recorder: TimingRecorder | None = None
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.recorder = _current_recorder.get()
+        if self.recorder is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self.recorder is not None:
+            self.recorder.add(self.category, time.perf_counter() - self.start)
@@ -0,0 +1,269 @@
+"""
+Batch runs: run a task over many inputs in a single request.
+
+Inputs are executed with bounded concurrency through a single adapter's invoke_batch, completed runs are saved in batches, and per-item results are streamed back as newline delimited JSON (NDJSON) as they complete. Each line is a JSON object with a "type" field: "result" for each input (in completion order), then a final "done" summary.
+
+Progress is also published as "batch_progress" events on the event stream (see event_api), so other clients can follow along.
+"""
+
+import json
+import uuid
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Literal
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    DEFAULT_BATCH_CONCURRENCY,
+    SAVE_BATCH_SIZE,
+    BaseAdapter,
+)
+from kiln_ai.adapters.response_cache import ResponseCacheMode
+from kiln_ai.datamodel import DatasetSplit, DataSource, Task, TaskRun
+from pydantic import BaseModel, ConfigDict, Field
+
+from kiln_server.event_api import EventBroker
+from kiln_server.run_api import adapter_for_run_request
+from kiln_server.task_api import task_from_id
+
+MAX_BATCH_CONCURRENCY = 64
+
+
+class RunBatchRequest(BaseModel):
+    model_name: str
+    provider: str
+    ui_prompt_method: str | None = None
+    tags: list[str] | None = None
+    plaintext_inputs: list[str] | None = None
+    structured_inputs: list[Dict[str, Any]] | None = None
+    dataset_split_id: str | None = Field(
+        default=None,
+        description="Run the inputs of the task runs in this dataset split, instead of passing inputs.",
+    )
+    dataset_split_name: str | None = Field(
+        default=None,
+        description="Only use the runs in this split of the dataset (eg 'test'). Defaults to all splits.",
+    )
+    concurrency: int = Field(
+        default=DEFAULT_BATCH_CONCURRENCY, ge=1, le=MAX_BATCH_CONCURRENCY
+    )
+    response_cache: ResponseCacheMode = Field(
+        default=ResponseCacheMode.default,
+        description="Use of the response cache for these runs, when enabled in settings.",
+    )
+
+    # Allows use of the model_name field (usually pydantic will reserve model_*)
+    model_config = ConfigDict(protected_namespaces=())
+
+
+class BatchRunItemResult(BaseModel):
+    type: Literal["result"] = "result"
+    # Index of the input in the request (or dataset split)
+    index: int
+    success: bool
+    run: TaskRun | None = None
+    error: str | None = None
+    # The run the input was taken from, when running a dataset split
+    source_run_id: str | None = None
+    completed: int
+    total: int
+
+
+class BatchRunSummary(BaseModel):
+    type: Literal["done"] = "done"
+    batch_id: str
+    total: int
+    succeeded: int
+    failed: int
+
+
+@dataclass
+class BatchInput:
+    input: Dict | str
+    input_source: DataSource | None = None
+    source_run_id: str | None = None
+
+
+def batch_inputs_from_request(task: Task, request: RunBatchRequest) -> list[BatchInput]:
+    sources = [
+        request.plaintext_inputs is not None,
+        request.structured_inputs is not None,
+        request.dataset_split_id is not None,
+    ]
+    if sum(sources) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide exactly one of plaintext_inputs, structured_inputs or dataset_split_id.",
+        )
+
+    if request.dataset_split_id is not None:
+        return batch_inputs_from_dataset_split(
+            task, request.dataset_split_id, request.dataset_split_name
+        )
+
+    structured = task.input_json_schema is not None
+    if structured and request.structured_inputs is None:
+        raise HTTPException(
+            status_code=400,
+            detail="This task requires structured inputs.",
+        )
+    if not structured and request.plaintext_inputs is None:
+        raise HTTPException(
+            status_code=400,
+            detail="This task requires plaintext inputs.",
+        )
+    inputs: list[Dict | str] = list(
+        request.structured_inputs or request.plaintext_inputs or []
+    )
+    return [BatchInput(input=input) for input in inputs]
+
+
+def batch_inputs_from_dataset_split(
+    task: Task, dataset_split_id: str, split_name: str | None
+) -> list[BatchInput]:
+    dataset_split = DatasetSplit.from_id_and_parent_path(dataset_split_id, task.path)
+    if dataset_split is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Dataset split not found. ID: {dataset_split_id}",
+        )
+    if split_name is not None:
+        if split_name not in dataset_split.split_contents:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Split {split_name} not found in dataset split.",
+            )
+        run_ids = dataset_split.split_contents[split_name]
+    else:
+        run_ids = [
+            run_id for ids in dataset_split.split_contents.values() for run_id in ids
+        ]
+
+    runs = TaskRun.from_ids_and_parent_path(set(run_ids), task.path)
+    structured = task.input_json_schema is not None
+    inputs: list[BatchInput] = []
+    # Keep the dataset order. Runs deleted since the split was created are skipped.
+    for run_id in dict.fromkeys(run_ids):
+        run = runs.get(run_id)
+        if run is None:
+            continue
+        inputs.append(
+            BatchInput(
+                input=json.loads(run.input) if structured else run.input,
+                input_source=run.input_source,
+                source_run_id=run_id,
+            )
+        )
+    return inputs
+
+
+def publish_batch_progress(
+    task: Task,
+    batch_id: str,
+    completed: int,
+    failed: int,
+    total: int,
+) -> None:
+    broker = EventBroker.shared()
+    if not broker.has_subscribers():
+        return
+    project = task.parent
+    parent_ids = {"project": project.id} if project is not None else {}
+    broker.publish(
+        {
+            "type": "batch_progress",
+            "model_type": "task",
+            "id": task.id,
+            "parent_ids": parent_ids,
+            "batch_id": batch_id,
+            "completed": completed,
+            "failed": failed,
+            "total": total,
+            "done": completed == total,
+        }
+    )
+
+
+async def stream_batch_run(
+    adapter: BaseAdapter,
+    inputs: list[BatchInput],
+    concurrency: int,
+    batch_id: str | None = None,
+    cache_mode: ResponseCacheMode = ResponseCacheMode.default,
+) -> AsyncIterator[str]:
+    """
+    Run all inputs through the adapter (see BaseAdapter.invoke_batch), at most `concurrency` at a time, yielding one NDJSON line per result in completion order, then a summary line.
+
+    Runs are saved in batches of SAVE_BATCH_SIZE, and a result is only reported once its run is on disk. If the client disconnects, in-flight calls are cancelled but already completed runs are still saved.
+    """
+    total = len(inputs)
+    batch_id = batch_id or str(uuid.uuid4())
+    completed = 0
+    failed = 0
+
+    async with aclosing(
+        adapter.invoke_batch(
+            [item.input for item in inputs],
+            [item.input_source for item in inputs],
+            concurrency=concurrency,
+            cache_mode=cache_mode,
+            save_batch_size=SAVE_BATCH_SIZE,
+        )
+    ) as results:
+        async for result in results:
+            completed += 1
+            if result.error is not None:
+                failed += 1
+            line = BatchRunItemResult(
+                index=result.index,
+                success=result.error is None,
+                run=result.run,
+                error=str(result.error) if result.error is not None else None,
+                source_run_id=inputs[result.index].source_run_id,
+                completed=completed,
+                total=total,
+            )
+            publish_batch_progress(
+                adapter.kiln_task, batch_id, completed, failed, total
+            )
+            yield line.model_dump_json() + "\n"
+
+    if total == 0:
+        publish_batch_progress(adapter.kiln_task, batch_id, 0, 0, 0)
+    summary = BatchRunSummary(
+        batch_id=batch_id,
+        total=total,
+        succeeded=completed - failed,
+        failed=failed,
+    )
+    yield summary.model_dump_json() + "\n"
+
+
+def connect_batch_run_api(app: FastAPI):
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/run_batch")
+    async def run_batch(
+        project_id: str, task_id: str, request: RunBatchRequest
+    ) -> StreamingResponse:
+        task = task_from_id(project_id, task_id)
+        inputs = batch_inputs_from_request(task, request)
+        adapter = adapter_for_run_request(
+            task,
+            model_name=request.model_name,
+            provider=request.provider,
+            ui_prompt_method=request.ui_prompt_method,
+            tags=request.tags,
+        )
+
+        batch_id = str(uuid.uuid4())
+        return StreamingResponse(
+            stream_batch_run(
+                adapter,
+                inputs,
+                request.concurrency,
+                batch_id,
+                cache_mode=request.response_cache,
+            ),
+            media_type="application/x-ndjson",
+            headers={"X-Kiln-Batch-Id": batch_id},
+        )
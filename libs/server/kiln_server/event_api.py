@@ -0,0 +1,174 @@
+"""
+Server push of datamodel changes, so clients don't need to poll.
+
+GET /api/events is a Server-Sent Events (SSE) stream. Each event has an `event:` name and a JSON `data:` payload:
+
+ - created/updated/deleted: a datamodel object was saved or deleted in this server process (runs, fine-tunes, etc). Includes the object (except for deletes) and the IDs of its parents.
+ - batch_progress: progress of a running batch job.
+ - resync: the client fell too far behind and events were dropped. Reload any state you depend on.
+
+Events come from the datamodel's save/delete hooks (see kiln_ai.datamodel.model_events). When there are no connected clients, the stream registers nothing on those hooks, so it adds no cost to saves. Other listeners (eg caches in kiln_ai) may still be registered.
+"""
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Type
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from kiln_ai.datamodel.basemodel import KilnBaseModel, KilnParentedModel
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents, ModelEventType
+
+# Events buffered per client before we give up and tell it to resync
+MAX_QUEUED_EVENTS = 1000
+# Send a comment line this often so proxies don't close idle connections, and to notice disconnected clients
+HEARTBEAT_SECONDS = 15.0
+
+
+class EventBroker:
+    """
+    Fans out events to every connected client. Safe to publish from any thread: the datamodel saves from worker threads.
+    """
+
+    _shared_instance = None
+
+    def __init__(self, max_queued_events: int = MAX_QUEUED_EVENTS):
+        self.max_queued_events = max_queued_events
+        self._subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+        # Parent file path -> parent ID. IDs never change once saved, so this never goes stale.
+        self._parent_id_cache: Dict[Path, str | None] = {}
+
+    @classmethod
+    def shared(cls):
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a client. Must be called from the event loop which will read the queue."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queued_events)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+            if len(self._subscribers) == 1:
+                ModelEvents.shared().add_listener(self.on_model_event)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+            if len(self._subscribers) == 0:
+                ModelEvents.shared().remove_listener(self.on_model_event)
+
+    def has_subscribers(self) -> bool:
+        return len(self._subscribers) > 0
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._enqueue, queue, event)
+            except RuntimeError:
+                # Loop was closed without unsubscribing
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _enqueue(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        if queue.full():
+            # Slow client: drop what it hasn't read, and tell it to reload
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+            return
+        queue.put_nowait(event)
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        self.publish(self.model_event_payload(event))
+
+    def model_event_payload(self, event: ModelEvent) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "type": event.type.value,
+            "model_type": event.model_type,
+            "id": event.id,
+            "parent_ids": self.parent_ids(type(event.model), event.path),
+        }
+        if event.type != ModelEventType.deleted:
+            payload["model"] = event.model.model_dump(mode="json")
+        return payload
+
+    def parent_ids(self, cls: Type[KilnBaseModel], path: Path) -> Dict[str, str]:
+        """IDs of all ancestors of the model at this path, keyed by model type (eg {"task": "123", "project": "456"})."""
+        ids: Dict[str, str] = {}
+        while issubclass(cls, KilnParentedModel):
+            parent_cls = cls.parent_type()
+            # Same layout as KilnParentedModel.load_parent
+            parent_path = path.parent.parent.parent / parent_cls.base_filename()
+            if parent_path not in self._parent_id_cache:
+                try:
+                    parent_id = parent_cls.load_from_file(parent_path, readonly=True).id
+                except Exception:
+                    parent_id = None
+                self._parent_id_cache[parent_path] = parent_id
+            parent_id = self._parent_id_cache[parent_path]
+            if parent_id is None:
+                break
+            ids[parent_cls.type_name()] = parent_id
+            cls, path = parent_cls, parent_path
+        return ids
+
+
+def event_matches(
+    event: Dict[str, Any], project_id: str | None, task_id: str | None
+) -> bool:
+    if event["type"] == "resync":
+        return True
+    ids = {**event.get("parent_ids", {}), event.get("model_type"): event.get("id")}
+    if project_id is not None and ids.get("project") != project_id:
+        return False
+    if task_id is not None and ids.get("task") != task_id:
+        return False
+    return True
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(
+    request: Request,
+    broker: EventBroker,
+    project_id: str | None = None,
+    task_id: str | None = None,
+) -> AsyncIterator[str]:
+    # Subscribe when streaming starts (not when the request arrives), so the finally below always unsubscribes
+    queue = broker.subscribe()
+    try:
+        # Flush headers right away, so the client knows it's connected
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if event_matches(event, project_id, task_id):
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(queue)
+
+
+def connect_event_api(app: FastAPI):
+    @app.get("/api/events")
+    async def events(
+        request: Request, project_id: str | None = None, task_id: str | None = None
+    ) -> StreamingResponse:
+        return StreamingResponse(
+            event_stream(request, EventBroker.shared(), project_id, task_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
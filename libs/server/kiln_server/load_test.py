@@ -0,0 +1,195 @@
+"""
+Load test for the server's multi-worker mode: measures throughput as worker processes are added.
+
+Creates a temporary project with a task and runs, starts the server with each worker count in turn, and sends a mix of read and update requests from concurrent clients.
+
+Usage:
+    python -m kiln_server.load_test --workers 1 2 4 --runs 500 --concurrency 32 --seconds 10
+
+Runs against a temporary home folder, so never touches your real Kiln settings or projects.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import yaml
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskRun,
+)
+
+from kiln_server.server import WORKERS_ENV_VAR
+
+# Share of requests of each kind
+READ_SUMMARIES_WEIGHT = 1
+READ_RUN_WEIGHT = 6
+UPDATE_RUN_WEIGHT = 3
+
+
+def create_data(home: Path, run_count: int) -> tuple[str, str, list[str]]:
+    project = Project(
+        name="Load Test", path=home / "projects" / "load_test" / "project.kiln"
+    )
+    project.save_to_file()
+    task = Task(name="Load Test Task", instruction="Repeat the input", parent=project)
+    task.save_to_file()
+    source = DataSource(type=DataSourceType.human, properties={"created_by": "load"})
+    run_ids = []
+    for i in range(run_count):
+        run = TaskRun(
+            parent=task,
+            input=f"Input {i} " + "lorem ipsum " * 20,
+            input_source=source,
+            output=TaskOutput(output=f"Output {i}", source=source),
+        )
+        run.save_to_file()
+        run_ids.append(run.id)
+
+    # The server finds projects via the settings file in the home folder
+    settings_dir = home / ".kiln_ai"
+    settings_dir.mkdir(parents=True, exist_ok=True)
+    with open(settings_dir / "settings.yaml", "w") as f:
+        yaml.dump({"projects": [str(project.path)]}, f)
+    return project.id, task.id, run_ids
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(home: Path, port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "HOME": str(home), "USERPROFILE": str(home)}
+    env[WORKERS_ENV_VAR] = str(workers)
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "kiln_server.server:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+async def wait_for_server(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/ping")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def run_load(
+    base_url: str,
+    project_id: str,
+    task_id: str,
+    run_ids: list[str],
+    concurrency: int,
+    seconds: float,
+) -> tuple[int, int]:
+    """Returns (successful requests, failed requests)."""
+    task_url = f"/api/projects/{project_id}/tasks/{task_id}"
+    kinds = random.choices(
+        ["summaries", "read", "update"],
+        weights=[READ_SUMMARIES_WEIGHT, READ_RUN_WEIGHT, UPDATE_RUN_WEIGHT],
+        k=10_000,
+    )
+    ok = 0
+    failed = 0
+    deadline = time.monotonic() + seconds
+
+    async def client_loop(client: httpx.AsyncClient, worker_index: int) -> None:
+        nonlocal ok, failed
+        i = worker_index
+        while time.monotonic() < deadline:
+            kind = kinds[i % len(kinds)]
+            run_id = random.choice(run_ids)
+            i += concurrency
+            if kind == "summaries":
+                response = await client.get(f"{task_url}/runs_summaries")
+            elif kind == "read":
+                response = await client.get(f"{task_url}/runs/{run_id}")
+            else:
+                response = await client.patch(
+                    f"{task_url}/runs/{run_id}", json={"tags": [f"tag_{i % 10}"]}
+                )
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+    return ok, failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        project_id, task_id, run_ids = create_data(home, args.runs)
+        baseline = None
+        print(f"{'workers':>8} {'req/s':>10} {'failed':>8} {'speedup':>8}")
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(home, port, workers)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                asyncio.run(wait_for_server(base_url))
+                ok, failed = asyncio.run(
+                    run_load(
+                        base_url,
+                        project_id,
+                        task_id,
+                        run_ids,
+                        args.concurrency,
+                        args.seconds,
+                    )
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            rate = ok / args.seconds
+            baseline = baseline or rate
+            print(f"{workers:>8} {rate:>10.1f} {failed:>8} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
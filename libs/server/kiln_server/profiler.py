@@ -0,0 +1,315 @@
+"""
+On-demand profiling of slow requests. Off by default: set KILN_PROFILER=true to enable.
+
+When enabled, a request is profiled if it has an `X-Kiln-Profile: true` header or `kiln_profile=true` query param, or at random with probability KILN_PROFILER_SAMPLE_RATE (default 0).
+
+For each profiled request:
+ - A statistical sampling profiler records the stacks of the threads doing the work, every KILN_PROFILER_INTERVAL_MS (default 5ms). The event loop thread is always sampled, worker threads only while running Kiln code.
+ - Time is split across disk I/O, validation, cache copies and provider calls (see kiln_ai.utils.timing).
+ - The response gets a `Server-Timing` header with the split (shown in browser dev tools), and an `X-Kiln-Profile-Id` header.
+
+The last MAX_PROFILES profiles are kept in memory:
+ - GET /api/debug/profiles lists them, with their timings.
+ - GET /api/debug/profiles/{profile_id} returns the samples as folded stacks, the input format for flamegraph.pl, inferno and speedscope.
+
+Samples are per thread, not per request: concurrent requests running on the same threads appear in each other's profiles. Profile one request at a time for a clean flame graph.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import FrameType
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from kiln_ai.utils.timing import TimingCategory, TimingRecorder, record_timings
+from pydantic import BaseModel
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ENABLED_ENV_VAR = "KILN_PROFILER"
+SAMPLE_RATE_ENV_VAR = "KILN_PROFILER_SAMPLE_RATE"
+INTERVAL_ENV_VAR = "KILN_PROFILER_INTERVAL_MS"
+PROFILE_HEADER = b"x-kiln-profile"
+PROFILE_QUERY_PARAM = "kiln_profile"
+PROFILES_PATH = "/api/debug/profiles"
+DEFAULT_INTERVAL_MS = 5.0
+MAX_PROFILES = 100
+# Deeper stacks are truncated, keeping the outermost frames
+MAX_STACK_DEPTH = 256
+# Module prefixes of code worth sampling on worker threads (idle workers are skipped)
+KILN_MODULE_PREFIXES = ("kiln_ai", "kiln_server", "app.")
+
+
+def env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("true", "1", "yes")
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}:{name}"
+
+
+def fold_stack(thread_name: str, frame: FrameType | None) -> tuple[str, bool]:
+    """
+    The stack as a folded string (outermost first, `;` separated, rooted at the thread name), and whether it includes Kiln code.
+    """
+    labels = []
+    has_kiln_frame = False
+    while frame is not None:
+        label = frame_label(frame)
+        has_kiln_frame = has_kiln_frame or label.startswith(KILN_MODULE_PREFIXES)
+        labels.append(label)
+        frame = frame.f_back
+    labels = labels[-MAX_STACK_DEPTH:]
+    labels.append(thread_name)
+    labels.reverse()
+    return ";".join(labels), has_kiln_frame
+
+
+@dataclass
+class ActiveSampling:
+    # The thread running the request's event loop. Always sampled.
+    loop_thread_id: int
+    stacks: Counter = field(default_factory=Counter)
+    sample_count: int = 0
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks for the requests being profiled. One background thread, running only while at least one request is being profiled.
+    """
+
+    def __init__(self, interval_seconds: float = DEFAULT_INTERVAL_MS / 1000):
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._active: List[ActiveSampling] = []
+        self._thread: threading.Thread | None = None
+
+    def start(self, loop_thread_id: int) -> ActiveSampling:
+        sampling = ActiveSampling(loop_thread_id=loop_thread_id)
+        with self._lock:
+            self._active = [*self._active, sampling]
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="kiln-profiler", daemon=True
+                )
+                self._thread.start()
+        return sampling
+
+    def stop(self, sampling: ActiveSampling) -> None:
+        with self._lock:
+            self._active = [active for active in self._active if active is not sampling]
+
+    def _run(self) -> None:
+        own_thread_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = self._active
+                if not active:
+                    self._thread = None
+                    return
+            self.sample(active, own_thread_id)
+            time.sleep(self.interval_seconds)
+
+    def sample(self, active: List[ActiveSampling], own_thread_id: int) -> None:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            stack, has_kiln_frame = fold_stack(
+                thread_names.get(thread_id, f"thread-{thread_id}"), frame
+            )
+            for sampling in active:
+                if thread_id == sampling.loop_thread_id or has_kiln_frame:
+                    sampling.stacks[stack] += 1
+        for sampling in active:
+            sampling.sample_count += 1
+
+
+class ProfileSummary(BaseModel):
+    id: str
+    method: str
+    path: str
+    status_code: int | None
+    started_at: datetime
+    duration_ms: float
+    sample_count: int
+    # Milliseconds in each category (see kiln_ai.utils.timing). Categories can overlap.
+    timings_ms: Dict[str, float]
+    timing_counts: Dict[str, int]
+
+
+@dataclass
+class Profile:
+    summary: ProfileSummary
+    stacks: Counter
+
+    def folded(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+class ProfileStore:
+    """The most recent profiles, in memory."""
+
+    def __init__(self, max_profiles: int = MAX_PROFILES):
+        self._lock = threading.Lock()
+        self._profiles: deque[Profile] = deque(maxlen=max_profiles)
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Profile | None:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.summary.id == profile_id:
+                    return profile
+        return None
+
+    def summaries(self) -> List[ProfileSummary]:
+        """Newest first."""
+        with self._lock:
+            return [profile.summary for profile in reversed(self._profiles)]
+
+
+def timings_ms(recorder: TimingRecorder) -> Dict[str, float]:
+    seconds = recorder.seconds()
+    return {
+        category.value: round(seconds.get(category, 0.0) * 1000, 3)
+        for category in TimingCategory
+    }
+
+
+def server_timing_header(recorder: TimingRecorder, total_seconds: float) -> bytes:
+    metrics = [f"{name};dur={ms}" for name, ms in timings_ms(recorder).items()]
+    metrics.append(f"total;dur={round(total_seconds * 1000, 3)}")
+    return ", ".join(metrics).encode("latin-1")
+
+
+class ProfilerMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        profiler: SamplingProfiler,
+        sample_rate: float = 0.0,
+    ):
+        self.app = app
+        self.store = store
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+
+    def should_profile(self, scope: Scope) -> bool:
+        if scope["path"].startswith(PROFILES_PATH):
+            return False
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.lower() in (b"true", b"1")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if query.get(PROFILE_QUERY_PARAM, [""])[-1].lower() in ("true", "1"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        started_at = datetime.now()
+        start = time.perf_counter()
+        status_code: int | None = None
+
+        with record_timings() as recorder:
+
+            async def send_with_headers(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-kiln-profile-id", profile_id.encode()))
+                    headers.append(
+                        (
+                            b"server-timing",
+                            server_timing_header(recorder, time.perf_counter() - start),
+                        )
+                    )
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            sampling = self.profiler.start(threading.get_ident())
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                self.profiler.stop(sampling)
+                self.store.add(
+                    Profile(
+                        summary=ProfileSummary(
+                            id=profile_id,
+                            method=scope["method"],
+                            path=scope["path"],
+                            status_code=status_code,
+                            started_at=started_at,
+                            duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                            sample_count=sampling.sample_count,
+                            timings_ms=timings_ms(recorder),
+                            timing_counts={
+                                category.value: count
+                                for category, count in recorder.counts().items()
+                            },
+                        ),
+                        stacks=sampling.stacks,
+                    )
+                )
+
+
+def connect_profiler(app: FastAPI, enabled: bool | None = None) -> None:
+    """
+    Add the profiler middleware and endpoints to the app. No-op unless enabled (defaults to the KILN_PROFILER env var).
+    """
+    if enabled is None:
+        enabled = env_flag(ENABLED_ENV_VAR)
+    if not enabled:
+        return
+
+    store = ProfileStore()
+    profiler = SamplingProfiler(
+        interval_seconds=env_float(INTERVAL_ENV_VAR, DEFAULT_INTERVAL_MS) / 1000
+    )
+
+    @app.get(PROFILES_PATH)
+    async def get_profiles() -> List[ProfileSummary]:
+        return store.summaries()
+
+    @app.get(f"{PROFILES_PATH}/{{profile_id}}", response_class=PlainTextResponse)
+    async def get_profile(profile_id: str) -> PlainTextResponse:
+        profile = store.get(profile_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(profile.folded())
+
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=store,
+        profiler=profiler,
+        sample_rate=env_float(SAMPLE_RATE_ENV_VAR, 0.0),
+    )
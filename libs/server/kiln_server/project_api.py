@@ -1,9 +1,11 @@
+import asyncio
 import os
 from pathlib import Path
 from typing import Any, Dict
 
 from fastapi import FastAPI, HTTPException
 from kiln_ai.datamodel import Project
+from kiln_ai.datamodel.listing_index import ListingIndex, ProjectListing
 from kiln_ai.datamodel.registry import project_from_id as project_from_id_core
 from kiln_ai.utils.config import Config
 
@@ -69,7 +71,8 @@ def connect_project_api(app: FastAPI):
         projects = []
         for project_path in project_paths if project_paths is not None else []:
             try:
-                project = Project.load_from_file(project_path)
+                # Readonly: dumped, never mutated, so no need for a copy
+                project = Project.load_from_file(project_path, readonly=True)
                 json_project = project.model_dump()
                 json_project["path"] = project_path
                 projects.append(json_project)
@@ -79,6 +82,16 @@ def connect_project_api(app: FastAPI):
 
         return projects
 
+    @app.get("/api/project_listings")
+    async def get_project_listings() -> list[ProjectListing]:
+        """Lightweight project metadata with task and run counts, for list views."""
+        project_paths = Config.shared().projects or []
+        # Off the event loop: the first listing of a task scans its runs
+        return await asyncio.to_thread(
+            ListingIndex.shared().project_listings,
+            [Path(project_path) for project_path in project_paths],
+        )
+
     @app.get("/api/projects/{project_id}")
     async def get_project(project_id: str) -> Project:
         return project_from_id(project_id)
@@ -1,19 +1,82 @@
+import asyncio
+import hashlib
+import os
+import threading
+import zlib
 from asyncio import Lock
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Literal
 
-from fastapi import FastAPI, HTTPException
-from kiln_ai.adapters.adapter_registry import adapter_for_task
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from kiln_ai.adapters.adapter_cache import AdapterCache
 from kiln_ai.adapters.ml_model_list import ModelProviderName
+from kiln_ai.adapters.model_adapters.base_adapter import BaseAdapter
 from kiln_ai.adapters.prompt_builders import prompt_builder_from_ui_name
+from kiln_ai.adapters.response_cache import ResponseCacheMode
+from kiln_ai.adapters.retry_policy import CallMetrics, RetryPolicies
+from kiln_ai.adapters.run_output import StreamChannel
+from kiln_ai.adapters.run_usage import TaskUsageStats, task_usage_stats
 from kiln_ai.datamodel import Task, TaskOutputRating, TaskOutputRatingType, TaskRun
 from kiln_ai.datamodel.basemodel import ID_TYPE
-from pydantic import BaseModel, ConfigDict
+from kiln_ai.datamodel.batch_writer import save_all
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.model_events import ModelEvent, ModelEvents
+from kiln_ai.datamodel.multi_process import MultiProcess
+from kiln_ai.datamodel.search_index import SearchIndex
+from kiln_ai.datamodel.tag_index import TagIndex, TagQuery
+from kiln_ai.utils.file_lock import FileLock
+from pydantic import BaseModel, ConfigDict, Field
 
 from kiln_server.task_api import task_from_id
 
-# Lock to prevent overwriting via concurrent updates. We use a load/update/write pattern that is not atomic.
-update_run_lock = Lock()
+# Locks to prevent overwriting via concurrent updates. We use a load/update/write pattern that is not atomic.
+# Striped by run ID: updates to the same run are serialized, updates to different runs (almost always) proceed in parallel.
+RUN_LOCK_STRIPES = 64
+run_locks = [Lock() for _ in range(RUN_LOCK_STRIPES)]
+
+
+def run_lock_stripe(run_id: str) -> int:
+    # Stable hash (unlike hash()), so a run always maps to the same stripe
+    return zlib.crc32(run_id.encode("utf-8")) % RUN_LOCK_STRIPES
+
+
+async def acquire_file_lock(lock: FileLock) -> None:
+    # Blocking wait, so off the event loop
+    acquire = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+        # The thread can't be cancelled: release the lock if it gets it after we've given up
+        acquire.add_done_callback(
+            lambda task: lock.release()
+            if not task.cancelled() and task.exception() is None
+            else None
+        )
+        raise
+
+
+@asynccontextmanager
+async def run_update_locks(run_ids: list[str]):
+    """
+    Hold the update locks for all the given runs. Stripes are acquired in a fixed order to prevent deadlocks between overlapping bulk updates.
+
+    In multi-process mode, each stripe also holds a file lock, so updates are serialized across processes too.
+    """
+    stripes = sorted(set(run_lock_stripe(run_id) for run_id in run_ids))
+    multi_process = MultiProcess.shared()
+    async with AsyncExitStack() as stack:
+        for stripe in stripes:
+            await stack.enter_async_context(run_locks[stripe])
+            if multi_process.enabled:
+                file_lock = multi_process.lock(f"run_stripe_{stripe}")
+                await acquire_file_lock(file_lock)
+                stack.callback(file_lock.release)
+        yield
 
 
 def deep_update(
@@ -40,11 +103,92 @@ class RunTaskRequest(BaseModel):
     structured_input: Dict[str, Any] | None = None
     ui_prompt_method: str | None = None
     tags: list[str] | None = None
+    response_cache: ResponseCacheMode = Field(
+        default=ResponseCacheMode.default,
+        description="Use of the response cache for this run, when enabled in settings.",
+    )
 
     # Allows use of the model_name field (usually pydantic will reserve model_*)
     model_config = ConfigDict(protected_namespaces=())
 
 
+class RunStreamDelta(BaseModel):
+    type: Literal["delta"] = "delta"
+    channel: StreamChannel
+    text: str
+
+
+class RunStreamResult(BaseModel):
+    type: Literal["run"] = "run"
+    run: TaskRun
+
+
+class RunStreamError(BaseModel):
+    type: Literal["error"] = "error"
+    error: str
+
+
+def run_request_input(task: Task, request: RunTaskRequest) -> Dict | str:
+    input = request.plaintext_input
+    if task.input_schema() is not None:
+        input = request.structured_input
+
+    if input is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No input provided. Ensure your provided the proper format (plaintext or structured).",
+        )
+    return input
+
+
+async def stream_run(
+    adapter: BaseAdapter, input: Dict | str, cache_mode: ResponseCacheMode
+) -> AsyncIterator[str]:
+    """The run's stream as NDJSON lines. Errors after the response has started are reported in an error line."""
+    try:
+        async for item in adapter.invoke_stream(input, cache_mode=cache_mode):
+            if isinstance(item, TaskRun):
+                line: BaseModel = RunStreamResult(run=item)
+            else:
+                line = RunStreamDelta(channel=item.channel, text=item.text)
+            yield line.model_dump_json() + "\n"
+    except Exception as e:
+        yield RunStreamError(error=str(e)).model_dump_json() + "\n"
+
+
+class BulkRunUpdateRequest(BaseModel):
+    """
+    A set of patch operations applied to every run in run_ids.
+    """
+
+    run_ids: list[str]
+    add_tags: list[str] | None = None
+    remove_tags: list[str] | None = None
+    rating: Dict[str, Any] | None = Field(
+        default=None,
+        description="Merged into the existing output rating (same semantics as the run PATCH endpoint). Set a key to null to remove it.",
+    )
+    fields: Dict[str, Any] | None = Field(
+        default=None,
+        description="Top level run fields to update, merged into existing values (same semantics as the run PATCH endpoint).",
+    )
+
+
+class BulkRunUpdateResult(BaseModel):
+    run_id: str
+    success: bool
+    modified: bool = False
+    error: str | None = None
+
+
+class BulkRunUpdateResponse(BaseModel):
+    results: list[BulkRunUpdateResult]
+
+
+# Fields which identify the run on disk, and can't be changed by a patch
+immutable_run_fields = {"id", "path", "model_type"}
+
+
 class RunSummary(BaseModel):
     id: ID_TYPE
     rating: TaskOutputRating | None = None
@@ -111,6 +255,148 @@ class RunSummary(BaseModel):
         )
 
 
+class RunSearchResult(BaseModel):
+    run: RunSummary
+    score: float = Field(description="BM25 score. Lower is a better match.")
+    snippet: str = Field(
+        description="Excerpt of the best matching field, with matches wrapped in [ and ]."
+    )
+
+
+class RunSearchResponse(BaseModel):
+    results: list[RunSearchResult]
+    total: int = Field(description="Total number of matches, across all pages.")
+
+
+@dataclass
+class RunJson:
+    """A run serialized for an API response, and the file state it was serialized from."""
+
+    run_id: str
+    mtime_ns: int
+    size: int
+    content: bytes
+
+    @classmethod
+    def from_run(cls, run: TaskRun, stat: os.stat_result) -> "RunJson":
+        if run.id is None:
+            raise ValueError("Run must have an ID to be served")
+        return cls(
+            run_id=run.id,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            content=run.model_dump_json().encode("utf-8"),
+        )
+
+    @property
+    def etag(self) -> str:
+        # From the content, not the file stat: a same sized write within one coarse mtime tick must still change it
+        return f'"{hashlib.blake2b(self.content, digest_size=16).hexdigest()}"'
+
+
+class RunJsonCache:
+    """
+    LRU cache of serialized runs, keyed by file path. Lets repeat fetches of a run skip loading, validating, copying and re-serializing it.
+
+    Entries are dropped when the run is saved or deleted in this process (via ModelEvents), and are only used while the file's mtime and size are unchanged, for writes from other processes. Callers shouldn't use it where mtimes are coarse (see ModelCache.enabled).
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict[Path, RunJson] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, stat: os.stat_result) -> RunJson | None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            if entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                del self._entries[path]
+                return None
+            self._entries.move_to_end(path)
+            return entry
+
+    def set(self, path: Path, stat: os.stat_result, run: TaskRun) -> RunJson:
+        """Serialize and cache a run. The stat must be taken before the run was read, so a concurrent write invalidates the entry rather than being masked by it."""
+        entry = RunJson.from_run(run, stat)
+        # Watch for saves once something is cached, so saves don't pay for dispatching to this listener before then
+        ModelEvents.shared().add_listener(self.on_model_event)
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def on_model_event(self, event: ModelEvent) -> None:
+        if isinstance(event.model, TaskRun):
+            self.invalidate(event.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+run_json_cache = RunJsonCache()
+
+
+def default_run_path(task: Task, run_id: str) -> Path | None:
+    """Where a run with this ID is saved by default (runs don't have names, so their folder is just the ID)."""
+    if task.path is None:
+        return None
+    # Only a plain folder name: never let an ID point outside the runs folder
+    if Path(run_id).name != run_id or run_id in (".", ".."):
+        return None
+    return (
+        task.path.parent
+        / TaskRun.relationship_name()
+        / run_id
+        / TaskRun.base_filename()
+    )
+
+
+def run_json_from_id(project_id: str, task_id: str, run_id: str) -> RunJson:
+    """
+    The JSON for a run, ready to send. Checks the run's default path first, and serves the cached serialization if the file hasn't changed. Falls back to searching all runs.
+
+    The cache isn't used on file systems with coarse timestamps, where a file's stat can't show that it changed.
+    """
+    use_cache = ModelCache.shared().enabled()
+    task = task_from_id(project_id, task_id)
+    path = default_run_path(task, run_id)
+    if path is not None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is not None:
+            if use_cache:
+                cached = run_json_cache.get(path, stat)
+                if cached is not None and cached.run_id == run_id:
+                    return cached
+            run = TaskRun.load_from_file(path, readonly=True)
+            if run.id == run_id:
+                if use_cache:
+                    return run_json_cache.set(path, stat, run)
+                return RunJson.from_run(run, stat)
+
+    found_run = TaskRun.from_id_and_parent_path(run_id, task.path)
+    if found_run is None or found_run.path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Run not found. ID: {run_id}",
+        )
+    stat = os.stat(found_run.path)
+    if use_cache:
+        return run_json_cache.set(found_run.path, stat, found_run)
+    return RunJson.from_run(found_run, stat)
+
+
 def run_from_id(project_id: str, task_id: str, run_id: str) -> TaskRun:
     task, run = task_and_run_from_id(project_id, task_id, run_id)
     return run
@@ -130,10 +416,34 @@ def task_and_run_from_id(
     )
 
 
+def runs_matching_tags(task: Task, tag_query: TagQuery) -> list[TaskRun]:
+    """
+    All runs of the task matching the tag query. Uses the tag index, so only matching runs are loaded from disk.
+    """
+    if tag_query.is_empty():
+        return task.runs(readonly=True)
+    if task.path is None:
+        return []
+    run_ids = TagIndex.shared().query(task.path, tag_query)
+    return list(TaskRun.from_ids_and_parent_path(set(run_ids), task.path).values())
+
+
 def connect_run_api(app: FastAPI):
-    @app.get("/api/projects/{project_id}/tasks/{task_id}/runs/{run_id}")
-    async def get_run(project_id: str, task_id: str, run_id: str) -> TaskRun:
-        return run_from_id(project_id, task_id, run_id)
+    @app.get(
+        "/api/projects/{project_id}/tasks/{task_id}/runs/{run_id}",
+        response_model=TaskRun,
+    )
+    async def get_run(
+        project_id: str, task_id: str, run_id: str, request: Request
+    ) -> Response:
+        # Send the serialized run directly: skips response model validation and re-serialization
+        run_json = run_json_from_id(project_id, task_id, run_id)
+        headers = {"ETag": run_json.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == run_json.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=run_json.content, media_type="application/json", headers=headers
+        )
 
     @app.delete("/api/projects/{project_id}/tasks/{task_id}/runs/{run_id}")
     async def delete_run(project_id: str, task_id: str, run_id: str):
@@ -141,21 +451,100 @@ def connect_run_api(app: FastAPI):
         run.delete()
 
     @app.get("/api/projects/{project_id}/tasks/{task_id}/runs")
-    async def get_runs(project_id: str, task_id: str) -> list[TaskRun]:
+    async def get_runs(
+        project_id: str,
+        task_id: str,
+        tags: list[str] = Query(default=[]),
+        any_tags: list[str] = Query(default=[]),
+        exclude_tags: list[str] = Query(default=[]),
+    ) -> list[TaskRun]:
         task = task_from_id(project_id, task_id)
-        return list(task.runs(readonly=True))
+        tag_query = TagQuery(
+            all_tags=tags, any_tags=any_tags, exclude_tags=exclude_tags
+        )
+        return runs_matching_tags(task, tag_query)
 
     @app.get("/api/projects/{project_id}/tasks/{task_id}/runs_summaries")
-    async def get_runs_summary(project_id: str, task_id: str) -> list[RunSummary]:
+    async def get_runs_summary(
+        project_id: str,
+        task_id: str,
+        tags: list[str] = Query(default=[]),
+        any_tags: list[str] = Query(default=[]),
+        exclude_tags: list[str] = Query(default=[]),
+    ) -> list[RunSummary]:
         task = task_from_id(project_id, task_id)
-        # Readonly since we are not mutating the runs. Faster as we don't need to copy them.
-        runs = task.runs(readonly=True)
+        tag_query = TagQuery(
+            all_tags=tags, any_tags=any_tags, exclude_tags=exclude_tags
+        )
+        # Readonly (when unfiltered) since we are not mutating the runs. Faster as we don't need to copy them.
+        runs = runs_matching_tags(task, tag_query)
         run_summaries: list[RunSummary] = []
         for run in runs:
             summary = RunSummary.from_run(run)
             run_summaries.append(summary)
         return run_summaries
 
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/usage_stats")
+    async def get_usage_stats(
+        project_id: str,
+        task_id: str,
+        tags: list[str] = Query(default=[]),
+        any_tags: list[str] = Query(default=[]),
+        exclude_tags: list[str] = Query(default=[]),
+    ) -> TaskUsageStats:
+        """Token usage, cost and latency of the task's runs, per model and per prompt."""
+        task = task_from_id(project_id, task_id)
+        tag_query = TagQuery(
+            all_tags=tags, any_tags=any_tags, exclude_tags=exclude_tags
+        )
+        return task_usage_stats(runs_matching_tags(task, tag_query))
+
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/search_runs")
+    async def search_runs(
+        project_id: str,
+        task_id: str,
+        q: str,
+        limit: int = Query(default=20, ge=1, le=200),
+        offset: int = Query(default=0, ge=0),
+        raw: bool = False,
+    ) -> RunSearchResponse:
+        task = task_from_id(project_id, task_id)
+        task_path = task.path
+        if task_path is None:
+            return RunSearchResponse(results=[], total=0)
+
+        def search() -> RunSearchResponse:
+            try:
+                found = SearchIndex.shared().search(task_path, q, limit, offset, raw)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            results: list[RunSearchResult] = []
+            # Load each hit from its indexed path: scanning the runs folder for the IDs would make every search O(runs)
+            for result in found.results:
+                try:
+                    run = TaskRun.load_from_file(result.run_path, readonly=True)
+                except FileNotFoundError:
+                    # Deleted by another process since it was indexed
+                    continue
+                results.append(
+                    RunSearchResult(
+                        run=RunSummary.from_run(run),
+                        score=result.score,
+                        snippet=result.snippet,
+                    )
+                )
+            return RunSearchResponse(results=results, total=found.total)
+
+        # Index sync and SQLite are blocking: keep them off the event loop
+        return await asyncio.to_thread(search)
+
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/tag_counts")
+    async def get_tag_counts(project_id: str, task_id: str) -> Dict[str, int]:
+        task = task_from_id(project_id, task_id)
+        if task.path is None:
+            return {}
+        return TagIndex.shared().for_task(task.path).tag_counts()
+
     @app.post("/api/projects/{project_id}/tasks/{task_id}/runs/delete")
     async def delete_runs(project_id: str, task_id: str, run_ids: list[str]):
         task = task_from_id(project_id, task_id)
@@ -187,35 +576,45 @@ def connect_run_api(app: FastAPI):
         project_id: str, task_id: str, request: RunTaskRequest
     ) -> TaskRun:
         task = task_from_id(project_id, task_id)
-
-        prompt_builder = prompt_builder_from_ui_name(
-            request.ui_prompt_method or "basic",
+        adapter = adapter_for_run_request(
             task,
+            model_name=request.model_name,
+            provider=request.provider,
+            ui_prompt_method=request.ui_prompt_method,
+            tags=request.tags,
         )
-        if prompt_builder is None:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unknown prompt method: {request.ui_prompt_method}",
-            )
-        adapter = adapter_for_task(
+
+        input = run_request_input(task, request)
+        return await adapter.invoke(input, cache_mode=request.response_cache)
+
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/run_stream")
+    async def run_task_stream(
+        project_id: str, task_id: str, request: RunTaskRequest
+    ) -> StreamingResponse:
+        """
+        Run the task, streaming the response as NDJSON: a "delta" line per chunk of output, reasoning or chain of thought text, then a "run" line with the parsed, validated and saved run (or an "error" line).
+        """
+        task = task_from_id(project_id, task_id)
+        adapter = adapter_for_run_request(
             task,
             model_name=request.model_name,
-            provider=model_provider_from_string(request.provider),
-            prompt_builder=prompt_builder,
+            provider=request.provider,
+            ui_prompt_method=request.ui_prompt_method,
             tags=request.tags,
         )
+        input = run_request_input(task, request)
+        # Invalid input is a 4xx, not an error line
+        adapter.validate_input(input)
 
-        input = request.plaintext_input
-        if task.input_schema() is not None:
-            input = request.structured_input
-
-        if input is None:
-            raise HTTPException(
-                status_code=400,
-                detail="No input provided. Ensure your provided the proper format (plaintext or structured).",
-            )
+        return StreamingResponse(
+            stream_run(adapter, input, request.response_cache),
+            media_type="application/x-ndjson",
+        )
 
-        return await adapter.invoke(input)
+    @app.get("/api/model_call_metrics")
+    async def get_model_call_metrics() -> Dict[str, CallMetrics]:
+        """Calls, retries, hedges, timeouts and latency for each model, keyed by "provider/model_name"."""
+        return RetryPolicies.shared().metrics()
 
     @app.patch("/api/projects/{project_id}/tasks/{task_id}/runs/{run_id}")
     async def update_run(
@@ -231,25 +630,17 @@ def connect_run_api(app: FastAPI):
         add_tags: list[str] | None = None,
         remove_tags: list[str] | None = None,
     ):
-        task = task_from_id(project_id, task_id)
-        failed_runs: list[str] = []
-        for run_id in run_ids:
-            run = TaskRun.from_id_and_parent_path(run_id, task.path)
-            if not run:
-                failed_runs.append(run_id)
-            else:
-                modified = False
-                if remove_tags and any(tag in (run.tags or []) for tag in remove_tags):
-                    run.tags = list(
-                        set(tag for tag in (run.tags or []) if tag not in remove_tags)
-                    )
-                    modified = True
-                if add_tags and any(tag not in (run.tags or []) for tag in add_tags):
-                    run.tags = list(set((run.tags or []) + add_tags))
-                    modified = True
-                if modified:
-                    run.save_to_file()
+        response = await bulk_update_runs_util(
+            project_id,
+            task_id,
+            BulkRunUpdateRequest(
+                run_ids=run_ids, add_tags=add_tags, remove_tags=remove_tags
+            ),
+        )
 
+        failed_runs = [
+            result.run_id for result in response.results if not result.success
+        ]
         if failed_runs:
             raise HTTPException(
                 status_code=500,
@@ -260,28 +651,177 @@ def connect_run_api(app: FastAPI):
             )
         return {"success": True}
 
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/runs/bulk_update")
+    async def bulk_update_runs(
+        project_id: str, task_id: str, request: BulkRunUpdateRequest
+    ) -> BulkRunUpdateResponse:
+        return await bulk_update_runs_util(project_id, task_id, request)
+
+
+run_modified_error_message = (
+    "The run was modified by another request while updating. Reload and try again."
+)
+
 
 async def update_run_util(
     project_id: str, task_id: str, run_id: str, run_data: Dict[str, Any]
 ) -> TaskRun:
-    # Lock to prevent overwriting concurrent updates
-    async with update_run_lock:
-        task = task_from_id(project_id, task_id)
+    # Lock to prevent overwriting concurrent updates to this run
+    async with run_update_locks([run_id]):
+        # Disk scan and write off the event loop, so updates to other runs can proceed in parallel
+        return await asyncio.to_thread(
+            _update_run, project_id, task_id, run_id, run_data
+        )
 
-        run = TaskRun.from_id_and_parent_path(run_id, task.path)
-        if run is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Run not found. ID: {run_id}",
-            )
 
-        # Update and save
-        old_run_dumped = run.model_dump()
-        merged = deep_update(old_run_dumped, run_data)
+def _update_run(
+    project_id: str, task_id: str, run_id: str, run_data: Dict[str, Any]
+) -> TaskRun:
+    task = task_from_id(project_id, task_id)
+
+    run = TaskRun.from_id_and_parent_path(run_id, task.path)
+    if run is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Run not found. ID: {run_id}",
+        )
+
+    # Update and save
+    old_run_dumped = run.model_dump()
+    merged = deep_update(old_run_dumped, run_data)
+    updated_run = TaskRun.model_validate(merged)
+    updated_run.path = run.path
+
+    # Optimistic concurrency check: the lock only covers this process and this API. Don't overwrite a change from another writer.
+    if run.modified_on_disk():
+        raise HTTPException(status_code=409, detail=run_modified_error_message)
+
+    updated_run.save_to_file()
+    return updated_run
+
+
+def apply_run_patch(
+    run: TaskRun, request: BulkRunUpdateRequest
+) -> tuple[TaskRun, bool]:
+    """
+    Apply the patch operations in a bulk update request to a run.
+
+    Tag and rating operations are assigned field by field, so only the changed fields are validated. Field updates can change several related fields at once (like repair_instructions and repaired_output), so they are merged and validated together, like the PATCH endpoint.
+
+    Returns:
+        The updated run (may be a new instance), and True if it was modified and needs to be saved.
+    """
+    modified = False
+
+    if request.fields:
+        for key in request.fields:
+            if key in immutable_run_fields:
+                raise ValueError(f"Run field '{key}' can not be updated.")
+        merged = deep_update(run.model_dump(), request.fields)
         updated_run = TaskRun.model_validate(merged)
         updated_run.path = run.path
-        updated_run.save_to_file()
-        return updated_run
+        run = updated_run
+        modified = True
+
+    if request.rating is not None:
+        current_rating = run.output.rating.model_dump() if run.output.rating else None
+        run.output.rating = deep_update(current_rating, request.rating)  # type: ignore
+        modified = True
+
+    tags = run.tags or []
+    if request.remove_tags and any(tag in tags for tag in request.remove_tags):
+        tags = [tag for tag in tags if tag not in request.remove_tags]
+        run.tags = list(set(tags))
+        modified = True
+    if request.add_tags and any(tag not in tags for tag in request.add_tags):
+        run.tags = list(set(tags + request.add_tags))
+        modified = True
+
+    return run, modified
+
+
+async def bulk_update_runs_util(
+    project_id: str, task_id: str, request: BulkRunUpdateRequest
+) -> BulkRunUpdateResponse:
+    # dedupe, keeping the request order for the results
+    run_ids = list(dict.fromkeys(request.run_ids))
+    async with run_update_locks(run_ids):
+        # Disk scan and writes off the event loop, so other updates can proceed in parallel
+        return await asyncio.to_thread(
+            _bulk_update_runs, project_id, task_id, run_ids, request
+        )
+
+
+def _bulk_update_runs(
+    project_id: str, task_id: str, run_ids: list[str], request: BulkRunUpdateRequest
+) -> BulkRunUpdateResponse:
+    task = task_from_id(project_id, task_id)
+
+    # Single pass over the runs folder to resolve every ID
+    runs = TaskRun.from_ids_and_parent_path(set(run_ids), task.path)
+
+    results: dict[str, BulkRunUpdateResult] = {}
+    runs_to_save: list[TaskRun] = []
+    for run_id in run_ids:
+        run = runs.get(run_id)
+        if run is None:
+            results[run_id] = BulkRunUpdateResult(
+                run_id=run_id, success=False, error="Run not found"
+            )
+            continue
+        try:
+            updated_run, modified = apply_run_patch(run, request)
+        except ValueError as e:
+            results[run_id] = BulkRunUpdateResult(
+                run_id=run_id, success=False, error=str(e)
+            )
+            continue
+        if modified and run.modified_on_disk():
+            results[run_id] = BulkRunUpdateResult(
+                run_id=run_id, success=False, error=run_modified_error_message
+            )
+            continue
+        results[run_id] = BulkRunUpdateResult(
+            run_id=run_id, success=True, modified=modified
+        )
+        if modified:
+            runs_to_save.append(updated_run)
+
+    # Parallel batched write
+    save_errors = save_all(runs_to_save)
+    for run, error in zip(runs_to_save, save_errors):
+        if error is not None and run.id is not None:
+            results[run.id] = BulkRunUpdateResult(
+                run_id=run.id, success=False, error=str(error)
+            )
+
+    return BulkRunUpdateResponse(results=[results[id] for id in run_ids])
+
+
+def adapter_for_run_request(
+    task: Task,
+    model_name: str,
+    provider: str,
+    ui_prompt_method: str | None,
+    tags: list[str] | None,
+) -> BaseAdapter:
+    prompt_builder = prompt_builder_from_ui_name(
+        ui_prompt_method or "basic",
+        task,
+    )
+    if prompt_builder is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown prompt method: {ui_prompt_method}",
+        )
+    # Reused across runs, keeping the adapter's initialized model and request options
+    return AdapterCache.shared().adapter_for_task(
+        task,
+        model_name=model_name,
+        provider=model_provider_from_string(provider),
+        prompt_builder=prompt_builder,
+        tags=tags,
+    )
 
 
 def model_provider_from_string(provider: str) -> ModelProviderName:
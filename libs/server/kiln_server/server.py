@@ -1,22 +1,86 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from kiln_ai.adapters.adapter_registry import connected_openai_compatible_configs
+from kiln_ai.adapters.model_adapters.openai_client_pool import OpenAIClientPool
+from kiln_ai.adapters.ollama_tools import OllamaDiscovery
+from kiln_ai.datamodel.multi_process import MultiProcess
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from .batch_run_api import connect_batch_run_api
 from .custom_errors import connect_custom_errors
+from .event_api import connect_event_api
+from .profiler import connect_profiler
 from .project_api import connect_project_api
 from .prompt_api import connect_prompt_api
 from .run_api import connect_run_api
 from .task_api import connect_task_api
 
+# Number of uvicorn worker processes. More than 1 enables multi-process mode.
+WORKERS_ENV_VAR = "KILN_SERVER_WORKERS"
+# Open connections to connected model providers on startup
+WARM_UP_ENV_VAR = "KILN_WARM_UP_CONNECTIONS"
+
+
+def worker_count() -> int:
+    try:
+        return max(1, int(os.environ.get(WORKERS_ENV_VAR, "1")))
+    except ValueError:
+        return 1
+
+
+class MultiProcessMiddleware:
+    """
+    Before each request, drop in-memory state made stale by writes from other worker processes.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            MultiProcess.shared().check_for_changes()
+        await self.app(scope, receive, send)
+
+
+def server_lifespan(lifespan=None):
+    """
+    Wrap the app's lifespan (if any) with the server's own startup and shutdown: provider connection warm-up, and closing pooled clients.
+    """
+
+    @asynccontextmanager
+    async def wrapped_lifespan(app: FastAPI):
+        warm_up = None
+        if os.environ.get(WARM_UP_ENV_VAR, "").lower() in ("true", "1", "yes"):
+            # In the background: startup shouldn't wait on the network
+            warm_up = asyncio.create_task(
+                OpenAIClientPool.shared().warm_up(connected_openai_compatible_configs())
+            )
+        try:
+            if lifespan is None:
+                yield
+            else:
+                async with lifespan(app):
+                    yield
+        finally:
+            if warm_up is not None:
+                warm_up.cancel()
+            await OpenAIClientPool.shared().aclose()
+            await OllamaDiscovery.shared().aclose()
+
+    return wrapped_lifespan
+
 
 def make_app(lifespan=None):
     app = FastAPI(
         title="Kiln AI Server",
         summary="A REST API for the Kiln AI datamodel.",
         description="Learn more about Kiln AI at https://github.com/kiln-ai/kiln",
-        lifespan=lifespan,
+        lifespan=server_lifespan(lifespan),
     )
 
     @app.get("/ping")
@@ -27,6 +91,8 @@ def make_app(lifespan=None):
     connect_task_api(app)
     connect_prompt_api(app)
     connect_run_api(app)
+    connect_batch_run_api(app)
+    connect_event_api(app)
     connect_custom_errors(app)
 
     allowed_origins = [
@@ -44,6 +110,13 @@ def make_app(lifespan=None):
         allow_headers=["*"],
     )
 
+    if worker_count() > 1:
+        MultiProcess.shared().enable()
+        app.add_middleware(MultiProcessMiddleware)
+
+    # Off unless KILN_PROFILER is set. Added last, so it wraps the whole request.
+    connect_profiler(app)
+
     return app
 
 
@@ -55,4 +128,6 @@ if __name__ == "__main__":
         host="127.0.0.1",
         port=8757,
         reload=auto_reload,
+        # Each worker imports this module, and reads the env var in make_app
+        workers=worker_count(),
     )
@@ -1,7 +1,9 @@
+import asyncio
 from typing import Any, Dict, List
 
 from fastapi import FastAPI, HTTPException
 from kiln_ai.datamodel import Task
+from kiln_ai.datamodel.listing_index import ListingIndex, TaskListing
 
 from kiln_server.project_api import project_from_id
 
@@ -79,7 +81,17 @@ def connect_task_api(app: FastAPI):
     @app.get("/api/projects/{project_id}/tasks")
     async def get_tasks(project_id: str) -> List[Task]:
         parent_project = project_from_id(project_id)
-        return parent_project.tasks()
+        # Readonly: serialized, never mutated, so no need for copies
+        return parent_project.tasks(readonly=True)
+
+    @app.get("/api/projects/{project_id}/task_listings")
+    async def get_task_listings(project_id: str) -> List[TaskListing]:
+        """Lightweight task metadata with run, rating, dataset split and fine-tune counts, for list views."""
+        parent_project = project_from_id(project_id)
+        # Off the event loop: the first listing of a task scans its runs
+        return await asyncio.to_thread(
+            ListingIndex.shared().task_listings, parent_project.path
+        )
 
     @app.get("/api/projects/{project_id}/tasks/{task_id}")
     async def get_task(project_id: str, task_id: str) -> Task:
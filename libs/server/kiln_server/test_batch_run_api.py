@@ -0,0 +1,330 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    AdapterInfo,
+    BaseAdapter,
+    RunOutput,
+)
+from kiln_ai.datamodel import (
+    DatasetSplit,
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskRun,
+)
+from kiln_ai.datamodel.dataset_split import (
+    AllSplitDefinition,
+    Train80Test20SplitDefinition,
+)
+
+from kiln_server.batch_run_api import (
+    BatchInput,
+    connect_batch_run_api,
+    stream_batch_run,
+)
+from kiln_server.custom_errors import connect_custom_errors
+
+
+class MockAdapter(BaseAdapter):
+    async def _run(self, input: dict | str) -> RunOutput:
+        if input == "fail":
+            raise RuntimeError("Model call failed")
+        return RunOutput(output=f"Output for {input}", intermediate_outputs=None)
+
+    def adapter_info(self) -> AdapterInfo:
+        return AdapterInfo(
+            adapter_name="mock_adapter",
+            model_name="mock_model",
+            model_provider="mock_provider",
+            prompt_builder_name="mock_prompt_builder",
+        )
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    connect_batch_run_api(app)
+    connect_custom_errors(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(
+        name="Test Task",
+        instruction="This is a test instruction",
+        parent=project,
+    )
+    task.save_to_file()
+    return task
+
+
+@pytest.fixture
+def mock_config():
+    with patch("kiln_ai.utils.config.Config.shared") as mock_shared:
+        mock_config = mock_shared.return_value
+        mock_config.autosave_runs = True
+        mock_config.user_id = "test_user"
+        yield mock_config
+
+
+@pytest.fixture
+def mock_adapter(task, mock_config):
+    adapter = MockAdapter(task, model_name="phi_3_5", model_provider_name="ollama")
+    with (
+        patch("kiln_server.batch_run_api.task_from_id", return_value=task),
+        patch(
+            "kiln_server.batch_run_api.adapter_for_run_request", return_value=adapter
+        ),
+    ):
+        yield adapter
+
+
+def post_batch(client, body):
+    response = client.post("/api/projects/project1/tasks/task1/run_batch", json=body)
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    return response, lines
+
+
+def batch_body(**kwargs):
+    return {"model_name": "phi_3_5", "provider": "ollama", **kwargs}
+
+
+def test_run_batch_plaintext(client, task, mock_adapter):
+    inputs = [f"input {i}" for i in range(5)]
+    response, lines = post_batch(client, batch_body(plaintext_inputs=inputs))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results, summary = lines[:-1], lines[-1]
+    assert summary == {
+        "type": "done",
+        "batch_id": response.headers["X-Kiln-Batch-Id"],
+        "total": 5,
+        "succeeded": 5,
+        "failed": 0,
+    }
+    assert len(results) == 5
+    assert sorted(r["index"] for r in results) == list(range(5))
+    assert [r["completed"] for r in results] == [1, 2, 3, 4, 5]
+    for result in results:
+        assert result["type"] == "result"
+        assert result["success"]
+        assert result["total"] == 5
+        assert (
+            result["run"]["output"]["output"] == f"Output for {inputs[result['index']]}"
+        )
+
+    # All runs saved
+    saved = task.runs()
+    assert len(saved) == 5
+    assert {run.id for run in saved} == {r["run"]["id"] for r in results}
+
+
+def test_run_batch_reports_failures(client, task, mock_adapter):
+    response, lines = post_batch(
+        client, batch_body(plaintext_inputs=["a", "fail", "b"])
+    )
+
+    assert response.status_code == 200
+    assert lines[-1]["succeeded"] == 2
+    assert lines[-1]["failed"] == 1
+    failed = [r for r in lines[:-1] if not r["success"]]
+    assert len(failed) == 1
+    assert failed[0]["index"] == 1
+    assert failed[0]["error"] == "Model call failed"
+    assert failed[0]["run"] is None
+    assert len(task.runs()) == 2
+
+
+def test_run_batch_autosave_off(client, task, mock_adapter, mock_config):
+    mock_config.autosave_runs = False
+    response, lines = post_batch(client, batch_body(plaintext_inputs=["a", "b"]))
+
+    assert response.status_code == 200
+    assert all(r["run"]["id"] is None for r in lines[:-1])
+    assert len(task.runs()) == 0
+
+
+def test_run_batch_saves_in_batches(client, task, mock_adapter):
+    with (
+        patch("kiln_server.batch_run_api.SAVE_BATCH_SIZE", 2),
+        patch(
+            "kiln_ai.adapters.model_adapters.base_adapter.save_all",
+            wraps=lambda runs: [run.save_to_file() for run in runs],
+        ) as mock_save_all,
+    ):
+        response, lines = post_batch(
+            client, batch_body(plaintext_inputs=["a", "b", "c", "d", "e"])
+        )
+
+    assert response.status_code == 200
+    assert lines[-1]["succeeded"] == 5
+    # Two full batches, then the remainder
+    assert [len(call.args[0]) for call in mock_save_all.call_args_list] == [2, 2, 1]
+    assert len(task.runs()) == 5
+
+
+def test_run_batch_requires_one_input_source(client, mock_adapter):
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch", json=batch_body()
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(plaintext_inputs=["a"], dataset_split_id="123"),
+    )
+    assert response.status_code == 400
+    assert "exactly one" in response.json()["message"]
+
+
+def test_run_batch_structured_task_requires_structured_inputs(
+    client, task, mock_adapter
+):
+    task.input_json_schema = json.dumps(
+        {"type": "object", "properties": {"text": {"type": "string"}}}
+    )
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(plaintext_inputs=["a"]),
+    )
+    assert response.status_code == 400
+    assert response.json()["message"] == "This task requires structured inputs."
+
+
+def test_run_batch_concurrency_limits(client, mock_adapter):
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(plaintext_inputs=["a"], concurrency=0),
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(plaintext_inputs=["a"], concurrency=1000),
+    )
+    assert response.status_code == 422
+
+
+def add_runs(task, inputs):
+    runs = []
+    for input in inputs:
+        run = TaskRun(
+            parent=task,
+            input=input,
+            input_source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+            ),
+            output={
+                "output": "Original output",
+                "source": {
+                    "type": "human",
+                    "properties": {"created_by": "Jane Doe"},
+                },
+            },
+        )
+        run.save_to_file()
+        runs.append(run)
+    return runs
+
+
+def test_run_batch_dataset_split(client, task, mock_adapter):
+    add_runs(task, [f"dataset input {i}" for i in range(10)])
+    split = DatasetSplit.from_task("Test Split", task, Train80Test20SplitDefinition)
+    split.save_to_file()
+
+    response, lines = post_batch(
+        client, batch_body(dataset_split_id=split.id, dataset_split_name="test")
+    )
+
+    assert response.status_code == 200
+    results = lines[:-1]
+    assert len(results) == 2
+    test_ids = split.split_contents["test"]
+    for result in results:
+        assert result["source_run_id"] == test_ids[result["index"]]
+        assert result["run"]["input_source"]["type"] == "human"
+    # The original 10 runs, plus one new run per test item
+    assert len(task.runs()) == 12
+
+
+def test_run_batch_dataset_split_all(client, task, mock_adapter):
+    add_runs(task, ["a", "b", "c"])
+    split = DatasetSplit.from_task("Test Split", task, AllSplitDefinition)
+    split.save_to_file()
+
+    response, lines = post_batch(client, batch_body(dataset_split_id=split.id))
+    assert lines[-1]["total"] == 3
+    assert lines[-1]["succeeded"] == 3
+
+
+def test_run_batch_dataset_split_errors(client, task, mock_adapter):
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(dataset_split_id="missing"),
+    )
+    assert response.status_code == 404
+
+    split = DatasetSplit.from_task("Test Split", task, AllSplitDefinition)
+    split.save_to_file()
+    response = client.post(
+        "/api/projects/project1/tasks/task1/run_batch",
+        json=batch_body(dataset_split_id=split.id, dataset_split_name="nope"),
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_stream_batch_run_bounded_concurrency(task, mock_config):
+    active = 0
+    max_active = 0
+
+    class SlowAdapter(MockAdapter):
+        async def _run(self, input: dict | str) -> RunOutput:
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return await super()._run(input)
+
+    adapter = SlowAdapter(task, model_name="phi_3_5", model_provider_name="ollama")
+    inputs = [BatchInput(input=f"input {i}") for i in range(10)]
+    lines = [line async for line in stream_batch_run(adapter, inputs, concurrency=3)]
+
+    assert len(lines) == 11
+    assert max_active == 3
+
+
+def test_run_batch_publishes_progress(client, task, mock_adapter):
+    published = []
+    with patch("kiln_server.batch_run_api.EventBroker.shared") as mock_shared:
+        broker = mock_shared.return_value
+        broker.has_subscribers.return_value = True
+        broker.publish.side_effect = published.append
+        response, lines = post_batch(
+            client, batch_body(plaintext_inputs=["a", "fail", "b"])
+        )
+
+    assert [event["completed"] for event in published] == [1, 2, 3]
+    assert published[-1]["done"]
+    assert published[-1]["failed"] == 1
+    for event in published:
+        assert event["type"] == "batch_progress"
+        assert event["batch_id"] == response.headers["X-Kiln-Batch-Id"]
+        assert event["id"] == task.id
+        assert event["parent_ids"] == {"project": task.parent.id}
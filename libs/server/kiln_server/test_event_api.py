@@ -0,0 +1,206 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskRun,
+)
+from kiln_ai.datamodel.model_events import ModelEvents
+
+from kiln_server.event_api import (
+    EventBroker,
+    connect_event_api,
+    event_matches,
+    event_stream,
+    format_sse,
+)
+
+
+@pytest.fixture
+def model_events():
+    events = ModelEvents()
+    with patch.object(ModelEvents, "shared", return_value=events):
+        yield events
+
+
+@pytest.fixture
+def broker(model_events):
+    return EventBroker()
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def make_run(task):
+    return TaskRun(
+        parent=task,
+        input="Test input",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+        ),
+        output=TaskOutput(
+            output="Test output",
+            source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "Jane Doe"}
+            ),
+        ),
+    )
+
+
+async def next_event(queue: asyncio.Queue):
+    return await asyncio.wait_for(queue.get(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_subscribe_registers_model_listener(broker, model_events):
+    assert not model_events.has_listeners()
+
+    queue = broker.subscribe()
+    second_queue = broker.subscribe()
+    assert model_events.has_listeners()
+    assert broker.has_subscribers()
+
+    broker.unsubscribe(queue)
+    assert model_events.has_listeners()
+    broker.unsubscribe(second_queue)
+    assert not model_events.has_listeners()
+    assert not broker.has_subscribers()
+
+
+@pytest.mark.asyncio
+async def test_run_events(broker, task):
+    queue = broker.subscribe()
+    run = make_run(task)
+    run.save_to_file()
+    run.tags = ["new_tag"]
+    # Saved from a worker thread, as the bulk APIs do
+    await asyncio.to_thread(run.save_to_file)
+    run.delete()
+
+    created = await next_event(queue)
+    assert created["type"] == "created"
+    assert created["model_type"] == "task_run"
+    assert created["id"] == run.id
+    assert created["parent_ids"] == {"task": task.id, "project": task.parent.id}
+    assert created["model"]["input"] == "Test input"
+
+    updated = await next_event(queue)
+    assert updated["type"] == "updated"
+    assert updated["model"]["tags"] == ["new_tag"]
+
+    deleted = await next_event(queue)
+    assert deleted["type"] == "deleted"
+    assert deleted["parent_ids"] == created["parent_ids"]
+    assert "model" not in deleted
+    broker.unsubscribe(queue)
+
+
+@pytest.mark.asyncio
+async def test_parent_ids_cached(broker, task):
+    queue = broker.subscribe()
+    with patch.object(
+        Task, "load_from_file", wraps=Task.load_from_file
+    ) as mock_load_task:
+        make_run(task).save_to_file()
+        make_run(task).save_to_file()
+    assert mock_load_task.call_count == 1
+    broker.unsubscribe(queue)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_gets_resync(model_events):
+    broker = EventBroker(max_queued_events=2)
+    queue = broker.subscribe()
+    for i in range(3):
+        broker.publish({"type": "batch_progress", "completed": i})
+    await asyncio.sleep(0)
+
+    assert await next_event(queue) == {"type": "resync"}
+    assert queue.empty()
+    broker.unsubscribe(queue)
+
+
+def test_event_matches():
+    event = {
+        "type": "updated",
+        "model_type": "task_run",
+        "id": "run1",
+        "parent_ids": {"task": "task1", "project": "project1"},
+    }
+    assert event_matches(event, None, None)
+    assert event_matches(event, "project1", "task1")
+    assert not event_matches(event, "project2", None)
+    assert not event_matches(event, None, "task2")
+
+    task_event = {
+        "type": "batch_progress",
+        "model_type": "task",
+        "id": "task1",
+        "parent_ids": {"project": "project1"},
+    }
+    assert event_matches(task_event, "project1", "task1")
+    assert event_matches({"type": "resync"}, "project1", "task1")
+
+
+def test_format_sse():
+    event = {"type": "resync"}
+    assert format_sse(event) == 'event: resync\ndata: {"type": "resync"}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_event_stream(broker, task):
+    request = MagicMock()
+    stream = event_stream(request, broker, project_id=task.parent.id)
+
+    assert await anext(stream) == ": connected\n\n"
+    assert broker.has_subscribers()
+
+    # Filtered out: another project
+    broker.publish(
+        {"type": "updated", "model_type": "project", "id": "other", "parent_ids": {}}
+    )
+    run = make_run(task)
+    run.save_to_file()
+
+    line = await asyncio.wait_for(anext(stream), timeout=1)
+    event_name, data = line.strip().split("\n")
+    assert event_name == "event: created"
+    assert json.loads(data.removeprefix("data: "))["id"] == run.id
+
+    await stream.aclose()
+    assert not broker.has_subscribers()
+
+
+@pytest.mark.asyncio
+async def test_event_stream_heartbeat_and_disconnect(broker):
+    request = MagicMock()
+    disconnected = [False, True]
+
+    async def is_disconnected():
+        return disconnected.pop(0)
+
+    request.is_disconnected = is_disconnected
+    with patch("kiln_server.event_api.HEARTBEAT_SECONDS", 0.01):
+        lines = [line async for line in event_stream(request, broker)]
+
+    assert lines == [": connected\n\n", ": keepalive\n\n"]
+    assert not broker.has_subscribers()
+
+
+def test_connect_event_api():
+    app = FastAPI()
+    connect_event_api(app)
+    assert "/api/events" in [route.path for route in app.routes]
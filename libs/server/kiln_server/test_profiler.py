@@ -0,0 +1,160 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from kiln_ai.utils.timing import TimingCategory, timed
+
+from kiln_server.profiler import (
+    ENABLED_ENV_VAR,
+    Profile,
+    ProfileStore,
+    ProfileSummary,
+    SamplingProfiler,
+    connect_profiler,
+    fold_stack,
+)
+
+
+def busy_wait(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def make_test_app(enabled=True) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        with timed(TimingCategory.disk_io):
+            await asyncio.sleep(0.01)
+        with timed(TimingCategory.validation):
+            busy_wait(0.05)
+        return {"ok": True}
+
+    connect_profiler(app, enabled=enabled)
+    return app
+
+
+def make_profile(id: str) -> Profile:
+    summary = ProfileSummary(
+        id=id,
+        method="GET",
+        path="/",
+        status_code=200,
+        started_at=datetime.now(),
+        duration_ms=1,
+        sample_count=0,
+        timings_ms={},
+        timing_counts={},
+    )
+    return Profile(summary=summary, stacks=Counter())
+
+
+@pytest.fixture
+def client():
+    return TestClient(make_test_app())
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(ENABLED_ENV_VAR, raising=False)
+    app = FastAPI()
+    connect_profiler(app)
+    assert app.user_middleware == []
+    assert not any(route.path.startswith("/api/debug") for route in app.routes)
+
+
+def test_enabled_by_env(monkeypatch):
+    monkeypatch.setenv(ENABLED_ENV_VAR, "true")
+    app = FastAPI()
+    connect_profiler(app)
+    assert len(app.user_middleware) == 1
+
+
+def test_unselected_requests_not_profiled(client):
+    response = client.get("/slow")
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert client.get("/api/debug/profiles").json() == []
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"headers": {"X-Kiln-Profile": "true"}}, {"params": {"kiln_profile": "1"}}],
+)
+def test_profile_request(client, kwargs):
+    response = client.get("/slow", **kwargs)
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+
+    server_timing = response.headers["server-timing"]
+    assert "disk_io;dur=" in server_timing
+    assert "validation;dur=" in server_timing
+    assert "total;dur=" in server_timing
+    profile_id = response.headers["x-kiln-profile-id"]
+
+    profiles = client.get("/api/debug/profiles").json()
+    assert len(profiles) == 1
+    summary = profiles[0]
+    assert summary["id"] == profile_id
+    assert summary["method"] == "GET"
+    assert summary["path"] == "/slow"
+    assert summary["status_code"] == 200
+    assert summary["duration_ms"] >= 60
+    assert summary["timings_ms"]["validation"] >= 50
+    assert summary["timings_ms"]["provider_call"] == 0
+    assert summary["timing_counts"] == {"disk_io": 1, "validation": 1}
+    assert summary["sample_count"] > 0
+
+    folded = client.get(f"/api/debug/profiles/{profile_id}")
+    assert folded.status_code == 200
+    assert folded.headers["content-type"].startswith("text/plain")
+    lines = folded.text.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_profiler:busy_wait" in line for line in lines)
+
+
+def test_profile_not_found(client):
+    response = client.get("/api/debug/profiles/missing")
+    assert response.status_code == 404
+
+
+def test_profile_store_keeps_most_recent():
+    store = ProfileStore(max_profiles=2)
+    profiles = [make_profile(str(i)) for i in range(3)]
+    for profile in profiles:
+        store.add(profile)
+    assert [summary.id for summary in store.summaries()] == ["2", "1"]
+    assert store.get("0") is None
+    assert store.get("1") is profiles[1]
+
+
+def test_fold_stack():
+    def inner():
+        return sys._getframe()
+
+    stack, has_kiln_frame = fold_stack("MainThread", inner())
+    labels = stack.split(";")
+    assert labels[0] == "MainThread"
+    assert labels[-1] == "kiln_server.test_profiler:test_fold_stack.<locals>.inner"
+    assert has_kiln_frame
+
+
+def test_sampler_stops_when_idle():
+    profiler = SamplingProfiler(interval_seconds=0.001)
+    sampling = profiler.start(threading.get_ident())
+    busy_wait(0.02)
+    profiler.stop(sampling)
+    assert sampling.sample_count > 0
+    assert any("busy_wait" in stack for stack in sampling.stacks)
+    for _ in range(100):
+        if profiler._thread is None:
+            break
+        time.sleep(0.005)
+    assert profiler._thread is None
@@ -6,7 +6,8 @@ import pytest
 from fastapi import FastAPI
 from fastapi.exceptions import HTTPException
 from fastapi.testclient import TestClient
-from kiln_ai.datamodel import Project
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.datamodel.listing_index import ListingIndex
 from kiln_ai.utils.config import Config
 
 from kiln_server.custom_errors import connect_custom_errors
@@ -496,3 +497,28 @@ def test_update_project_invalid_data(client, tmp_path):
     assert response.status_code == 422
     assert "Input should be a valid string" in response.text
     mock_project_from_id.assert_called_once_with(original_project.id)
+
+
+def test_get_project_listings(client, tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project" / "project.kiln")
+    project.save_to_file()
+    Task(name="Test Task", instruction="Instruction", parent=project).save_to_file()
+
+    with (
+        patch.object(Config, "shared") as mock_config,
+        patch.object(ListingIndex, "shared", return_value=ListingIndex()),
+    ):
+        mock_config.return_value.projects = [
+            str(project.path),
+            str(tmp_path / "missing" / "project.kiln"),
+        ]
+        response = client.get("/api/project_listings")
+
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result) == 1
+    assert result[0]["id"] == project.id
+    assert result[0]["name"] == "Test Project"
+    assert result[0]["path"] == str(project.path)
+    assert result[0]["task_count"] == 1
+    assert result[0]["counts"]["runs"] == 0
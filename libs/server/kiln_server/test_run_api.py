@@ -1,28 +1,48 @@
+import asyncio
+import json
+import os
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import FastAPI, HTTPException
 from fastapi.testclient import TestClient
 from kiln_ai.adapters.ml_model_list import ModelProviderName
-from kiln_ai.adapters.model_adapters.langchain_adapters import LangchainAdapter
+from kiln_ai.adapters.model_adapters.ollama_adapter import OllamaAdapter
+from kiln_ai.adapters.response_cache import ResponseCacheMode
+from kiln_ai.adapters.retry_policy import RetryPolicies
+from kiln_ai.adapters.run_output import StreamDelta
 from kiln_ai.datamodel import (
     DataSource,
     DataSourceType,
     Project,
+    RunTimings,
     Task,
     TaskOutput,
     TaskOutputRating,
     TaskOutputRatingType,
     TaskRun,
+    Usage,
 )
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.multi_process import MultiProcess
+from kiln_ai.datamodel.search_index import SearchIndex
+from kiln_ai.utils.file_lock import FileLock, FileLockTimeout
 
 from kiln_server.custom_errors import connect_custom_errors
 from kiln_server.run_api import (
+    RUN_LOCK_STRIPES,
+    RunJsonCache,
     RunSummary,
+    acquire_file_lock,
     connect_run_api,
     deep_update,
+    default_run_path,
     model_provider_from_string,
     run_from_id,
+    run_json_cache,
+    run_lock_stripe,
+    run_locks,
+    run_update_locks,
 )
 
 
@@ -107,7 +127,7 @@ async def test_run_task_success(client, task_run_setup):
 
     with (
         patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
-        patch.object(LangchainAdapter, "invoke", new_callable=AsyncMock) as mock_invoke,
+        patch.object(OllamaAdapter, "invoke", new_callable=AsyncMock) as mock_invoke,
         patch("kiln_ai.utils.config.Config.shared") as MockConfig,
     ):
         mock_task_from_id.return_value = task
@@ -128,6 +148,101 @@ async def test_run_task_success(client, task_run_setup):
     assert res["id"] is not None
 
 
+@pytest.mark.asyncio
+async def test_run_task_response_cache_mode(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    run_task_request = {
+        **task_run_setup["run_task_request"],
+        "response_cache": "bypass",
+    }
+
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch.object(OllamaAdapter, "invoke", new_callable=AsyncMock) as mock_invoke,
+        patch("kiln_ai.utils.config.Config.shared"),
+    ):
+        mock_task_from_id.return_value = task
+        mock_invoke.return_value = task_run_setup["task_run"]
+
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/run", json=run_task_request
+        )
+
+    assert response.status_code == 200
+    mock_invoke.assert_called_once_with(
+        run_task_request["plaintext_input"], cache_mode=ResponseCacheMode.bypass
+    )
+
+
+def post_stream(client, project, task, body):
+    response = client.post(
+        f"/api/projects/{project.id}/tasks/{task.id}/run_stream", json=body
+    )
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    return response, lines
+
+
+@pytest.mark.asyncio
+async def test_run_task_stream(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    async def invoke_stream(self, input, input_source=None, cache_mode=None):
+        assert input == task_run_setup["run_task_request"]["plaintext_input"]
+        yield StreamDelta(channel="reasoning", text="thinking")
+        yield StreamDelta(channel="output", text="Test output")
+        yield task_run
+
+    with (
+        patch("kiln_server.run_api.task_from_id", return_value=task),
+        patch.object(OllamaAdapter, "invoke_stream", invoke_stream),
+        patch("kiln_ai.utils.config.Config.shared"),
+    ):
+        response, lines = post_stream(
+            client, project, task, task_run_setup["run_task_request"]
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert lines[:2] == [
+        {"type": "delta", "channel": "reasoning", "text": "thinking"},
+        {"type": "delta", "channel": "output", "text": "Test output"},
+    ]
+    assert lines[2]["type"] == "run"
+    assert lines[2]["run"]["output"]["output"] == "Test output"
+
+
+@pytest.mark.asyncio
+async def test_run_task_stream_errors(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+
+    async def invoke_stream(self, input, input_source=None, cache_mode=None):
+        yield StreamDelta(channel="output", text="{")
+        raise RuntimeError("structured response is not a dict")
+
+    with (
+        patch("kiln_server.run_api.task_from_id", return_value=task),
+        patch.object(OllamaAdapter, "invoke_stream", invoke_stream),
+        patch("kiln_ai.utils.config.Config.shared"),
+    ):
+        response, lines = post_stream(
+            client, project, task, task_run_setup["run_task_request"]
+        )
+        assert response.status_code == 200
+        assert lines == [
+            {"type": "delta", "channel": "output", "text": "{"},
+            {"type": "error", "error": "structured response is not a dict"},
+        ]
+
+        # Missing input fails before streaming
+        body = {**task_run_setup["run_task_request"], "plaintext_input": None}
+        response, _ = post_stream(client, project, task, body)
+        assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_run_task_structured_output(client, task_run_setup):
     task = task_run_setup["task"]
@@ -135,7 +250,7 @@ async def test_run_task_structured_output(client, task_run_setup):
 
     with (
         patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
-        patch.object(LangchainAdapter, "invoke", new_callable=AsyncMock) as mock_invoke,
+        patch.object(OllamaAdapter, "invoke", new_callable=AsyncMock) as mock_invoke,
         patch("kiln_ai.utils.config.Config.shared") as MockConfig,
     ):
         mock_task_from_id.return_value = task
@@ -197,7 +312,7 @@ async def test_run_task_structured_input(client, task_run_setup):
         with (
             patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
             patch.object(
-                LangchainAdapter, "invoke", new_callable=AsyncMock
+                OllamaAdapter, "invoke", new_callable=AsyncMock
             ) as mock_invoke,
             patch("kiln_ai.utils.config.Config.shared") as MockConfig,
         ):
@@ -523,8 +638,8 @@ def test_run_from_id_not_found(test_run):
 
 
 async def test_get_run_success(client, test_run):
-    with patch("kiln_server.run_api.run_from_id") as mock_run_from_id:
-        mock_run_from_id.return_value = test_run
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = test_run.parent
         response = client.get(
             f"/api/projects/{test_run.parent.parent.id}/tasks/{test_run.parent.id}/runs/{test_run.id}"
         )
@@ -537,8 +652,8 @@ async def test_get_run_success(client, test_run):
 
 
 async def test_get_run_not_found(client):
-    with patch("kiln_server.run_api.run_from_id") as mock_run_from_id:
-        mock_run_from_id.side_effect = HTTPException(
+    with patch("kiln_server.run_api.run_json_from_id") as mock_run_json_from_id:
+        mock_run_json_from_id.side_effect = HTTPException(
             status_code=404, detail="Run not found"
         )
         response = client.get(
@@ -1219,9 +1334,635 @@ async def test_remove_tags_multiple_runs(client, task_run_setup):
     assert set(updated_run2.tags) == {"tag3"}
 
 
+def add_second_run(task) -> TaskRun:
+    second_run = TaskRun(
+        parent=task,
+        input="Test input 2",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "Test User"}
+        ),
+        output=TaskOutput(
+            output="Test output 2",
+            source=DataSource(
+                type=DataSourceType.human,
+                properties={"created_by": "Test User"},
+            ),
+        ),
+    )
+    second_run.save_to_file()
+    return second_run
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_tags_and_rating(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    task_run.tags = ["tag1"]
+    task_run.save_to_file()
+    second_run = add_second_run(task)
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={
+                "run_ids": [task_run.id, second_run.id],
+                "add_tags": ["reviewed"],
+                "remove_tags": ["tag1"],
+                "rating": {"value": 5, "type": "five_star"},
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "results": [
+            {"run_id": task_run.id, "success": True, "modified": True, "error": None},
+            {
+                "run_id": second_run.id,
+                "success": True,
+                "modified": True,
+                "error": None,
+            },
+        ]
+    }
+
+    for run_id in [task_run.id, second_run.id]:
+        updated_run = TaskRun.from_id_and_parent_path(run_id, task.path)
+        assert updated_run.tags == ["reviewed"]
+        assert updated_run.output.rating.value == 5.0
+        assert updated_run.output.rating.type == TaskOutputRatingType.five_star
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_merges_rating(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    task_run.output.rating = TaskOutputRating(
+        value=2, requirement_ratings={"req1": {"value": 3, "type": "five_star"}}
+    )
+    task_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={"run_ids": [task_run.id], "rating": {"value": 4}},
+        )
+
+    assert response.status_code == 200
+    updated_run = TaskRun.from_id_and_parent_path(task_run.id, task.path)
+    assert updated_run.output.rating.value == 4.0
+    assert updated_run.output.rating.requirement_ratings["req1"].value == 3.0
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_fields(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={
+                "run_ids": [task_run.id],
+                "fields": {
+                    "repair_instructions": "Fix it",
+                    "repaired_output": {
+                        "output": "Fixed output",
+                        "source": {
+                            "type": "human",
+                            "properties": {"created_by": "Jane Doe"},
+                        },
+                    },
+                },
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json()["results"][0]["success"] is True
+    updated_run = TaskRun.from_id_and_parent_path(task_run.id, task.path)
+    assert updated_run.repair_instructions == "Fix it"
+    assert updated_run.repaired_output.output == "Fixed output"
+    # untouched fields are preserved
+    assert updated_run.input == "Test input"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_partial_failure(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    second_run = add_second_run(task)
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={
+                "run_ids": [task_run.id, "missing_run", second_run.id],
+                "fields": {"repair_instructions": "Missing repaired output"},
+            },
+        )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["run_id"] for r in results] == [
+        task_run.id,
+        "missing_run",
+        second_run.id,
+    ]
+    assert results[1] == {
+        "run_id": "missing_run",
+        "success": False,
+        "modified": False,
+        "error": "Run not found",
+    }
+    # Invalid patch is reported per run, and nothing is written
+    assert results[0]["success"] is False
+    assert "repaired output is required" in results[0]["error"]
+    updated_run = TaskRun.from_id_and_parent_path(task_run.id, task.path)
+    assert updated_run.repair_instructions is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_immutable_field(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={"run_ids": [task_run.id], "fields": {"id": "new_id"}},
+        )
+
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert result["success"] is False
+    assert result["error"] == "Run field 'id' can not be updated."
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_unmodified_not_saved(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    task_run.tags = ["tag1"]
+    task_run.save_to_file()
+
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch("kiln_server.run_api.save_all", return_value=[]) as mock_save_all,
+    ):
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={"run_ids": [task_run.id], "add_tags": ["tag1"]},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["results"][0]["modified"] is False
+    mock_save_all.assert_called_once_with([])
+
+
+@pytest.mark.asyncio
+async def test_update_run_conflict(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch.object(TaskRun, "modified_on_disk", return_value=True),
+    ):
+        mock_task_from_id.return_value = task
+        response = client.patch(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/{task_run.id}",
+            json={"input": "Updated input"},
+        )
+
+    assert response.status_code == 409
+    assert "modified by another request" in response.json()["message"]
+    # Not overwritten
+    updated_run = TaskRun.from_id_and_parent_path(task_run.id, task.path)
+    assert updated_run.input == "Test input"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_conflict(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch.object(TaskRun, "modified_on_disk", return_value=True),
+    ):
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/bulk_update",
+            json={"run_ids": [task_run.id], "add_tags": ["new_tag"]},
+        )
+
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert result["success"] is False
+    assert "modified by another request" in result["error"]
+    updated_run = TaskRun.from_id_and_parent_path(task_run.id, task.path)
+    assert updated_run.tags == []
+
+
+def test_run_lock_stripe():
+    assert run_lock_stripe("123") == run_lock_stripe("123")
+    stripes = set(run_lock_stripe(str(i)) for i in range(1000))
+    assert len(stripes) == RUN_LOCK_STRIPES
+    assert all(0 <= stripe < RUN_LOCK_STRIPES for stripe in stripes)
+
+
+@pytest.mark.asyncio
+async def test_run_update_locks_only_lock_matching_stripes():
+    run_id = "run1"
+    other_run_id = next(
+        str(i)
+        for i in range(1000)
+        if run_lock_stripe(str(i)) != run_lock_stripe(run_id)
+    )
+
+    async with run_update_locks([run_id, run_id]):
+        assert run_locks[run_lock_stripe(run_id)].locked()
+        assert not run_locks[run_lock_stripe(other_run_id)].locked()
+        # Other runs can be updated in parallel
+        async with run_update_locks([other_run_id]):
+            assert run_locks[run_lock_stripe(other_run_id)].locked()
+
+    assert not run_locks[run_lock_stripe(run_id)].locked()
+
+
+@pytest.mark.asyncio
+async def test_run_update_locks_serialize_same_run():
+    order = []
+
+    async def update(name: str):
+        async with run_update_locks(["same_run"]):
+            order.append(f"{name}_start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}_end")
+
+    await asyncio.gather(update("a"), update("b"))
+    assert order == ["a_start", "a_end", "b_start", "b_end"]
+
+
 def test_model_provider_from_string():
     assert model_provider_from_string("openai") == ModelProviderName.openai
     assert model_provider_from_string("ollama") == ModelProviderName.ollama
 
     with pytest.raises(ValueError, match="Unsupported provider: unknown"):
         model_provider_from_string("unknown")
+
+
+@pytest.mark.asyncio
+async def test_get_runs_summaries_tag_filter(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    task_run.tags = ["reviewed", "synthetic"]
+    task_run.save_to_file()
+    second_run = add_second_run(task)
+    second_run.tags = ["synthetic"]
+    second_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        url = f"/api/projects/{project.id}/tasks/{task.id}/runs_summaries"
+
+        response = client.get(url, params={"tags": "synthetic"})
+        assert response.status_code == 200
+        assert {r["id"] for r in response.json()} == {task_run.id, second_run.id}
+
+        response = client.get(
+            url, params={"tags": "synthetic", "exclude_tags": "reviewed"}
+        )
+        assert [r["id"] for r in response.json()] == [second_run.id]
+
+        response = client.get(url, params={"any_tags": ["reviewed", "missing"]})
+        assert [r["id"] for r in response.json()] == [task_run.id]
+
+        response = client.get(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs",
+            params={"tags": "reviewed"},
+        )
+        assert [r["id"] for r in response.json()] == [task_run.id]
+
+
+@pytest.mark.asyncio
+async def test_get_tag_counts(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    task_run.tags = ["reviewed", "synthetic"]
+    task_run.save_to_file()
+    second_run = add_second_run(task)
+    second_run.tags = ["synthetic"]
+    second_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.get(f"/api/projects/{project.id}/tasks/{task.id}/tag_counts")
+
+    assert response.status_code == 200
+    assert response.json() == {"reviewed": 1, "synthetic": 2}
+
+
+@pytest.fixture
+def search_index(tmp_path):
+    index = SearchIndex(index_dir=tmp_path / "search_index")
+    with patch.object(SearchIndex, "shared", return_value=index):
+        yield index
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_search_runs(client, task_run_setup, search_index):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+    second_run = add_second_run(task)
+    second_run.input = "Something about zebras"
+    second_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        url = f"/api/projects/{project.id}/tasks/{task.id}/search_runs"
+
+        response = client.get(url, params={"q": "zebra"})
+        assert response.status_code == 200
+        result = response.json()
+        assert result["total"] == 1
+        assert result["results"][0]["run"]["id"] == second_run.id
+        assert "[zebras]" in result["results"][0]["snippet"]
+
+        response = client.get(url, params={"q": "test output", "limit": 1})
+        result = response.json()
+        assert result["total"] == 2
+        assert len(result["results"]) == 1
+
+        response = client.get(url, params={"q": "output 2", "offset": 0})
+        assert [r["run"]["id"] for r in response.json()["results"]] == [second_run.id]
+        assert task_run.id not in [r["run"]["id"] for r in response.json()["results"]]
+
+
+@pytest.mark.asyncio
+async def test_search_runs_loads_hits_by_path(client, task_run_setup, search_index):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    second_run = add_second_run(task)
+    second_run.input = "Something about zebras"
+    second_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        url = f"/api/projects/{project.id}/tasks/{task.id}/search_runs"
+        # First search syncs the index with disk
+        assert client.get(url, params={"q": "zebra"}).json()["total"] == 1
+
+        # Later searches don't scan the runs folder
+        with patch.object(
+            TaskRun,
+            "iterate_children_paths_of_parent_path",
+            side_effect=AssertionError("scanned runs folder"),
+        ):
+            response = client.get(url, params={"q": "zebra"})
+        assert response.status_code == 200
+        assert response.json()["results"][0]["run"]["id"] == second_run.id
+
+        # Removed without an event (eg by another process): the hit is dropped
+        os.remove(second_run.path)
+        response = client.get(url, params={"q": "zebra"})
+        assert response.status_code == 200
+        assert response.json()["results"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_runs_invalid(client, task_run_setup, search_index):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        url = f"/api/projects/{project.id}/tasks/{task.id}/search_runs"
+
+        response = client.get(url, params={"q": 'bad "quote', "raw": True})
+        assert response.status_code == 400
+        assert "Invalid search query" in response.json()["message"]
+
+        response = client.get(url, params={"q": "test", "limit": 0})
+        assert response.status_code == 422
+
+
+@pytest.fixture
+def clear_run_json_cache():
+    run_json_cache.clear()
+    # As on file systems with fine-grained timestamps, where the cache is used
+    with patch.object(ModelCache, "enabled", return_value=True):
+        yield
+    run_json_cache.clear()
+
+
+def get_run_url(run: TaskRun) -> str:
+    return f"/api/projects/{run.parent.parent.id}/tasks/{run.parent.id}/runs/{run.id}"
+
+
+async def test_get_run_matches_model_serialization(
+    client, test_run, clear_run_json_cache
+):
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = test_run.parent
+        response = client.get(get_run_url(test_run))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == json.loads(test_run.model_dump_json())
+
+
+async def test_get_run_cached_until_file_changes(
+    client, test_run, clear_run_json_cache
+):
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch.object(
+            TaskRun, "load_from_file", wraps=TaskRun.load_from_file
+        ) as mock_load,
+    ):
+        mock_task_from_id.return_value = test_run.parent
+        first = client.get(get_run_url(test_run))
+        second = client.get(get_run_url(test_run))
+        assert mock_load.call_count == 1
+        assert first.content == second.content
+        assert first.headers["etag"] == second.headers["etag"]
+
+        test_run.tags = ["updated_tag"]
+        test_run.save_to_file()
+        # Make sure the change is visible even with coarse file timestamps
+        stat = os.stat(test_run.path)
+        os.utime(test_run.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        third = client.get(get_run_url(test_run))
+
+    assert mock_load.call_count == 2
+    assert third.json()["tags"] == ["updated_tag"]
+    assert third.headers["etag"] != first.headers["etag"]
+
+
+async def test_get_run_cache_evicted_on_save(client, test_run, clear_run_json_cache):
+    test_run.tags = ["a"]
+    test_run.save_to_file()
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = test_run.parent
+        first = client.get(get_run_url(test_run))
+        assert test_run.path in run_json_cache._entries
+
+        # Same size, and (on coarse file systems) possibly the same mtime
+        test_run.tags = ["b"]
+        test_run.save_to_file()
+        assert test_run.path not in run_json_cache._entries
+        second = client.get(get_run_url(test_run))
+
+    assert second.json()["tags"] == ["b"]
+    assert second.headers["etag"] != first.headers["etag"]
+
+
+async def test_get_run_uncached_with_coarse_timestamps(client, test_run):
+    run_json_cache.clear()
+    with (
+        patch("kiln_server.run_api.task_from_id") as mock_task_from_id,
+        patch.object(ModelCache, "enabled", return_value=False),
+        patch.object(
+            TaskRun, "load_from_file", wraps=TaskRun.load_from_file
+        ) as mock_load,
+    ):
+        mock_task_from_id.return_value = test_run.parent
+        first = client.get(get_run_url(test_run))
+        second = client.get(get_run_url(test_run))
+
+    assert mock_load.call_count == 2
+    assert first.content == second.content
+    # From the content, so still usable for If-None-Match
+    assert first.headers["etag"] == second.headers["etag"]
+    assert run_json_cache._entries == {}
+
+
+async def test_get_run_not_modified(client, test_run, clear_run_json_cache):
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = test_run.parent
+        first = client.get(get_run_url(test_run))
+        response = client.get(
+            get_run_url(test_run), headers={"If-None-Match": first.headers["etag"]}
+        )
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+async def test_get_run_non_default_path(client, test_run, clear_run_json_cache):
+    # Runs moved to another folder name are found by scanning
+    moved_dir = test_run.path.parent.parent / "renamed_run"
+    test_run.path.parent.rename(moved_dir)
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = test_run.parent
+        response = client.get(get_run_url(test_run))
+        missing = client.get(
+            f"/api/projects/{test_run.parent.parent.id}/tasks/{test_run.parent.id}/runs/missing"
+        )
+
+    assert response.status_code == 200
+    assert response.json()["id"] == test_run.id
+    assert response.json()["path"] == str(moved_dir / "task_run.kiln")
+    assert missing.status_code == 404
+
+
+def test_default_run_path(test_run):
+    task = test_run.parent
+    assert default_run_path(task, test_run.id) == test_run.path
+    assert default_run_path(task, "..") is None
+    assert default_run_path(task, "../other") is None
+
+
+def test_run_json_cache_evicts_oldest(tmp_path, test_run):
+    cache = RunJsonCache(max_size=2)
+    stat = os.stat(test_run.path)
+    for name in ["a", "b", "c"]:
+        cache.set(tmp_path / name, stat, test_run)
+
+    assert cache.get(tmp_path / "a", stat) is None
+    assert cache.get(tmp_path / "b", stat) is not None
+    assert cache.get(tmp_path / "c", stat).run_id == test_run.id
+
+
+@pytest.mark.asyncio
+async def test_run_update_locks_multi_process(tmp_path):
+    multi_process = MultiProcess()
+    multi_process._state_dir = tmp_path
+    run_id = "run1"
+    stripe = run_lock_stripe(run_id)
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        async with run_update_locks([run_id]):
+            # Held across processes: another process can't take it
+            with pytest.raises(FileLockTimeout):
+                multi_process.lock(f"run_stripe_{stripe}").acquire(timeout=0)
+        # Released on exit
+        with multi_process.lock(f"run_stripe_{stripe}"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_acquire_file_lock_cancelled(tmp_path):
+    path = tmp_path / "test.lock"
+    waiting = FileLock(path)
+    with FileLock(path):
+        task = asyncio.create_task(acquire_file_lock(waiting))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    # The abandoned acquire gets the lock once free, and gives it straight back
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not waiting.is_locked:
+            break
+    with FileLock(path, timeout=5):
+        pass
+
+
+def test_get_model_call_metrics(client):
+    policies = RetryPolicies()
+    policies._count(policies._state("openai/gpt_4o"), "retries")
+    with patch.object(RetryPolicies, "shared", return_value=policies):
+        response = client.get("/api/model_call_metrics")
+    assert response.status_code == 200
+    assert response.json()["openai/gpt_4o"]["retries"] == 1
+
+
+def test_get_usage_stats(client, task_run_setup):
+    task = task_run_setup["task"]
+    run = task_run_setup["task_run"]
+    run.usage = Usage(input_tokens=100, output_tokens=20, cost=0.5)
+    run.timings = RunTimings(total_ms=200, provider_call_ms=150)
+    run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id", return_value=task):
+        response = client.get("/api/projects/project1/tasks/task1/usage_stats")
+
+    assert response.status_code == 200
+    stats = response.json()
+    model_stats = stats["by_model"]["ollama/gpt_4o"]
+    assert model_stats["runs"] == 1
+    assert model_stats["input_tokens"] == 100
+    assert model_stats["total_cost"] == 0.5
+    assert model_stats["latency"]["p50_ms"] == 200
+    assert model_stats["provider_latency"]["mean_ms"] == 150
+    assert stats["by_prompt"]["simple_prompt_builder"]["runs"] == 1
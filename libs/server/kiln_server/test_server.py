@@ -0,0 +1,88 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from kiln_ai.adapters.model_adapters.openai_client_pool import OpenAIClientPool
+from kiln_ai.datamodel.multi_process import MultiProcess
+
+from kiln_server.server import (
+    WARM_UP_ENV_VAR,
+    WORKERS_ENV_VAR,
+    MultiProcessMiddleware,
+    make_app,
+    worker_count,
+)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(None, 1), ("1", 1), ("4", 4), ("0", 1), ("many", 1)],
+)
+def test_worker_count(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv(WORKERS_ENV_VAR, raising=False)
+    else:
+        monkeypatch.setenv(WORKERS_ENV_VAR, value)
+    assert worker_count() == expected
+
+
+def test_single_worker_app(monkeypatch):
+    monkeypatch.delenv(WORKERS_ENV_VAR, raising=False)
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        app = make_app()
+    assert not multi_process.enabled
+    assert all(m.cls is not MultiProcessMiddleware for m in app.user_middleware)
+
+
+def test_multi_worker_app_checks_for_changes(monkeypatch):
+    monkeypatch.setenv(WORKERS_ENV_VAR, "2")
+    multi_process = MultiProcess()
+    with patch.object(MultiProcess, "shared", return_value=multi_process):
+        app = make_app()
+        assert multi_process.enabled
+        with patch.object(multi_process, "check_for_changes") as mock_check:
+            response = TestClient(app).get("/ping")
+            assert response.status_code == 200
+            mock_check.assert_called_once()
+    multi_process.disable()
+
+
+def test_lifespan_closes_client_pool(monkeypatch):
+    monkeypatch.delenv(WARM_UP_ENV_VAR, raising=False)
+    pool = OpenAIClientPool()
+    with (
+        patch.object(OpenAIClientPool, "shared", return_value=pool),
+        patch.object(pool, "aclose", wraps=pool.aclose) as mock_aclose,
+        patch.object(pool, "warm_up") as mock_warm_up,
+    ):
+        with TestClient(make_app()) as client:
+            assert client.get("/ping").status_code == 200
+        mock_aclose.assert_awaited_once()
+        mock_warm_up.assert_not_called()
+
+
+def test_lifespan_warm_up_and_wrapped_lifespan(monkeypatch):
+    monkeypatch.setenv(WARM_UP_ENV_VAR, "true")
+    pool = OpenAIClientPool()
+    events = []
+
+    @asynccontextmanager
+    async def app_lifespan(app):
+        events.append("start")
+        yield
+        events.append("stop")
+
+    with (
+        patch.object(OpenAIClientPool, "shared", return_value=pool),
+        patch.object(pool, "warm_up", new_callable=AsyncMock) as mock_warm_up,
+        patch(
+            "kiln_server.server.connected_openai_compatible_configs",
+            return_value=["config"],
+        ),
+    ):
+        with TestClient(make_app(lifespan=app_lifespan)):
+            assert events == ["start"]
+        assert events == ["start", "stop"]
+        mock_warm_up.assert_awaited_once_with(["config"])
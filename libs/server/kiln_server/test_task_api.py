@@ -7,6 +7,7 @@ from kiln_ai.datamodel import (
     Project,
     Task,
 )
+from kiln_ai.datamodel.listing_index import ListingIndex
 
 from kiln_server.custom_errors import connect_custom_errors
 from kiln_server.task_api import connect_task_api, task_from_id
@@ -316,3 +317,35 @@ def test_update_task_unexpected_return_type(client, project_and_task):
 
     assert response.status_code == 500
     assert response.json()["message"] == "Failed to patch task."
+
+
+def test_get_task_listings(client, project_and_task):
+    project, task = project_and_task
+    with (
+        patch("kiln_server.task_api.project_from_id", return_value=project),
+        patch.object(ListingIndex, "shared", return_value=ListingIndex()),
+    ):
+        response = client.get(f"/api/projects/{project.id}/task_listings")
+
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result) == 1
+    assert result[0]["id"] == task.id
+    assert result[0]["name"] == "Test Task"
+    assert result[0]["description"] == "This is a test task"
+    assert result[0]["counts"] == {
+        "runs": 0,
+        "rated": 0,
+        "repaired": 0,
+        "dataset_splits": 0,
+        "finetunes": 0,
+    }
+
+
+def test_get_task_listings_project_not_found(client):
+    with patch(
+        "kiln_server.task_api.project_from_id",
+        side_effect=HTTPException(status_code=404, detail="Project not found"),
+    ):
+        response = client.get("/api/projects/missing/task_listings")
+    assert response.status_code == 404